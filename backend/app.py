@@ -2,6 +2,7 @@ import os
 import json
 import logging
 import asyncio
+import multiprocessing
 from flask import Flask, jsonify, request
 from flask_cors import CORS
 from flask_socketio import SocketIO, emit, join_room, leave_room
@@ -30,8 +31,14 @@ def validate_config():
 
     return len(missing) == 0
 
+from utils.json_provider import ORJSONProvider
+from utils.compression import init_compression
+
 app = Flask(__name__)
-CORS(app)
+# orjson-backed jsonify / request.get_json, with a stdlib fallback
+app.json = ORJSONProvider(app)
+# Expose pagination cursors to browser clients
+CORS(app, expose_headers=["X-Next-Cursor"])
 
 # Initialize SocketIO for real-time conflict notifications
 socketio = SocketIO(app, cors_allowed_origins="*", async_mode='threading')
@@ -80,6 +87,9 @@ except Exception as e:
     logger.warning(f"Firebase initialization failed. Using mock mode. Error: {e}")
     db = None
 
+# Shared with request-time helpers (e.g. project access checks) without importing app
+app.extensions['firestore'] = db
+
 # Initialize Gemini AI
 gemini_api_key = os.getenv('GOOGLE_API_KEY')
 if gemini_api_key:
@@ -141,7 +151,7 @@ except Exception as e:
 # Most routes import 'app' to get 'db', or expect services to have it.
 # We need to make sure services handle db being None.
 
-from routes import story_bible, editor, visual_planning, continuity, inspiration, assets, export_routes, auth, sync, health
+from routes import story_bible, editor, visual_planning, continuity, inspiration, assets, export_routes, auth, sync, health, search
 
 # Register blueprints
 app.register_blueprint(auth.bp, url_prefix='/api/auth')
@@ -153,8 +163,12 @@ app.register_blueprint(inspiration.bp, url_prefix='/api/inspiration')
 app.register_blueprint(assets.bp, url_prefix='/api/assets')
 app.register_blueprint(export_routes.bp, url_prefix='/api/export')
 app.register_blueprint(sync.bp, url_prefix='/api/sync')
+app.register_blueprint(search.bp, url_prefix='/api/search')
 app.register_blueprint(health.health_bp, url_prefix='/api/diagnostics')
 
+# Gzip/Brotli for JSON and text bodies above COMPRESSION_MIN_SIZE
+init_compression(app)
+
 @app.after_request
 def set_security_headers(response):
     """Add security headers to all responses"""
@@ -326,6 +340,8 @@ def shutdown_workers(exception):
             logger.error(f"Error stopping worker for {user_id}: {e}")
 
 if __name__ == '__main__':
+    # Lets export render workers start from the frozen desktop executable
+    multiprocessing.freeze_support()
     port = int(os.getenv('PORT', 5000))
     debug_mode = os.getenv('FLASK_ENV', 'production') == 'development'
     # Use socketio.run instead of app.run for WebSocket support
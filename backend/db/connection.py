@@ -6,8 +6,9 @@ from .schema import DatabaseSchema, DB_PATH
 class DatabaseManager:
     """High-level database operations for offline-first sync"""
 
-    def __init__(self):
+    def __init__(self, search_index=None):
         DatabaseSchema.init_database()
+        self.search_index = search_index
 
     def _get_conn(self):
         """Get database connection"""
@@ -49,6 +50,7 @@ class DatabaseManager:
             ''', (doc_id, user_id, content, device_id, new_version, now))
 
             conn.commit()
+            self._index_document(user_id, doc_id, title, content)
 
             return {
                 'version': new_version,
@@ -59,6 +61,23 @@ class DatabaseManager:
         finally:
             conn.close()
 
+    def _index_document(self, user_id: str, doc_id: str, title: Optional[str], content: str):
+        """Keep the full-text search index in step with a saved document"""
+        if self.search_index:
+            try:
+                self.search_index.index_document(user_id, doc_id, title, content)
+            except Exception as e:
+                print(f"Warning: Failed to update search index: {e}")
+
+    async def reindex_search(self, user_id: str) -> int:
+        """Index all of a user's documents for search; returns how many were (re)indexed"""
+        if not self.search_index:
+            return 0
+        return sum(
+            self.search_index.index_document(user_id, doc['id'], doc.get('title'), doc['content'])
+            for doc in await self.get_all_documents(user_id)
+        )
+
     async def get_document(self, user_id: str, doc_id: str) -> Optional[Dict]:
         """Fetch latest version of document"""
         conn = self._get_conn()
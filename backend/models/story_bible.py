@@ -3,7 +3,7 @@ Story Bible Models
 Central data structures for tracking story elements
 """
 
-from dataclasses import dataclass, asdict
+from dataclasses import dataclass, asdict, field
 from typing import List, Dict, Optional
 from datetime import datetime
 
@@ -20,6 +20,7 @@ class Character:
     notes: str
     created_at: str
     updated_at: str
+    aliases: List[str] = field(default_factory=list)  # Other names used in the text
     
     def to_dict(self):
         return asdict(self)
@@ -85,6 +86,7 @@ class PlotPoint:
     notes: str
     created_at: str
     updated_at: str
+    rank: Optional[str] = None  # Fractional key ordering plot points
     
     def to_dict(self):
         return asdict(self)
@@ -109,6 +111,7 @@ class Scene:
     notes: str
     created_at: str
     updated_at: str
+    rank: Optional[str] = None  # Fractional key ordering the manuscript
     
     def to_dict(self):
         return asdict(self)
@@ -6,9 +6,12 @@ API endpoints for AI-powered continuity checking
 from flask import Blueprint, request, jsonify
 from services.continuity_tracker_service import ContinuityTrackerService
 from services.story_bible_service import StoryBibleService
+from services.embedding_index import get_embedding_index
+from services.mention_index import get_mention_index
 from firebase_admin import firestore
 from utils.auth import require_project_access
 from utils.rate_limiter import ai_rate_limit
+from utils.ai_quota import ai_quota, CONTINUITY_CHECK_TOKENS
 
 bp = Blueprint('continuity', __name__)
 
@@ -16,16 +19,17 @@ bp = Blueprint('continuity', __name__)
 try:
     db = firestore.client()
     continuity_service = ContinuityTrackerService(db)
-    story_bible_service = StoryBibleService(db)
+    story_bible_service = StoryBibleService(db, get_embedding_index(), mention_index=get_mention_index())
 except Exception as e:
     print(f"Warning: Failed to initialize Firestore client: {e}")
     db = None
     continuity_service = ContinuityTrackerService(None)
-    story_bible_service = StoryBibleService(None)
+    story_bible_service = StoryBibleService(None, get_embedding_index(), mention_index=get_mention_index())
 
 @bp.route('/check/<project_id>', methods=['POST'])
 @require_project_access
 @ai_rate_limit
+@ai_quota(CONTINUITY_CHECK_TOKENS)
 def check_continuity(current_user, project_id):
     """Check for continuity issues in the manuscript"""
     result = continuity_service.perform_full_check(project_id, story_bible_service)
@@ -6,9 +6,14 @@ API endpoints for AI-powered text generation
 from flask import Blueprint, request, jsonify
 from services.ai_editor_service import AIEditorService
 from services.story_bible_service import StoryBibleService
+from services.embedding_index import get_embedding_index
+from services.mention_index import get_mention_index
 from firebase_admin import firestore
 import firebase_admin
 from utils.rate_limiter import ai_rate_limit
+from utils.ai_quota import (
+    ai_quota, scene_cost, dialogue_cost, rewrite_cost, summarize_cost, continue_cost
+)
 from utils.auth import require_auth
 from utils.validation import validate_request
 from schemas.editor_schemas import (
@@ -28,19 +33,20 @@ ai_editor_service = AIEditorService()
 try:
     if firebase_admin._apps:
         db = firestore.client()
-        story_bible_service = StoryBibleService(db)
+        story_bible_service = StoryBibleService(db, get_embedding_index(), mention_index=get_mention_index())
     else:
         print("Warning: Firebase not initialized in editor.py")
-        story_bible_service = StoryBibleService(None)
+        story_bible_service = StoryBibleService(None, get_embedding_index(), mention_index=get_mention_index())
 except Exception as e:
     print(f"Warning: Failed to initialize Firestore client in editor.py: {e}")
     db = None
-    story_bible_service = StoryBibleService(None)
+    story_bible_service = StoryBibleService(None, get_embedding_index(), mention_index=get_mention_index())
 
 @bp.route('/generate-scene', methods=['POST'])
 @require_auth
 @ai_rate_limit
 @validate_request(GenerateSceneRequest)
+@ai_quota(scene_cost)
 def generate_scene(current_user):
     """Generate a new scene with AI"""
     data = request.validated_data
@@ -79,6 +85,7 @@ def generate_scene(current_user):
 @require_auth
 @ai_rate_limit
 @validate_request(GenerateDialogueRequest)
+@ai_quota(dialogue_cost)
 def generate_dialogue(current_user):
     """Generate dialogue between characters"""
     data = request.validated_data
@@ -105,6 +112,7 @@ def generate_dialogue(current_user):
 @require_auth
 @ai_rate_limit
 @validate_request(RewriteTextRequest)
+@ai_quota(rewrite_cost)
 def rewrite_text(current_user):
     """Rewrite text with specific instructions"""
     data = request.validated_data
@@ -123,6 +131,7 @@ def rewrite_text(current_user):
 @require_auth
 @ai_rate_limit
 @validate_request(ExpandTextRequest)
+@ai_quota(rewrite_cost)
 def expand_text(current_user):
     """Expand text with more detail"""
     data = request.validated_data
@@ -140,6 +149,7 @@ def expand_text(current_user):
 @require_auth
 @ai_rate_limit
 @validate_request(SummarizeTextRequest)
+@ai_quota(summarize_cost)
 def summarize_text(current_user):
     """Summarize text"""
     data = request.validated_data
@@ -152,6 +162,7 @@ def summarize_text(current_user):
 @require_auth
 @ai_rate_limit
 @validate_request(ContinueWritingRequest)
+@ai_quota(continue_cost)
 def continue_writing(current_user):
     """Continue writing from existing text"""
     data = request.validated_data
@@ -3,91 +3,205 @@ Export Routes
 API endpoints for multi-format export
 """
 
-from flask import Blueprint, request, jsonify, send_file
+import os
+from flask import Blueprint, Response, request, jsonify, send_file, current_app, stream_with_context
 from services.export_service import ExportService
-import io
+from services.export_jobs import ExportJobManager, JOB_COMPLETED
+from utils.auth import require_auth, require_project_access
+from firebase_admin import firestore
+import firebase_admin
 
 bp = Blueprint('export', __name__)
-export_service = ExportService()
 
-@bp.route('/pdf/<project_id>', methods=['POST'])
-def export_pdf(project_id):
+# Initialize service
+try:
+    if firebase_admin._apps:
+        db = firestore.client()
+        export_service = ExportService(db)
+    else:
+        print("Warning: Firebase not initialized in export_routes.py")
+        export_service = ExportService(None)
+except Exception as e:
+    print(f"Warning: Failed to initialize Firestore client in export_routes.py: {e}")
+    export_service = ExportService(None)
+
+export_jobs = ExportJobManager(export_service)
+
+# Content type of each format served from the export cache
+EXPORT_MIMETYPES = {
+    'pdf': 'application/pdf',
+    'epub': 'application/epub+zip',
+    'markdown': 'text/markdown',
+    'text': 'text/plain',
+}
+
+def _send_export(project_id, export_format, mimetype, options=None):
+    """Send a cached export artifact from disk with ETag revalidation"""
+    artifact = export_service.get_export(project_id, export_format, options)
+    extension = ExportService.CACHED_FORMATS[export_format]
+
+    # conditional=True answers If-None-Match with 304 and honours Range requests
+    return send_file(
+        artifact['path'],
+        mimetype=mimetype,
+        as_attachment=True,
+        download_name=f'novel-{project_id}.{extension}',
+        etag=artifact['etag'],
+        conditional=True,
+        max_age=0
+    )
+
+def _stream_export(project_id, export_format, mimetype):
+    """Stream a Markdown or text export scene by scene, or send it from the cache"""
+    artifact = export_service.stream_export(project_id, export_format)
+    extension = ExportService.CACHED_FORMATS[export_format]
+    if 'path' in artifact:
+        return send_file(
+            artifact['path'],
+            mimetype=mimetype,
+            as_attachment=True,
+            download_name=f'novel-{project_id}.{extension}',
+            etag=artifact['etag'],
+            conditional=True,
+            max_age=0
+        )
+
+    # Revalidate by hand: make_conditional() would buffer the generator to
+    # compute a Content-Length
+    if request.if_none_match.contains_weak(artifact['etag']):
+        response = Response(status=304)
+    else:
+        # No Content-Length, so the body goes out with chunked transfer encoding
+        response = Response(stream_with_context(artifact['chunks']), mimetype=mimetype)
+        response.headers['Content-Disposition'] = (
+            f'attachment; filename=novel-{project_id}.{extension}'
+        )
+    response.set_etag(artifact['etag'])
+    response.cache_control.max_age = 0
+    return response
+
+@bp.route('/pdf/<project_id>', methods=['GET', 'POST'])
+@require_project_access
+def export_pdf(current_user, project_id):
     """Export project to PDF"""
     try:
-        data = request.json or {}
+        data = request.get_json(silent=True) or {}
         options = data.get('options', {})
 
-        # Generate PDF
-        pdf_buffer = export_service.export_to_pdf(project_id, options)
-
-        # Return PDF file
-        return send_file(
-            pdf_buffer,
-            mimetype='application/pdf',
-            as_attachment=True,
-            download_name=f'novel-{project_id}.pdf'
-        )
+        # Rendered chapter by chapter on a cache miss, then served from disk
+        return _send_export(project_id, 'pdf', 'application/pdf', options)
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
-@bp.route('/epub/<project_id>', methods=['POST'])
-def export_epub(project_id):
+@bp.route('/epub/<project_id>', methods=['GET', 'POST'])
+@require_project_access
+def export_epub(current_user, project_id):
     """Export project to EPUB"""
     try:
-        data = request.json or {}
+        data = request.get_json(silent=True) or {}
         options = data.get('options', {})
 
-        # Generate EPUB
-        epub_buffer = export_service.export_to_epub(project_id, options)
-
-        # Return EPUB file
-        return send_file(
-            epub_buffer,
-            mimetype='application/epub+zip',
-            as_attachment=True,
-            download_name=f'novel-{project_id}.epub'
-        )
+        return _send_export(project_id, 'epub', 'application/epub+zip', options)
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
 @bp.route('/markdown/<project_id>', methods=['GET'])
-def export_markdown(project_id):
+@require_project_access
+def export_markdown(current_user, project_id):
     """Export project to Markdown"""
     try:
-        markdown = export_service.export_to_markdown(project_id)
-
-        buffer = io.BytesIO(markdown.encode('utf-8'))
-        buffer.seek(0)
-
-        return send_file(
-            buffer,
-            mimetype='text/markdown',
-            as_attachment=True,
-            download_name=f'novel-{project_id}.md'
-        )
+        return _stream_export(project_id, 'markdown', 'text/markdown')
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
 @bp.route('/text/<project_id>', methods=['GET'])
-def export_text(project_id):
+@require_project_access
+def export_text(current_user, project_id):
     """Export project to plain text"""
     try:
-        text = export_service.export_to_text(project_id)
-
-        buffer = io.BytesIO(text.encode('utf-8'))
-        buffer.seek(0)
-
-        return send_file(
-            buffer,
-            mimetype='text/plain',
-            as_attachment=True,
-            download_name=f'novel-{project_id}.txt'
-        )
+        return _stream_export(project_id, 'text', 'text/plain')
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+def _job_status(job):
+    """Public view of an export job"""
+    status = {
+        'job_id': job['id'],
+        'project_id': job['project_id'],
+        'format': job['format'],
+        'status': job['status'],
+        'progress': job['progress'],
+        'total': job['total'],
+        'error': job['error']
+    }
+    if job['status'] == JOB_COMPLETED:
+        status['download_url'] = f"/api/export/jobs/{job['id']}/download"
+    return status
+
+def _get_user_job(current_user, job_id):
+    """Get a job owned by the current user, or None"""
+    job = export_jobs.get_job(job_id)
+    if not job or job['user_id'] != current_user['uid']:
+        return None
+    return job
+
+@bp.route('/jobs/<project_id>', methods=['POST'])
+@require_project_access
+def submit_export_job(current_user, project_id):
+    """Queue an export to render in the background"""
+    data = request.get_json(silent=True) or {}
+    export_format = data.get('format')
+    if export_format not in ExportService.CACHED_FORMATS:
+        return jsonify({'error': f'Unsupported export format: {export_format}'}), 400
+
+    # Progress is pushed to the owner's room on the running Socket.IO server
+    socketio = current_app.extensions.get('socketio')
+
+    def publish(job):
+        if socketio:
+            socketio.emit('export:progress', _job_status(job), room=f"user_{job['user_id']}")
+
+    job = export_jobs.submit(
+        current_user['uid'], project_id, export_format, data.get('options', {}), on_update=publish
+    )
+    return jsonify(_job_status(job)), 202
+
+@bp.route('/jobs/<job_id>', methods=['GET'])
+@require_auth
+def get_export_job(current_user, job_id):
+    """Get the status and progress of an export job"""
+    job = _get_user_job(current_user, job_id)
+    if not job:
+        return jsonify({'error': 'Export job not found'}), 404
+    return jsonify(_job_status(job))
+
+@bp.route('/jobs/<job_id>/download', methods=['GET'])
+@require_auth
+def download_export_job(current_user, job_id):
+    """Download a finished export; Range requests resume interrupted downloads"""
+    job = _get_user_job(current_user, job_id)
+    if not job:
+        return jsonify({'error': 'Export job not found'}), 404
+    if job['status'] != JOB_COMPLETED:
+        return jsonify({'error': 'Export is not ready', **_job_status(job)}), 409
+    if not os.path.exists(job['path']):
+        # Evicted from the export cache; the client should submit a new job
+        return jsonify({'error': 'Export has expired'}), 410
+
+    extension = ExportService.CACHED_FORMATS[job['format']]
+    return send_file(
+        job['path'],
+        mimetype=EXPORT_MIMETYPES[job['format']],
+        as_attachment=True,
+        download_name=f"novel-{job['project_id']}.{extension}",
+        etag=job['etag'],
+        conditional=True,
+        max_age=0
+    )
+
 @bp.route('/audio/<project_id>', methods=['POST'])
-def export_audio(project_id):
+@require_project_access
+def export_audio(current_user, project_id):
     """Export project to audiobook"""
     data = request.json
     voice = data.get('voice', 'default')
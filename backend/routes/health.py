@@ -271,3 +271,27 @@ def service_health(service_name):
         'timestamp': datetime.utcnow().isoformat(),
         **service_status[service_name]
     }), 200
+
+@health_bp.route('/metrics', methods=['GET'])
+def metrics():
+    """
+    In-process performance counters (caches and their estimated savings)
+    """
+    from services.rank_rebalancer import rebalance_stats
+    from services.story_bible_service import collection_read_stats
+    from utils.ai_quota import get_ai_quota
+    from utils.auth import project_access_stats
+    from utils.compression import compression_stats
+    from utils.conditional import conditional_get_stats
+    from utils.token_verifier import get_token_verifier
+
+    return jsonify({
+        'timestamp': datetime.utcnow().isoformat(),
+        'project_access': project_access_stats(),
+        'token_verification': get_token_verifier().stats(),
+        'ai_quota': get_ai_quota().stats(),
+        'collection_reads': collection_read_stats(),
+        'conditional_get': conditional_get_stats(),
+        'compression': compression_stats(),
+        'rank_rebalance': rebalance_stats(),
+    }), 200
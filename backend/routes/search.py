@@ -0,0 +1,48 @@
+"""
+Search Routes
+Full-text search over manuscripts and the story bible
+"""
+
+from flask import Blueprint, request, jsonify
+from utils.auth import require_auth, require_project_access
+from services.search_index import (
+    get_search_index, project_scope, user_scope, DEFAULT_PAGE_SIZE
+)
+
+bp = Blueprint('search', __name__)
+
+search_index = get_search_index()
+
+
+def _search(scopes):
+    """Run the search described by the query string over the given scopes"""
+    query = request.args.get('q', '').strip()
+    if not query:
+        return jsonify({'error': 'q is required'}), 400
+    limit = request.args.get('limit', DEFAULT_PAGE_SIZE, type=int)
+    cursor = request.args.get('cursor', '0')
+    if not cursor.isdigit():
+        return jsonify({'error': 'Invalid cursor'}), 400
+    kinds = request.args.get('kinds')
+    kinds = [kind for kind in kinds.split(',') if kind] if kinds else None
+
+    page = search_index.search(scopes, query, kinds, limit, int(cursor))
+
+    response = jsonify(page['results'])
+    if page['next_offset'] is not None:
+        response.headers['X-Next-Cursor'] = str(page['next_offset'])
+    return response
+
+
+@bp.route('', methods=['GET'])
+@require_auth
+def search_documents(current_user):
+    """Search the current user's manuscript documents"""
+    return _search([user_scope(current_user['uid'])])
+
+
+@bp.route('/projects/<project_id>', methods=['GET'])
+@require_project_access
+def search_project(current_user, project_id):
+    """Search a project's scenes, lore, characters and locations, and the user's documents"""
+    return _search([project_scope(project_id), user_scope(current_user['uid'])])
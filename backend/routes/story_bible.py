@@ -3,22 +3,34 @@ Story Bible Routes
 API endpoints for managing story elements
 """
 
-from flask import Blueprint, request, jsonify
-from services.story_bible_service import StoryBibleService
+from flask import Blueprint, Response, request, jsonify
+from services.story_bible_service import StoryBibleService, PROJECT_PAGE_SIZE
+from services.project_stats import DEFAULT_STATS_DAYS
+from services.visual_planning_service import VisualPlanningService
+from services.snapshot_service import ProjectSnapshotService
+from services.project_versions import VERSIONED_RESOURCES
+from services.embedding_index import get_embedding_index
+from services.search_index import get_search_index
+from services.mention_index import get_mention_index
+from services.export_cache import get_export_cache
 from firebase_admin import firestore
 import firebase_admin
-from utils.auth import require_auth, require_project_access
+from utils.auth import require_auth, require_project_access, get_authorized_project
+from utils.conditional import versioned_etag
 from utils.validation import validate_request
 from schemas.story_bible_schemas import (
     CreateProjectRequest,
+    CollaboratorRequest,
     CreateCharacterRequest,
     UpdateCharacterRequest,
     CreateLocationRequest,
     UpdateLocationRequest,
     CreateLoreRequest,
     CreatePlotPointRequest,
+    MovePlotPointRequest,
     CreateSceneRequest,
-    UpdateSceneRequest
+    UpdateSceneRequest,
+    MoveSceneRequest
 )
 
 bp = Blueprint('story_bible', __name__)
@@ -27,22 +39,39 @@ bp = Blueprint('story_bible', __name__)
 try:
     if firebase_admin._apps:
         db = firestore.client()
-        story_bible_service = StoryBibleService(db)
+        story_bible_service = StoryBibleService(db, get_embedding_index(), get_search_index(),
+                                                get_mention_index())
+        planning_service = VisualPlanningService(db)
     else:
         # If firebase not init, use None
         print("Warning: Firebase not initialized in story_bible.py")
-        story_bible_service = StoryBibleService(None)
+        story_bible_service = StoryBibleService(None, get_embedding_index(), get_search_index(),
+                                                get_mention_index())
+        planning_service = VisualPlanningService(None)
 except Exception as e:
     print(f"Warning: Failed to initialize Firestore client in story_bible.py: {e}")
-    story_bible_service = StoryBibleService(None)
+    story_bible_service = StoryBibleService(None, get_embedding_index(), get_search_index(),
+                                            get_mention_index())
+    planning_service = VisualPlanningService(None)
+
+snapshot_service = ProjectSnapshotService(story_bible_service, planning_service)
 
 # Project routes
 @bp.route('/projects', methods=['GET'])
 @require_auth
 def list_projects(current_user):
-    """List all projects"""
-    projects = story_bible_service.list_projects()
-    return jsonify(projects)
+    """List the current user's projects, a page at a time"""
+    limit = request.args.get('limit', PROJECT_PAGE_SIZE, type=int)
+    cursor = request.args.get('cursor')
+    try:
+        page = story_bible_service.list_projects(current_user['uid'], limit, cursor)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+    response = jsonify(page['projects'])
+    if page['next_cursor']:
+        response.headers['X-Next-Cursor'] = page['next_cursor']
+    return response
 
 @bp.route('/projects', methods=['POST'])
 @require_auth
@@ -50,21 +79,79 @@ def list_projects(current_user):
 def create_project(current_user):
     """Create a new project"""
     data = request.validated_data.model_dump()
-    project = story_bible_service.create_project(data)
+    project = story_bible_service.create_project(data, owner_id=current_user['uid'])
     return jsonify(project), 201
 
 @bp.route('/projects/<project_id>', methods=['GET'])
 @require_project_access
 def get_project(current_user, project_id):
     """Get a project by ID"""
-    project = story_bible_service.get_project(project_id)
+    project = get_authorized_project() or story_bible_service.get_project(project_id)
     if project:
         return jsonify(project)
     return jsonify({'error': 'Project not found'}), 404
 
+@bp.route('/projects/<project_id>/snapshot', methods=['GET'])
+@require_project_access
+@versioned_etag(*VERSIONED_RESOURCES)
+def get_project_snapshot(current_user, project_id):
+    """Get a project with its Story Bible, scene summaries and planning views"""
+    snapshot = snapshot_service.get_snapshot(project_id, get_authorized_project())
+    if not snapshot:
+        return jsonify({'error': 'Project not found'}), 404
+
+    encoded = snapshot_service.serialize(snapshot)
+    response = Response(encoded['body'], mimetype='application/json')
+    response.set_etag(encoded['etag'])
+    return response
+
+@bp.route('/projects/<project_id>/stats', methods=['GET'])
+@require_project_access
+def get_project_stats(current_user, project_id):
+    """Get word and scene totals per project and chapter, with daily writing progress"""
+    days = request.args.get('days', DEFAULT_STATS_DAYS, type=int)
+    stats = story_bible_service.get_stats(project_id, days)
+    project = get_authorized_project() or story_bible_service.get_project(project_id) or {}
+    stats['target_word_count'] = project.get('target_word_count')
+    return jsonify(stats)
+
+@bp.route('/projects/<project_id>/collaborators', methods=['POST'])
+@require_project_access
+@validate_request(CollaboratorRequest)
+def add_collaborator(current_user, project_id):
+    """Share a project with another user (owner only)"""
+    project = get_authorized_project() or story_bible_service.get_project(project_id)
+    if not project:
+        return jsonify({'error': 'Project not found'}), 404
+    if project.get('owner_id') != current_user['uid']:
+        return jsonify({'error': 'Only the project owner can change collaborators'}), 403
+
+    try:
+        story_bible_service.add_collaborator(project_id, request.validated_data.user_id)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    return jsonify({'success': True})
+
+@bp.route('/projects/<project_id>/collaborators/<user_id>', methods=['DELETE'])
+@require_project_access
+def remove_collaborator(current_user, project_id, user_id):
+    """Stop sharing a project with a user (owner only)"""
+    project = get_authorized_project() or story_bible_service.get_project(project_id)
+    if not project:
+        return jsonify({'error': 'Project not found'}), 404
+    if project.get('owner_id') != current_user['uid']:
+        return jsonify({'error': 'Only the project owner can change collaborators'}), 403
+
+    try:
+        story_bible_service.remove_collaborator(project_id, user_id)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    return '', 204
+
 # Character routes
 @bp.route('/projects/<project_id>/characters', methods=['GET'])
 @require_project_access
+@versioned_etag('characters')
 def list_characters(current_user, project_id):
     """List all characters in a project"""
     characters = story_bible_service.list_characters(project_id)
@@ -106,9 +193,22 @@ def delete_character(current_user, project_id, character_id):
         return '', 204
     return jsonify({'error': 'Failed to delete character'}), 500
 
+@bp.route('/projects/<project_id>/characters/<character_id>/mentions', methods=['GET'])
+@require_project_access
+def get_character_mentions(current_user, project_id, character_id):
+    """List the scenes that name a character, with the positions of each mention"""
+    return jsonify(story_bible_service.scenes_mentioning(project_id, character_id))
+
+@bp.route('/projects/<project_id>/chapters/<chapter_id>/characters', methods=['GET'])
+@require_project_access
+def get_chapter_characters(current_user, project_id, chapter_id):
+    """List the characters named in a chapter, most mentioned first"""
+    return jsonify(story_bible_service.characters_in_chapter(project_id, chapter_id))
+
 # Location routes
 @bp.route('/projects/<project_id>/locations', methods=['GET'])
 @require_project_access
+@versioned_etag('locations')
 def list_locations(current_user, project_id):
     """List all locations in a project"""
     locations = story_bible_service.list_locations(project_id)
@@ -144,6 +244,7 @@ def update_location(current_user, project_id, location_id):
 # Lore routes
 @bp.route('/projects/<project_id>/lore', methods=['GET'])
 @require_project_access
+@versioned_etag('lore')
 def list_lore(current_user, project_id):
     """List all lore entries in a project"""
     lore = story_bible_service.list_lore(project_id)
@@ -161,6 +262,7 @@ def create_lore(current_user, project_id):
 # Plot routes
 @bp.route('/projects/<project_id>/plot-points', methods=['GET'])
 @require_project_access
+@versioned_etag('plot_points')
 def list_plot_points(current_user, project_id):
     """List all plot points in a project"""
     plot_points = story_bible_service.list_plot_points(project_id)
@@ -175,9 +277,26 @@ def create_plot_point(current_user, project_id):
     plot_point = story_bible_service.create_plot_point(project_id, data)
     return jsonify(plot_point), 201
 
+@bp.route('/projects/<project_id>/plot-points/<plot_id>/move', methods=['POST'])
+@require_project_access
+@validate_request(MovePlotPointRequest)
+def move_plot_point(current_user, project_id, plot_id):
+    """Move a plot point between two others"""
+    data = request.validated_data
+    try:
+        plot_point = story_bible_service.move_plot_point(
+            project_id, plot_id, data.after_id, data.before_id, data.act
+        )
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    if plot_point is None:
+        return jsonify({'error': 'Plot point not found'}), 404
+    return jsonify(plot_point)
+
 # Scene routes
 @bp.route('/projects/<project_id>/scenes', methods=['GET'])
 @require_project_access
+@versioned_etag('scenes')
 def list_scenes(current_user, project_id):
     """List all scenes in a project"""
     scenes = story_bible_service.list_scenes(project_id)
@@ -190,6 +309,7 @@ def create_scene(current_user, project_id):
     """Create a new scene"""
     data = request.validated_data.model_dump()
     scene = story_bible_service.create_scene(project_id, data)
+    get_export_cache().invalidate_project(project_id)
     return jsonify(scene), 201
 
 @bp.route('/projects/<project_id>/scenes/<scene_id>', methods=['GET'])
@@ -208,6 +328,22 @@ def update_scene(current_user, project_id, scene_id):
     """Update a scene"""
     data = request.validated_data.model_dump(exclude_unset=True)
     scene = story_bible_service.update_scene(project_id, scene_id, data)
+    get_export_cache().invalidate_project(project_id)
+    return jsonify(scene)
+
+@bp.route('/projects/<project_id>/scenes/<scene_id>/move', methods=['POST'])
+@require_project_access
+@validate_request(MoveSceneRequest)
+def move_scene(current_user, project_id, scene_id):
+    """Move a scene between two others in the manuscript"""
+    data = request.validated_data
+    try:
+        scene = story_bible_service.move_scene(project_id, scene_id, data.after_id, data.before_id)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    if scene is None:
+        return jsonify({'error': 'Scene not found'}), 404
+    get_export_cache().invalidate_project(project_id)
     return jsonify(scene)
 
 @bp.route('/projects/<project_id>/scenes/<scene_id>/context', methods=['GET'])
@@ -12,6 +12,7 @@ import platform
 
 from utils.auth import require_auth
 from db.connection import DatabaseManager
+from services.search_index import get_search_index
 from services.sync_service import SyncService
 from services.firebase_sync import FirebaseSyncAdapter
 
@@ -25,7 +26,7 @@ try:
     if firebase_admin._apps:
         db = firestore.client()
         firebase_adapter = FirebaseSyncAdapter(db)
-        db_manager = DatabaseManager()
+        db_manager = DatabaseManager(get_search_index())
         print("Sync services initialized successfully")
     else:
         print("Warning: Firebase not initialized in sync.py")
@@ -3,13 +3,47 @@ Visual Planning Routes
 API endpoints for visual planning tools (Corkboard, Matrix, Outlines)
 """
 
+import math
 from flask import Blueprint, request, jsonify
-from services.visual_planning_service import VisualPlanningService
+from services.visual_planning_service import (
+    VisualPlanningService, PatchConflict, CorkboardItemNotFound, MAX_VIEWPORT_SPAN
+)
 from services.story_bible_service import StoryBibleService
 from firebase_admin import firestore
+from utils.conditional import versioned_etag
+from utils.json_patch import JsonPatchError, JsonPatchTestFailed
 
 bp = Blueprint('visual_planning', __name__)
 
+
+def _patch_response(apply):
+    """Run a patch, mapping patch failures to error responses"""
+    try:
+        return jsonify(apply())
+    except CorkboardItemNotFound as e:
+        return jsonify({'error': str(e)}), 404
+    except JsonPatchTestFailed as e:
+        return jsonify({'error': 'Patch test failed', 'details': str(e)}), 409
+    except JsonPatchError as e:
+        return jsonify({'error': 'Invalid patch', 'details': str(e)}), 400
+    except PatchConflict as e:
+        return jsonify({'error': str(e)}), 409
+
+
+def _patch_body():
+    """The JSON body of a PATCH request (application/json or application/json-patch+json)"""
+    return request.get_json(silent=True) if request.is_json else None
+
+
+def _changed_scene_ids():
+    """Optional 'scene_ids' of a generate request, limiting it to the views' affected acts"""
+    data = request.get_json(silent=True) if request.is_json else None
+    scene_ids = data.get('scene_ids') if isinstance(data, dict) else None
+    if scene_ids is not None and (not isinstance(scene_ids, list)
+                                  or not all(isinstance(i, str) for i in scene_ids)):
+        return None, (jsonify({'error': 'scene_ids must be a list of scene IDs'}), 400)
+    return scene_ids, None
+
 # Initialize services
 try:
     db = firestore.client()
@@ -22,9 +56,21 @@ except Exception as e:
     story_bible_service = StoryBibleService(None)
 
 @bp.route('/corkboard/<project_id>', methods=['GET'])
+@versioned_etag('corkboard')
 def get_corkboard(project_id):
-    """Get corkboard layout for a project"""
-    corkboard = planning_service.get_corkboard(project_id)
+    """Get corkboard layout for a project, optionally only the items in ?bbox=left,top,right,bottom"""
+    bbox = request.args.get('bbox')
+    if bbox is not None:
+        try:
+            bbox = tuple(float(v) for v in bbox.split(','))
+        except ValueError:
+            bbox = ()
+        if len(bbox) != 4 or not all(math.isfinite(v) for v in bbox) \
+                or bbox[0] > bbox[2] or bbox[1] > bbox[3]:
+            return jsonify({'error': 'bbox must be left,top,right,bottom'}), 400
+        if bbox[2] - bbox[0] > MAX_VIEWPORT_SPAN or bbox[3] - bbox[1] > MAX_VIEWPORT_SPAN:
+            return jsonify({'error': f'bbox may span at most {MAX_VIEWPORT_SPAN} pixels each way'}), 400
+    corkboard = planning_service.get_corkboard(project_id, bbox)
     return jsonify(corkboard)
 
 @bp.route('/corkboard/<project_id>', methods=['POST'])
@@ -41,7 +87,33 @@ def add_corkboard_item(project_id):
     item = planning_service.add_corkboard_item(project_id, data)
     return jsonify(item), 201
 
+@bp.route('/corkboard/<project_id>', methods=['PATCH'])
+def patch_corkboard(project_id):
+    """Apply a JSON Patch to the corkboard, addressing items by ID"""
+    ops = _patch_body()
+    return _patch_response(lambda: planning_service.patch_corkboard(project_id, ops))
+
+@bp.route('/corkboard/<project_id>/items/<item_id>', methods=['PATCH'])
+def update_corkboard_item(project_id, item_id):
+    """Update some fields of a corkboard item"""
+    data = _patch_body()
+    if not isinstance(data, dict):
+        return jsonify({'error': 'Request body must be a JSON object'}), 400
+    return _patch_response(lambda: planning_service.update_corkboard_item(project_id, item_id, data))
+
+@bp.route('/corkboard/<project_id>/items/<item_id>', methods=['DELETE'])
+def delete_corkboard_item(project_id, item_id):
+    """Remove an item from the corkboard"""
+    try:
+        planning_service.delete_corkboard_item(project_id, item_id)
+    except CorkboardItemNotFound as e:
+        return jsonify({'error': str(e)}), 404
+    except PatchConflict as e:
+        return jsonify({'error': str(e)}), 409
+    return '', 204
+
 @bp.route('/matrix/<project_id>', methods=['GET'])
+@versioned_etag('matrix')
 def get_matrix(project_id):
     """Get matrix/grid layout for a project"""
     matrix = planning_service.get_matrix(project_id)
@@ -54,13 +126,36 @@ def save_matrix(project_id):
     result = planning_service.save_matrix(project_id, data)
     return jsonify(result)
 
+@bp.route('/matrix/<project_id>', methods=['PATCH'])
+def patch_matrix(project_id):
+    """Apply a JSON Patch to the matrix"""
+    ops = _patch_body()
+    return _patch_response(lambda: planning_service.patch_view(project_id, 'matrix', ops))
+
+@bp.route('/matrix/<project_id>/cells', methods=['PATCH'])
+def update_matrix_cell(project_id):
+    """Set one matrix cell, addressed by row and column ID or index"""
+    data = _patch_body()
+    if not isinstance(data, dict) or not all(key in data for key in ('row', 'col', 'content')):
+        return jsonify({'error': 'row, col and content are required'}), 400
+    return _patch_response(lambda: planning_service.update_matrix_cell(
+        project_id, data['row'], data['col'], data['content']
+    ))
+
 @bp.route('/matrix/<project_id>/generate', methods=['POST'])
 def generate_matrix(project_id):
-    """Generate matrix from scenes and plot points"""
-    matrix = planning_service.create_matrix_from_scenes(project_id, story_bible_service)
+    """Generate matrix from scenes and plot points, or refresh the rows of changed scenes"""
+    scene_ids, error = _changed_scene_ids()
+    if error:
+        return error
+    try:
+        matrix = planning_service.create_matrix_from_scenes(project_id, story_bible_service, scene_ids)
+    except PatchConflict as e:
+        return jsonify({'error': str(e)}), 409
     return jsonify(matrix)
 
 @bp.route('/outline/<project_id>', methods=['GET'])
+@versioned_etag('outline')
 def get_outline(project_id):
     """Get outline for a project"""
     outline = planning_service.get_outline(project_id)
@@ -73,8 +168,20 @@ def save_outline(project_id):
     result = planning_service.save_outline(project_id, data)
     return jsonify(result)
 
+@bp.route('/outline/<project_id>', methods=['PATCH'])
+def patch_outline(project_id):
+    """Apply a JSON Patch to the outline"""
+    ops = _patch_body()
+    return _patch_response(lambda: planning_service.patch_view(project_id, 'outline', ops))
+
 @bp.route('/outline/<project_id>/generate', methods=['POST'])
 def generate_outline(project_id):
-    """Generate outline from plot points and scenes"""
-    outline = planning_service.generate_outline_from_plot(project_id, story_bible_service)
+    """Generate outline from plot points and scenes, or refresh the acts of changed scenes"""
+    scene_ids, error = _changed_scene_ids()
+    if error:
+        return error
+    try:
+        outline = planning_service.generate_outline_from_plot(project_id, story_bible_service, scene_ids)
+    except PatchConflict as e:
+        return jsonify({'error': str(e)}), 409
     return jsonify(outline)
@@ -1,3 +1,16 @@
 """
 Pydantic schemas for request/response validation
 """
+
+from pydantic import BaseModel, ConfigDict
+
+
+class RequestModel(BaseModel):
+    """
+    Base for request body schemas
+
+    Validation is lax, so JSON values that convert cleanly are accepted
+    (e.g. "5" for an int). A route can require exact JSON types with
+    validate_request(schema, strict=True).
+    """
+    model_config = ConfigDict(strict=False)
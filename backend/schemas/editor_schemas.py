@@ -3,11 +3,13 @@ Pydantic schemas for AI Editor endpoints
 Provides request validation with type safety and constraints
 """
 
-from pydantic import BaseModel, Field, field_validator, constr
+from pydantic import Field, field_validator, constr
 from typing import Optional, List
 
+from schemas import RequestModel
 
-class GenerateSceneRequest(BaseModel):
+
+class GenerateSceneRequest(RequestModel):
     """Schema for scene generation requests"""
     project_id: str = Field(..., min_length=1, max_length=100, description="Project ID")
     scene_id: Optional[str] = Field(None, max_length=100, description="Optional scene ID for context")
@@ -34,7 +36,7 @@ class GenerateSceneRequest(BaseModel):
         return v
 
 
-class GenerateDialogueRequest(BaseModel):
+class GenerateDialogueRequest(RequestModel):
     """Schema for dialogue generation requests"""
     project_id: str = Field(..., min_length=1, max_length=100)
     characters: List[str] = Field(..., min_length=1, max_length=10, description="Character names")
@@ -57,7 +59,7 @@ class GenerateDialogueRequest(BaseModel):
         return v.strip()
 
 
-class RewriteTextRequest(BaseModel):
+class RewriteTextRequest(RequestModel):
     """Schema for text rewriting requests"""
     text: str = Field(..., min_length=1, max_length=10000, description="Text to rewrite")
     instruction: str = Field(..., min_length=1, max_length=500, description="Rewrite instruction")
@@ -71,7 +73,7 @@ class RewriteTextRequest(BaseModel):
         return v.strip()
 
 
-class ExpandTextRequest(BaseModel):
+class ExpandTextRequest(RequestModel):
     """Schema for text expansion requests"""
     text: str = Field(..., min_length=1, max_length=10000, description="Text to expand")
     project_id: Optional[str] = Field(None, max_length=100)
@@ -84,7 +86,7 @@ class ExpandTextRequest(BaseModel):
         return v.strip()
 
 
-class SummarizeTextRequest(BaseModel):
+class SummarizeTextRequest(RequestModel):
     """Schema for text summarization requests"""
     text: str = Field(..., min_length=10, max_length=50000, description="Text to summarize")
 
@@ -98,7 +100,7 @@ class SummarizeTextRequest(BaseModel):
         return v.strip()
 
 
-class ContinueWritingRequest(BaseModel):
+class ContinueWritingRequest(RequestModel):
     """Schema for continue writing requests"""
     text: str = Field(..., min_length=1, max_length=10000, description="Existing text")
     direction: Optional[str] = Field(default="", max_length=500, description="Direction for continuation")
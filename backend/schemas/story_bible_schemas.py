@@ -3,11 +3,13 @@ Pydantic schemas for Story Bible endpoints
 Provides request validation for characters, locations, lore, etc.
 """
 
-from pydantic import BaseModel, Field, field_validator
+from pydantic import Field, field_validator
 from typing import Optional, List, Dict
 
+from schemas import RequestModel
 
-class CreateProjectRequest(BaseModel):
+
+class CreateProjectRequest(RequestModel):
     """Schema for project creation"""
     title: str = Field(..., min_length=1, max_length=200, description="Project title")
     author: Optional[str] = Field(default="", max_length=100, description="Author name")
@@ -23,11 +25,24 @@ class CreateProjectRequest(BaseModel):
         return v.strip()
 
 
-class CreateCharacterRequest(BaseModel):
+
+class CollaboratorRequest(RequestModel):
+    """Schema for sharing a project with another user"""
+    user_id: str = Field(..., min_length=1, max_length=128, description="Firebase UID of the collaborator")
+
+    @field_validator('user_id')
+    @classmethod
+    def validate_user_id(cls, v: str) -> str:
+        if not v.strip():
+            raise ValueError('user_id cannot be empty')
+        return v.strip()
+
+class CreateCharacterRequest(RequestModel):
     """Schema for character creation"""
     name: str = Field(..., min_length=1, max_length=100, description="Character name")
     description: Optional[str] = Field(default="", max_length=2000, description="Character description")
     traits: Optional[List[str]] = Field(default_factory=list, max_length=20, description="Character traits")
+    aliases: Optional[List[str]] = Field(default_factory=list, max_length=20, description="Other names the character goes by")
     backstory: Optional[str] = Field(default="", max_length=5000, description="Character backstory")
     relationships: Optional[Dict[str, str]] = Field(default_factory=dict, description="Relationships")
     appearances: Optional[List[str]] = Field(default_factory=list, description="Scene IDs where character appears")
@@ -47,18 +62,24 @@ class CreateCharacterRequest(BaseModel):
             raise ValueError('Maximum 20 traits allowed')
         return [trait.strip() for trait in v if trait.strip()]
 
+    @field_validator('aliases')
+    @classmethod
+    def validate_aliases(cls, v: List[str]) -> List[str]:
+        return [alias.strip() for alias in v if alias.strip()]
+
 
-class UpdateCharacterRequest(BaseModel):
+class UpdateCharacterRequest(RequestModel):
     """Schema for character updates"""
     name: Optional[str] = Field(None, min_length=1, max_length=100)
     description: Optional[str] = Field(None, max_length=2000)
     traits: Optional[List[str]] = Field(None, max_length=20)
+    aliases: Optional[List[str]] = Field(None, max_length=20)
     backstory: Optional[str] = Field(None, max_length=5000)
     relationships: Optional[Dict[str, str]] = None
     notes: Optional[str] = Field(None, max_length=2000)
 
 
-class CreateLocationRequest(BaseModel):
+class CreateLocationRequest(RequestModel):
     """Schema for location creation"""
     name: str = Field(..., min_length=1, max_length=100, description="Location name")
     description: Optional[str] = Field(default="", max_length=2000, description="Location description")
@@ -75,7 +96,7 @@ class CreateLocationRequest(BaseModel):
         return v.strip()
 
 
-class UpdateLocationRequest(BaseModel):
+class UpdateLocationRequest(RequestModel):
     """Schema for location updates"""
     name: Optional[str] = Field(None, min_length=1, max_length=100)
     description: Optional[str] = Field(None, max_length=2000)
@@ -84,7 +105,7 @@ class UpdateLocationRequest(BaseModel):
     notes: Optional[str] = Field(None, max_length=2000)
 
 
-class CreateLoreRequest(BaseModel):
+class CreateLoreRequest(RequestModel):
     """Schema for lore entry creation"""
     title: str = Field(..., min_length=1, max_length=200, description="Lore entry title")
     category: Optional[str] = Field(default="", max_length=50, description="Lore category")
@@ -102,7 +123,7 @@ class CreateLoreRequest(BaseModel):
         return v.strip()
 
 
-class CreatePlotPointRequest(BaseModel):
+class CreatePlotPointRequest(RequestModel):
     """Schema for plot point creation"""
     title: str = Field(..., min_length=1, max_length=200, description="Plot point title")
     description: str = Field(..., min_length=1, max_length=2000, description="Plot point description")
@@ -130,7 +151,7 @@ class CreatePlotPointRequest(BaseModel):
         return v
 
 
-class CreateSceneRequest(BaseModel):
+class CreateSceneRequest(RequestModel):
     """Schema for scene creation"""
     title: str = Field(..., min_length=1, max_length=200, description="Scene title")
     content: Optional[str] = Field(default="", max_length=100000, description="Scene content")
@@ -158,7 +179,7 @@ class CreateSceneRequest(BaseModel):
         return v
 
 
-class UpdateSceneRequest(BaseModel):
+class UpdateSceneRequest(RequestModel):
     """Schema for scene updates"""
     title: Optional[str] = Field(None, min_length=1, max_length=200)
     content: Optional[str] = Field(None, max_length=100000)
@@ -167,3 +188,14 @@ class UpdateSceneRequest(BaseModel):
     plot_points: Optional[List[str]] = None
     status: Optional[str] = None
     notes: Optional[str] = Field(None, max_length=2000)
+
+
+class MoveSceneRequest(RequestModel):
+    """Schema for moving a scene between two neighbours"""
+    after_id: Optional[str] = Field(None, max_length=100, description="Scene to follow (None: first)")
+    before_id: Optional[str] = Field(None, max_length=100, description="Scene to precede (None: last)")
+
+
+class MovePlotPointRequest(MoveSceneRequest):
+    """Schema for moving a plot point, optionally into another act"""
+    act: Optional[int] = Field(None, ge=1, le=10, description="New act number")
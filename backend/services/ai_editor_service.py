@@ -56,6 +56,12 @@ class AIEditorService:
                 content = lore.get('content', '')[:200]
                 prompt_parts.append(f"- {lore.get('title', '')}: {content}...")
         
+        # Add passages from elsewhere in the manuscript that match this scene
+        if context.get('relevant_passages'):
+            prompt_parts.append("\nRelated Passages:")
+            for passage in context['relevant_passages']:
+                prompt_parts.append(f"- {passage.get('text', '')[:500]}")
+        
         # Add existing scene content
         if context.get('scene') and context['scene'].get('content'):
             prompt_parts.append(f"\nExisting scene content:\n{context['scene'].get('content', '')}")
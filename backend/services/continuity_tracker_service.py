@@ -4,11 +4,16 @@ AI-powered continuity checking for manuscripts
 """
 
 import google.generativeai as genai
+import hashlib
+import re
 from typing import List, Dict, Optional
 
 # Firestore batch operation limit (500 max, using 450 for safety margin)
 FIRESTORE_BATCH_COMMIT_LIMIT = 450
 
+# Fields owned by the user rather than the checker; never overwritten on re-check
+USER_MANAGED_ISSUE_FIELDS = ('status',)
+
 class ContinuityTrackerService:
     """Service for tracking and checking story continuity"""
     
@@ -26,6 +31,139 @@ class ContinuityTrackerService:
             return self.db.collection('projects').document(project_id).collection('continuity_issues')
         return None
     
+    @staticmethod
+    def _issue_id(issue: Dict) -> str:
+        """
+        Derive a stable issue ID from the issue's type and subject
+
+        Each check reports at most one issue per subject (a character, a
+        location, or the whole timeline), so the model's wording, which
+        varies between runs, is deliberately left out.
+        """
+        subject = issue.get('character_id') or issue.get('location_id') or ''
+        fingerprint = f"{issue['type']}|{subject}"
+        return 'issue_' + hashlib.sha1(fingerprint.encode('utf-8')).hexdigest()[:20]
+
+    @staticmethod
+    def _cited_scenes(text: str, scenes: List[Dict], numbered: bool = False) -> List[str]:
+        """
+        IDs of the scenes a finding cites, which tell one finding from another
+
+        Scenes are cited by quoted title, or with numbered=True by their
+        1-based position in the list the model was shown.
+        """
+        cited = set()
+        if numbered:
+            for line in re.findall(r'Scenes?:([^\n]*)', text):
+                for number in re.findall(r'\d+', line):
+                    if 0 < int(number) <= len(scenes):
+                        cited.add(scenes[int(number) - 1].get('id'))
+        else:
+            for scene in scenes:
+                title = scene.get('title')
+                if title and (f'"{title}"' in text or f"'{title}'" in text):
+                    cited.add(scene.get('id'))
+        return sorted(scene_id for scene_id in cited if scene_id)
+
+    def _unique_issues(self, issues: List[Dict]) -> List[Dict]:
+        """Assign issue IDs; findings with the same ID collapse into the first"""
+        current = {}
+        for issue in issues:
+            issue['id'] = self._issue_id(issue)
+            current.setdefault(issue['id'], issue)
+        return list(current.values())
+
+    def _reconcile_issues(self, project_id: str, issues: List[Dict]) -> Dict:
+        """
+        Write only new or changed issues and delete vanished ones
+
+        Issues keep their stored status, so an issue the user resolved stays
+        resolved when the same problem is reported again. A finding that
+        cites other scenes is a different problem about the same subject
+        and is reopened.
+
+        Returns:
+            Dict: Counts of created, updated, deleted and unchanged issues
+        """
+        writes = {'created': 0, 'updated': 0, 'deleted': 0, 'unchanged': 0}
+        current = {issue['id']: issue for issue in self._unique_issues(issues)}
+
+        collection = self._get_collection(project_id)
+        if not collection or not self.db:
+            return writes
+
+        existing = {doc.id: doc.to_dict() for doc in collection.stream()}
+
+        # Issues stored under an older ID scheme hand their status to the issue that replaces them
+        previous = {}
+        for stored in existing.values():
+            if stored and stored.get('type'):
+                previous.setdefault(self._issue_id(stored), stored)
+
+        batch = self.db.batch()
+        operation_count = 0
+
+        def count_operation():
+            nonlocal batch, operation_count
+            operation_count += 1
+
+            # Commit batch if approaching limit
+            if operation_count >= FIRESTORE_BATCH_COMMIT_LIMIT:
+                batch.commit()
+                batch = self.db.batch()
+                operation_count = 0
+
+        for issue_id, issue in current.items():
+            stored = existing.get(issue_id)
+            source = stored if stored is not None else previous.get(issue_id, {})
+            # Issues stored before scenes were recorded keep their status
+            if source.get('scene_ids', issue.get('scene_ids')) != issue.get('scene_ids'):
+                source = {}
+            for field in USER_MANAGED_ISSUE_FIELDS:
+                if field in source:
+                    issue[field] = source[field]
+            if stored == issue:
+                writes['unchanged'] += 1
+                continue
+
+            batch.set(collection.document(issue_id), issue)
+            writes['created' if stored is None else 'updated'] += 1
+            count_operation()
+
+        # Delete issues that were not reported again
+        for issue_id in existing.keys() - current.keys():
+            batch.delete(collection.document(issue_id))
+            writes['deleted'] += 1
+            count_operation()
+
+        # Commit remaining operations
+        if operation_count > 0:
+            batch.commit()
+
+        return writes
+
+    def _relevant_excerpts(self, project_id: str, story_bible_service, query: str,
+                           scenes: List[Dict], limit: int, excerpt_chars: int) -> List[tuple]:
+        """
+        Pick (scene title, excerpt) pairs from the passages most relevant to query
+
+        Falls back to the opening of the first scenes when the Story Bible
+        service has no embedding index.
+        """
+        scenes_by_id = {scene.get('id'): scene for scene in scenes}
+        hits = story_bible_service.search_related(
+            project_id, query, ['scene'], limit, item_ids=list(scenes_by_id)
+        )
+        excerpts = [
+            (scenes_by_id[hit['item_id']]['title'], hit['text'][:excerpt_chars])
+            for hit in hits
+            if hit['item_id'] in scenes_by_id
+        ]
+        if excerpts:
+            return excerpts
+
+        return [(s['title'], s['content'][:excerpt_chars]) for s in scenes[:limit]]
+
     def check_character_continuity(self, project_id: str, story_bible_service) -> List[Dict]:
         """Check for character continuity issues"""
         issues = []
@@ -46,6 +184,17 @@ class ContinuityTrackerService:
                     char_scene_map[char_id] = []
                 char_scene_map[char_id].append(scene)
 
+        # Add scenes that name a character without tagging them
+        scenes_by_id = {scene.get('id'): scene for scene in scenes}
+        for character in characters:
+            char_scenes = char_scene_map.setdefault(character['id'], [])
+            tagged = {scene.get('id') for scene in char_scenes}
+            for mention in story_bible_service.scenes_mentioning(project_id, character['id']):
+                scene = scenes_by_id.get(mention['scene_id'])
+                if scene and mention['scene_id'] not in tagged:
+                    char_scenes.append(scene)
+                    tagged.add(mention['scene_id'])
+
         for character in characters:
             char_id = character['id']
             char_name = character['name']
@@ -68,10 +217,13 @@ Traits: {', '.join(character.get('traits', []))}
 Backstory: {character.get('backstory', '')}
 """
 
-                    # Limit to first 5 scenes to avoid prompt size issues
+                    # Limit to the 5 most relevant passages to avoid prompt size issues
                     scene_contents = "\n\n---\n\n".join([
-                        f"Scene: {s['title']}\n{s['content'][:500]}"
-                        for s in char_scenes[:5]
+                        f"Scene: {title}\n{excerpt}"
+                        for title, excerpt in self._relevant_excerpts(
+                            project_id, story_bible_service, character_description,
+                            char_scenes, limit=5, excerpt_chars=500
+                        )
                     ])
 
                     prompt = f"""Analyze the following character and their appearances in scenes for continuity issues.
@@ -101,6 +253,7 @@ List only clear inconsistencies. Be concise. Format as:
                             'character_id': char_id,
                             'character_name': char_name,
                             'description': response.text,
+                            'scene_ids': self._cited_scenes(response.text, char_scenes),
                             'severity': 'medium',
                             'status': 'open'
                         })
@@ -116,8 +269,8 @@ List only clear inconsistencies. Be concise. Format as:
         
         scenes = story_bible_service.list_scenes(project_id)
         
-        # Sort scenes by sequence
-        sorted_scenes = sorted(scenes, key=lambda s: s.get('sequence', 0))
+        # Scenes are listed in manuscript order
+        sorted_scenes = scenes
         
         if self.model and len(sorted_scenes) > 2:
             try:
@@ -149,6 +302,8 @@ List only clear issues. Format as:
                     issues.append({
                         'type': 'timeline_inconsistency',
                         'description': response.text,
+                        'scene_ids': self._cited_scenes(response.text, sorted_scenes[:10],
+                                                        numbered=True),
                         'severity': 'medium',
                         'status': 'open'
                     })
@@ -189,10 +344,14 @@ List only clear issues. Format as:
 
             if len(loc_scenes) > 1 and self.model:
                 try:
-                    # Limit to first 3 scenes to avoid prompt size issues
+                    # Limit to the 3 most relevant passages to avoid prompt size issues
                     scene_descriptions = "\n\n".join([
-                        f"In '{s['title']}':\n{s['content'][:300]}"
-                        for s in loc_scenes[:3]
+                        f"In '{title}':\n{excerpt}"
+                        for title, excerpt in self._relevant_excerpts(
+                            project_id, story_bible_service,
+                            f"{loc_name}\n{loc_description}",
+                            loc_scenes, limit=3, excerpt_chars=300
+                        )
                     ])
 
                     prompt = f"""Check if these scene descriptions match the location profile:
@@ -221,6 +380,7 @@ List only clear contradictions. Format as:
                             'location_id': loc_id,
                             'location_name': loc_name,
                             'description': response.text,
+                            'scene_ids': self._cited_scenes(response.text, loc_scenes),
                             'severity': 'low',
                             'status': 'open'
                         })
@@ -239,42 +399,9 @@ List only clear contradictions. Format as:
         all_issues.extend(self.check_timeline_continuity(project_id, story_bible_service))
         all_issues.extend(self.check_location_continuity(project_id, story_bible_service))
 
-        # Save issues to database using batch operations for performance
-        collection = self._get_collection(project_id)
-        if collection and self.db:
-            # Use batch operations to minimize database roundtrips
-            # Maximum 500 operations per batch in Firestore
-            batch = self.db.batch()
-            operation_count = 0
-
-            # Clear old issues (batch delete)
-            docs = list(collection.stream())  # Convert to list to avoid iterator issues
-            for doc in docs:
-                batch.delete(doc.reference)
-                operation_count += 1
-
-                # Commit batch if approaching limit
-                if operation_count >= FIRESTORE_BATCH_COMMIT_LIMIT:
-                    batch.commit()
-                    batch = self.db.batch()
-                    operation_count = 0
-
-            # Save new issues (batch write)
-            for i, issue in enumerate(all_issues):
-                issue['id'] = f'issue_{i}'
-                doc_ref = collection.document(issue['id'])
-                batch.set(doc_ref, issue)
-                operation_count += 1
-
-                # Commit batch if approaching limit
-                if operation_count >= FIRESTORE_BATCH_COMMIT_LIMIT:
-                    batch.commit()
-                    batch = self.db.batch()
-                    operation_count = 0
-
-            # Commit remaining operations
-            if operation_count > 0:
-                batch.commit()
+        # Reconcile with stored issues so only changed documents are written
+        all_issues = self._unique_issues(all_issues)
+        writes = self._reconcile_issues(project_id, all_issues)
 
         return {
             'total_issues': len(all_issues),
@@ -288,7 +415,8 @@ List only clear contradictions. Format as:
                 'timeline': len([i for i in all_issues if i['type'] == 'timeline_inconsistency']),
                 'location': len([i for i in all_issues if i['type'] == 'location_inconsistency'])
             },
-            'issues': all_issues
+            'issues': all_issues,
+            'writes': writes
         }
     
     def get_issues(self, project_id: str) -> List[Dict]:
@@ -0,0 +1,363 @@
+"""
+Embedding Index Service
+Local vector index over scenes, lore and characters for relevant-context selection
+"""
+
+import hashlib
+import os
+import re
+import sqlite3
+import threading
+from collections import OrderedDict
+from typing import Dict, Iterable, List, Optional
+
+import numpy as np
+import google.generativeai as genai
+
+from db.schema import DB_PATH
+
+# Index lives next to the offline-first database
+EMBEDDING_DB_PATH = os.path.join(os.path.dirname(DB_PATH), 'embeddings.db')
+
+# Projects whose vectors are held in memory per process; the least recently searched is dropped
+EMBEDDING_CACHE_PROJECTS = int(os.getenv('EMBEDDING_CACHE_PROJECTS') or 32)
+
+# Words per indexed passage; long scenes are split so search returns passages
+CHUNK_WORDS = 200
+
+_TOKEN_PATTERN = re.compile(r"[a-z0-9']+")
+
+# Function words carry no topical signal for the hashing embedder
+_STOPWORDS = frozenset(
+    "a an and are as at be but by for from had has have he her his i in into is it its "
+    "of on or she so that the their them then there they this to was we were with you".split()
+)
+
+
+def chunk_text(text: str, chunk_words: int = CHUNK_WORDS) -> List[str]:
+    """Split text into passages of roughly chunk_words words"""
+    words = text.split()
+    return [
+        ' '.join(words[start:start + chunk_words])
+        for start in range(0, len(words), chunk_words)
+    ]
+
+
+class HashingEmbedder:
+    """
+    Deterministic offline embedder using signed feature hashing of word tokens
+
+    Needs no network access or credentials, so it is the default for the
+    desktop build and for tests.
+    """
+
+    def __init__(self, dimensions: int = 256):
+        self.dimensions = dimensions
+        self.name = f'hashing-{dimensions}'
+
+    def embed(self, texts: List[str]) -> np.ndarray:
+        vectors = np.zeros((len(texts), self.dimensions), dtype=np.float32)
+        for row, text in enumerate(texts):
+            for token in _TOKEN_PATTERN.findall(text.lower()):
+                if token in _STOPWORDS:
+                    continue
+                digest = int.from_bytes(
+                    hashlib.blake2b(token.encode('utf-8'), digest_size=8).digest(), 'little'
+                )
+                sign = 1.0 if digest >> 63 else -1.0
+                vectors[row, digest % self.dimensions] += sign
+        # Dampen repeated terms so one frequent word cannot dominate a passage
+        return np.sign(vectors) * np.log1p(np.abs(vectors))
+
+
+class GeminiEmbedder:
+    """Embedder backed by the Gemini embedding API"""
+
+    def __init__(self, model: str = 'models/text-embedding-004'):
+        self.model = model
+        self.name = model.split('/')[-1]
+
+    def embed(self, texts: List[str]) -> np.ndarray:
+        result = genai.embed_content(model=self.model, content=texts)
+        return np.asarray(result['embedding'], dtype=np.float32)
+
+
+def default_embedder():
+    """Select the embedder from EMBEDDING_BACKEND ('hashing' or 'gemini')"""
+    if os.getenv('EMBEDDING_BACKEND', 'hashing') == 'gemini':
+        return GeminiEmbedder()
+    return HashingEmbedder()
+
+
+def _normalize(vectors: np.ndarray) -> np.ndarray:
+    """Scale rows to unit length so a dot product is cosine similarity"""
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return (vectors / norms).astype(np.float32)
+
+
+class _ProjectVectors:
+    """In-memory matrix of one project's passage vectors"""
+
+    def __init__(self, version: int = 0):
+        self.keys: List[tuple] = []  # (kind, item_id, chunk, text)
+        self.matrix: Optional[np.ndarray] = None
+        self.version = version  # The project's index version this matrix reflects
+
+    def remove(self, kind: str, item_id: str):
+        keep = [i for i, key in enumerate(self.keys) if key[0] != kind or key[1] != item_id]
+        if len(keep) != len(self.keys):
+            self.keys = [self.keys[i] for i in keep]
+            self.matrix = self.matrix[keep]
+
+    def append(self, keys: List[tuple], vectors: np.ndarray):
+        self.keys.extend(keys)
+        self.matrix = vectors if self.matrix is None else np.vstack([self.matrix, vectors])
+
+
+class EmbeddingIndex:
+    """
+    Vector index stored in SQLite and searched from in-memory NumPy arrays
+
+    Items are re-embedded only when their text changes. Every change bumps
+    the project's version in SQLite. A loaded matrix is updated in place
+    by writes made in this process, and reloaded when a search finds that
+    another process changed the version since.
+    """
+
+    def __init__(self, embedder=None, db_path: str = EMBEDDING_DB_PATH,
+                 cache_projects: int = EMBEDDING_CACHE_PROJECTS):
+        self.embedder = embedder or HashingEmbedder()
+        self.db_path = db_path
+        self.cache_projects = cache_projects
+        self.lock = threading.Lock()
+        self._conn = None
+        self._projects: OrderedDict = OrderedDict()
+
+    def _get_conn(self):
+        """Open the index database on first use"""
+        if self._conn is None:
+            os.makedirs(os.path.dirname(self.db_path) or '.', exist_ok=True)
+            conn = sqlite3.connect(self.db_path, check_same_thread=False)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('''
+                CREATE TABLE IF NOT EXISTS embeddings (
+                    project_id TEXT NOT NULL,
+                    kind TEXT NOT NULL,
+                    item_id TEXT NOT NULL,
+                    chunk INTEGER NOT NULL,
+                    embedder TEXT NOT NULL,
+                    content_hash TEXT NOT NULL,
+                    text TEXT NOT NULL,
+                    vector BLOB NOT NULL,
+                    PRIMARY KEY (project_id, embedder, kind, item_id, chunk)
+                )
+            ''')
+            conn.execute('''
+                CREATE TABLE IF NOT EXISTS embedding_versions (
+                    project_id TEXT PRIMARY KEY,
+                    version INTEGER NOT NULL
+                )
+            ''')
+            conn.commit()
+            self._conn = conn
+        return self._conn
+
+    def _version(self, project_id: str) -> int:
+        """Number of changes made to a project's index, by any process"""
+        row = self._get_conn().execute(
+            'SELECT version FROM embedding_versions WHERE project_id = ?', (project_id,)
+        ).fetchone()
+        return row[0] if row else 0
+
+    def _bump_version(self, project_id: str) -> int:
+        """Record a change to a project's index; call inside the write's transaction"""
+        return self._get_conn().execute(
+            'INSERT INTO embedding_versions (project_id, version) VALUES (?, 1) '
+            'ON CONFLICT (project_id) DO UPDATE SET version = version + 1 RETURNING version',
+            (project_id,)
+        ).fetchone()[0]
+
+    def _load_project(self, project_id: str) -> _ProjectVectors:
+        """A project's vectors, reloaded from SQLite if another process changed them"""
+        version = self._version(project_id)
+        vectors = self._projects.get(project_id)
+        if vectors is not None and vectors.version == version:
+            self._projects.move_to_end(project_id)
+            return vectors
+
+        rows = self._get_conn().execute(
+            'SELECT kind, item_id, chunk, text, vector FROM embeddings '
+            'WHERE project_id = ? AND embedder = ?',
+            (project_id, self.embedder.name)
+        ).fetchall()
+
+        vectors = _ProjectVectors(version)
+        if rows:
+            vectors.keys = [tuple(row[:4]) for row in rows]
+            vectors.matrix = np.vstack([np.frombuffer(row[4], dtype=np.float32) for row in rows])
+        self._projects[project_id] = vectors
+        self._projects.move_to_end(project_id)
+        while len(self._projects) > self.cache_projects:
+            self._projects.popitem(last=False)
+        return vectors
+
+    def _cached_for_update(self, project_id: str, previous_version: int) -> Optional[_ProjectVectors]:
+        """
+        The loaded matrix a write should update in place, if any
+
+        A matrix that had already missed another process's change is
+        dropped instead, so the next search reloads it.
+        """
+        project = self._projects.get(project_id)
+        if project is not None and project.version != previous_version:
+            del self._projects[project_id]
+            return None
+        return project
+
+    def upsert(self, project_id: str, kind: str, item_id: str, text: str) -> bool:
+        """
+        Index (or re-index) an item's text
+
+        Returns:
+            bool: True if the item was re-embedded, False if it was unchanged
+        """
+        content_hash = hashlib.sha1(text.encode('utf-8')).hexdigest()
+
+        with self.lock:
+            conn = self._get_conn()
+            row = conn.execute(
+                'SELECT content_hash FROM embeddings '
+                'WHERE project_id = ? AND embedder = ? AND kind = ? AND item_id = ? LIMIT 1',
+                (project_id, self.embedder.name, kind, item_id)
+            ).fetchone()
+            if row and row[0] == content_hash:
+                return False
+
+        # Embed outside the lock; remote embedders can be slow
+        chunks = chunk_text(text)
+        vectors = _normalize(self.embedder.embed(chunks)) if chunks else None
+
+        with self.lock:
+            conn = self._get_conn()
+            previous_version = self._version(project_id)
+            conn.execute(
+                'DELETE FROM embeddings WHERE project_id = ? AND embedder = ? AND kind = ? AND item_id = ?',
+                (project_id, self.embedder.name, kind, item_id)
+            )
+            conn.executemany(
+                'INSERT INTO embeddings '
+                '(project_id, kind, item_id, chunk, embedder, content_hash, text, vector) '
+                'VALUES (?, ?, ?, ?, ?, ?, ?, ?)',
+                [
+                    (project_id, kind, item_id, i, self.embedder.name, content_hash,
+                     chunk, vectors[i].tobytes())
+                    for i, chunk in enumerate(chunks)
+                ]
+            )
+            version = self._bump_version(project_id)
+            conn.commit()
+
+            project = self._cached_for_update(project_id, previous_version)
+            if project is not None:
+                project.remove(kind, item_id)
+                if chunks:
+                    project.append(
+                        [(kind, item_id, i, chunk) for i, chunk in enumerate(chunks)], vectors
+                    )
+                project.version = version
+        return True
+
+    def remove(self, project_id: str, kind: str, item_id: str):
+        """Drop an item from the index"""
+        with self.lock:
+            conn = self._get_conn()
+            previous_version = self._version(project_id)
+            deleted = conn.execute(
+                'DELETE FROM embeddings WHERE project_id = ? AND kind = ? AND item_id = ?',
+                (project_id, kind, item_id)
+            ).rowcount
+            if not deleted:
+                conn.commit()
+                return
+            version = self._bump_version(project_id)
+            conn.commit()
+
+            project = self._cached_for_update(project_id, previous_version)
+            if project is not None:
+                project.remove(kind, item_id)
+                project.version = version
+
+    def search(self, project_id: str, query: str, k: int = 5,
+               kinds: Optional[Iterable[str]] = None,
+               item_ids: Optional[Iterable[str]] = None,
+               exclude_ids: Optional[Iterable[str]] = None) -> List[Dict]:
+        """
+        Top-k cosine search over a project's indexed passages
+
+        Args:
+            project_id: Project ID
+            query: Free text to match against
+            k: Maximum number of passages to return
+            kinds: Restrict to item kinds (e.g. 'scene', 'lore')
+            item_ids: Restrict to these item IDs
+            exclude_ids: Skip these item IDs
+
+        Returns:
+            List[Dict]: Passages ordered by descending similarity
+        """
+        if not query.strip() or k <= 0:
+            return []
+
+        query_vector = _normalize(self.embedder.embed([query]))[0]
+
+        with self.lock:
+            project = self._load_project(project_id)
+            keys, matrix = project.keys, project.matrix
+
+        if not keys:
+            return []
+
+        scores = matrix @ query_vector
+
+        kinds = set(kinds) if kinds is not None else None
+        item_ids = set(item_ids) if item_ids is not None else None
+        exclude_ids = set(exclude_ids or ())
+        if kinds is not None or item_ids is not None or exclude_ids:
+            mask = np.fromiter(
+                ((kinds is None or key[0] in kinds)
+                 and (item_ids is None or key[1] in item_ids)
+                 and key[1] not in exclude_ids
+                 for key in keys),
+                dtype=bool, count=len(keys)
+            )
+            scores = np.where(mask, scores, -np.inf)
+
+        k = min(k, len(keys))
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+
+        return [
+            {
+                'kind': keys[i][0],
+                'item_id': keys[i][1],
+                'chunk': keys[i][2],
+                'text': keys[i][3],
+                'score': float(scores[i])
+            }
+            for i in top
+            if np.isfinite(scores[i])
+        ]
+
+
+_default_index = None
+_default_index_lock = threading.Lock()
+
+
+def get_embedding_index() -> EmbeddingIndex:
+    """Get the process-wide embedding index"""
+    global _default_index
+    with _default_index_lock:
+        if _default_index is None:
+            _default_index = EmbeddingIndex(default_embedder())
+        return _default_index
@@ -0,0 +1,196 @@
+"""
+Export Cache Service
+Content-addressed on-disk cache of rendered export artifacts
+"""
+
+import hashlib
+import json
+import os
+import tempfile
+import threading
+from typing import Dict, Iterable, Iterator, List, Optional
+
+from db.schema import DB_PATH
+
+EXPORT_CACHE_DIR = (
+    os.getenv('EXPORT_CACHE_DIR') or os.path.join(os.path.dirname(DB_PATH), 'export_cache')
+)
+EXPORT_CACHE_MAX_BYTES = int(os.getenv('EXPORT_CACHE_MAX_BYTES') or 512 * 1024 * 1024)
+
+# Separates the project ID from the content key in artifact file names
+_KEY_SEPARATOR = '__'
+
+# Rendered chapters are shared by content, so they live outside any project's
+# namespace and survive invalidate_project(); LRU eviction retires them
+CHAPTER_NAMESPACE = '_chapters'
+
+
+class ExportCache:
+    """
+    Stores export artifacts on disk under a hash of everything that shapes them
+
+    A key covers project metadata, the ordered scene versions and the export
+    options, so an unchanged book maps to the same artifact. The least
+    recently used artifacts are evicted once the cache exceeds max_bytes.
+    """
+
+    def __init__(self, cache_dir: str = EXPORT_CACHE_DIR,
+                 max_bytes: int = EXPORT_CACHE_MAX_BYTES):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.lock = threading.Lock()
+
+    @staticmethod
+    def make_key(project: Dict, scene_versions: List[Dict], export_format: str,
+                 options: Optional[Dict] = None) -> str:
+        """
+        Hash the inputs of an export
+
+        Args:
+            project: Project metadata document
+            scene_versions: Scenes in manuscript order (id and updated_at at least)
+            export_format: Export format name
+            options: Export options
+
+        Returns:
+            str: Hex digest identifying the artifact
+        """
+        payload = json.dumps({
+            'project': project,
+            'scenes': [[s.get('id'), s.get('updated_at')] for s in scene_versions],
+            'format': export_format,
+            'options': options or {}
+        }, sort_keys=True, default=str)
+        return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+    @staticmethod
+    def make_chapter_key(scenes: List[Dict], export_format: str,
+                         options: Optional[Dict] = None) -> str:
+        """
+        Hash the inputs of one rendered chapter
+
+        Args:
+            scenes: The chapter's scenes as passed to the renderer
+            export_format: Export format name
+            options: Export options
+
+        Returns:
+            str: Hex digest identifying the chapter fragment
+        """
+        payload = json.dumps({
+            'scenes': scenes,
+            'format': export_format,
+            'options': options or {}
+        }, sort_keys=True, default=str)
+        return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+    def _path(self, project_id: str, key: str, extension: str) -> str:
+        return os.path.join(self.cache_dir, f'{project_id}{_KEY_SEPARATOR}{key}.{extension}')
+
+    def get(self, project_id: str, key: str, extension: str) -> Optional[str]:
+        """Path of a cached artifact, or None on a miss"""
+        path = self._path(project_id, key, extension)
+        try:
+            # Touch to mark as recently used
+            os.utime(path)
+        except FileNotFoundError:
+            return None
+        return path
+
+    def put(self, project_id: str, key: str, extension: str, fileobj) -> str:
+        """
+        Store an artifact from a readable file object
+
+        Returns:
+            str: Path of the stored artifact
+        """
+        chunks = iter(lambda: fileobj.read(1024 * 1024), b'')
+        for _ in self.tee(project_id, key, extension, chunks):
+            pass
+        return self._path(project_id, key, extension)
+
+    def tee(self, project_id: str, key: str, extension: str,
+            chunks: Iterable[bytes]) -> Iterator[bytes]:
+        """
+        Pass chunks through while storing them as an artifact
+
+        The artifact is only kept if the stream is consumed to the end, so an
+        aborted download never leaves a truncated export in the cache.
+
+        Yields:
+            bytes: The chunks, unchanged
+        """
+        os.makedirs(self.cache_dir, exist_ok=True)
+        path = self._path(project_id, key, extension)
+
+        # Write to a temporary name first so readers never see partial files
+        fd, tmp_path = tempfile.mkstemp(dir=self.cache_dir, suffix='.tmp')
+        stored = False
+        try:
+            with os.fdopen(fd, 'wb') as out:
+                for chunk in chunks:
+                    out.write(chunk)
+                    yield chunk
+            os.replace(tmp_path, path)
+            stored = True
+        finally:
+            if not stored:
+                self._remove(tmp_path)
+
+        self._evict(keep=path)
+
+    def invalidate_project(self, project_id: str) -> int:
+        """Remove every cached artifact of a project; returns the number removed"""
+        prefix = f'{project_id}{_KEY_SEPARATOR}'
+        removed = 0
+        with self.lock:
+            for entry in self._entries():
+                if entry.name.startswith(prefix):
+                    self._remove(entry.path)
+                    removed += 1
+        return removed
+
+    def _entries(self) -> List[os.DirEntry]:
+        try:
+            return [
+                entry for entry in os.scandir(self.cache_dir)
+                if entry.is_file() and not entry.name.endswith('.tmp')
+            ]
+        except FileNotFoundError:
+            return []
+
+    @staticmethod
+    def _remove(path: str):
+        try:
+            os.unlink(path)
+        except FileNotFoundError:
+            pass
+
+    def _evict(self, keep: Optional[str] = None):
+        """Delete least recently used artifacts until the cache fits max_bytes"""
+        with self.lock:
+            entries = [(entry, entry.stat()) for entry in self._entries()]
+            total = sum(stat.st_size for _, stat in entries)
+            if total <= self.max_bytes:
+                return
+
+            for entry, stat in sorted(entries, key=lambda item: item[1].st_mtime):
+                if total <= self.max_bytes:
+                    break
+                if entry.path == keep:
+                    continue
+                self._remove(entry.path)
+                total -= stat.st_size
+
+
+_default_cache = None
+_default_cache_lock = threading.Lock()
+
+
+def get_export_cache() -> ExportCache:
+    """Get the process-wide export cache"""
+    global _default_cache
+    with _default_cache_lock:
+        if _default_cache is None:
+            _default_cache = ExportCache()
+        return _default_cache
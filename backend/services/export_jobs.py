@@ -0,0 +1,270 @@
+"""
+Export Jobs Service
+Runs exports in the background and tracks their status and progress
+"""
+
+import json
+import os
+import socket
+import sqlite3
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, Optional
+
+from db.schema import DB_PATH
+
+# Job records live next to the offline-first database so every worker process sees them
+EXPORT_JOBS_DB_PATH = os.path.join(os.path.dirname(DB_PATH), 'export_jobs.db')
+
+# Exports rendered concurrently per process; further jobs wait in the queue
+EXPORT_JOB_WORKERS = int(os.getenv('EXPORT_JOB_WORKERS') or 2)
+
+# Finished jobs are forgotten after this many seconds
+EXPORT_JOB_TTL = 24 * 60 * 60
+
+# Seconds between a running job's heartbeats, and without one before it counts as dead
+EXPORT_JOB_HEARTBEAT = 30
+EXPORT_JOB_STALE_AFTER = 4 * EXPORT_JOB_HEARTBEAT
+
+JOB_QUEUED = 'queued'
+JOB_RUNNING = 'running'
+JOB_COMPLETED = 'completed'
+JOB_FAILED = 'failed'
+
+# Error recorded on a job whose worker process went away
+JOB_INTERRUPTED = 'Export was interrupted; please try again'
+
+
+def _pid_alive(pid: Optional[int], host: Optional[str]) -> bool:
+    """
+    Whether a job's owner process still runs
+
+    A PID means nothing on another host, so owners elsewhere (or of jobs
+    recorded without a host) count as alive and are left to the heartbeat.
+    """
+    if host != socket.gethostname():
+        return True
+    if not pid or pid == os.getpid() or os.name == 'nt':
+        # os.kill cannot probe a process on Windows; the heartbeat covers it
+        return True
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+class ExportJobStore:
+    """SQLite-backed record of export jobs"""
+
+    def __init__(self, db_path: str = EXPORT_JOBS_DB_PATH):
+        self.db_path = db_path
+        self.lock = threading.Lock()
+        self._conn = None
+
+    def _get_conn(self):
+        """Open the job database on first use"""
+        if self._conn is None:
+            os.makedirs(os.path.dirname(self.db_path) or '.', exist_ok=True)
+            conn = sqlite3.connect(self.db_path, check_same_thread=False)
+            conn.row_factory = sqlite3.Row
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('''
+                CREATE TABLE IF NOT EXISTS export_jobs (
+                    id TEXT PRIMARY KEY,
+                    user_id TEXT NOT NULL,
+                    project_id TEXT NOT NULL,
+                    format TEXT NOT NULL,
+                    options TEXT NOT NULL,
+                    status TEXT NOT NULL,
+                    progress INTEGER NOT NULL DEFAULT 0,
+                    total INTEGER NOT NULL DEFAULT 0,
+                    path TEXT,
+                    etag TEXT,
+                    error TEXT,
+                    created_at REAL NOT NULL,
+                    updated_at REAL NOT NULL,
+                    owner_pid INTEGER,
+                    owner_host TEXT
+                )
+            ''')
+            columns = {row['name'] for row in conn.execute('PRAGMA table_info(export_jobs)')}
+            for column, column_type in (('owner_pid', 'INTEGER'), ('owner_host', 'TEXT')):
+                if column not in columns:
+                    conn.execute(f'ALTER TABLE export_jobs ADD COLUMN {column} {column_type}')
+            conn.commit()
+            self._conn = conn
+        return self._conn
+
+    def create(self, user_id: str, project_id: str, export_format: str,
+               options: Optional[Dict] = None) -> Dict:
+        """Record a new queued job, owned by this process"""
+        now = time.time()
+        job_id = uuid.uuid4().hex
+        with self.lock:
+            conn = self._get_conn()
+            conn.execute(
+                'INSERT INTO export_jobs '
+                '(id, user_id, project_id, format, options, status, created_at, updated_at, '
+                'owner_pid, owner_host) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)',
+                (job_id, user_id, project_id, export_format, json.dumps(options or {}),
+                 JOB_QUEUED, now, now, os.getpid(), socket.gethostname())
+            )
+            conn.commit()
+        return self.get(job_id)
+
+    @staticmethod
+    def _is_stale(job, now: float) -> bool:
+        """
+        Whether an unfinished job can no longer finish
+
+        Its owner process on this host has exited, or it is running and has
+        missed its heartbeats (the owner hung, or died on another host).
+        """
+        if job['status'] not in (JOB_QUEUED, JOB_RUNNING):
+            return False
+        if not _pid_alive(job['owner_pid'], job['owner_host']):
+            return True
+        return job['status'] == JOB_RUNNING and job['updated_at'] < now - EXPORT_JOB_STALE_AFTER
+
+    def _fail_stale(self, conn, rows) -> int:
+        """Mark the stale jobs among rows failed; call with the lock held"""
+        now = time.time()
+        stale = [row['id'] for row in rows if self._is_stale(row, now)]
+        for job_id in stale:
+            conn.execute(
+                'UPDATE export_jobs SET status = ?, error = ?, updated_at = ? '
+                'WHERE id = ? AND status IN (?, ?)',
+                (JOB_FAILED, JOB_INTERRUPTED, now, job_id, JOB_QUEUED, JOB_RUNNING)
+            )
+        if stale:
+            conn.commit()
+        return len(stale)
+
+    def get(self, job_id: str) -> Optional[Dict]:
+        """Get a job by ID, failing it first if its worker has gone"""
+        with self.lock:
+            conn = self._get_conn()
+            row = conn.execute('SELECT * FROM export_jobs WHERE id = ?', (job_id,)).fetchone()
+            if row and self._fail_stale(conn, [row]):
+                row = conn.execute('SELECT * FROM export_jobs WHERE id = ?', (job_id,)).fetchone()
+        if not row:
+            return None
+        job = dict(row)
+        job['options'] = json.loads(job['options'])
+        return job
+
+    def update(self, job_id: str, **fields) -> Optional[Dict]:
+        """Update a job's fields and return the job"""
+        fields['updated_at'] = time.time()
+        assignments = ', '.join(f'{name} = ?' for name in fields)
+        with self.lock:
+            conn = self._get_conn()
+            conn.execute(
+                f'UPDATE export_jobs SET {assignments} WHERE id = ?',
+                (*fields.values(), job_id)
+            )
+            conn.commit()
+        return self.get(job_id)
+
+    def prune(self, max_age: float = EXPORT_JOB_TTL) -> int:
+        """
+        Fail jobs whose worker has gone, then delete finished jobs older
+        than max_age seconds; returns the number removed
+        """
+        with self.lock:
+            conn = self._get_conn()
+            self._fail_stale(conn, conn.execute(
+                'SELECT id, status, updated_at, owner_pid, owner_host FROM export_jobs '
+                'WHERE status IN (?, ?)',
+                (JOB_QUEUED, JOB_RUNNING)
+            ).fetchall())
+            cursor = conn.execute(
+                'DELETE FROM export_jobs WHERE status IN (?, ?) AND updated_at < ?',
+                (JOB_COMPLETED, JOB_FAILED, time.time() - max_age)
+            )
+            conn.commit()
+        return cursor.rowcount
+
+
+class ExportJobManager:
+    """
+    Runs exports on a bounded thread pool, recording progress in a job store
+
+    Request handlers only enqueue work, so a long export never holds a
+    request worker. Every status change of a job is passed to the
+    on_update callback given at submission.
+    """
+
+    def __init__(self, export_service, store: Optional[ExportJobStore] = None,
+                 max_workers: int = EXPORT_JOB_WORKERS):
+        self.export_service = export_service
+        self.store = store or ExportJobStore()
+        self.executor = ThreadPoolExecutor(max_workers=max_workers,
+                                           thread_name_prefix='export-job')
+
+    def submit(self, user_id: str, project_id: str, export_format: str,
+               options: Optional[Dict] = None,
+               on_update: Optional[Callable[[Dict], None]] = None) -> Dict:
+        """
+        Queue an export
+
+        Args:
+            user_id: User who owns the job
+            project_id: Project ID
+            export_format: One of ExportService.CACHED_FORMATS
+            options: Export options
+            on_update: Called with the job after every status or progress change
+
+        Returns:
+            Dict: The queued job
+        """
+        self.store.prune()
+        job = self.store.create(user_id, project_id, export_format, options)
+        self.executor.submit(self._run, job['id'], on_update)
+        return job
+
+    def get_job(self, job_id: str) -> Optional[Dict]:
+        """Get a job by ID"""
+        return self.store.get(job_id)
+
+    def _run(self, job_id: str, on_update: Optional[Callable[[Dict], None]] = None):
+        """Render a job's export and record the outcome"""
+
+        def notify(job: Dict):
+            if on_update:
+                try:
+                    on_update(job)
+                except Exception as e:
+                    print(f"Warning: Failed to publish export job update: {e}")
+
+        job = self.store.update(job_id, status=JOB_RUNNING)
+        notify(job)
+
+        def on_progress(done: int, total: int):
+            notify(self.store.update(job_id, progress=done, total=total))
+
+        # Keep updated_at fresh while a long chapter renders without progress
+        finished = threading.Event()
+
+        def heartbeat():
+            while not finished.wait(EXPORT_JOB_HEARTBEAT):
+                self.store.update(job_id)
+
+        threading.Thread(target=heartbeat, name=f'export-job-heartbeat-{job_id}', daemon=True).start()
+        try:
+            artifact = self.export_service.get_export(
+                job['project_id'], job['format'], job['options'], progress=on_progress
+            )
+            job = self.store.update(
+                job_id, status=JOB_COMPLETED, path=artifact['path'], etag=artifact['etag']
+            )
+        except Exception as e:
+            job = self.store.update(job_id, status=JOB_FAILED, error=str(e))
+        finally:
+            finished.set()
+        notify(job)
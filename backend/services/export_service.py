@@ -3,104 +3,236 @@ Export service for multi-format book generation
 """
 from io import BytesIO
 from datetime import datetime
+from collections import deque
+from concurrent.futures import Future, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+import itertools
+import json
+import multiprocessing
+import os
+import tempfile
+import threading
 import markdown
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Callable, Iterable, Iterator, Optional
+
+from services.export_cache import CHAPTER_NAMESPACE
+
+# Streamed exports stay in memory up to this size, then spill to disk
+SPOOL_MAX_MEMORY = 8 * 1024 * 1024
+
+# Worker processes used to render chapters; 1 renders in-process. Each
+# gunicorn worker starts its own pool, so this stays small by default.
+EXPORT_WORKERS = int(os.getenv('EXPORT_WORKERS') or 2)
+
+_render_pool = None
+_render_pool_lock = threading.Lock()
+
+
+def _get_render_pool() -> Optional[ProcessPoolExecutor]:
+    """Get the process-wide chapter render pool, or None to render in-process"""
+    global _render_pool
+    if EXPORT_WORKERS <= 1:
+        return None
+    with _render_pool_lock:
+        if _render_pool is None:
+            # Spawned rather than forked: forking a threaded server can copy
+            # held locks into the child, and frozen builds cannot fork
+            _render_pool = ProcessPoolExecutor(
+                max_workers=EXPORT_WORKERS, mp_context=multiprocessing.get_context('spawn')
+            )
+        return _render_pool
+
+
+def _reset_render_pool():
+    """Discard a broken render pool so the next export starts a fresh one"""
+    global _render_pool
+    with _render_pool_lock:
+        if _render_pool is not None:
+            _render_pool.shutdown(wait=False)
+            _render_pool = None
+
+
+def render_pdf_chapter(scenes: List[Dict]) -> bytes:
+    """Render one chapter's scenes into a standalone PDF (runs in a worker process)"""
+    from reportlab.platypus import PageBreak
+
+    styles = ExportService._pdf_styles()
+    elements = []
+    for scene in scenes:
+        if elements:
+            elements.append(PageBreak())
+        elements.extend(ExportService._pdf_scene_flowables(scene, 0, styles))
+
+    buffer = BytesIO()
+    ExportService._render_pdf(elements, buffer)
+    return buffer.getvalue()
+
+
+def render_epub_chapter(scenes: List[Dict]) -> bytes:
+    """Render one chapter's scenes to titled XHTML pages, JSON-encoded (runs in a worker process)"""
+    pages = []
+    for scene in scenes:
+        parts = [f"<h1>{scene['title']}</h1>"]
+        for para in scene['content'].split('\n\n'):
+            if para.strip():
+                parts.append(f"<p>{para.strip()}</p>")
+        pages.append({'title': scene['title'], 'content': ''.join(parts)})
+    return json.dumps(pages).encode('utf-8')
+
+
+# Chapter renderer and cached fragment extension of each parallel format
+CHAPTER_RENDERERS = {
+    'pdf': (render_pdf_chapter, 'pdf'),
+    'epub': (render_epub_chapter, 'json'),
+}
 
 
 class ExportService:
     """Service for exporting projects to various formats"""
 
-    def __init__(self):
-        self.db = None
+    # File extension of each cacheable export format
+    CACHED_FORMATS = {
+        'pdf': 'pdf',
+        'epub': 'epub',
+        'markdown': 'md',
+        'text': 'txt',
+    }
+
+    # Formats produced as a stream of encoded chunks rather than a rendered file
+    STREAMED_FORMATS = ('markdown', 'text')
+
+    def __init__(self, db=None, cache=None):
+        from services.export_cache import get_export_cache
+
+        self.db = db
+        self.cache = cache if cache is not None else get_export_cache()
 
-    def _get_project_content(self, project_id: str) -> Dict[str, Any]:
-        """Fetch all project content for export"""
+    def _get_story_bible_service(self):
+        """Story Bible service sharing this export service's database"""
         from services.story_bible_service import StoryBibleService
 
-        service = StoryBibleService()
+        return StoryBibleService(self.db)
 
-        # Get project metadata
+    def _export_key(self, project_id: str, export_format: str, options: Dict = None):
+        """Cache key and scene count of an export; raises ValueError for a missing project"""
+        service = self._get_story_bible_service()
         project = service.get_project(project_id)
         if not project:
-            return None
-
-        # Get all scenes
-        scenes = service.list_scenes(project_id)
-
-        # Sort scenes by order
-        scenes.sort(key=lambda x: x.get('order', 0))
+            raise ValueError("Project not found")
 
-        return {
-            'project': project,
-            'scenes': scenes
-        }
+        scene_versions = service.list_scene_versions(project_id)
+        key = self.cache.make_key(project, scene_versions, export_format, options)
+        return key, len(scene_versions)
 
-    def export_to_pdf(self, project_id: str, options: Dict = None) -> BytesIO:
+    def get_export(self, project_id: str, export_format: str, options: Dict = None,
+                   progress: Optional[Callable[[int, int], None]] = None) -> Dict[str, str]:
         """
-        Export project to PDF
+        Get an export artifact from the cache, rendering it on a miss
 
         Args:
             project_id: Project ID
-            options: Export options (font_size, page_size, etc.)
+            export_format: One of CACHED_FORMATS
+            options: Export options
+            progress: Called with (scenes rendered, total scenes) as rendering advances
 
         Returns:
-            BytesIO: PDF file buffer
+            Dict: 'path' of the artifact on disk and its 'etag'
         """
-        try:
-            from reportlab.lib.pagesizes import letter
-            from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
-            from reportlab.lib.units import inch
-            from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, PageBreak
-            from reportlab.lib.enums import TA_CENTER, TA_JUSTIFY
-
-            content = self._get_project_content(project_id)
-            if not content:
-                raise ValueError("Project not found")
-
-            project = content['project']
-            scenes = content['scenes']
-
-            # Create PDF buffer
-            buffer = BytesIO()
+        extension = self.CACHED_FORMATS[export_format]
+        key, total = self._export_key(project_id, export_format, options)
+
+        path = self.cache.get(project_id, key, extension)
+        if path is None:
+            if export_format in self.STREAMED_FORMATS:
+                chunks = self.cache.tee(
+                    project_id, key, extension, self._iter_export(project_id, export_format)
+                )
+                for _ in chunks:
+                    pass
+                path = self.cache.get(project_id, key, extension)
+            else:
+                report = (lambda done: progress(done, total)) if progress else None
+                artifact = self._render(project_id, export_format, options, report)
+                try:
+                    path = self.cache.put(project_id, key, extension, artifact)
+                finally:
+                    artifact.close()
+        if progress:
+            progress(total, total)
+
+        return {'path': path, 'etag': key}
+
+    def stream_export(self, project_id: str, export_format: str) -> Dict[str, Any]:
+        """
+        Open a Markdown or plain text export for streaming
 
-            # Create PDF document
-            doc = SimpleDocTemplate(
-                buffer,
-                pagesize=letter,
-                rightMargin=72,
-                leftMargin=72,
-                topMargin=72,
-                bottomMargin=18,
-            )
+        A cached artifact is returned by path. Otherwise the export is returned
+        as a generator of encoded chunks that stores the artifact in the cache
+        as it is consumed.
 
-            # Container for the 'Flowable' objects
-            elements = []
+        Args:
+            project_id: Project ID
+            export_format: One of STREAMED_FORMATS
 
-            # Define styles
-            styles = getSampleStyleSheet()
+        Returns:
+            Dict: 'etag' and either 'path' of the cached artifact or 'chunks'
+        """
+        extension = self.CACHED_FORMATS[export_format]
+        key, _ = self._export_key(project_id, export_format)
+
+        path = self.cache.get(project_id, key, extension)
+        if path is not None:
+            return {'path': path, 'etag': key}
+
+        chunks = self._iter_export(project_id, export_format)
+        return {'chunks': self.cache.tee(project_id, key, extension, chunks), 'etag': key}
+
+    def _iter_export(self, project_id: str, export_format: str) -> Iterator[bytes]:
+        """Encoded chunks of a streamed export format"""
+        if export_format == 'markdown':
+            return self.iter_markdown(project_id)
+        if export_format == 'text':
+            return self.iter_text(project_id)
+        raise ValueError(f"Unsupported export format: {export_format}")
+
+    def _render(self, project_id: str, export_format: str, options: Dict = None,
+                progress: Optional[Callable[[int], None]] = None):
+        """Render an export into a readable file object"""
+        if export_format == 'pdf':
+            return self.stream_pdf(project_id, options, progress)
+        if export_format == 'epub':
+            return self.export_to_epub(project_id, options, progress)
+        raise ValueError(f"Unsupported export format: {export_format}")
+
+    @staticmethod
+    def _pdf_styles() -> Dict[str, Any]:
+        """Paragraph styles used for PDF export"""
+        from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
+        from reportlab.lib.enums import TA_CENTER, TA_JUSTIFY
+
+        styles = getSampleStyleSheet()
 
+        return {
             # Title style
-            title_style = ParagraphStyle(
+            'title': ParagraphStyle(
                 'CustomTitle',
                 parent=styles['Heading1'],
                 fontSize=24,
                 textColor='black',
                 spaceAfter=30,
                 alignment=TA_CENTER,
-            )
-
+            ),
             # Author style
-            author_style = ParagraphStyle(
+            'author': ParagraphStyle(
                 'CustomAuthor',
                 parent=styles['Normal'],
                 fontSize=14,
                 textColor='black',
                 spaceAfter=12,
                 alignment=TA_CENTER,
-            )
-
+            ),
             # Chapter style
-            chapter_style = ParagraphStyle(
+            'chapter': ParagraphStyle(
                 'CustomChapter',
                 parent=styles['Heading2'],
                 fontSize=18,
@@ -108,10 +240,9 @@ class ExportService:
                 spaceAfter=20,
                 spaceBefore=20,
                 alignment=TA_CENTER,
-            )
-
+            ),
             # Body text style
-            body_style = ParagraphStyle(
+            'body': ParagraphStyle(
                 'CustomBody',
                 parent=styles['Normal'],
                 fontSize=12,
@@ -119,54 +250,201 @@ class ExportService:
                 alignment=TA_JUSTIFY,
                 spaceAfter=12,
                 leading=16,
-            )
+            ),
+        }
 
-            # Add title page
-            elements.append(Spacer(1, 2 * inch))
-            elements.append(Paragraph(project.get('title', 'Untitled'), title_style))
-            elements.append(Spacer(1, 0.3 * inch))
-            elements.append(Paragraph(f"by {project.get('author', 'Unknown')}", author_style))
-            elements.append(Spacer(1, 0.2 * inch))
-            elements.append(Paragraph(project.get('genre', ''), author_style))
-            elements.append(PageBreak())
+    @staticmethod
+    def _pdf_title_flowables(project: Dict, styles: Dict[str, Any]) -> List:
+        """Flowables for the title page"""
+        from reportlab.lib.units import inch
+        from reportlab.platypus import Paragraph, Spacer
+
+        return [
+            Spacer(1, 2 * inch),
+            Paragraph(project.get('title', 'Untitled'), styles['title']),
+            Spacer(1, 0.3 * inch),
+            Paragraph(f"by {project.get('author', 'Unknown')}", styles['author']),
+            Spacer(1, 0.2 * inch),
+            Paragraph(project.get('genre', ''), styles['author']),
+        ]
+
+    @staticmethod
+    def _pdf_scene_flowables(scene: Dict, index: int, styles: Dict[str, Any]) -> List:
+        """Flowables for one scene: its heading followed by its paragraphs"""
+        from reportlab.lib.units import inch
+        from reportlab.platypus import Paragraph, Spacer
+
+        # Chapter/Scene title
+        scene_title = scene.get('title', f'Chapter {index + 1}')
+        elements = [Paragraph(scene_title, styles['chapter']), Spacer(1, 0.2 * inch)]
+
+        # Scene content, split into paragraphs
+        for para in scene.get('content', '').split('\n\n'):
+            if para.strip():
+                elements.append(Paragraph(para.strip(), styles['body']))
+
+        return elements
+
+    @staticmethod
+    def _render_pdf(elements: List, buffer) -> None:
+        """Lay out flowables into a PDF written to buffer"""
+        from reportlab.lib.pagesizes import letter
+        from reportlab.platypus import SimpleDocTemplate
+
+        doc = SimpleDocTemplate(
+            buffer,
+            pagesize=letter,
+            rightMargin=72,
+            leftMargin=72,
+            topMargin=72,
+            bottomMargin=18,
+        )
+        doc.build(elements)
+
+    @staticmethod
+    def _iter_chapters(scenes: Iterable[Dict]) -> Iterator[List[Dict]]:
+        """Group consecutive scenes sharing a chapter_id; unassigned scenes stand alone"""
+        chapter = []
+        for scene in scenes:
+            chapter_id = scene.get('chapter_id')
+            if chapter and (chapter_id is None or chapter_id != chapter[-1].get('chapter_id')):
+                yield chapter
+                chapter = []
+            chapter.append(scene)
+        if chapter:
+            yield chapter
+
+    def _render_chapters(self, scenes: Iterable[Dict], export_format: str,
+                         options: Dict = None,
+                         progress: Optional[Callable[[int], None]] = None) -> Iterator[bytes]:
+        """
+        Render chapters in manuscript order, fanning cache misses out to worker processes
 
-            # Add scenes
-            for i, scene in enumerate(scenes):
-                # Chapter/Scene title
-                scene_title = scene.get('title', f'Chapter {i + 1}')
-                elements.append(Paragraph(scene_title, chapter_style))
-                elements.append(Spacer(1, 0.2 * inch))
-
-                # Scene content
-                content_text = scene.get('content', '')
-                # Split into paragraphs
-                paragraphs = content_text.split('\n\n')
-                for para in paragraphs:
-                    if para.strip():
-                        elements.append(Paragraph(para.strip(), body_style))
-
-                # Page break between scenes if not last
-                if i < len(scenes) - 1:
-                    elements.append(PageBreak())
-
-            # Build PDF
-            doc.build(elements)
-
-            # Get PDF bytes
-            buffer.seek(0)
-            return buffer
+        Each chapter is cached under a hash of its own content, so after an
+        edit only the changed chapters are rendered again. At most two
+        chapters per worker are in flight, which bounds memory by the
+        window rather than by the book.
 
+        Args:
+            scenes: Scenes in manuscript order
+            export_format: One of CHAPTER_RENDERERS
+            options: Export options
+            progress: Called with the number of scenes rendered after each chapter
+
+        Yields:
+            bytes: Each chapter's rendered fragment
+        """
+        render, extension = CHAPTER_RENDERERS[export_format]
+        pool = _get_render_pool()
+        window = max(1, EXPORT_WORKERS * 2)
+        pending = deque()
+
+        def submit(payload: List[Dict]) -> Future:
+            if pool is not None:
+                try:
+                    return pool.submit(render, payload)
+                except BrokenProcessPool:
+                    _reset_render_pool()
+            future = Future()
+            future.set_result(render(payload))
+            return future
+
+        scenes_done = 0
+
+        def collect(key: str, payload: List[Dict], future: Future, cached: bool) -> bytes:
+            nonlocal scenes_done
+            try:
+                fragment = future.result()
+            except BrokenProcessPool:
+                # A worker died; render this chapter here instead
+                _reset_render_pool()
+                fragment = render(payload)
+            if not cached:
+                self.cache.put(CHAPTER_NAMESPACE, key, extension, BytesIO(fragment))
+            scenes_done += len(payload)
+            if progress:
+                progress(scenes_done)
+            return fragment
+
+        scene_index = 0
+        for chapter in self._iter_chapters(scenes):
+            payload = [
+                {
+                    'title': scene.get('title', f'Chapter {scene_index + i + 1}'),
+                    'content': scene.get('content', '')
+                }
+                for i, scene in enumerate(chapter)
+            ]
+            scene_index += len(chapter)
+
+            key = self.cache.make_chapter_key(payload, export_format, options)
+            path = self.cache.get(CHAPTER_NAMESPACE, key, extension)
+            if path is not None:
+                with open(path, 'rb') as f:
+                    future = Future()
+                    future.set_result(f.read())
+                pending.append((key, payload, future, True))
+            else:
+                pending.append((key, payload, submit(payload), False))
+
+            while len(pending) > window:
+                yield collect(*pending.popleft())
+
+        while pending:
+            yield collect(*pending.popleft())
+
+    def stream_pdf(self, project_id: str, options: Dict = None,
+                   progress: Optional[Callable[[int], None]] = None):
+        """
+        Export project to PDF without materializing the whole book
+
+        Scenes are fetched in pages and each chapter is laid out as its own
+        PDF, in worker processes when EXPORT_WORKERS > 1, so only a window
+        of chapters exists at once. Each chapter's pages are written to a
+        spooled temporary file as soon as it is rendered, so the finished
+        book is never held in memory.
+
+        Args:
+            project_id: Project ID
+            options: Export options (font_size, page_size, etc.)
+            progress: Called with the number of scenes rendered after each chapter
+
+        Returns:
+            file: Temporary file positioned at the start of the PDF
+        """
+        try:
+            import reportlab  # noqa: F401
+            from utils.pdf_concat import concatenate_pdfs
         except ImportError:
             # Fallback if reportlab not available
             return self._export_to_text(project_id, 'pdf')
 
-    def export_to_epub(self, project_id: str, options: Dict = None) -> BytesIO:
+        service = self._get_story_bible_service()
+        project = service.get_project(project_id)
+        if not project:
+            raise ValueError("Project not found")
+
+        title_page = BytesIO()
+        self._render_pdf(self._pdf_title_flowables(project, self._pdf_styles()), title_page)
+        chapters = self._render_chapters(service.iter_scenes(project_id), 'pdf', options, progress)
+
+        output = tempfile.SpooledTemporaryFile(max_size=SPOOL_MAX_MEMORY)
+        concatenate_pdfs(itertools.chain([title_page.getvalue()], chapters), output)
+        output.seek(0)
+        return output
+
+    def export_to_epub(self, project_id: str, options: Dict = None,
+                       progress: Optional[Callable[[int], None]] = None) -> BytesIO:
         """
         Export project to EPUB
 
+        Chapter XHTML is rendered through the same cached, parallel chapter
+        pipeline as PDF; ebooklib then writes the zip container.
+
         Args:
             project_id: Project ID
             options: Export options
+            progress: Called with the number of scenes rendered after each chapter
 
         Returns:
             BytesIO: EPUB file buffer
@@ -174,13 +452,11 @@ class ExportService:
         try:
             from ebooklib import epub
 
-            content = self._get_project_content(project_id)
-            if not content:
+            service = self._get_story_bible_service()
+            project = service.get_project(project_id)
+            if not project:
                 raise ValueError("Project not found")
 
-            project = content['project']
-            scenes = content['scenes']
-
             # Create EPUB book
             book = epub.EpubBook()
 
@@ -194,29 +470,21 @@ class ExportService:
             chapters = []
             spine = ['nav']
 
-            for i, scene in enumerate(scenes):
-                # Create chapter
-                chapter = epub.EpubHtml(
-                    title=scene.get('title', f'Chapter {i + 1}'),
-                    file_name=f'chap_{i+1}.xhtml',
-                    lang='en'
-                )
-
-                # Format content
-                content_html = f"<h1>{scene.get('title', f'Chapter {i + 1}')}</h1>"
-
-                # Convert paragraphs to HTML
-                paragraphs = scene.get('content', '').split('\n\n')
-                for para in paragraphs:
-                    if para.strip():
-                        content_html += f"<p>{para.strip()}</p>"
-
-                chapter.content = content_html
-
-                # Add chapter to book
-                book.add_item(chapter)
-                chapters.append(chapter)
-                spine.append(chapter)
+            scenes = service.iter_scenes(project_id)
+            for fragment in self._render_chapters(scenes, 'epub', options, progress):
+                for page in json.loads(fragment):
+                    # One EPUB chapter per scene
+                    chapter = epub.EpubHtml(
+                        title=page['title'],
+                        file_name=f'chap_{len(chapters) + 1}.xhtml',
+                        lang='en'
+                    )
+                    chapter.content = page['content']
+
+                    # Add chapter to book
+                    book.add_item(chapter)
+                    chapters.append(chapter)
+                    spine.append(chapter)
 
             # Define Table of Contents
             book.toc = tuple(chapters)
@@ -267,52 +535,82 @@ class ExportService:
 
     def export_to_markdown(self, project_id: str) -> str:
         """Export project to Markdown"""
-        content = self._get_project_content(project_id)
-        if not content:
-            raise ValueError("Project not found")
+        return b''.join(self.iter_markdown(project_id)).decode('utf-8')
 
-        project = content['project']
-        scenes = content['scenes']
+    def iter_markdown(self, project_id: str) -> Iterator[bytes]:
+        """
+        Export project to Markdown as UTF-8 chunks, one per scene
 
-        # Build markdown
-        md = f"# {project.get('title', 'Untitled')}\n\n"
-        md += f"**Author:** {project.get('author', 'Unknown')}  \n"
-        md += f"**Genre:** {project.get('genre', 'Unknown')}  \n\n"
+        Scenes are fetched a page at a time, so memory stays flat regardless
+        of book size. A missing project raises before the first chunk.
 
-        if project.get('description'):
-            md += f"## Synopsis\n\n{project['description']}\n\n"
+        Args:
+            project_id: Project ID
 
-        md += "---\n\n"
+        Returns:
+            Iterator[bytes]: Encoded Markdown
+        """
+        service = self._get_story_bible_service()
+        project = service.get_project(project_id)
+        if not project:
+            raise ValueError("Project not found")
 
-        # Add scenes
-        for i, scene in enumerate(scenes):
-            md += f"## {scene.get('title', f'Chapter {i + 1}')}\n\n"
-            md += f"{scene.get('content', '')}\n\n"
-            md += "---\n\n"
+        return self._markdown_chunks(project, service.iter_scenes(project_id))
+
+    @staticmethod
+    def _markdown_chunks(project: Dict, scenes: Iterable[Dict]) -> Iterator[bytes]:
+        header = [
+            f"# {project.get('title', 'Untitled')}\n\n",
+            f"**Author:** {project.get('author', 'Unknown')}  \n",
+            f"**Genre:** {project.get('genre', 'Unknown')}  \n\n",
+        ]
+        if project.get('description'):
+            header.append(f"## Synopsis\n\n{project['description']}\n\n")
+        header.append("---\n\n")
+        yield ''.join(header).encode('utf-8')
 
-        return md
+        for i, scene in enumerate(scenes):
+            yield (
+                f"## {scene.get('title', f'Chapter {i + 1}')}\n\n"
+                f"{scene.get('content', '')}\n\n"
+                "---\n\n"
+            ).encode('utf-8')
 
     def export_to_text(self, project_id: str) -> str:
         """Export project to plain text"""
-        content = self._get_project_content(project_id)
-        if not content:
+        return b''.join(self.iter_text(project_id)).decode('utf-8')
+
+    def iter_text(self, project_id: str) -> Iterator[bytes]:
+        """
+        Export project to plain text as UTF-8 chunks, one per scene
+
+        Args:
+            project_id: Project ID
+
+        Returns:
+            Iterator[bytes]: Encoded text
+        """
+        service = self._get_story_bible_service()
+        project = service.get_project(project_id)
+        if not project:
             raise ValueError("Project not found")
 
-        project = content['project']
-        scenes = content['scenes']
+        return self._text_chunks(project, service.iter_scenes(project_id))
 
-        # Build text
-        text = f"{project.get('title', 'Untitled').upper()}\n"
-        text += f"by {project.get('author', 'Unknown')}\n\n"
-        text += "=" * 60 + "\n\n"
+    @staticmethod
+    def _text_chunks(project: Dict, scenes: Iterable[Dict]) -> Iterator[bytes]:
+        yield (
+            f"{project.get('title', 'Untitled').upper()}\n"
+            f"by {project.get('author', 'Unknown')}\n\n"
+            + "=" * 60 + "\n\n"
+        ).encode('utf-8')
 
-        # Add scenes
         for i, scene in enumerate(scenes):
-            text += f"\n{scene.get('title', f'Chapter {i + 1}').upper()}\n\n"
-            text += f"{scene.get('content', '')}\n\n"
-            text += "-" * 60 + "\n"
-
-        return text
+            yield (
+                f"\n{scene.get('title', f'Chapter {i + 1}').upper()}\n\n"
+                f"{scene.get('content', '')}\n\n"
+                + "-" * 60 + "\n"
+            ).encode('utf-8')
 
     def _export_to_text(self, project_id: str, format_type: str) -> BytesIO:
         """Fallback text export"""
@@ -0,0 +1,446 @@
+"""
+Mention Index Service
+Finds where characters are named in scenes, by name or alias, and stores the positions
+"""
+
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+from collections import OrderedDict, deque
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from db.schema import DB_PATH
+
+# Index lives next to the offline-first database
+MENTION_DB_PATH = os.path.join(os.path.dirname(DB_PATH), 'mentions.db')
+
+# Names shorter than this (e.g. an initial) would match too much ordinary text
+MIN_NAME_LENGTH = 2
+
+# Projects whose compiled matcher is kept in memory, least recently used dropped first
+MATCHER_CACHE_PROJECTS = int(os.getenv('MATCHER_CACHE_PROJECTS') or 256)
+
+# Whitespace folds to a plain space so multi-word names match across line breaks
+_SPACES = str.maketrans('\t\n\r\x0b\x0c\xa0', '      ')
+
+
+def fold(text: str) -> str:
+    """
+    Case- and whitespace-folded text, with the same length as the input
+
+    Positions found in the folded text are positions in the original.
+    """
+    folded = text.lower()
+    if len(folded) != len(text):
+        # A few characters lower-case to two (e.g. 'İ'); keep those as they are
+        folded = ''.join(ch if len(ch.lower()) != 1 else ch.lower() for ch in text)
+    return folded.translate(_SPACES)
+
+
+def name_patterns(names: Iterable[str]) -> List[str]:
+    """Distinct folded search patterns for a character's names and aliases"""
+    patterns = []
+    for name in names:
+        pattern = fold(' '.join((name or '').split()))
+        if len(pattern) >= MIN_NAME_LENGTH and pattern not in patterns:
+            patterns.append(pattern)
+    return patterns
+
+
+class MentionMatcher:
+    """
+    Aho-Corasick automaton over every name and alias of a project's characters
+
+    A scene is scanned once, whatever the number of names. Matches must be
+    whole words and ignore case. Characters are matched independently, so
+    one character's names never hide another's.
+    """
+
+    def __init__(self, names: Dict[str, Iterable[str]]):
+        goto: List[Dict[str, int]] = [{}]
+        outputs: List[Tuple] = [()]
+        fingerprint = hashlib.sha1()
+
+        for character_id in sorted(names):
+            patterns = name_patterns(names[character_id])
+            fingerprint.update(json.dumps([character_id, patterns]).encode('utf-8'))
+            for pattern in patterns:
+                state = 0
+                for ch in pattern:
+                    following = goto[state].get(ch)
+                    if following is None:
+                        goto.append({})
+                        outputs.append(())
+                        following = goto[state][ch] = len(goto) - 1
+                    state = following
+                outputs[state] += ((len(pattern), character_id),)
+
+        # Breadth-first, so a state's failure state is complete before the state itself
+        fail = [0] * len(goto)
+        order = []
+        queue = deque(goto[0].values())
+        while queue:
+            state = queue.popleft()
+            order.append(state)
+            for ch, following in goto[state].items():
+                queue.append(following)
+                fallback = fail[state]
+                while fallback and ch not in goto[fallback]:
+                    fallback = fail[fallback]
+                target = goto[fallback].get(ch, 0)
+                fail[following] = target if target != following else 0
+                outputs[following] += outputs[fail[following]]
+
+        # Fold failure links into the transition tables: one dict lookup per character
+        self._delta = [dict(goto[0])] + [None] * (len(goto) - 1)
+        for state in order:
+            self._delta[state] = {**self._delta[fail[state]], **goto[state]}
+        self._outputs = outputs
+        self.fingerprint = fingerprint.hexdigest()
+
+    @property
+    def empty(self) -> bool:
+        return len(self._outputs) == 1
+
+    def find(self, text: str) -> Dict[str, List[Tuple[int, int]]]:
+        """
+        Positions of every character named in text
+
+        Returns:
+            Dict: Character ID -> (start, end) offsets into text, in order.
+            Where one character's names overlap (e.g. 'Anna' inside 'Anna
+            Maria'), only the longest, leftmost is kept.
+        """
+        found: Dict[str, List[Tuple[int, int]]] = {}
+        if self.empty or not text:
+            return found
+
+        folded = fold(text)
+        last = len(folded) - 1
+        delta, outputs = self._delta, self._outputs
+        state = 0
+        for end, ch in enumerate(folded):
+            state = delta[state].get(ch, 0)
+            if outputs[state]:
+                if end < last and folded[end + 1].isalnum():
+                    continue
+                for length, character_id in outputs[state]:
+                    start = end - length + 1
+                    if start == 0 or not folded[start - 1].isalnum():
+                        found.setdefault(character_id, []).append((start, end + 1))
+
+        for character_id, spans in found.items():
+            spans.sort(key=lambda span: (span[0], -span[1]))
+            kept = []
+            for span in spans:
+                if not kept or span[0] >= kept[-1][1]:
+                    kept.append(span)
+            found[character_id] = kept
+        return found
+
+
+class MentionIndex:
+    """
+    Character mentions per scene, stored in SQLite
+
+    Scenes are scanned when they are written and re-scanned only when their
+    text, chapter or the project's character names change. Lookups by
+    character or by chapter read the stored mentions instead of the text.
+
+    Every change to a project's names bumps its version in SQLite. Compiled
+    matchers are cached by that version, so names written by another
+    process are picked up on the next scan, and a scan's mentions are only
+    stored if the names did not change while it ran.
+    """
+
+    def __init__(self, db_path: str = MENTION_DB_PATH,
+                 cache_projects: int = MATCHER_CACHE_PROJECTS):
+        self.db_path = db_path
+        self.cache_projects = cache_projects
+        self.lock = threading.Lock()
+        self._conn = None
+        self._matchers: OrderedDict = OrderedDict()  # Project ID -> (version, matcher)
+
+    def _get_conn(self):
+        """Open the index database on first use"""
+        if self._conn is None:
+            os.makedirs(os.path.dirname(self.db_path) or '.', exist_ok=True)
+            conn = sqlite3.connect(self.db_path, check_same_thread=False)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('''
+                CREATE TABLE IF NOT EXISTS mention_names (
+                    project_id TEXT NOT NULL,
+                    character_id TEXT NOT NULL,
+                    patterns TEXT NOT NULL,
+                    PRIMARY KEY (project_id, character_id)
+                )
+            ''')
+            conn.execute('''
+                CREATE TABLE IF NOT EXISTS mention_scenes (
+                    project_id TEXT NOT NULL,
+                    scene_id TEXT NOT NULL,
+                    content_hash TEXT NOT NULL,
+                    PRIMARY KEY (project_id, scene_id)
+                )
+            ''')
+            conn.execute('''
+                CREATE TABLE IF NOT EXISTS mentions (
+                    project_id TEXT NOT NULL,
+                    scene_id TEXT NOT NULL,
+                    character_id TEXT NOT NULL,
+                    chapter_id TEXT,
+                    count INTEGER NOT NULL,
+                    positions TEXT NOT NULL,
+                    PRIMARY KEY (project_id, scene_id, character_id)
+                )
+            ''')
+            conn.execute('''
+                CREATE TABLE IF NOT EXISTS mention_versions (
+                    project_id TEXT PRIMARY KEY,
+                    version INTEGER NOT NULL
+                )
+            ''')
+            conn.execute('CREATE INDEX IF NOT EXISTS mentions_by_character '
+                         'ON mentions (project_id, character_id)')
+            conn.execute('CREATE INDEX IF NOT EXISTS mentions_by_chapter '
+                         'ON mentions (project_id, chapter_id)')
+            conn.commit()
+            self._conn = conn
+        return self._conn
+
+    def set_character(self, project_id: str, character_id: str, names: Iterable[str]) -> bool:
+        """
+        Record a character's name and aliases
+
+        Returns:
+            bool: True if they changed, so scenes need re-scanning for this character
+        """
+        patterns = json.dumps(name_patterns(names))
+        with self.lock:
+            conn = self._get_conn()
+            row = conn.execute(
+                'SELECT patterns FROM mention_names WHERE project_id = ? AND character_id = ?',
+                (project_id, character_id)
+            ).fetchone()
+            if row and row[0] == patterns:
+                return False
+            with conn:
+                conn.execute('INSERT OR REPLACE INTO mention_names (project_id, character_id, patterns) '
+                             'VALUES (?, ?, ?)', (project_id, character_id, patterns))
+                self._bump_version(project_id)
+        return True
+
+    def remove_character(self, project_id: str, character_id: str):
+        """Forget a character and every mention of them"""
+        with self.lock:
+            conn = self._get_conn()
+            with conn:
+                conn.execute('DELETE FROM mention_names WHERE project_id = ? AND character_id = ?',
+                             (project_id, character_id))
+                conn.execute('DELETE FROM mentions WHERE project_id = ? AND character_id = ?',
+                             (project_id, character_id))
+                self._bump_version(project_id)
+
+    def character_ids(self, project_id: str) -> List[str]:
+        """Characters whose names are recorded for a project"""
+        with self.lock:
+            rows = self._get_conn().execute(
+                'SELECT character_id FROM mention_names WHERE project_id = ?', (project_id,)
+            ).fetchall()
+        return [row[0] for row in rows]
+
+    def _version(self, project_id: str) -> int:
+        """Number of changes made to a project's names, by any process"""
+        row = self._get_conn().execute(
+            'SELECT version FROM mention_versions WHERE project_id = ?', (project_id,)
+        ).fetchone()
+        return row[0] if row else 0
+
+    def _bump_version(self, project_id: str):
+        """Record a change to a project's names; call inside the write's transaction"""
+        self._get_conn().execute(
+            'INSERT INTO mention_versions (project_id, version) VALUES (?, 1) '
+            'ON CONFLICT (project_id) DO UPDATE SET version = version + 1', (project_id,)
+        )
+
+    def _names(self, project_id: str, character_ids: Optional[Iterable[str]] = None,
+               cached_version: Optional[int] = None) -> Tuple[int, Optional[Dict]]:
+        """
+        A project's names version and names, read together
+
+        The names are None when the version equals cached_version.
+        """
+        with self.lock:
+            conn = self._get_conn()
+            version = self._version(project_id)
+            if version == cached_version:
+                return version, None
+            rows = conn.execute(
+                'SELECT character_id, patterns FROM mention_names WHERE project_id = ?',
+                (project_id,)
+            ).fetchall()
+        wanted = set(character_ids) if character_ids is not None else None
+        return version, {character_id: json.loads(patterns) for character_id, patterns in rows
+                         if wanted is None or character_id in wanted}
+
+    def _versioned_matcher(self, project_id: str) -> Tuple[int, MentionMatcher]:
+        cached = self._matchers.get(project_id)
+        version, names = self._names(project_id, cached_version=cached[0] if cached else None)
+        if names is None:
+            matcher = cached[1]
+        else:
+            matcher = MentionMatcher(names)
+        with self.lock:
+            self._matchers[project_id] = (version, matcher)
+            self._matchers.move_to_end(project_id)
+            while len(self._matchers) > self.cache_projects:
+                self._matchers.popitem(last=False)
+        return version, matcher
+
+    def matcher(self, project_id: str) -> MentionMatcher:
+        """The compiled matcher for a project's current names, rebuilt when they change"""
+        return self._versioned_matcher(project_id)[1]
+
+    def index_scene(self, project_id: str, scene_id: str, chapter_id: Optional[str], text: str,
+                    character_ids: Optional[Iterable[str]] = None) -> Optional[int]:
+        """
+        Scan a scene and replace its stored mentions
+
+        Args:
+            project_id: Project ID
+            scene_id: Scene ID
+            chapter_id: Chapter the scene belongs to, if any
+            text: Scene content
+            character_ids: Only re-scan for these characters, e.g. after a rename
+
+        Returns:
+            int: Mentions found, or None if the scene was unchanged and skipped
+        """
+        text = text or ''
+        if character_ids is not None:
+            character_ids = list(character_ids)
+
+        while True:
+            if character_ids is not None:
+                version, names = self._names(project_id, character_ids)
+                matcher = MentionMatcher(names)
+                content_hash = None
+            else:
+                version, matcher = self._versioned_matcher(project_id)
+                content_hash = hashlib.sha1(
+                    f'{chapter_id or ""}\0{matcher.fingerprint}\0{text}'.encode('utf-8')
+                ).hexdigest()
+                with self.lock:
+                    row = self._get_conn().execute(
+                        'SELECT content_hash FROM mention_scenes WHERE project_id = ? AND scene_id = ?',
+                        (project_id, scene_id)
+                    ).fetchone()
+                if row and row[0] == content_hash:
+                    return None
+
+            found = matcher.find(text)
+            rows = [(project_id, scene_id, character_id, chapter_id, len(spans),
+                     json.dumps(spans, separators=(',', ':')))
+                    for character_id, spans in found.items()]
+            if self._store_scene(project_id, scene_id, content_hash, rows, character_ids, version):
+                return sum(row[4] for row in rows)
+
+    def _store_scene(self, project_id: str, scene_id: str, content_hash: Optional[str],
+                     rows: List[Tuple], character_ids: Optional[List[str]], version: int) -> bool:
+        """
+        Replace a scene's mentions with a scan's results
+
+        Returns:
+            bool: False, with nothing written, if the project's names changed
+            since the scan read them (the scan may miss a new character)
+        """
+        with self.lock:
+            conn = self._get_conn()
+            with conn:
+                # Take the write lock first, so names cannot change before this commits
+                conn.execute('BEGIN IMMEDIATE')
+                if self._version(project_id) != version:
+                    return False
+                if character_ids is None:
+                    conn.execute('DELETE FROM mentions WHERE project_id = ? AND scene_id = ?',
+                                 (project_id, scene_id))
+                    conn.execute('INSERT OR REPLACE INTO mention_scenes (project_id, scene_id, content_hash) '
+                                 'VALUES (?, ?, ?)', (project_id, scene_id, content_hash))
+                elif character_ids:
+                    conn.execute(
+                        f"DELETE FROM mentions WHERE project_id = ? AND scene_id = ? "
+                        f"AND character_id IN ({','.join('?' * len(character_ids))})",
+                        (project_id, scene_id, *character_ids)
+                    )
+                conn.executemany('INSERT INTO mentions (project_id, scene_id, character_id, chapter_id, '
+                                 'count, positions) VALUES (?, ?, ?, ?, ?, ?)', rows)
+        return True
+
+    def remove_scene(self, project_id: str, scene_id: str):
+        """Drop a scene's mentions"""
+        with self.lock:
+            conn = self._get_conn()
+            with conn:
+                conn.execute('DELETE FROM mentions WHERE project_id = ? AND scene_id = ?',
+                             (project_id, scene_id))
+                conn.execute('DELETE FROM mention_scenes WHERE project_id = ? AND scene_id = ?',
+                             (project_id, scene_id))
+
+    def scenes_mentioning(self, project_id: str, character_id: str) -> List[Dict]:
+        """
+        Scenes that name a character, most mentions first
+
+        Returns:
+            List[Dict]: 'scene_id', 'chapter_id', 'count' and 'positions',
+            a list of [start, end) offsets into the scene content
+        """
+        with self.lock:
+            rows = self._get_conn().execute('''
+                SELECT scene_id, chapter_id, count, positions FROM mentions
+                WHERE project_id = ? AND character_id = ?
+                ORDER BY count DESC, scene_id
+            ''', (project_id, character_id)).fetchall()
+        return [{'scene_id': scene_id, 'chapter_id': chapter_id, 'count': count,
+                 'positions': json.loads(positions)}
+                for scene_id, chapter_id, count, positions in rows]
+
+    def characters_in_chapter(self, project_id: str, chapter_id: str) -> List[Dict]:
+        """
+        Characters named in a chapter's scenes, most mentioned first
+
+        Returns:
+            List[Dict]: 'character_id', 'scenes' (scene count) and 'mentions'
+        """
+        with self.lock:
+            rows = self._get_conn().execute('''
+                SELECT character_id, COUNT(*), SUM(count) FROM mentions
+                WHERE project_id = ? AND chapter_id = ?
+                GROUP BY character_id
+                ORDER BY SUM(count) DESC, character_id
+            ''', (project_id, chapter_id)).fetchall()
+        return [{'character_id': character_id, 'scenes': scenes, 'mentions': mentions}
+                for character_id, scenes, mentions in rows]
+
+    def characters_in_scene(self, project_id: str, scene_id: str) -> List[str]:
+        """Characters named in a scene, most mentioned first"""
+        with self.lock:
+            rows = self._get_conn().execute(
+                'SELECT character_id FROM mentions WHERE project_id = ? AND scene_id = ? '
+                'ORDER BY count DESC, character_id', (project_id, scene_id)
+            ).fetchall()
+        return [row[0] for row in rows]
+
+
+_default_index = None
+_default_index_lock = threading.Lock()
+
+
+def get_mention_index() -> MentionIndex:
+    """Get the process-wide mention index"""
+    global _default_index
+    with _default_index_lock:
+        if _default_index is None:
+            _default_index = MentionIndex()
+        return _default_index
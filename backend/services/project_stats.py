@@ -0,0 +1,171 @@
+"""
+Project Stats Service
+Word and scene totals per chapter and project, and daily writing progress
+"""
+
+from datetime import datetime, timedelta
+from typing import Dict, Iterable, Optional, Tuple
+
+from firebase_admin import firestore
+from google.cloud.firestore_v1.base_query import FieldFilter
+
+# Days of writing progress returned by default, and at most
+DEFAULT_STATS_DAYS = 30
+MAX_STATS_DAYS = 366
+
+# Chapter key for scenes that are not in a chapter (Firestore field names cannot be empty)
+UNASSIGNED_CHAPTER = '_unassigned'
+
+# A scene's place in the totals: (chapter ID, word count)
+SceneCount = Tuple[Optional[str], int]
+
+
+def _today() -> str:
+    return datetime.utcnow().date().isoformat()
+
+
+class ProjectStatsService:
+    """
+    Keeps running word and scene totals for each project
+
+    Totals live in one document per project (projects/{id}/stats/totals)
+    with a map of per-chapter totals; each writing day has a document in
+    projects/{id}/stats_daily. The project total is also kept in the
+    project document's current_word_count, which project lists show.
+    Scene writes add increments to the batch that writes the scene, so
+    totals change exactly when the scene does and reading them never needs
+    the scenes themselves.
+    """
+
+    def __init__(self, db):
+        self.db = db
+
+    def _project(self, project_id: str):
+        return self.db.collection('projects').document(project_id)
+
+    def _totals_ref(self, project_id: str):
+        return self._project(project_id).collection('stats').document('totals')
+
+    def _daily(self, project_id: str):
+        return self._project(project_id).collection('stats_daily')
+
+    def record(self, batch, project_id: str, before: Optional[SceneCount],
+               after: Optional[SceneCount], day: Optional[str] = None):
+        """
+        Add the totals changes of one scene write to a batch
+
+        Args:
+            batch: Batch (or transaction) that also writes the scene
+            project_id: Project ID
+            before: Scene's chapter and word count before the write; None for a new scene
+            after: Chapter and word count after the write; None for a deleted scene
+            day: UTC date the words are credited to (default: today)
+        """
+        chapters: Dict[str, Dict[str, int]] = {}
+        for count, sign in ((before, -1), (after, 1)):
+            if count is None:
+                continue
+            chapter_id, words = count
+            delta = chapters.setdefault(chapter_id or UNASSIGNED_CHAPTER, {'words': 0, 'scenes': 0})
+            delta['words'] += sign * (words or 0)
+            delta['scenes'] += sign
+
+        words = sum(delta['words'] for delta in chapters.values())
+        scenes = sum(delta['scenes'] for delta in chapters.values())
+        chapters = {chapter: delta for chapter, delta in chapters.items() if any(delta.values())}
+        if not chapters:
+            return
+
+        totals = {
+            'chapters': {
+                chapter: {field: firestore.Increment(value) for field, value in delta.items() if value}
+                for chapter, delta in chapters.items()
+            }
+        }
+        if words:
+            totals['words'] = firestore.Increment(words)
+        if scenes:
+            totals['scenes'] = firestore.Increment(scenes)
+        batch.set(self._totals_ref(project_id), totals, merge=True)
+
+        if words:
+            batch.update(self._project(project_id), {'current_word_count': firestore.Increment(words)})
+            day = day or _today()
+            batch.set(self._daily(project_id).document(day), {
+                'date': day,
+                'words_added': firestore.Increment(max(words, 0)),
+                'words_removed': firestore.Increment(max(-words, 0)),
+                'net_words': firestore.Increment(words)
+            }, merge=True)
+
+    def get(self, project_id: str, days: int = DEFAULT_STATS_DAYS,
+            today: Optional[str] = None) -> Dict:
+        """
+        Current totals and the daily series ending today
+
+        Reads the totals document and at most one document per day.
+
+        Returns:
+            Dict: 'words', 'scenes', 'chapters' (a list of per-chapter
+            totals) and 'daily' (one entry per day, oldest first, with
+            'words_added', 'words_removed' and 'net_words')
+        """
+        days = max(1, min(days, MAX_STATS_DAYS))
+        end = datetime.strptime(today or _today(), '%Y-%m-%d').date()
+        dates = [(end - timedelta(days=offset)).isoformat() for offset in range(days - 1, -1, -1)]
+
+        stats = {'words': 0, 'scenes': 0, 'chapters': [], 'daily': []}
+        if not self.db:
+            return stats
+
+        snapshot = self._totals_ref(project_id).get()
+        totals = (snapshot.to_dict() or {}) if snapshot.exists else {}
+        stats['words'] = totals.get('words', 0)
+        stats['scenes'] = totals.get('scenes', 0)
+        stats['chapters'] = [
+            {'chapter_id': None if chapter == UNASSIGNED_CHAPTER else chapter,
+             'words': counts.get('words', 0), 'scenes': counts.get('scenes', 0)}
+            for chapter, counts in sorted((totals.get('chapters') or {}).items())
+            if counts.get('scenes')
+        ]
+
+        query = self._daily(project_id).where(filter=FieldFilter('date', '>=', dates[0]))
+        recorded = {doc.id: doc.to_dict() or {} for doc in query.order_by('date').stream()}
+        stats['daily'] = [
+            {'date': date,
+             'words_added': recorded.get(date, {}).get('words_added', 0),
+             'words_removed': recorded.get(date, {}).get('words_removed', 0),
+             'net_words': recorded.get(date, {}).get('net_words', 0)}
+            for date in dates
+        ]
+        return stats
+
+    def rebuild(self, project_id: str, scenes: Iterable[Dict]) -> Dict:
+        """
+        Recompute a project's totals and current_word_count from its scenes and overwrite them
+
+        For projects written before totals were kept; the daily series
+        starts from the first write after this.
+
+        Args:
+            project_id: Project ID
+            scenes: Scenes with at least 'chapter_id' and 'word_count'
+
+        Returns:
+            Dict: The totals written
+        """
+        totals = {'words': 0, 'scenes': 0, 'chapters': {}}
+        for scene in scenes:
+            words = scene.get('word_count') or 0
+            chapter = totals['chapters'].setdefault(scene.get('chapter_id') or UNASSIGNED_CHAPTER,
+                                                    {'words': 0, 'scenes': 0})
+            chapter['words'] += words
+            chapter['scenes'] += 1
+            totals['words'] += words
+            totals['scenes'] += 1
+        if self.db:
+            batch = self.db.batch()
+            batch.set(self._totals_ref(project_id), totals)
+            batch.update(self._project(project_id), {'current_word_count': totals['words']})
+            batch.commit()
+        return totals
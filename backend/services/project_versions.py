@@ -0,0 +1,79 @@
+"""
+Project Version Service
+Per-project change counters used to validate cached responses cheaply
+"""
+
+import hashlib
+from typing import Dict, Iterable, Optional
+
+from firebase_admin import firestore
+
+# Resources with their own counter; a write to one leaves the others' ETags valid
+VERSIONED_RESOURCES = (
+    'project', 'characters', 'locations', 'lore', 'plot_points', 'scenes',
+    'corkboard', 'matrix', 'outline'
+)
+
+
+class ProjectVersionService:
+    """
+    Keeps one small document per project counting writes to each resource
+
+    Counters are bumped after the data write, so a reader that reads the
+    counters before the data can at worst tag newer data with an older
+    version, which only costs it one extra full response.
+    """
+
+    def __init__(self, db):
+        self.db = db
+
+    def _ref(self, project_id: str):
+        return self.db.collection('project_versions').document(project_id)
+
+    def bump(self, project_id: str, *resources: str):
+        """Record a write to one or more of a project's resources"""
+        if not self.db:
+            return
+        try:
+            self._ref(project_id).set(
+                {resource: firestore.Increment(1) for resource in resources}, merge=True
+            )
+        except Exception as e:
+            print(f"Warning: Failed to bump project version: {e}")
+
+    def get(self, project_id: str) -> Optional[Dict]:
+        """
+        Current counters of a project
+
+        Returns:
+            Dict with a counter per resource and 'created' (when the
+            document was first written), or None if it does not exist yet
+        """
+        if not self.db:
+            return None
+        doc = self._ref(project_id).get()
+        if not doc.exists:
+            return None
+        versions = {resource: 0 for resource in VERSIONED_RESOURCES}
+        versions.update(doc.to_dict() or {})
+        versions['created'] = str(getattr(doc, 'create_time', ''))
+        return versions
+
+    def etag(self, project_id: str, resources: Iterable[str], variant: str = '') -> Optional[str]:
+        """
+        Strong ETag for a view of a project built from the given resources
+
+        Args:
+            project_id: Project ID
+            resources: Resources the view is built from
+            variant: Anything else that shapes the response (e.g. the route)
+
+        Returns:
+            str or None when the project has no version document yet
+        """
+        versions = self.get(project_id)
+        if versions is None:
+            return None
+        parts = [project_id, variant, versions['created']]
+        parts += [f"{resource}={versions.get(resource, 0)}" for resource in sorted(resources)]
+        return hashlib.sha256('\n'.join(parts).encode('utf-8')).hexdigest()[:32]
@@ -0,0 +1,222 @@
+"""
+Rank Rebalancer
+Respaces the rank keys of a project collection when they grow long
+"""
+
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional, Tuple
+
+from services.project_versions import ProjectVersionService
+from utils.ranking import spread_ranks
+
+# Firestore allows 500 writes per batch; commit early to stay clear of it
+FIRESTORE_BATCH_COMMIT_LIMIT = 450
+
+# One worker: rebalances are rare and each one rewrites a whole collection
+_rebalance_pool: Optional[ThreadPoolExecutor] = None
+_rebalance_pool_lock = threading.Lock()
+
+# (project, collection) pairs queued or running, so repeated triggers run once
+_pending = set()
+# (project, collection) pairs this process has seen fully ranked; new documents
+# are always created with a rank, so they are not checked again
+_ranked = set()
+_stats_lock = threading.Lock()
+_stats = {'scheduled': 0, 'runs': 0, 'writes': 0, 'retries': 0, 'failures': 0}
+
+
+def _get_rebalance_pool() -> ThreadPoolExecutor:
+    """Get the process-wide rebalance worker, starting it on first use"""
+    global _rebalance_pool
+    with _rebalance_pool_lock:
+        if _rebalance_pool is None:
+            _rebalance_pool = ThreadPoolExecutor(max_workers=1, thread_name_prefix='rank-rebalance')
+        return _rebalance_pool
+
+
+def rebalance_stats() -> Dict:
+    """Counts of rebalances scheduled and run, and the documents they rewrote"""
+    with _stats_lock:
+        return {**_stats, 'pending': len(_pending)}
+
+
+def _count(**deltas):
+    with _stats_lock:
+        for name, delta in deltas.items():
+            _stats[name] += delta
+
+
+def _legacy_order(doc: Dict) -> Tuple:
+    """Position of a document ranked before rank keys existed"""
+    return (doc.get('act') or 0, doc.get('sequence') or 0, doc['id'])
+
+
+class RankRebalancer:
+    """
+    Rewrites a collection's rank keys as evenly spaced short keys
+
+    The current order is kept. Documents without a rank (written before
+    ranks existed) follow the ranked ones in their legacy act/sequence
+    order, so a rebalance also backfills them.
+    """
+
+    # Attempts before giving up when documents keep changing under a rebalance
+    MAX_ATTEMPTS = 3
+
+    def __init__(self, db):
+        self.db = db
+        self.versions = ProjectVersionService(db)
+
+    def _get_collection(self, project_id: str, collection_name: str):
+        return self.db.collection('projects').document(project_id).collection(collection_name)
+
+    def _read(self, project_id: str, collection_name: str,
+              rank_of=lambda data: data.get('rank')) -> List[Tuple]:
+        """
+        Documents of a collection in order, as (snapshot, data) pairs
+
+        Args:
+            rank_of: Key a document is ordered by; None places it among
+                the unranked documents, in legacy act/sequence order
+        """
+        collection = self._get_collection(project_id, collection_name)
+        docs = [(doc, {'id': doc.id, **(doc.to_dict() or {})})
+                for doc in collection.select(['rank', 'act', 'sequence']).stream()]
+        keys = {data['id']: rank_of(data) for _, data in docs}
+        ranked = sorted((pair for pair in docs if keys[pair[1]['id']]),
+                        key=lambda pair: (keys[pair[1]['id']], pair[1]['id']))
+        unranked = sorted((pair for pair in docs if not keys[pair[1]['id']]),
+                          key=lambda pair: _legacy_order(pair[1]))
+        return ranked + unranked
+
+    def rebalance(self, project_id: str, collection_name: str, force: bool = True) -> int:
+        """
+        Respace a collection's ranks now
+
+        Collections of up to FIRESTORE_BATCH_COMMIT_LIMIT documents are
+        rewritten in one atomic batch. Each write is conditional on the
+        document not having changed since it was read. If a write lands
+        mid-rebalance, the collection is read again and re-planned: each
+        document already given its new rank is ordered by the rank it had
+        before, so a document moved meanwhile (placed between its
+        neighbours' old ranks) keeps the position its move gave it. The
+        collection's version is bumped once any write has committed, so
+        cached list responses are not revalidated with stale ranks.
+
+        Args:
+            project_id: Project ID
+            collection_name: 'scenes' or 'plot_points'
+            force: Respace even when every document already has a rank
+
+        Returns:
+            int: Documents rewritten
+        """
+        if not self.db:
+            return 0
+
+        key = (project_id, collection_name)
+        docs = self._read(project_id, collection_name)
+        if not force and all(data.get('rank') for _, data in docs):
+            with _stats_lock:
+                _ranked.add(key)
+            return 0
+
+        # Rank each document had before this rebalance rewrote it, and the
+        # ranks any attempt planned for it (partly committed attempts leave some)
+        previous = {data['id']: data.get('rank') for _, data in docs}
+        planned: Dict[str, set] = {}
+
+        def rank_of(data: Dict) -> Optional[str]:
+            rank = data.get('rank')
+            if rank is not None and rank in planned.get(data['id'], ()):
+                return previous.get(data['id'])
+            # Untouched, moved or new: its rank is still comparable to the old ones
+            previous[data['id']] = rank
+            return rank
+
+        total = 0
+        for attempt in range(self.MAX_ATTEMPTS):
+            if attempt:
+                docs = self._read(project_id, collection_name, rank_of)
+            targets = {data['id']: rank for (_, data), rank in zip(docs, spread_ranks(len(docs)))}
+            for doc_id, rank in targets.items():
+                planned.setdefault(doc_id, set()).add(rank)
+
+            written = 0
+            try:
+                batch = self.db.batch()
+                for doc, data in docs:
+                    rank = targets[data['id']]
+                    if data.get('rank') == rank:
+                        continue
+                    batch.update(doc.reference, {'rank': rank},
+                                 option=self.db.write_option(last_update_time=doc.update_time))
+                    written += 1
+                    if written % FIRESTORE_BATCH_COMMIT_LIMIT == 0:
+                        batch.commit()
+                        total += FIRESTORE_BATCH_COMMIT_LIMIT
+                        batch = self.db.batch()
+                batch.commit()
+            except Exception as e:
+                _count(retries=1)
+                print(f"Warning: Rank rebalance of {project_id}/{collection_name} "
+                      f"interrupted, retrying: {e}")
+                continue
+
+            total += written % FIRESTORE_BATCH_COMMIT_LIMIT
+            _count(runs=1, writes=total)
+            with _stats_lock:
+                _ranked.add(key)
+            if total:
+                self.versions.bump(project_id, collection_name)
+            return total
+
+        _count(failures=1, writes=total)
+        print(f"Warning: Gave up rebalancing ranks of {project_id}/{collection_name}")
+        if total:
+            self.versions.bump(project_id, collection_name)
+        return total
+
+    def ensure_ranked(self, project_id: str, collection_name: str) -> int:
+        """
+        Backfill a collection's missing ranks before it is first read in order
+
+        Firestore leaves documents without a rank out of rank-ordered
+        queries, so a collection is checked (one projection read) the first
+        time this process orders it, and its unranked documents are ranked
+        after the others. Later reads skip the check.
+
+        Returns:
+            int: Documents ranked
+        """
+        with _stats_lock:
+            if (project_id, collection_name) in _ranked:
+                return 0
+        return self.rebalance(project_id, collection_name, force=False)
+
+    def schedule(self, project_id: str, collection_name: str) -> bool:
+        """
+        Rebalance a collection in the background
+
+        Returns:
+            bool: False if a rebalance of it is already queued or running
+        """
+        key = (project_id, collection_name)
+        with _stats_lock:
+            if key in _pending:
+                return False
+            _pending.add(key)
+            _stats['scheduled'] += 1
+
+        def run():
+            try:
+                self.rebalance(project_id, collection_name)
+            except Exception as e:
+                print(f"Warning: Rank rebalance failed: {e}")
+            finally:
+                with _stats_lock:
+                    _pending.discard(key)
+
+        _get_rebalance_pool().submit(run)
+        return True
@@ -0,0 +1,245 @@
+"""
+Search Index Service
+Local SQLite FTS5 full-text index over manuscripts and the story bible
+"""
+
+import hashlib
+import html
+import os
+import re
+import sqlite3
+import threading
+from typing import Dict, Iterable, List, Optional
+
+from db.schema import DB_PATH
+
+# Index lives next to the offline-first database
+SEARCH_DB_PATH = os.path.join(os.path.dirname(DB_PATH), 'search.db')
+
+# Results returned per page, by default and at most
+DEFAULT_PAGE_SIZE = 20
+MAX_PAGE_SIZE = 50
+
+# Words of context around each hit in result snippets
+SNIPPET_WORDS = 24
+
+# Title matches count this many times as much as body matches (bm25 weights)
+TITLE_WEIGHT = 5.0
+
+# Highlighted terms are wrapped in these tags; all other snippet text is HTML-escaped
+HIGHLIGHT_OPEN = '<mark>'
+HIGHLIGHT_CLOSE = '</mark>'
+
+# FTS5 marks highlights with control characters that cannot occur in indexed text
+_OPEN, _CLOSE, _ELLIPSIS = '\x02', '\x03', '\x04'
+_CONTROL_CHARS = re.compile('[\x02-\x04]')
+
+# A quoted phrase or a bare word of a search query
+_QUERY_TERM = re.compile(r'"([^"]*)"|(\S+)')
+
+
+def match_expression(query: str) -> Optional[str]:
+    """
+    FTS5 MATCH expression for a user's search query
+
+    Every word must appear and "quoted phrases" must appear as written. The
+    last bare word also matches as a prefix, so results keep up with typing.
+    FTS5 operators in the input are treated as plain words.
+
+    Returns:
+        str: The expression, or None if the query has no searchable words
+    """
+    terms = []
+    for phrase, word in _QUERY_TERM.findall(query):
+        text = (phrase or word).replace('"', ' ').strip()
+        if text:
+            terms.append((f'"{text}"', bool(word)))
+    if not terms:
+        return None
+    if terms[-1][1]:
+        terms[-1] = (terms[-1][0] + '*', True)
+    return ' '.join(term for term, _ in terms)
+
+
+def _render(marked: str) -> str:
+    """Snippet with FTS5 markers turned into escaped HTML"""
+    return (html.escape(marked)
+            .replace(_OPEN, HIGHLIGHT_OPEN)
+            .replace(_CLOSE, HIGHLIGHT_CLOSE)
+            .replace(_ELLIPSIS, '…'))
+
+
+class SearchIndex:
+    """
+    Full-text index stored in SQLite FTS5
+
+    Entries belong to a scope: 'project:<id>' for story bible entities and
+    'user:<id>' for a user's manuscript documents. Entries are rewritten
+    only when their text changes.
+    """
+
+    def __init__(self, db_path: str = SEARCH_DB_PATH):
+        self.db_path = db_path
+        self.lock = threading.Lock()
+        self._conn = None
+
+    def _get_conn(self):
+        """Open the index database on first use"""
+        if self._conn is None:
+            os.makedirs(os.path.dirname(self.db_path) or '.', exist_ok=True)
+            conn = sqlite3.connect(self.db_path, check_same_thread=False)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('''
+                CREATE TABLE IF NOT EXISTS search_items (
+                    id INTEGER PRIMARY KEY,
+                    scope TEXT NOT NULL,
+                    kind TEXT NOT NULL,
+                    item_id TEXT NOT NULL,
+                    content_hash TEXT NOT NULL,
+                    UNIQUE (scope, kind, item_id)
+                )
+            ''')
+            # Row IDs match search_items.id; prefix indexes serve as-you-type queries
+            conn.execute('''
+                CREATE VIRTUAL TABLE IF NOT EXISTS search_text USING fts5(
+                    title, content, tokenize = 'unicode61 remove_diacritics 2', prefix = '2 3'
+                )
+            ''')
+            conn.commit()
+            self._conn = conn
+        return self._conn
+
+    def upsert(self, scope: str, kind: str, item_id: str, title: str, content: str) -> bool:
+        """
+        Index (or re-index) an item's text
+
+        Returns:
+            bool: True if the item was rewritten, False if it was unchanged
+        """
+        title = _CONTROL_CHARS.sub(' ', title or '')
+        content = _CONTROL_CHARS.sub(' ', content or '')
+        content_hash = hashlib.sha1(f'{title}\0{content}'.encode('utf-8')).hexdigest()
+
+        with self.lock:
+            conn = self._get_conn()
+            row = conn.execute(
+                'SELECT id, content_hash FROM search_items WHERE scope = ? AND kind = ? AND item_id = ?',
+                (scope, kind, item_id)
+            ).fetchone()
+            if row and row[1] == content_hash:
+                return False
+
+            with conn:
+                if row:
+                    rowid = row[0]
+                    conn.execute('DELETE FROM search_text WHERE rowid = ?', (rowid,))
+                    conn.execute('UPDATE search_items SET content_hash = ? WHERE id = ?',
+                                 (content_hash, rowid))
+                else:
+                    rowid = conn.execute(
+                        'INSERT INTO search_items (scope, kind, item_id, content_hash) VALUES (?, ?, ?, ?)',
+                        (scope, kind, item_id, content_hash)
+                    ).lastrowid
+                conn.execute('INSERT INTO search_text (rowid, title, content) VALUES (?, ?, ?)',
+                             (rowid, title, content))
+        return True
+
+    def index_document(self, user_id: str, doc_id: str, title: Optional[str], content: str) -> bool:
+        """Index (or re-index) one of a user's manuscript documents"""
+        return self.upsert(user_scope(user_id), 'document', doc_id, title or '', content)
+
+    def remove(self, scope: str, kind: str, item_id: str):
+        """Drop an item from the index"""
+        with self.lock:
+            conn = self._get_conn()
+            row = conn.execute(
+                'SELECT id FROM search_items WHERE scope = ? AND kind = ? AND item_id = ?',
+                (scope, kind, item_id)
+            ).fetchone()
+            if row:
+                with conn:
+                    conn.execute('DELETE FROM search_text WHERE rowid = ?', (row[0],))
+                    conn.execute('DELETE FROM search_items WHERE id = ?', (row[0],))
+
+    def search(self, scopes: Iterable[str], query: str, kinds: Optional[Iterable[str]] = None,
+               limit: int = DEFAULT_PAGE_SIZE, offset: int = 0) -> Dict:
+        """
+        Ranked full-text search
+
+        Args:
+            scopes: Scopes to search, e.g. ['project:p1', 'user:u1']
+            query: Words and "quoted phrases" that must all match
+            kinds: Restrict to item kinds (e.g. 'scene', 'document')
+            limit: Results per page (at most MAX_PAGE_SIZE)
+            offset: Results to skip
+
+        Returns:
+            Dict: 'results' (best match first, each with highlighted 'title'
+            and 'snippet' HTML) and 'next_offset' (None on the last page)
+        """
+        expression = match_expression(query)
+        scopes = list(scopes)
+        kinds = list(kinds) if kinds is not None else None
+        limit = max(1, min(limit, MAX_PAGE_SIZE))
+        if expression is None or not scopes or kinds == []:
+            return {'results': [], 'next_offset': None}
+
+        filters = f"search_items.scope IN ({','.join('?' * len(scopes))})"
+        params: List = [expression, *scopes]
+        if kinds is not None:
+            filters += f" AND search_items.kind IN ({','.join('?' * len(kinds))})"
+            params.extend(kinds)
+
+        with self.lock:
+            rows = self._get_conn().execute(f'''
+                SELECT search_items.scope, search_items.kind, search_items.item_id,
+                       highlight(search_text, 0, ?, ?),
+                       snippet(search_text, 1, ?, ?, ?, ?),
+                       bm25(search_text, ?, 1.0)
+                FROM search_text JOIN search_items ON search_items.id = search_text.rowid
+                WHERE search_text MATCH ? AND {filters}
+                ORDER BY bm25(search_text, ?, 1.0)
+                LIMIT ? OFFSET ?
+            ''', [_OPEN, _CLOSE, _OPEN, _CLOSE, _ELLIPSIS, SNIPPET_WORDS, TITLE_WEIGHT,
+                  *params, TITLE_WEIGHT, limit + 1, offset]).fetchall()
+
+        results = [
+            {
+                'scope': scope,
+                'kind': kind,
+                'item_id': item_id,
+                'title': _render(title),
+                'snippet': _render(snippet),
+                'score': -score
+            }
+            for scope, kind, item_id, title, snippet, score in rows[:limit]
+        ]
+        return {'results': results, 'next_offset': offset + limit if len(rows) > limit else None}
+
+    def count(self, scope: str) -> int:
+        """Items indexed in a scope"""
+        with self.lock:
+            return self._get_conn().execute(
+                'SELECT COUNT(*) FROM search_items WHERE scope = ?', (scope,)
+            ).fetchone()[0]
+
+
+def project_scope(project_id: str) -> str:
+    return f'project:{project_id}'
+
+
+def user_scope(user_id: str) -> str:
+    return f'user:{user_id}'
+
+
+_default_index = None
+_default_index_lock = threading.Lock()
+
+
+def get_search_index() -> SearchIndex:
+    """Get the process-wide search index"""
+    global _default_index
+    with _default_index_lock:
+        if _default_index is None:
+            _default_index = SearchIndex()
+        return _default_index
@@ -0,0 +1,97 @@
+"""
+Project Snapshot Service
+Assembles everything a project page needs in one concurrent fetch
+"""
+
+import hashlib
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Optional
+
+from utils.json_provider import dumps_bytes
+
+# Threads fetching snapshot parts; shared by all requests in the process
+SNAPSHOT_WORKERS = int(os.getenv('SNAPSHOT_WORKERS') or 16)
+
+_snapshot_pool: Optional[ThreadPoolExecutor] = None
+_snapshot_pool_lock = threading.Lock()
+
+
+def _get_snapshot_pool() -> ThreadPoolExecutor:
+    """Get the process-wide snapshot fetch pool, starting it on first use"""
+    global _snapshot_pool
+    with _snapshot_pool_lock:
+        if _snapshot_pool is None:
+            _snapshot_pool = ThreadPoolExecutor(max_workers=SNAPSHOT_WORKERS,
+                                                thread_name_prefix='snapshot')
+        return _snapshot_pool
+
+
+class ProjectSnapshotService:
+    """Service building composite project snapshots"""
+
+    def __init__(self, story_bible_service, planning_service):
+        self.story_bible_service = story_bible_service
+        self.planning_service = planning_service
+
+    def get_snapshot(self, project_id: str, project: Optional[Dict] = None) -> Optional[Dict]:
+        """
+        Fetch a project and its Story Bible and planning views concurrently
+
+        Scenes are listed without their content.
+
+        Args:
+            project_id: Project ID
+            project: Project document already read (e.g. during authorization)
+
+        Returns:
+            Dict or None if the project does not exist
+        """
+        story_bible = self.story_bible_service
+        planning = self.planning_service
+        parts = {
+            'characters': story_bible.list_characters,
+            'locations': story_bible.list_locations,
+            'lore': story_bible.list_lore,
+            'plot_points': story_bible.list_plot_points,
+            'scenes': story_bible.list_scene_summaries,
+            'corkboard': planning.get_corkboard,
+            'matrix': planning.get_matrix,
+            'outline': planning.get_outline,
+        }
+        if project is None:
+            parts['project'] = story_bible.get_project
+
+        pool = _get_snapshot_pool()
+        futures = {name: pool.submit(fetch, project_id) for name, fetch in parts.items()}
+        snapshot = {name: future.result() for name, future in futures.items()}
+
+        snapshot.setdefault('project', project)
+        if not snapshot['project']:
+            return None
+
+        return {
+            'project': snapshot['project'],
+            'characters': snapshot['characters'],
+            'locations': snapshot['locations'],
+            'lore': snapshot['lore'],
+            'plot_points': snapshot['plot_points'],
+            'scenes': snapshot['scenes'],
+            'planning': {
+                'corkboard': snapshot['corkboard'],
+                'matrix': snapshot['matrix'],
+                'outline': snapshot['outline'],
+            },
+        }
+
+    @staticmethod
+    def serialize(snapshot: Dict) -> Dict:
+        """
+        Encode a snapshot once, returning the JSON body and its strong ETag
+
+        Returns:
+            Dict: 'body' (bytes) and 'etag'
+        """
+        body = dumps_bytes(snapshot)
+        return {'body': body, 'etag': hashlib.sha256(body).hexdigest()[:32]}
@@ -3,22 +3,484 @@ Story Bible Service
 Handles CRUD operations for story elements
 """
 
+from concurrent.futures import ThreadPoolExecutor
+import copy
 from datetime import datetime
-from typing import List, Dict, Optional
+from typing import List, Dict, Optional, Iterator, Tuple
+import threading
 import uuid
 
+from firebase_admin import firestore
+from google.api_core import exceptions as gcp_exceptions
+
+from services.project_stats import ProjectStatsService, DEFAULT_STATS_DAYS
+from services.project_versions import ProjectVersionService, VERSIONED_RESOURCES
+from services.rank_rebalancer import RankRebalancer
+from services.search_index import project_scope
+from utils.auth import invalidate_project_access
+from utils.ranking import rank_after, rank_before, rank_between, RANK_MAX_LENGTH
+from utils.single_flight import SingleFlight
+from utils.ttl_cache import TTLCache, MISSING
+from utils.word_count import count_words
+
+# Number of semantically related lore entries and passages added to scene context
+RELEVANT_LORE_LIMIT = 5
+RELEVANT_PASSAGE_LIMIT = 3
+# Cosine similarity below which a search hit is treated as unrelated
+MIN_RELEVANCE_SCORE = 0.1
+
+# Scenes fetched per Firestore query when iterating a whole manuscript
+SCENE_PAGE_SIZE = 50
+
+# Scene fields listed without the body, e.g. for navigation and planning views
+SCENE_SUMMARY_FIELDS = [
+    'id', 'title', 'chapter_id', 'sequence', 'rank', 'characters', 'location_id',
+    'plot_points', 'word_count', 'status', 'created_at', 'updated_at'
+]
+
+# Scene fields read when scanning a manuscript for character mentions
+MENTION_SCAN_FIELDS = ['id', 'chapter_id', 'content', 'rank']
+
+# Scene fields read to rebuild a project's word totals
+STATS_SCAN_FIELDS = ['chapter_id', 'word_count', 'rank']
+
+# Attempts at a counted scene update when the scene keeps changing under it
+SCENE_WRITE_ATTEMPTS = 5
+
+# Conditional-write failures meaning a document changed since it was read
+_WRITE_CONFLICTS = (
+    gcp_exceptions.FailedPrecondition, gcp_exceptions.Aborted, gcp_exceptions.Conflict
+)
+
+# Collections kept in order by a fractional rank key
+RANKED_COLLECTIONS = ('scenes', 'plot_points')
+
+# Firestore allows 500 writes per batch; commit early to stay clear of it
+FIRESTORE_BATCH_COMMIT_LIMIT = 450
+
+# Projects returned per page of a user's project list
+PROJECT_PAGE_SIZE = 50
+MAX_PROJECT_PAGE_SIZE = 200
+# Seconds a listed page is served from memory; writes in this process invalidate it
+PROJECT_LIST_TTL = 15
+
+# Shared by every service instance so a write here invalidates all of them
+_project_list_cache = TTLCache(maxsize=4096, ttl=PROJECT_LIST_TTL)
+
+# Concurrent reads of the same project collection share one Firestore stream
+_collection_reads = SingleFlight()
+
+
+# One worker scans scenes for new or renamed characters after the write has returned
+_mention_pool: Optional[ThreadPoolExecutor] = None
+_mention_pool_lock = threading.Lock()
+# (project, character) scans queued but not started; a rename mid-scan queues another
+_pending_mention_scans = set()
+
+
+def _get_mention_pool() -> ThreadPoolExecutor:
+    """Get the process-wide mention scan worker, starting it on first use"""
+    global _mention_pool
+    with _mention_pool_lock:
+        if _mention_pool is None:
+            _mention_pool = ThreadPoolExecutor(max_workers=1, thread_name_prefix='mention-scan')
+        return _mention_pool
+
+
+def collection_read_stats() -> Dict:
+    """Counts of collection reads, and how many joined a read already in flight"""
+    return _collection_reads.stats()
+
+
 class StoryBibleService:
     """Service for managing Story Bible entities"""
     
-    def __init__(self, db):
+    def __init__(self, db, embedding_index=None, search_index=None, mention_index=None):
         self.db = db
+        self.embedding_index = embedding_index
+        self.search_index = search_index
+        self.mention_index = mention_index
+        self.versions = ProjectVersionService(db)
+        self.stats = ProjectStatsService(db)
+        self.rebalancer = RankRebalancer(db)
     
     def _get_collection(self, project_id: str, collection_name: str):
         """Get a collection reference for a project"""
         if self.db:
             return self.db.collection('projects').document(project_id).collection(collection_name)
         return None
+
+    def _list_collection(self, project_id: str, collection_name: str,
+                         fields: Optional[List[str]] = None,
+                         order_by: Optional[str] = None) -> List[Dict]:
+        """
+        Read every document of a project collection
+
+        Identical reads already in flight are joined rather than repeated.
+        Every caller, including the one that ran the read, gets its own
+        deep copies of the documents, nested lists and maps included, so
+        one caller mutating a result cannot affect another.
+
+        Args:
+            project_id: Project ID
+            collection_name: Collection under the project
+            fields: Only download these fields (a Firestore projection)
+            order_by: Field Firestore sorts the documents by
+        """
+        collection = self._get_collection(project_id, collection_name)
+        if not collection:
+            return []
+        if order_by == 'rank':
+            self._ensure_ranked(project_id, collection_name)
+
+        query = collection.select(fields) if fields else collection
+        if order_by:
+            query = query.order_by(order_by)
+        docs, _ = _collection_reads.do(
+            (id(self.db), project_id, collection_name, tuple(fields or ()), order_by),
+            lambda: [doc.to_dict() for doc in query.stream()]
+        )
+        return copy.deepcopy(docs)
+
+    @staticmethod
+    def _embedding_text(kind: str, entity: Dict) -> str:
+        """Text used to represent an entity in the embedding index"""
+        if kind == 'character':
+            parts = [entity.get('name', ''), entity.get('description', ''),
+                     ', '.join(entity.get('traits', [])), entity.get('backstory', '')]
+        elif kind == 'location':
+            parts = [entity.get('name', ''), entity.get('description', '')]
+        else:
+            parts = [entity.get('title', ''), entity.get('content', '')]
+        return '\n'.join(part for part in parts if part)
+
+    @staticmethod
+    def _character_names(character: Dict) -> List[str]:
+        """Name and aliases a character is mentioned by"""
+        return [character.get('name', '')] + list(character.get('aliases') or [])
+
+    @staticmethod
+    def _search_fields(kind: str, entity: Dict) -> Tuple[str, str]:
+        """Title and body text of an entity in the full-text search index"""
+        if kind in ('character', 'location'):
+            title = entity.get('name', '')
+            parts = [entity.get('description', ''), ', '.join(entity.get('traits', [])),
+                     entity.get('backstory', '')]
+        else:
+            title = entity.get('title', '')
+            parts = [entity.get('content', '')]
+        return title, '\n'.join(part for part in parts if part)
+
+    def _after_write(self, project_id: str, kind: str, entity: Optional[Dict]):
+        """Keep local indexes in step with a created or updated entity"""
+        if not entity or not entity.get('id'):
+            return
+
+        if self.embedding_index:
+            try:
+                self.embedding_index.upsert(
+                    project_id, kind, entity['id'], self._embedding_text(kind, entity)
+                )
+            except Exception as e:
+                print(f"Warning: Failed to update embedding index: {e}")
+
+        if self.search_index:
+            try:
+                self.search_index.upsert(
+                    project_scope(project_id), kind, entity['id'], *self._search_fields(kind, entity)
+                )
+            except Exception as e:
+                print(f"Warning: Failed to update search index: {e}")
+
+        if self.mention_index and kind in ('character', 'scene'):
+            try:
+                if kind == 'scene':
+                    self.mention_index.index_scene(project_id, entity['id'], entity.get('chapter_id'),
+                                                   entity.get('content', ''))
+                elif self.mention_index.set_character(project_id, entity['id'],
+                                                      self._character_names(entity)):
+                    self._schedule_mention_scan(project_id, entity['id'])
+            except Exception as e:
+                print(f"Warning: Failed to update mention index: {e}")
+
+    def _schedule_mention_scan(self, project_id: str, character_id: str) -> bool:
+        """
+        Look for a new or renamed character in every scene, in the background
+
+        Returns:
+            bool: False if a scan for them is already queued
+        """
+        key = (project_id, character_id)
+        with _mention_pool_lock:
+            if key in _pending_mention_scans:
+                return False
+            _pending_mention_scans.add(key)
+
+        def run():
+            with _mention_pool_lock:
+                _pending_mention_scans.discard(key)
+            try:
+                self.reindex_mentions(project_id, [character_id])
+            except Exception as e:
+                print(f"Warning: Mention scan failed: {e}")
+
+        _get_mention_pool().submit(run)
+        return True
+
+    def _after_delete(self, project_id: str, kind: str, entity_id: str):
+        """Drop a deleted entity from local indexes"""
+        if self.embedding_index:
+            try:
+                self.embedding_index.remove(project_id, kind, entity_id)
+            except Exception as e:
+                print(f"Warning: Failed to update embedding index: {e}")
+
+        if self.search_index:
+            try:
+                self.search_index.remove(project_scope(project_id), kind, entity_id)
+            except Exception as e:
+                print(f"Warning: Failed to update search index: {e}")
+
+        if self.mention_index and kind in ('character', 'scene'):
+            try:
+                if kind == 'scene':
+                    self.mention_index.remove_scene(project_id, entity_id)
+                else:
+                    self.mention_index.remove_character(project_id, entity_id)
+            except Exception as e:
+                print(f"Warning: Failed to update mention index: {e}")
+
+    def search_related(self, project_id: str, query: str, kinds: List[str], limit: int,
+                       exclude_ids: Optional[List[str]] = None,
+                       item_ids: Optional[List[str]] = None) -> List[Dict]:
+        """Top passages semantically related to query; empty without an index"""
+        if not self.embedding_index:
+            return []
+        try:
+            hits = self.embedding_index.search(
+                project_id, query, k=limit, kinds=kinds,
+                item_ids=item_ids, exclude_ids=exclude_ids
+            )
+            return [hit for hit in hits if hit['score'] >= MIN_RELEVANCE_SCORE]
+        except Exception as e:
+            print(f"Warning: Embedding search failed: {e}")
+            return []
     
+    # Ordering
+    def _ensure_ranked(self, project_id: str, collection_name: str):
+        """Rank a collection's legacy documents so rank-ordered queries include them"""
+        try:
+            self.rebalancer.ensure_ranked(project_id, collection_name)
+        except Exception as e:
+            print(f"Warning: Failed to backfill ranks of {project_id}/{collection_name}: {e}")
+
+    def _next_rank(self, project_id: str, collection_name: str, collection) -> str:
+        """Rank placing a new document after the last one of a collection"""
+        self._ensure_ranked(project_id, collection_name)
+        last = list(collection.order_by('rank', direction='DESCENDING').limit(1).stream())
+        return rank_after(last[0].to_dict().get('rank') if last else None)
+
+    def _move(self, project_id: str, collection_name: str, item_id: str,
+              after_id: Optional[str], before_id: Optional[str],
+              updates: Optional[Dict] = None) -> Optional[Dict]:
+        """
+        Move a document between two neighbours with a single write
+
+        Only the moved document gets a new rank; the rest of the collection
+        is untouched. Neighbours without a usable rank pair (legacy or tied
+        documents) trigger a rebalance first. Keys that grow past
+        RANK_MAX_LENGTH schedule one in the background.
+
+        Args:
+            project_id: Project ID
+            collection_name: One of RANKED_COLLECTIONS
+            item_id: Document to move
+            after_id: Document it should follow (None to move it first)
+            before_id: Document it should precede (None to move it last)
+            updates: Other fields to set in the same write
+
+        Returns:
+            Dict with the document's new 'id', 'rank' and updates, or None if
+            it does not exist
+
+        Raises:
+            ValueError: If a neighbour is missing or they are out of order
+        """
+        collection = self._get_collection(project_id, collection_name)
+        if not collection:
+            return None
+        if item_id in (after_id, before_id):
+            raise ValueError("An item cannot be moved next to itself")
+
+        neighbour_ids = [i for i in (after_id, before_id) if i]
+        refs = [collection.document(i) for i in [item_id] + neighbour_ids]
+        for attempt in range(2):
+            ranks = {doc.id: (doc.to_dict() or {}).get('rank')
+                     for doc in self.db.get_all(refs) if doc.exists}
+            if item_id not in ranks:
+                return None
+            missing = [i for i in neighbour_ids if i not in ranks]
+            if missing:
+                raise ValueError(f"Neighbour not found: {missing[0]}")
+
+            low = ranks[after_id] if after_id else None
+            high = ranks[before_id] if before_id else None
+            usable = all(ranks[i] for i in neighbour_ids) and (
+                low is None or high is None or low < high
+            )
+            if usable:
+                break
+            if attempt:
+                raise ValueError("after_id must come before before_id")
+            self.rebalancer.rebalance(project_id, collection_name)
+
+        # Moves to either end step past the end key, which keeps keys short
+        if high is None:
+            rank = rank_after(low)
+        elif low is None:
+            rank = rank_before(high)
+        else:
+            rank = rank_between(low, high)
+        move = dict(updates or {})
+        move['rank'] = rank
+        move['updated_at'] = datetime.utcnow().isoformat()
+        collection.document(item_id).update(move)
+        self.versions.bump(project_id, collection_name)
+
+        if len(rank) > RANK_MAX_LENGTH:
+            self.rebalancer.schedule(project_id, collection_name)
+        return {'id': item_id, **move}
+
+    def backfill_ranks(self) -> int:
+        """
+        Rank the scenes and plot points of every project
+
+        Migration for documents created before rank keys existed. Reads
+        rank a collection on first use anyway; this does every project
+        ahead of time so no first read pays for it.
+
+        Returns:
+            int: Number of documents ranked
+        """
+        if not self.db:
+            return 0
+
+        written = 0
+        for doc in self.db.collection('projects').stream():
+            for collection_name in RANKED_COLLECTIONS:
+                written += self.rebalancer.rebalance(doc.id, collection_name, force=False)
+        return written
+
+    def reindex_embeddings(self, project_id: str) -> int:
+        """
+        Embed a project's scenes, lore, characters and locations for related-context search
+
+        Only entities whose text changed are re-embedded, so this is cheap
+        to repeat. Needed once for projects written before the embedding
+        index existed; later writes keep it current.
+
+        Returns:
+            int: Number of entities (re)embedded
+        """
+        if not self.embedding_index:
+            return 0
+
+        entities = [('character', c) for c in self.list_characters(project_id)]
+        entities += [('location', loc) for loc in self.list_locations(project_id)]
+        entities += [('lore', lore) for lore in self.list_lore(project_id)]
+        written = sum(
+            self.embedding_index.upsert(project_id, kind, entity['id'],
+                                        self._embedding_text(kind, entity))
+            for kind, entity in entities if entity.get('id')
+        )
+        for scene in self.iter_scenes(project_id):
+            written += self.embedding_index.upsert(project_id, 'scene', scene['id'],
+                                                   self._embedding_text('scene', scene))
+        return written
+
+    def reindex_search(self, project_id: str) -> int:
+        """
+        Index a project's scenes, lore, characters and locations for search
+
+        Entries are written only for entities whose text changed, so this is
+        cheap to repeat. Needed once for projects written before the search
+        index existed; later writes keep it current.
+
+        Returns:
+            int: Number of entities (re)indexed
+        """
+        if not self.search_index:
+            return 0
+
+        scope = project_scope(project_id)
+        entities = [('character', c) for c in self.list_characters(project_id)]
+        entities += [('location', loc) for loc in self.list_locations(project_id)]
+        entities += [('lore', lore) for lore in self.list_lore(project_id)]
+        written = sum(
+            self.search_index.upsert(scope, kind, entity['id'], *self._search_fields(kind, entity))
+            for kind, entity in entities if entity.get('id')
+        )
+        for scene in self.iter_scenes(project_id):
+            written += self.search_index.upsert(scope, 'scene', scene['id'],
+                                                *self._search_fields('scene', scene))
+        return written
+
+    def reindex_mentions(self, project_id: str, character_ids: Optional[List[str]] = None) -> int:
+        """
+        Scan a project's scenes for character mentions
+
+        With character_ids, only those characters are looked for, which is
+        what a new or renamed character needs; other characters' stored
+        mentions are kept. Without, the index is rebuilt from the current
+        characters and every scene whose text changed is re-scanned. Scene
+        bodies are read a page at a time.
+
+        Returns:
+            int: Number of scenes scanned
+        """
+        if not self.mention_index:
+            return 0
+
+        if character_ids is None:
+            characters = self.list_characters(project_id)
+            current = {character['id'] for character in characters if character.get('id')}
+            for character_id in set(self.mention_index.character_ids(project_id)) - current:
+                self.mention_index.remove_character(project_id, character_id)
+            for character in characters:
+                if character.get('id'):
+                    self.mention_index.set_character(project_id, character['id'],
+                                                     self._character_names(character))
+
+        scanned = 0
+        for scene in self.iter_scenes(project_id, fields=MENTION_SCAN_FIELDS):
+            found = self.mention_index.index_scene(project_id, scene['id'], scene.get('chapter_id'),
+                                                   scene.get('content', ''), character_ids)
+            scanned += found is not None
+        return scanned
+
+    def scenes_mentioning(self, project_id: str, character_id: str) -> List[Dict]:
+        """Scenes that name a character, with positions; empty without an index"""
+        if not self.mention_index:
+            return []
+        return self.mention_index.scenes_mentioning(project_id, character_id)
+
+    def characters_in_chapter(self, project_id: str, chapter_id: str) -> List[Dict]:
+        """Characters named in a chapter's scenes; empty without an index"""
+        if not self.mention_index:
+            return []
+        return self.mention_index.characters_in_chapter(project_id, chapter_id)
+
+    def _scene_character_ids(self, project_id: str, scene: Dict) -> List[str]:
+        """Characters tagged on a scene, then any others its text names"""
+        character_ids = list(scene.get('characters', []))
+        if self.mention_index and scene.get('id'):
+            try:
+                mentioned = self.mention_index.characters_in_scene(project_id, scene['id'])
+                character_ids += [c for c in mentioned if c not in character_ids]
+            except Exception as e:
+                print(f"Warning: Mention lookup failed: {e}")
+        return character_ids
+
     # Character operations
     def create_character(self, project_id: str, character_data: Dict) -> Dict:
         """Create a new character"""
@@ -30,6 +492,7 @@ class StoryBibleService:
             'name': character_data.get('name', ''),
             'description': character_data.get('description', ''),
             'traits': character_data.get('traits', []),
+            'aliases': character_data.get('aliases', []),
             'backstory': character_data.get('backstory', ''),
             'relationships': character_data.get('relationships', {}),
             'appearances': character_data.get('appearances', []),
@@ -41,7 +504,9 @@ class StoryBibleService:
         collection = self._get_collection(project_id, 'characters')
         if collection:
             collection.document(character_id).set(character)
+            self.versions.bump(project_id, 'characters')
         
+        self._after_write(project_id, 'character', character)
         return character
     
     def get_character(self, project_id: str, character_id: str) -> Optional[Dict]:
@@ -55,11 +520,7 @@ class StoryBibleService:
     
     def list_characters(self, project_id: str) -> List[Dict]:
         """List all characters in a project"""
-        collection = self._get_collection(project_id, 'characters')
-        if collection:
-            docs = collection.stream()
-            return [doc.to_dict() for doc in docs]
-        return []
+        return self._list_collection(project_id, 'characters')
     
     def update_character(self, project_id: str, character_id: str, updates: Dict) -> Dict:
         """Update a character"""
@@ -67,7 +528,10 @@ class StoryBibleService:
         collection = self._get_collection(project_id, 'characters')
         if collection:
             collection.document(character_id).update(updates)
-            return self.get_character(project_id, character_id)
+            self.versions.bump(project_id, 'characters')
+            character = self.get_character(project_id, character_id)
+            self._after_write(project_id, 'character', character)
+            return character
         return updates
     
     def delete_character(self, project_id: str, character_id: str) -> bool:
@@ -75,6 +539,8 @@ class StoryBibleService:
         collection = self._get_collection(project_id, 'characters')
         if collection:
             collection.document(character_id).delete()
+            self.versions.bump(project_id, 'characters')
+            self._after_delete(project_id, 'character', character_id)
             return True
         return False
     
@@ -100,7 +566,9 @@ class StoryBibleService:
         collection = self._get_collection(project_id, 'locations')
         if collection:
             collection.document(location_id).set(location)
+            self.versions.bump(project_id, 'locations')
         
+        self._after_write(project_id, 'location', location)
         return location
     
     def get_location(self, project_id: str, location_id: str) -> Optional[Dict]:
@@ -114,11 +582,7 @@ class StoryBibleService:
     
     def list_locations(self, project_id: str) -> List[Dict]:
         """List all locations in a project"""
-        collection = self._get_collection(project_id, 'locations')
-        if collection:
-            docs = collection.stream()
-            return [doc.to_dict() for doc in docs]
-        return []
+        return self._list_collection(project_id, 'locations')
     
     def update_location(self, project_id: str, location_id: str, updates: Dict) -> Dict:
         """Update a location"""
@@ -126,7 +590,10 @@ class StoryBibleService:
         collection = self._get_collection(project_id, 'locations')
         if collection:
             collection.document(location_id).update(updates)
-            return self.get_location(project_id, location_id)
+            self.versions.bump(project_id, 'locations')
+            location = self.get_location(project_id, location_id)
+            self._after_write(project_id, 'location', location)
+            return location
         return updates
     
     # Lore operations
@@ -151,16 +618,14 @@ class StoryBibleService:
         collection = self._get_collection(project_id, 'lore')
         if collection:
             collection.document(lore_id).set(lore)
+            self.versions.bump(project_id, 'lore')
         
+        self._after_write(project_id, 'lore', lore)
         return lore
     
     def list_lore(self, project_id: str) -> List[Dict]:
         """List all lore entries in a project"""
-        collection = self._get_collection(project_id, 'lore')
-        if collection:
-            docs = collection.stream()
-            return [doc.to_dict() for doc in docs]
-        return []
+        return self._list_collection(project_id, 'lore')
     
     # Plot operations
     def create_plot_point(self, project_id: str, plot_data: Dict) -> Dict:
@@ -185,17 +650,22 @@ class StoryBibleService:
         
         collection = self._get_collection(project_id, 'plot_points')
         if collection:
+            plot_point['rank'] = self._next_rank(project_id, 'plot_points', collection)
             collection.document(plot_id).set(plot_point)
+            self.versions.bump(project_id, 'plot_points')
         
         return plot_point
     
     def list_plot_points(self, project_id: str) -> List[Dict]:
-        """List all plot points in a project"""
-        collection = self._get_collection(project_id, 'plot_points')
-        if collection:
-            docs = collection.stream()
-            return [doc.to_dict() for doc in docs]
-        return []
+        """List all plot points in a project, in story order"""
+        return self._list_collection(project_id, 'plot_points', order_by='rank')
+
+    def move_plot_point(self, project_id: str, plot_id: str, after_id: Optional[str] = None,
+                        before_id: Optional[str] = None,
+                        act: Optional[int] = None) -> Optional[Dict]:
+        """Move a plot point between two others, optionally into another act"""
+        updates = {'act': act} if act is not None else None
+        return self._move(project_id, 'plot_points', plot_id, after_id, before_id, updates)
     
     # Scene operations
     def create_scene(self, project_id: str, scene_data: Dict) -> Dict:
@@ -213,7 +683,7 @@ class StoryBibleService:
             'characters': scene_data.get('characters', []),
             'location_id': scene_data.get('location_id'),
             'plot_points': scene_data.get('plot_points', []),
-            'word_count': len(content.split()),
+            'word_count': count_words(content),
             'status': scene_data.get('status', 'draft'),
             'notes': scene_data.get('notes', ''),
             'created_at': timestamp,
@@ -222,8 +692,14 @@ class StoryBibleService:
         
         collection = self._get_collection(project_id, 'scenes')
         if collection:
-            collection.document(scene_id).set(scene)
+            scene['rank'] = self._next_rank(project_id, 'scenes', collection)
+            batch = self.db.batch()
+            batch.set(collection.document(scene_id), scene)
+            self.stats.record(batch, project_id, None, (scene['chapter_id'], scene['word_count']))
+            batch.commit()
+            self.versions.bump(project_id, 'scenes')
         
+        self._after_write(project_id, 'scene', scene)
         return scene
     
     def get_scene(self, project_id: str, scene_id: str) -> Optional[Dict]:
@@ -236,28 +712,124 @@ class StoryBibleService:
         return None
     
     def list_scenes(self, project_id: str) -> List[Dict]:
-        """List all scenes in a project"""
+        """List all scenes in a project, in manuscript order"""
+        return self._list_collection(project_id, 'scenes', order_by='rank')
+    
+    def list_scene_summaries(self, project_id: str) -> List[Dict]:
+        """List all scenes in a project without their content"""
+        return self._list_collection(project_id, 'scenes', SCENE_SUMMARY_FIELDS, order_by='rank')
+
+    def move_scene(self, project_id: str, scene_id: str, after_id: Optional[str] = None,
+                   before_id: Optional[str] = None) -> Optional[Dict]:
+        """Move a scene between two others in the manuscript"""
+        return self._move(project_id, 'scenes', scene_id, after_id, before_id)
+
+    def list_scene_versions(self, project_id: str) -> List[Dict]:
+        """
+        List scene IDs and modification times in manuscript order
+
+        Uses a field projection, so scene bodies are not downloaded.
+        """
         collection = self._get_collection(project_id, 'scenes')
         if collection:
-            docs = collection.stream()
-            return [doc.to_dict() for doc in docs]
+            self._ensure_ranked(project_id, 'scenes')
+            docs = collection.select(['rank', 'updated_at']).order_by('rank').stream()
+            return [{'id': doc.id, **doc.to_dict()} for doc in docs]
         return []
     
+    def iter_scenes(self, project_id: str, page_size: int = SCENE_PAGE_SIZE,
+                    fields: Optional[List[str]] = None) -> Iterator[Dict]:
+        """
+        Yield a project's scenes in manuscript order, fetched page by page
+
+        Only one page of scene documents is held at a time, which keeps
+        memory flat for exports of long manuscripts. fields limits the
+        download to those fields ('rank' is needed to page and must be one).
+        """
+        collection = self._get_collection(project_id, 'scenes')
+        if not collection:
+            return
+        self._ensure_ranked(project_id, 'scenes')
+
+        query = collection.select(fields) if fields else collection
+        query = query.order_by('rank').limit(page_size)
+        last_doc = None
+        while True:
+            page = query.start_after(last_doc) if last_doc else query
+            docs = list(page.stream())
+            for doc in docs:
+                yield doc.to_dict()
+            if len(docs) < page_size:
+                return
+            last_doc = docs[-1]
+    
     def update_scene(self, project_id: str, scene_id: str, updates: Dict) -> Dict:
         """Update a scene"""
         updates['updated_at'] = datetime.utcnow().isoformat()
         if 'content' in updates:
-            updates['word_count'] = len(updates['content'].split())
+            updates['word_count'] = count_words(updates['content'])
         
         collection = self._get_collection(project_id, 'scenes')
         if collection:
-            collection.document(scene_id).update(updates)
-            return self.get_scene(project_id, scene_id)
+            if 'word_count' in updates or 'chapter_id' in updates:
+                self._update_counted_scene(project_id, collection.document(scene_id), updates)
+            else:
+                collection.document(scene_id).update(updates)
+            self.versions.bump(project_id, 'scenes')
+            scene = self.get_scene(project_id, scene_id)
+            self._after_write(project_id, 'scene', scene)
+            return scene
         return updates
     
+    def _update_counted_scene(self, project_id: str, ref, updates: Dict):
+        """
+        Update a scene together with the word totals it contributes to
+
+        The scene's previous count and chapter are read, then the update
+        and the matching total increments are committed in one batch on
+        condition the scene is unchanged, retrying if it was changed.
+        """
+        for attempt in range(SCENE_WRITE_ATTEMPTS):
+            snapshot = ref.get(field_paths=['chapter_id', 'word_count'])
+            if not snapshot.exists:
+                # Fails like a plain update of a missing scene
+                ref.update(updates)
+                return
+            previous = snapshot.to_dict() or {}
+            before = (previous.get('chapter_id'), int(previous.get('word_count') or 0))
+            after = (updates.get('chapter_id', before[0]), updates.get('word_count', before[1]))
+
+            batch = self.db.batch()
+            batch.update(ref, updates, option=self.db.write_option(last_update_time=snapshot.update_time))
+            self.stats.record(batch, project_id, before, after)
+            try:
+                batch.commit()
+                return
+            except _WRITE_CONFLICTS:
+                if attempt == SCENE_WRITE_ATTEMPTS - 1:
+                    raise
+
+    def get_stats(self, project_id: str, days: int = DEFAULT_STATS_DAYS) -> Dict:
+        """Word and scene totals per project and chapter, and daily progress"""
+        return self.stats.get(project_id, days)
+
+    def rebuild_stats(self, project_id: str) -> Dict:
+        """
+        Recompute a project's word totals from stored scene counts
+
+        Reads only each scene's chapter and word count. Needed once for
+        projects written before totals were kept; later writes keep them
+        current.
+        """
+        return self.stats.rebuild(project_id, self.iter_scenes(project_id, fields=STATS_SCAN_FIELDS))
+
     # Project operations
-    def create_project(self, project_data: Dict) -> Dict:
-        """Create a new project"""
+    def _project_refs(self, user_id: str):
+        """A user's index of the projects they own or collaborate on"""
+        return self.db.collection('users').document(user_id).collection('project_refs')
+
+    def create_project(self, project_data: Dict, owner_id: Optional[str] = None) -> Dict:
+        """Create a new project, indexed under its owner"""
         project_id = str(uuid.uuid4())
         timestamp = datetime.utcnow().isoformat()
         
@@ -270,15 +842,92 @@ class StoryBibleService:
             'status': project_data.get('status', 'planning'),
             'target_word_count': project_data.get('target_word_count', 50000),
             'current_word_count': 0,
+            'owner_id': owner_id,
+            'collaborators': [],
             'created_at': timestamp,
             'updated_at': timestamp
         }
         
         if self.db:
-            self.db.collection('projects').document(project_id).set(project)
+            batch = self.db.batch()
+            batch.set(self.db.collection('projects').document(project_id), project)
+            if owner_id:
+                batch.set(self._project_refs(owner_id).document(project_id), {
+                    'project_id': project_id,
+                    'role': 'owner',
+                    'created_at': timestamp
+                })
+            batch.commit()
+            self.versions.bump(project_id, *VERSIONED_RESOURCES)
+
+        if owner_id:
+            _project_list_cache.invalidate_where(lambda key: key[0] == owner_id)
         
         return project
     
+    def _check_not_owner(self, project_id: str, user_id: str):
+        """Refuse a membership change that would demote the owner or drop their project ref"""
+        project = self.get_project(project_id)
+        if project and project.get('owner_id') == user_id:
+            raise ValueError("The project owner cannot be a collaborator")
+
+    def add_collaborator(self, project_id: str, user_id: str) -> bool:
+        """
+        Share a project with a user
+
+        Raises:
+            ValueError: If user_id is the project's owner
+        """
+        if not self.db:
+            return False
+        self._check_not_owner(project_id, user_id)
+
+        timestamp = datetime.utcnow().isoformat()
+        batch = self.db.batch()
+        batch.update(self.db.collection('projects').document(project_id), {
+            'collaborators': firestore.ArrayUnion([user_id]),
+            'updated_at': timestamp
+        })
+        batch.set(self._project_refs(user_id).document(project_id), {
+            'project_id': project_id,
+            'role': 'collaborator',
+            'created_at': timestamp
+        })
+        batch.commit()
+        self.versions.bump(project_id, 'project')
+
+        self._after_membership_change(project_id, user_id)
+        return True
+
+    def remove_collaborator(self, project_id: str, user_id: str) -> bool:
+        """
+        Stop sharing a project with a user
+
+        Raises:
+            ValueError: If user_id is the project's owner
+        """
+        if not self.db:
+            return False
+        self._check_not_owner(project_id, user_id)
+
+        batch = self.db.batch()
+        batch.update(self.db.collection('projects').document(project_id), {
+            'collaborators': firestore.ArrayRemove([user_id]),
+            'updated_at': datetime.utcnow().isoformat()
+        })
+        batch.delete(self._project_refs(user_id).document(project_id))
+        batch.commit()
+        self.versions.bump(project_id, 'project')
+
+        self._after_membership_change(project_id, user_id)
+        return True
+
+    @staticmethod
+    def _after_membership_change(project_id: str, user_id: str):
+        """Drop cached access decisions and project lists affected by a membership change"""
+        invalidate_project_access(project_id, user_id)
+        _project_list_cache.invalidate_where(lambda key: key[0] == user_id)
+
     def get_project(self, project_id: str) -> Optional[Dict]:
         """Get a project by ID"""
         if self.db:
@@ -287,13 +936,90 @@ class StoryBibleService:
                 return doc.to_dict()
         return None
     
-    def list_projects(self) -> List[Dict]:
-        """List all projects"""
-        if self.db:
-            docs = self.db.collection('projects').stream()
-            return [doc.to_dict() for doc in docs]
-        return []
-    
+    def list_projects(self, user_id: str, limit: int = PROJECT_PAGE_SIZE,
+                      cursor: Optional[str] = None) -> Dict:
+        """
+        List a page of the projects a user owns or collaborates on, newest first
+
+        Reads the user's project_refs index rather than the projects
+        collection, so cost grows with the user's own projects. Pages are
+        cached briefly per user.
+
+        Args:
+            user_id: User ID
+            limit: Page size, capped at MAX_PROJECT_PAGE_SIZE
+            cursor: next_cursor of the previous page
+
+        Returns:
+            Dict: 'projects' and 'next_cursor' (None on the last page)
+        """
+        if not self.db:
+            return {'projects': [], 'next_cursor': None}
+
+        limit = max(1, min(limit, MAX_PROJECT_PAGE_SIZE))
+        cache_key = (user_id, limit, cursor)
+        page = _project_list_cache.get(cache_key)
+        if page is not MISSING:
+            return page
+
+        refs = self._project_refs(user_id)
+        query = refs.order_by('created_at', direction='DESCENDING').limit(limit)
+        if cursor:
+            cursor_doc = refs.document(cursor).get()
+            if not cursor_doc.exists:
+                raise ValueError("Invalid cursor")
+            query = query.start_after(cursor_doc)
+
+        ref_ids = [doc.id for doc in query.stream()]
+
+        # Fetch the page's project documents in one batched read
+        projects_ref = self.db.collection('projects')
+        docs = self.db.get_all([projects_ref.document(project_id) for project_id in ref_ids])
+        by_id = {doc.id: doc.to_dict() for doc in docs if doc.exists}
+
+        page = {
+            'projects': [by_id[project_id] for project_id in ref_ids if project_id in by_id],
+            'next_cursor': ref_ids[-1] if len(ref_ids) == limit else None
+        }
+        _project_list_cache.set(cache_key, page)
+        return page
+
+    def backfill_project_refs(self) -> int:
+        """
+        Index existing projects under their owners and collaborators
+
+        One-off migration for projects created before project_refs existed.
+
+        Returns:
+            int: Number of index entries written
+        """
+        if not self.db:
+            return 0
+
+        written = 0
+        batch = self.db.batch()
+        for doc in self.db.collection('projects').stream():
+            project = doc.to_dict()
+            members = [('owner', project.get('owner_id'))] + [
+                ('collaborator', uid) for uid in project.get('collaborators', [])
+            ]
+            for role, user_id in members:
+                if not user_id:
+                    continue
+                batch.set(self._project_refs(user_id).document(doc.id), {
+                    'project_id': doc.id,
+                    'role': role,
+                    'created_at': project.get('created_at', '')
+                })
+                written += 1
+                if written % FIRESTORE_BATCH_COMMIT_LIMIT == 0:
+                    batch.commit()
+                    batch = self.db.batch()
+        batch.commit()
+
+        _project_list_cache.clear()
+        return written
+
     def get_context_for_scene(self, project_id: str, scene_id: str) -> Dict:
         """Get all Story Bible context relevant to a scene"""
         scene = self.get_scene(project_id, scene_id)
@@ -313,8 +1039,8 @@ class StoryBibleService:
         all_plot_points = self.list_plot_points(project_id)
         all_lore = self.list_lore(project_id)
 
-        # Build character ID set from scene for fast lookups
-        scene_char_ids = set(scene.get('characters', []))
+        # Tagged characters and those the scene names, as a set for fast lookups
+        scene_char_ids = set(self._scene_character_ids(project_id, scene))
         scene_plot_ids = set(scene.get('plot_points', []))
         location_id = scene.get('location_id')
 
@@ -343,4 +1069,19 @@ class StoryBibleService:
                 or location_id in lore.get('related_locations', []))
         ]
 
+        # Add lore and passages from other scenes that read as most similar
+        query = self._embedding_text('scene', scene)
+        linked_lore_ids = {lore.get('id') for lore in context['related_lore']}
+        lore_by_id = {lore.get('id'): lore for lore in all_lore}
+        for hit in self.search_related(project_id, query, ['lore'],
+                                       RELEVANT_LORE_LIMIT, exclude_ids=linked_lore_ids):
+            lore = lore_by_id.get(hit['item_id'])
+            if lore and hit['item_id'] not in linked_lore_ids:
+                context['related_lore'].append(lore)
+                linked_lore_ids.add(hit['item_id'])
+
+        context['relevant_passages'] = self.search_related(
+            project_id, query, ['scene'], RELEVANT_PASSAGE_LIMIT, exclude_ids=[scene_id]
+        )
+
         return context
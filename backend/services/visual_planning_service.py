@@ -3,78 +3,713 @@ Visual Planning Service
 Handles corkboard, matrix, and outline views for story planning
 """
 
-from typing import List, Dict, Optional
+from typing import Any, Callable, Iterable, List, Dict, Optional, Tuple
 from datetime import datetime
+import os
 import uuid
 
+from firebase_admin import firestore
+from google.api_core import exceptions as gcp_exceptions
+from google.cloud.firestore_v1.base_query import FieldFilter
+from google.cloud.firestore_v1.field_path import FieldPath
+
+from services.project_versions import ProjectVersionService
+from utils.json_patch import (
+    JsonPatchError, JsonPatchTestFailed, apply_patch, escape_token, parse_pointer,
+    validate_patch
+)
+from utils.ranking import rank_after, spread_ranks
+
+# Corkboards with more items than this keep each item in its own document
+# under corkboard_items, so a card edit rewrites one small document
+CORKBOARD_SHARD_THRESHOLD = int(os.getenv('CORKBOARD_SHARD_THRESHOLD') or 200)
+
+# Side in board pixels of the grid cells sharded corkboard items are indexed by
+CORKBOARD_GRID_SIZE = int(os.getenv('CORKBOARD_GRID_SIZE') or 1000)
+
+# Items spanning more grid cells than this are returned for every viewport
+MAX_ITEM_GRID_CELLS = 16
+
+# Firestore accepts up to 30 values in an array-contains-any filter; viewports
+# covering more cells than this many queries' worth read the whole board
+ARRAY_CONTAINS_ANY_LIMIT = 30
+MAX_VIEWPORT_QUERIES = 10
+
+# Widest and tallest viewport, in board pixels, a windowed read accepts
+MAX_VIEWPORT_SPAN = int(os.getenv('MAX_VIEWPORT_SPAN') or 100000)
+
+# Times a patch is re-applied when the view changes between its read and write
+PATCH_ATTEMPTS = 5
+
+# Firestore allows 500 writes per batch; commit early to stay clear of it
+FIRESTORE_BATCH_COMMIT_LIMIT = 450
+
+# Top-level fields of each planning view a patch may change
+PATCHABLE_FIELDS = {
+    'corkboard': ('items', 'connections'),
+    'matrix': ('rows', 'columns', 'cells'),
+    'outline': ('structure',),
+}
+
+# Bookkeeping fields of sharded corkboards and their items, not returned to clients
+_CORKBOARD_INTERNAL_FIELDS = ('sharded', 'item_count', 'last_rank', 'grid_size')
+_ITEM_INTERNAL_FIELDS = ('rank', 'grid_cells')
+
+# Grid cell of items too large to index, matched by every viewport
+_ANY_GRID_CELL = '*'
+
+_MISSING = object()
+
+# Commit failures meaning another write got there first
+_WRITE_CONFLICTS = (
+    gcp_exceptions.FailedPrecondition, gcp_exceptions.Aborted,
+    gcp_exceptions.AlreadyExists, gcp_exceptions.Conflict
+)
+
+
+def _field_updates(field: str, old: Any, new: Any) -> Dict:
+    """
+    Update of one view field, by key when it is a map with few keys changed
+
+    Writing only the changed keys of e.g. the matrix cells keeps a cell
+    edit from rewriting every cell.
+    """
+    if isinstance(old, dict) and isinstance(new, dict) and old:
+        changed = [key for key, value in new.items() if old.get(key, _MISSING) != value]
+        removed = [key for key in old if key not in new]
+        if len(changed) + len(removed) < len(new):
+            updates = {FieldPath(field, key).to_api_repr(): new[key] for key in changed}
+            updates.update({FieldPath(field, key).to_api_repr(): firestore.DELETE_FIELD for key in removed})
+            return updates
+    return {field: new}
+
+
+class PatchConflict(Exception):
+    """A planning view kept changing while a patch was being applied"""
+
+
+class CorkboardItemNotFound(JsonPatchError):
+    """A patch refers to a corkboard item that does not exist"""
+
+
+def _empty_view(view_type: str) -> Dict:
+    """Structure of a planning view that has never been saved"""
+    if view_type == 'corkboard':
+        return {'view_type': 'corkboard', 'items': [], 'connections': []}
+    if view_type == 'matrix':
+        return {'view_type': 'matrix', 'rows': [], 'columns': [], 'cells': {}}
+    return {'view_type': 'outline', 'structure': []}
+
+
+def _new_corkboard_item(item_data: Dict, timestamp: str) -> Dict:
+    """A corkboard item with defaults filled in"""
+    return {
+        'id': item_data.get('id') or str(uuid.uuid4()),
+        'type': item_data.get('type', 'note'),  # note, scene, character, plot_point
+        'title': item_data.get('title', ''),
+        'content': item_data.get('content', ''),
+        'position': item_data.get('position', {'x': 0, 'y': 0}),
+        'size': item_data.get('size', {'width': 200, 'height': 150}),
+        'color': item_data.get('color', '#FFD700'),
+        'reference_id': item_data.get('reference_id'),  # Link to actual entity
+        'created_at': timestamp,
+        'updated_at': timestamp
+    }
+
+
+def _item_bounds(item: Dict) -> Tuple[float, float, float, float]:
+    """(left, top, right, bottom) of a corkboard item in board pixels"""
+    position = item.get('position') or {}
+    size = item.get('size') or {}
+    x, y = position.get('x') or 0, position.get('y') or 0
+    return x, y, x + (size.get('width') or 0), y + (size.get('height') or 0)
+
+
+def _overlaps(item: Dict, bbox: Tuple[float, float, float, float]) -> bool:
+    left, top, right, bottom = _item_bounds(item)
+    return left <= bbox[2] and right >= bbox[0] and top <= bbox[3] and bottom >= bbox[1]
+
+
+def _grid_range(bbox: Tuple[float, float, float, float]) -> Tuple[int, int, int, int]:
+    """(left, top, right, bottom) grid coordinates of the cells a box overlaps"""
+    left, top, right, bottom = (int(v // CORKBOARD_GRID_SIZE) for v in bbox)
+    return left, top, right, bottom
+
+
+def _grid_cell_count(bbox: Tuple[float, float, float, float]) -> int:
+    """Number of grid cells a box overlaps, without listing them"""
+    left, top, right, bottom = _grid_range(bbox)
+    return (right - left + 1) * (bottom - top + 1)
+
+
+def _grid_cells(bbox: Tuple[float, float, float, float]) -> List[str]:
+    """Keys of the grid cells a box overlaps"""
+    left, top, right, bottom = _grid_range(bbox)
+    return [f'{gx}:{gy}' for gx in range(left, right + 1) for gy in range(top, bottom + 1)]
+
+
+def _item_doc(item: Dict, rank: Optional[str]) -> Dict:
+    """Item document of a sharded corkboard, indexed by rank and grid cells"""
+    if _grid_cell_count(_item_bounds(item)) > MAX_ITEM_GRID_CELLS:
+        cells = [_ANY_GRID_CELL]
+    else:
+        cells = _grid_cells(_item_bounds(item))
+    return dict(item, rank=rank, grid_cells=cells)
+
+
+def _public_item(doc: Dict) -> Dict:
+    """A sharded item document without its index fields"""
+    return {k: v for k, v in doc.items() if k not in _ITEM_INTERNAL_FIELDS}
+
+
+def _patch_scope(op: Dict, view_type: str) -> Tuple[str, Optional[str]]:
+    """
+    Field an operation targets, and for corkboard items the item ID
+
+    Raises:
+        JsonPatchError: If the operation reaches outside the view's patchable
+            fields, or moves values between corkboard items
+    """
+    scopes = []
+    for pointer in (op['path'], op.get('from')) if op['op'] in ('move', 'copy') else (op['path'],):
+        tokens = parse_pointer(pointer)
+        if not tokens or tokens[0] not in PATCHABLE_FIELDS[view_type]:
+            raise JsonPatchError(f"Cannot patch {pointer!r} of the {view_type}")
+        item_id = tokens[1] if view_type == 'corkboard' and tokens[0] == 'items' and len(tokens) > 1 else None
+        scopes.append((tokens[0], item_id))
+    if len(set(scopes)) > 1:
+        raise JsonPatchError("'move' and 'copy' must stay within one field or corkboard item")
+    return scopes[0]
+
+
+def _act_row(plot_point: Dict) -> str:
+    """Matrix row and outline node ID of a plot point's act"""
+    return f"act_{plot_point.get('act', 1)}"
+
+
+def _matrix_rows(plot_points: List[Dict]) -> List[Dict]:
+    """Create rows for acts/chapters"""
+    acts = {pp.get('act', 1) for pp in plot_points}
+    return [{'id': f'act_{act}', 'label': f'Act {act}'} for act in sorted(acts)]
+
+
+def _scene_acts(scenes: List[Dict], plot_index: Dict, scene_ids: set) -> set:
+    """Act rows the given scenes are linked to through their plot points"""
+    return {_act_row(plot_index[pp_id]) for scene in scenes if scene['id'] in scene_ids
+            for pp_id in scene.get('plot_points') or [] if pp_id in plot_index}
+
+
+def _matrix_cells(scenes: List[Dict], plot_index: Dict, rows: Optional[set] = None) -> Dict:
+    """
+    Cells mapping scenes to plot points, keyed '<act row>_<plot point ID>'
+
+    Args:
+        scenes: Scenes in story order
+        plot_index: Plot point ID -> plot point
+        rows: Build only the cells of these act rows (all when None)
+    """
+    cells = {}
+    for scene in scenes:
+        for pp_id in scene.get('plot_points') or []:
+            pp = plot_index.get(pp_id)
+            if pp is None:
+                continue
+            row_id = _act_row(pp)
+            if rows is not None and row_id not in rows:
+                continue
+            cells.setdefault(f'{row_id}_{pp_id}', []).append({
+                'scene_id': scene['id'],
+                'title': scene['title'],
+                'word_count': scene.get('word_count', 0)
+            })
+    return cells
+
+
+def _outline_acts(scenes: List[Dict], plot_points: List[Dict], plot_index: Dict,
+                  acts: Optional[set] = None) -> Dict:
+    """
+    Outline act nodes holding their plot points and the scenes linked to them
+
+    Args:
+        scenes: Scenes in story order
+        plot_points: Plot points in story order
+        plot_index: Plot point ID -> plot point
+        acts: Build only these act node IDs (all when None)
+
+    Returns:
+        Dict: Act node ID -> act node, in order of first appearance
+    """
+    nodes, pp_nodes = {}, {}
+    for pp in plot_points:
+        act_id = _act_row(pp)
+        if acts is not None and act_id not in acts:
+            continue
+        if act_id not in nodes:
+            nodes[act_id] = {
+                'id': act_id,
+                'title': f"Act {pp.get('act', 1)}",
+                'type': 'act',
+                'children': []
+            }
+        pp_nodes[pp['id']] = {
+            'id': pp['id'],
+            'title': pp['title'],
+            'type': 'plot_point',
+            'description': pp.get('description', ''),
+            'status': pp.get('status', 'planned'),
+            'children': []
+        }
+        nodes[act_id]['children'].append(pp_nodes[pp['id']])
+
+    # Add scenes to plot points
+    for scene in scenes:
+        for pp_id in scene.get('plot_points') or []:
+            if pp_id in pp_nodes:
+                pp_nodes[pp_id]['children'].append({
+                    'id': scene['id'],
+                    'title': scene['title'],
+                    'type': 'scene',
+                    'word_count': scene.get('word_count', 0),
+                    'status': scene.get('status', 'draft')
+                })
+    return nodes
+
+
+def _window(corkboard: Dict, bbox: Tuple[float, float, float, float]) -> Dict:
+    """The items of a corkboard inside a viewport, and the connections touching them"""
+    items = [item for item in corkboard.get('items', []) if _overlaps(item, bbox)]
+    visible = {item.get('id') for item in items}
+    connections = [c for c in corkboard.get('connections', [])
+                   if isinstance(c, dict) and (c.get('from') in visible or c.get('to') in visible)]
+    return dict(corkboard, items=items, connections=connections, bbox=list(bbox))
+
+
 class VisualPlanningService:
     """Service for managing visual planning views"""
     
     def __init__(self, db):
         self.db = db
+        self.versions = ProjectVersionService(db)
     
     def _get_collection(self, project_id: str, collection_name: str):
         """Get a collection reference for a project"""
         if self.db:
             return self.db.collection('projects').document(project_id).collection(collection_name)
         return None
+
+    def _commit_view(self, batch, ref, snapshot, fields: Dict):
+        """
+        Add a view document write to a batch, conditional on it being unchanged
+
+        A view that did not exist when read is created, which fails if
+        another writer created it first.
+        """
+        if snapshot.exists:
+            batch.update(ref, fields, option=self.db.write_option(last_update_time=snapshot.update_time))
+        else:
+            batch.create(ref, fields)
+
+    def patch_view(self, project_id: str, view_type: str, ops: List[Dict]) -> Dict:
+        """
+        Apply a JSON Patch (RFC 6902) to the matrix or outline
+
+        The patch is applied to the stored view and written back only if
+        the view has not changed since it was read; otherwise it is
+        re-applied to the newer version. Either every operation lands or
+        none does.
+
+        Args:
+            project_id: Project ID
+            view_type: 'matrix' or 'outline'
+            ops: Patch operations on the view's fields, e.g.
+                [{'op': 'replace', 'path': '/cells/act_1_pp1', 'value': [...]}]
+
+        Returns:
+            Dict: The patched view
+
+        Raises:
+            JsonPatchError: If the patch does not apply (JsonPatchTestFailed
+                when a 'test' operation fails)
+            PatchConflict: If the view kept changing concurrently
+        """
+        validate_patch(ops)
+        for op in ops:
+            _patch_scope(op, view_type)
+
+        return self._rewrite_view(project_id, view_type, lambda current: apply_patch(current, ops))
+
+    def _rewrite_view(self, project_id: str, view_type: str, change: Callable[[Dict], Dict]) -> Dict:
+        """
+        Read a planning view, change it and write back the fields that differ
+
+        The write is conditional on the view being unchanged since the read;
+        otherwise change is applied again to the newer version.
+
+        Args:
+            project_id: Project ID
+            view_type: 'corkboard', 'matrix' or 'outline'
+            change: Returns a changed copy of the view it is given
+
+        Returns:
+            Dict: The changed view
+
+        Raises:
+            PatchConflict: If the view kept changing concurrently
+        """
+        collection = self._get_collection(project_id, 'planning_views')
+        if not collection:
+            return change(_empty_view(view_type))
+
+        ref = collection.document(view_type)
+        for attempt in range(PATCH_ATTEMPTS):
+            snapshot = ref.get()
+            current = snapshot.to_dict() if snapshot.exists else _empty_view(view_type)
+            updated = change(current)
+            changed = {field: updated[field] for field in PATCHABLE_FIELDS[view_type]
+                       if field in updated and updated[field] != current.get(field)}
+            if snapshot.exists and not changed:
+                return updated
+            updated['updated_at'] = changed['updated_at'] = datetime.utcnow().isoformat()
+
+            fields = updated
+            if snapshot.exists:
+                fields = {}
+                for field, value in changed.items():
+                    fields.update(_field_updates(field, current.get(field), value))
+
+            batch = self.db.batch()
+            self._commit_view(batch, ref, snapshot, fields)
+            try:
+                batch.commit()
+            except _WRITE_CONFLICTS:
+                continue
+            self.versions.bump(project_id, view_type)
+            return updated
+
+        raise PatchConflict(f"The {view_type} changed concurrently {PATCH_ATTEMPTS} times")
     
     # Corkboard operations
-    def get_corkboard(self, project_id: str) -> Dict:
-        """Get corkboard layout for a project"""
+    def _corkboard_items(self, project_id: str):
+        return self._get_collection(project_id, 'corkboard_items')
+
+    def get_corkboard(self, project_id: str,
+                      bbox: Optional[Tuple[float, float, float, float]] = None) -> Dict:
+        """
+        Get corkboard layout for a project
+
+        Args:
+            project_id: Project ID
+            bbox: Viewport (left, top, right, bottom) in board pixels. When
+                given, only items overlapping it are returned, with the
+                connections that touch them.
+
+        Returns:
+            Dict: The corkboard
+        """
         collection = self._get_collection(project_id, 'planning_views')
         if collection:
             doc = collection.document('corkboard').get()
             if doc.exists:
-                return doc.to_dict()
+                corkboard = doc.to_dict()
+                if corkboard.get('sharded') is True:
+                    corkboard['items'] = [_public_item(item) for item in
+                                          self._read_sharded_items(project_id, corkboard, bbox)]
+                for field in _CORKBOARD_INTERNAL_FIELDS:
+                    corkboard.pop(field, None)
+                if bbox is not None:
+                    corkboard = _window(corkboard, bbox)
+                return corkboard
         
         # Return empty corkboard structure
-        return {
-            'view_type': 'corkboard',
-            'items': [],
-            'connections': []
-        }
-    
+        return _empty_view('corkboard')
+
+    def _read_sharded_items(self, project_id: str, meta: Dict,
+                            bbox: Optional[Tuple[float, float, float, float]]) -> List[Dict]:
+        """
+        Item documents of a sharded corkboard in rank order
+
+        With a viewport, only the grid cells it covers are queried. Boards
+        indexed with another grid size, and viewports covering too many
+        cells, are read whole.
+        """
+        items_ref = self._corkboard_items(project_id)
+        if (bbox is None or meta.get('grid_size') != CORKBOARD_GRID_SIZE
+                or _grid_cell_count(bbox) > ARRAY_CONTAINS_ANY_LIMIT * MAX_VIEWPORT_QUERIES):
+            return [item.to_dict() for item in items_ref.order_by('rank').stream()]
+
+        cells = _grid_cells(bbox) + [_ANY_GRID_CELL]
+        items = {}
+        for i in range(0, len(cells), ARRAY_CONTAINS_ANY_LIMIT):
+            query = items_ref.where(filter=FieldFilter(
+                'grid_cells', 'array_contains_any', cells[i:i + ARRAY_CONTAINS_ANY_LIMIT]
+            ))
+            for item in query.stream():
+                items[item.id] = item.to_dict()
+        return sorted(items.values(), key=lambda item: (item.get('rank') or '', item['id']))
+
+    def _delete_corkboard_items(self, project_id: str, keep: Optional[set] = None) -> int:
+        """Delete a sharded corkboard's item documents, except those in keep"""
+        batch, deleted = self.db.batch(), 0
+        for doc in self._corkboard_items(project_id).select([]).stream():
+            if keep and doc.id in keep:
+                continue
+            batch.delete(doc.reference)
+            deleted += 1
+            if deleted % FIRESTORE_BATCH_COMMIT_LIMIT == 0:
+                batch.commit()
+                batch = self.db.batch()
+        batch.commit()
+        return deleted
+
     def save_corkboard(self, project_id: str, data: Dict) -> Dict:
-        """Save corkboard layout"""
+        """
+        Save a whole corkboard layout
+
+        Boards over CORKBOARD_SHARD_THRESHOLD items are stored sharded,
+        which takes more than one batch above FIRESTORE_BATCH_COMMIT_LIMIT
+        items. Prefer patch_corkboard for edits.
+        """
         timestamp = datetime.utcnow().isoformat()
         
         corkboard_data = {
             'view_type': 'corkboard',
-            'items': data.get('items', []),
+            'items': [dict(item, id=item.get('id') or str(uuid.uuid4())) for item in data.get('items', [])],
             'connections': data.get('connections', []),
             'updated_at': timestamp
         }
         
         collection = self._get_collection(project_id, 'planning_views')
         if collection:
-            collection.document('corkboard').set(corkboard_data)
+            ref = collection.document('corkboard')
+            previous = ref.get()
+            was_sharded = previous.exists and (previous.to_dict() or {}).get('sharded') is True
+            items = corkboard_data['items']
+
+            if len(items) > CORKBOARD_SHARD_THRESHOLD:
+                ranks = spread_ranks(len(items))
+                batch = self.db.batch()
+                for i, (item, rank) in enumerate(zip(items, ranks), 1):
+                    batch.set(self._corkboard_items(project_id).document(item['id']),
+                              _item_doc(item, rank))
+                    if i % FIRESTORE_BATCH_COMMIT_LIMIT == 0:
+                        batch.commit()
+                        batch = self.db.batch()
+                batch.commit()
+                if was_sharded:
+                    self._delete_corkboard_items(project_id, keep={item['id'] for item in items})
+                ref.set({**corkboard_data, 'items': [], 'sharded': True,
+                         'item_count': len(items), 'last_rank': ranks[-1],
+                         'grid_size': CORKBOARD_GRID_SIZE})
+                corkboard_data['items'] = items
+            else:
+                ref.set(corkboard_data)
+                if was_sharded:
+                    self._delete_corkboard_items(project_id)
+            self.versions.bump(project_id, 'corkboard')
         
         return corkboard_data
+
+    def patch_corkboard(self, project_id: str, ops: List[Dict]) -> Dict:
+        """
+        Apply a JSON Patch (RFC 6902) to the corkboard atomically
+
+        Items are addressed by ID rather than position: '/items/<id>' is a
+        whole item, '/items/<id>/position/x' one of its fields, and adding
+        to '/items/-' creates an item (defaults filled in, ID generated if
+        missing). '/connections' is patched as an ordinary array. Only the
+        items a patch touches are read and written once the board is
+        sharded; a board crossing CORKBOARD_SHARD_THRESHOLD is sharded in
+        the same write.
+
+        Args:
+            project_id: Project ID
+            ops: Patch operations
+
+        Returns:
+            Dict: 'items' mapping each touched item ID to the item (None if
+            removed), 'connections' if they changed, and 'updated_at'
+
+        Raises:
+            CorkboardItemNotFound: If an operation targets a missing item
+            JsonPatchError: If the patch does not apply
+            PatchConflict: If the corkboard kept changing concurrently
+        """
+        validate_patch(ops)
+        scopes = [_patch_scope(op, 'corkboard') for op in ops]
+        referenced = {item_id for _, item_id in scopes if item_id not in (None, '-')}
+
+        collection = self._get_collection(project_id, 'planning_views')
+        if not collection:
+            raise PatchConflict("Corkboard storage is unavailable")
+
+        ref = collection.document('corkboard')
+        for attempt in range(PATCH_ATTEMPTS):
+            snapshot = ref.get()
+            meta = snapshot.to_dict() if snapshot.exists else _empty_view('corkboard')
+            sharded = meta.get('sharded') is True
+            if sharded:
+                items_ref = self._corkboard_items(project_id)
+                docs = self.db.get_all([items_ref.document(i) for i in referenced]) if referenced else []
+                items = {doc.id: doc.to_dict() for doc in docs if doc.exists}
+            else:
+                items = {item['id']: item for item in meta.get('items', []) if isinstance(item, dict)}
+
+            timestamp = datetime.utcnow().isoformat()
+            touched, connections = self._apply_corkboard_ops(
+                ops, scopes, items, meta.get('connections', []), timestamp
+            )
+
+            fields = {'updated_at': timestamp, 'view_type': 'corkboard'}
+            if connections is not None:
+                fields['connections'] = connections
+            added = [i for i, item in touched.items() if item is not None and i not in items]
+            removed = [i for i, item in touched.items() if item is None and i in items]
+
+            # Item ID -> item document to write, or None to delete
+            writes: Dict[str, Any] = {}
+            if sharded:
+                last_rank = meta.get('last_rank')
+                for item_id, item in touched.items():
+                    if item is None:
+                        writes[item_id] = None
+                        continue
+                    rank = items.get(item_id, {}).get('rank')
+                    if rank is None:
+                        last_rank = rank = rank_after(last_rank)
+                    writes[item_id] = _item_doc(item, rank)
+                count = meta.get('item_count', 0) + len(added) - len(removed)
+                fields.update(item_count=count, last_rank=last_rank)
+            else:
+                board = [touched.get(i, item) for i, item in items.items()] + [touched[i] for i in added]
+                board = [item for item in board if item is not None]
+                if len(board) > CORKBOARD_SHARD_THRESHOLD:
+                    # Move every item out of the view document in this same write
+                    ranks = spread_ranks(len(board))
+                    writes = {item['id']: _item_doc(item, rank) for item, rank in zip(board, ranks)}
+                    fields.update(items=firestore.DELETE_FIELD, sharded=True, item_count=len(board),
+                                  last_rank=ranks[-1], grid_size=CORKBOARD_GRID_SIZE)
+                else:
+                    fields['items'] = board
+
+            writes = {i: doc for i, doc in writes.items() if doc is not None or i in items}
+            if len(writes) + 1 > FIRESTORE_BATCH_COMMIT_LIMIT:
+                raise JsonPatchError("Patch touches too many items for one atomic write")
+            batch = self.db.batch()
+            items_ref = self._corkboard_items(project_id)
+            for item_id, doc in writes.items():
+                if doc is None:
+                    batch.delete(items_ref.document(item_id))
+                else:
+                    batch.set(items_ref.document(item_id), doc)
+            self._commit_view(batch, ref, snapshot, fields)
+            try:
+                batch.commit()
+            except _WRITE_CONFLICTS:
+                continue
+            self.versions.bump(project_id, 'corkboard')
+
+            result = {
+                'items': {i: (_public_item(item) if item else None) for i, item in touched.items()},
+                'updated_at': timestamp
+            }
+            if connections is not None:
+                result['connections'] = connections
+            return result
+
+        raise PatchConflict(f"The corkboard changed concurrently {PATCH_ATTEMPTS} times")
+
+    @staticmethod
+    def _apply_corkboard_ops(ops: List[Dict], scopes: List[Tuple], items: Dict,
+                             connections: List, timestamp: str) -> Tuple[Dict, Optional[List]]:
+        """
+        Apply corkboard operations in memory
+
+        Returns:
+            Tuple of the touched items (ID -> item, or None if removed) and
+            the new connections (None if unchanged)
+        """
+        touched: Dict[str, Any] = {}
+        new_connections = None
+
+        def current(item_id):
+            item = touched[item_id] if item_id in touched else items.get(item_id)
+            if item is None:
+                raise CorkboardItemNotFound(f"Corkboard item not found: {item_id}")
+            return item
+
+        for op, (field, item_id) in zip(ops, scopes):
+            if field == 'connections':
+                base = {'connections': connections if new_connections is None else new_connections}
+                new_connections = apply_patch(base, [op])['connections']
+                continue
+            if item_id is None:
+                raise JsonPatchError("Corkboard items are patched one at a time by ID")
+
+            tokens = parse_pointer(op['path'])
+            if len(tokens) == 2:
+                # Whole-item operations
+                exists = touched.get(item_id) is not None or (item_id not in touched and item_id in items)
+                if op['op'] == 'add' and not exists:
+                    value = op['value']
+                    if not isinstance(value, dict):
+                        raise JsonPatchError("A corkboard item must be an object")
+                    if item_id != '-':
+                        value = dict(value, id=item_id)
+                    item = _new_corkboard_item(value, timestamp)
+                    new_id = item['id']
+                    if touched.get(new_id) is not None or (new_id not in touched and new_id in items):
+                        raise JsonPatchError(f"Corkboard item already exists: {item['id']}")
+                    touched[item['id']] = item
+                elif op['op'] == 'remove':
+                    current(item_id)
+                    touched[item_id] = None
+                elif op['op'] in ('add', 'replace'):
+                    old = current(item_id)
+                    if not isinstance(op['value'], dict):
+                        raise JsonPatchError("A corkboard item must be an object")
+                    touched[item_id] = dict(op['value'], id=item_id,
+                                            created_at=old.get('created_at', timestamp),
+                                            updated_at=timestamp)
+                elif op['op'] == 'test':
+                    if _public_item(current(item_id)) != op['value']:
+                        raise JsonPatchTestFailed(f"Test failed at {op['path']}")
+                else:
+                    raise JsonPatchError(f"Cannot {op['op']} a whole corkboard item")
+                continue
+
+            # Operations inside one item
+            item_op = dict(op, path='/' + '/'.join(escape_token(t) for t in tokens[2:]))
+            if 'from' in op:
+                item_op['from'] = '/' + '/'.join(escape_token(t) for t in parse_pointer(op['from'])[2:])
+            patched = apply_patch(current(item_id), [item_op])
+            if patched.get('id') != item_id:
+                raise JsonPatchError("A corkboard item's id cannot be changed")
+            if op['op'] != 'test':
+                patched['updated_at'] = timestamp
+                touched[item_id] = patched
+
+        return touched, new_connections
     
     def add_corkboard_item(self, project_id: str, item_data: Dict) -> Dict:
         """Add an item to the corkboard"""
-        item_id = str(uuid.uuid4())
-        timestamp = datetime.utcnow().isoformat()
-        
-        item = {
-            'id': item_id,
-            'type': item_data.get('type', 'note'),  # note, scene, character, plot_point
-            'title': item_data.get('title', ''),
-            'content': item_data.get('content', ''),
-            'position': item_data.get('position', {'x': 0, 'y': 0}),
-            'size': item_data.get('size', {'width': 200, 'height': 150}),
-            'color': item_data.get('color', '#FFD700'),
-            'reference_id': item_data.get('reference_id'),  # Link to actual entity
-            'created_at': timestamp,
-            'updated_at': timestamp
-        }
-        
-        corkboard = self.get_corkboard(project_id)
-        corkboard['items'].append(item)
-        self.save_corkboard(project_id, corkboard)
-        
-        return item
+        item = _new_corkboard_item(dict(item_data, id=None), datetime.utcnow().isoformat())
+        if not self.db:
+            return item
+        result = self.patch_corkboard(project_id, [{'op': 'add', 'path': '/items/-', 'value': item}])
+        return result['items'][item['id']]
+
+    def update_corkboard_item(self, project_id: str, item_id: str, updates: Dict) -> Dict:
+        """Set some fields of a corkboard item, e.g. its position after a drag"""
+        path = f"/items/{escape_token(item_id)}"
+        ops = [{'op': 'add', 'path': f"{path}/{escape_token(key)}", 'value': value}
+               for key, value in updates.items() if key not in ('id', 'created_at', 'updated_at')]
+        ops.insert(0, {'op': 'test', 'path': f"{path}/id", 'value': item_id})
+        return self.patch_corkboard(project_id, ops)['items'][item_id]
+
+    def delete_corkboard_item(self, project_id: str, item_id: str) -> bool:
+        """Remove a corkboard item"""
+        self.patch_corkboard(project_id, [{'op': 'remove', 'path': f"/items/{escape_token(item_id)}"}])
+        return True
     
     # Matrix operations
     def get_matrix(self, project_id: str) -> Dict:
@@ -108,54 +743,86 @@ class VisualPlanningService:
         collection = self._get_collection(project_id, 'planning_views')
         if collection:
             collection.document('matrix').set(matrix_data)
+            self.versions.bump(project_id, 'matrix')
         
         return matrix_data
     
-    def create_matrix_from_scenes(self, project_id: str, story_bible_service) -> Dict:
-        """Create a matrix view from scenes and plot points"""
+    def update_matrix_cell(self, project_id: str, row, col, content) -> Dict:
+        """
+        Set one matrix cell
+
+        Args:
+            project_id: Project ID
+            row: Row ID, or index into the matrix's rows
+            col: Column ID, or index into the matrix's columns
+            content: New cell content
+
+        Returns:
+            Dict: The patched matrix
+
+        Raises:
+            JsonPatchError: If an index is out of range (JsonPatchTestFailed
+                if the row or column moved since the index was read)
+        """
+        ops = []
+        if isinstance(row, int) or isinstance(col, int):
+            matrix = self.get_matrix(project_id)
+            for name, value in (('rows', row), ('columns', col)):
+                if isinstance(value, int):
+                    entries = matrix.get(name, [])
+                    if not 0 <= value < len(entries):
+                        raise JsonPatchError(f"No matrix {name[:-1]} at index {value}")
+                    ops.append({'op': 'test', 'path': f"/{name}/{value}/id", 'value': entries[value]['id']})
+            row = ops[0]['value'] if isinstance(row, int) else row
+            col = ops[-1]['value'] if isinstance(col, int) else col
+        ops.append({'op': 'add', 'path': f"/cells/{escape_token(f'{row}_{col}')}", 'value': content})
+        return self.patch_view(project_id, 'matrix', ops)
+
+    def create_matrix_from_scenes(self, project_id: str, story_bible_service,
+                                  scene_ids: Optional[Iterable[str]] = None) -> Dict:
+        """
+        Create a matrix view from scenes and plot points
+
+        Args:
+            project_id: Project ID
+            story_bible_service: StoryBibleService to read scenes and plot points from
+            scene_ids: Scenes changed since the matrix was generated. When
+                given, only the rows (acts) those scenes were or are now in
+                are rebuilt and other rows keep any edits made to them.
+
+        Returns:
+            Dict: The matrix
+        """
         scenes = story_bible_service.list_scenes(project_id)
         plot_points = story_bible_service.list_plot_points(project_id)
-        characters = story_bible_service.list_characters(project_id)
-        
-        # Create rows for acts/chapters
-        acts = set()
-        for pp in plot_points:
-            acts.add(pp.get('act', 1))
-        
-        rows = [{'id': f'act_{act}', 'label': f'Act {act}'} for act in sorted(acts)]
-        
-        # Create columns for key plot points
-        columns = [
-            {'id': pp['id'], 'label': pp['title']} 
-            for pp in plot_points[:10]  # Limit to first 10
-        ]
-        
-        # Create cells mapping scenes to plot points
-        cells = {}
-        for scene in scenes:
-            scene_plot_points = scene.get('plot_points', [])
-            for pp_id in scene_plot_points:
-                # Find which act this plot point belongs to
-                pp = next((p for p in plot_points if p['id'] == pp_id), None)
-                if pp:
-                    act = pp.get('act', 1)
-                    row_id = f'act_{act}'
-                    cell_key = f'{row_id}_{pp_id}'
-                    
-                    if cell_key not in cells:
-                        cells[cell_key] = []
-                    
-                    cells[cell_key].append({
-                        'scene_id': scene['id'],
-                        'title': scene['title'],
-                        'word_count': scene['word_count']
-                    })
-        
+        plot_index = {pp['id']: pp for pp in plot_points}
+        rows = _matrix_rows(plot_points)
+
+        if scene_ids is not None and self._get_collection(project_id, 'planning_views'):
+            changed = set(scene_ids)
+
+            def refresh(matrix):
+                row_ids = [row['id'] for row in matrix.get('rows', [])] + [row['id'] for row in rows]
+                affected = _scene_acts(scenes, plot_index, changed)
+                for key, entries in matrix.get('cells', {}).items():
+                    if any(entry.get('scene_id') in changed for entry in entries):
+                        affected.update(row for row in row_ids if key.startswith(row + '_'))
+                cells = {key: entries for key, entries in matrix.get('cells', {}).items()
+                         if not any(key.startswith(row + '_') for row in affected)}
+                cells.update(_matrix_cells(scenes, plot_index, affected))
+                return dict(matrix, rows=rows, cells=cells)
+
+            return self._rewrite_view(project_id, 'matrix', refresh)
+
         matrix_data = {
             'view_type': 'matrix',
             'rows': rows,
-            'columns': columns,
-            'cells': cells
+            # Create columns for key plot points
+            'columns': [
+                {'id': pp['id'], 'label': pp['title']}
+                for pp in plot_points[:10]  # Limit to first 10
+            ],
+            'cells': _matrix_cells(scenes, plot_index)
         }
         
         self.save_matrix(project_id, matrix_data)
@@ -189,55 +856,47 @@ class VisualPlanningService:
         collection = self._get_collection(project_id, 'planning_views')
         if collection:
             collection.document('outline').set(outline_data)
+            self.versions.bump(project_id, 'outline')
         
         return outline_data
     
-    def generate_outline_from_plot(self, project_id: str, story_bible_service) -> Dict:
-        """Generate an outline from plot points and scenes"""
+    def generate_outline_from_plot(self, project_id: str, story_bible_service,
+                                   scene_ids: Optional[Iterable[str]] = None) -> Dict:
+        """
+        Generate an outline from plot points and scenes
+
+        Args:
+            project_id: Project ID
+            story_bible_service: StoryBibleService to read scenes and plot points from
+            scene_ids: Scenes changed since the outline was generated. When
+                given, only the acts those scenes were or are now in are
+                rebuilt and other acts keep any edits made to them.
+
+        Returns:
+            Dict: The outline
+        """
         plot_points = story_bible_service.list_plot_points(project_id)
         scenes = story_bible_service.list_scenes(project_id)
-        
-        # Group by act
-        acts = {}
-        for pp in plot_points:
-            act = pp.get('act', 1)
-            if act not in acts:
-                acts[act] = {
-                    'id': f'act_{act}',
-                    'title': f'Act {act}',
-                    'type': 'act',
-                    'children': []
-                }
-            
-            acts[act]['children'].append({
-                'id': pp['id'],
-                'title': pp['title'],
-                'type': 'plot_point',
-                'description': pp.get('description', ''),
-                'status': pp.get('status', 'planned'),
-                'children': []
-            })
-        
-        # Add scenes to plot points
-        for scene in scenes:
-            scene_plot_points = scene.get('plot_points', [])
-            for pp_id in scene_plot_points:
-                # Find the plot point in the structure
-                for act_data in acts.values():
-                    for pp in act_data['children']:
-                        if pp['id'] == pp_id:
-                            pp['children'].append({
-                                'id': scene['id'],
-                                'title': scene['title'],
-                                'type': 'scene',
-                                'word_count': scene.get('word_count', 0),
-                                'status': scene.get('status', 'draft')
-                            })
-        
-        structure = list(acts.values())
+        plot_index = {pp['id']: pp for pp in plot_points}
+
+        if scene_ids is not None and self._get_collection(project_id, 'planning_views'):
+            changed = set(scene_ids)
+
+            def refresh(outline):
+                affected = _scene_acts(scenes, plot_index, changed)
+                for act in outline.get('structure', []):
+                    if any(scene.get('id') in changed
+                           for pp in act.get('children', []) for scene in pp.get('children', [])):
+                        affected.add(act.get('id'))
+                rebuilt = _outline_acts(scenes, plot_points, plot_index, affected)
+                structure = [rebuilt.pop(act.get('id'), act) for act in outline.get('structure', [])]
+                return dict(outline, structure=structure + list(rebuilt.values()))
+
+            return self._rewrite_view(project_id, 'outline', refresh)
+
         outline_data = {
             'view_type': 'outline',
-            'structure': structure
+            'structure': list(_outline_acts(scenes, plot_points, plot_index).values())
         }
         
         self.save_outline(project_id, outline_data)
@@ -153,3 +153,10 @@ def mock_env_vars(monkeypatch):
     monkeypatch.setenv('FLASK_ENV', 'testing')
     monkeypatch.setenv('GOOGLE_API_KEY', 'test_api_key')
     monkeypatch.setenv('MOCK_AUTH', 'true')
+
+
+@pytest.fixture(autouse=True)
+def fresh_rate_limits(monkeypatch):
+    """Give every test its own rate limiter so limits do not carry across tests"""
+    from utils import rate_limiter
+    monkeypatch.setattr(rate_limiter, 'limiter', rate_limiter.RateLimiter())
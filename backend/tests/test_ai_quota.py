@@ -0,0 +1,203 @@
+"""
+Tests for per-user, token-weighted AI quotas
+"""
+import json
+import pytest
+from unittest.mock import patch
+from schemas.editor_schemas import (
+    GenerateSceneRequest, GenerateDialogueRequest, RewriteTextRequest,
+    ContinueWritingRequest, SummarizeTextRequest
+)
+from utils import ai_quota as ai_quota_module
+from utils.ai_quota import (
+    AIQuota, get_ai_quota, scene_cost, dialogue_cost, rewrite_cost, summarize_cost, continue_cost
+)
+from utils.rate_limiter import RateLimiter
+
+
+@pytest.fixture
+def clock():
+    return [1000.0]
+
+
+@pytest.fixture
+def quota(clock):
+    """A 6000-token-per-minute quota, waiting up to 3s, on a fake clock"""
+    def sleep(seconds):
+        clock[0] += seconds
+
+    return AIQuota(budget=6000, window=60, max_wait=3,
+                   limiter=RateLimiter(clock=lambda: clock[0]), sleep=sleep)
+
+
+class TestCostEstimates:
+    """Test request cost estimation"""
+
+    def test_long_scene_costs_more_than_summary(self):
+        """Test a long, context-heavy scene outweighs summarising a paragraph"""
+        scene = GenerateSceneRequest(project_id='proj1', prompt='The duel at dawn',
+                                     length='long', characters=['c1', 'c2'])
+        short_scene = GenerateSceneRequest(project_id='proj1', prompt='The duel at dawn',
+                                           length='short')
+        summary = SummarizeTextRequest(text='A paragraph of prose. ' * 20)
+
+        assert scene_cost(scene) > scene_cost(short_scene) > summarize_cost(summary)
+        assert scene_cost(scene) > 10 * summarize_cost(summary)
+
+    def test_costs_grow_with_input(self):
+        """Test dialogue, rewrite and continuation costs scale with characters, text and context"""
+        duo = GenerateDialogueRequest(project_id='proj1', characters=['Ann'], situation='An argument')
+        trio = GenerateDialogueRequest(project_id='proj1', characters=['Ann', 'Bo', 'Cy'],
+                                       situation='An argument')
+        assert dialogue_cost(trio) > dialogue_cost(duo)
+
+        text = 'A paragraph of prose. ' * 20
+        assert (rewrite_cost(RewriteTextRequest(text=text, instruction='Tighten', project_id='proj1'))
+                > rewrite_cost(RewriteTextRequest(text=text, instruction='Tighten'))
+                > rewrite_cost(RewriteTextRequest(text='Short.', instruction='Tighten')))
+        assert (continue_cost(ContinueWritingRequest(text=text, direction='A storm', project_id='proj1'))
+                > continue_cost(ContinueWritingRequest(text=text, project_id='proj1')))
+
+
+class TestAIQuota:
+    """Test suite for AIQuota"""
+
+    def test_charges_by_cost(self, quota):
+        """Test the budget is consumed by tokens, not by request count"""
+        assert quota.acquire('user1', 3000)['allowed']
+        assert quota.acquire('user1', 3000)['allowed']
+
+        assert quota.user_spend('user1')['tokens'] == 6000
+        assert quota.acquire('user2', 6000)['allowed']
+
+    def test_short_waits_are_queued(self, quota, clock):
+        """Test a request that fits within max_wait sleeps until it does"""
+        quota.acquire('user1', 6000)
+
+        result = quota.acquire('user1', 200)  # 200 tokens refill in 2s
+
+        assert result['allowed']
+        assert result['waited'] == pytest.approx(2)
+        assert clock[0] == pytest.approx(1002)
+        assert quota.stats()['queued'] == 1
+
+    def test_long_waits_are_refused_at_once(self, quota, clock):
+        """Test a request that would wait past max_wait is refused without sleeping"""
+        quota.acquire('user1', 6000)
+
+        result = quota.acquire('user1', 500)  # 500 tokens refill in 5s
+
+        assert not result['allowed']
+        assert result['waited'] == 0
+        assert result['retry_after'] == pytest.approx(5)
+        assert clock[0] == 1000.0
+        assert quota.stats()['rejected'] == 1
+
+        clock[0] += 5
+        assert quota.acquire('user1', 500)['allowed']
+        spend = quota.user_spend('user1')
+        assert (spend['requests'], spend['tokens'], spend['rejected']) == (2, 6500, 1)
+
+    def test_stats_rank_heaviest_users(self, quota):
+        """Test spend metrics list users by tokens charged"""
+        quota.acquire('light', 100)
+        quota.acquire('heavy', 4000)
+
+        stats = quota.stats()
+        assert (stats['users'], stats['requests'], stats['tokens']) == (2, 2, 4100)
+        assert [user['uid'] for user in stats['top_users']] == ['heavy', 'light']
+
+    def test_clear_forgets_spend(self, quota):
+        """Test clear drops recorded spend"""
+        quota.acquire('user1', 100)
+        quota.clear()
+
+        assert quota.user_spend('user1') == {}
+        assert quota.stats()['users'] == 0
+
+    def test_default_quota_is_shared(self, monkeypatch):
+        """Test get_ai_quota builds one process-wide quota"""
+        monkeypatch.setattr(ai_quota_module, '_default_quota', None)
+
+        assert get_ai_quota() is get_ai_quota()
+
+
+class TestAIQuotaRoutes:
+    """Test the ai_quota decorator on AI routes"""
+
+    @patch('routes.editor.ai_editor_service')
+    def test_route_refused_when_over_budget(self, mock_service, client, quota):
+        """Test an over-budget user gets 429 and the model is not called"""
+        mock_service.summarize_text.return_value = {'success': True, 'content': 'Short.'}
+        body = json.dumps({'text': 'A chapter of prose. ' * 400})  # ~2500 tokens, 25s to refill
+
+        with patch('utils.ai_quota.get_ai_quota', return_value=quota):
+            quota.acquire('mock-user-id', 6000)
+            refused = client.post('/api/editor/summarize', data=body,
+                                  content_type='application/json')
+            other_user_spend = quota.user_spend('someone-else')
+
+        assert refused.status_code == 429
+        assert json.loads(refused.data)['retry_after'] > 0
+        assert refused.headers['Retry-After'] == str(json.loads(refused.data)['retry_after'])
+        mock_service.summarize_text.assert_not_called()
+        assert other_user_spend == {}
+
+    @patch('routes.editor.ai_editor_service')
+    def test_route_waits_briefly_near_budget(self, mock_service, client, quota, clock):
+        """Test a request that fits within max_wait is served after its wait, not refused"""
+        mock_service.summarize_text.return_value = {'success': True, 'content': 'Short.'}
+        body = json.dumps({'text': 'A paragraph of prose. ' * 5})  # ~180 tokens, <2s to refill
+
+        with patch('utils.ai_quota.get_ai_quota', return_value=quota):
+            quota.acquire('mock-user-id', 6000)
+            response = client.post('/api/editor/summarize', data=body,
+                                   content_type='application/json')
+
+        assert response.status_code == 200
+        assert 0 < clock[0] - 1000 <= 3
+        mock_service.summarize_text.assert_called_once()
+
+    @patch('routes.editor.ai_editor_service')
+    def test_route_fails_open_when_quota_unavailable(self, mock_service, client):
+        """Test a quota backend error lets the request through"""
+        mock_service.summarize_text.return_value = {'success': True, 'content': 'Short.'}
+        broken = AIQuota(budget=6000, window=60)
+
+        with patch('utils.ai_quota.get_ai_quota', return_value=broken), \
+                patch.object(broken, 'acquire', side_effect=ConnectionError('limiter down')):
+            response = client.post('/api/editor/summarize',
+                                   data=json.dumps({'text': 'A paragraph of prose. ' * 5}),
+                                   content_type='application/json')
+
+        assert response.status_code == 200
+        mock_service.summarize_text.assert_called_once()
+
+    @patch('routes.editor.ai_editor_service')
+    def test_spend_reported_in_metrics(self, mock_service, client, quota):
+        """Test charged tokens show up under /api/diagnostics/metrics"""
+        mock_service.summarize_text.return_value = {'success': True, 'content': 'Short.'}
+
+        with patch('utils.ai_quota.get_ai_quota', return_value=quota):
+            response = client.post('/api/editor/summarize',
+                                   data=json.dumps({'text': 'A paragraph of prose. ' * 20}),
+                                   content_type='application/json')
+            assert response.status_code == 200
+            metrics = json.loads(client.get('/api/diagnostics/metrics').data)
+
+        assert metrics['ai_quota']['top_users'][0]['uid'] == 'mock-user-id'
+        assert metrics['ai_quota']['tokens'] > 0
+
+    @patch('routes.editor.ai_editor_service')
+    def test_per_ip_backstop(self, mock_service, client, quota):
+        """Test AI routes keep the per-IP request limit alongside the token quota"""
+        mock_service.summarize_text.return_value = {'success': True, 'content': 'Short.'}
+        body = json.dumps({'text': 'A paragraph of prose. ' * 20})
+
+        with patch('utils.ai_quota.get_ai_quota',
+                   return_value=AIQuota(budget=10 ** 6, window=60)):
+            statuses = [client.post('/api/editor/summarize', data=body,
+                                    content_type='application/json').status_code
+                        for _ in range(21)]
+
+        assert statuses == [200] * 20 + [429]
@@ -0,0 +1,126 @@
+"""
+Tests for authentication and project access utilities
+"""
+import json
+import pytest
+from unittest.mock import MagicMock, patch
+from utils import auth
+from utils.auth import check_project_access, invalidate_project_access
+
+
+@pytest.fixture
+def real_auth(monkeypatch):
+    """Disable mock auth and start with an empty access cache"""
+    monkeypatch.setenv('MOCK_AUTH', 'false')
+    auth._project_access_cache.clear()
+    yield
+    auth._project_access_cache.clear()
+
+
+def project_db(data):
+    """Mock Firestore whose projects/<id> document holds data (None if missing)"""
+    db = MagicMock()
+    snapshot = db.collection.return_value.document.return_value.get.return_value
+    snapshot.exists = data is not None
+    snapshot.to_dict.return_value = data
+    return db
+
+
+def project_reads(db):
+    return db.collection.return_value.document.return_value.get.call_count
+
+
+class TestProjectAccessCache:
+    """Test cached project authorization"""
+
+    def test_repeat_checks_reuse_decision(self, real_auth):
+        """Test a granted decision skips the Firestore read until it expires"""
+        db = project_db({'owner_id': 'user1', 'collaborators': ['user2']})
+
+        assert check_project_access('user1', 'proj1', db)
+        assert check_project_access('user1', 'proj1', db)
+        assert check_project_access('user2', 'proj1', db)
+
+        assert project_reads(db) == 2
+
+    def test_denials_expire_sooner(self, real_auth, monkeypatch):
+        """Test negative decisions are cached for the shorter denied TTL"""
+        now = [1000.0]
+        monkeypatch.setattr(auth._project_access_cache, 'clock', lambda: now[0])
+        db = project_db(None)
+
+        assert not check_project_access('user1', 'proj1', db)
+        assert not check_project_access('user1', 'proj1', db)
+        assert project_reads(db) == 1
+
+        now[0] += auth.PROJECT_ACCESS_DENIED_TTL + 1
+        assert not check_project_access('user1', 'proj1', db)
+        assert project_reads(db) == 2
+
+    def test_invalidation_after_membership_change(self, real_auth):
+        """Test invalidating a project forces the next check to re-read it"""
+        db = project_db({'owner_id': 'user1', 'collaborators': []})
+        assert not check_project_access('user2', 'proj1', db)
+
+        db.collection.return_value.document.return_value.get.return_value.to_dict.return_value = {
+            'owner_id': 'user1', 'collaborators': ['user2']
+        }
+        assert not check_project_access('user2', 'proj1', db)
+
+        invalidate_project_access('proj1')
+        assert check_project_access('user2', 'proj1', db)
+
+    def test_read_errors_are_not_cached(self, real_auth):
+        """Test a failed read denies this request only"""
+        db = project_db({'owner_id': 'user1'})
+        get = db.collection.return_value.document.return_value.get
+        snapshot = get.return_value
+        get.side_effect = [RuntimeError('unavailable'), snapshot]
+
+        assert not check_project_access('user1', 'proj1', db)
+        assert check_project_access('user1', 'proj1', db)
+
+
+class TestRequireProjectAccess:
+    """Test the require_project_access decorator"""
+
+    def test_handler_reuses_authorized_project(self, real_auth, client, flask_app, monkeypatch):
+        """Test the project document read for authorization is reused by get_project"""
+        db = project_db({'id': 'proj1', 'title': 'Novel', 'owner_id': 'user1'})
+        monkeypatch.setitem(flask_app.extensions, 'firestore', db)
+
+        with patch('utils.auth.verify_token', return_value={'uid': 'user1'}), \
+                patch('routes.story_bible.story_bible_service') as mock_service:
+            response = client.get('/api/story-bible/projects/proj1',
+                                  headers={'Authorization': 'Bearer token'})
+
+        assert response.status_code == 200
+        assert json.loads(response.data)['title'] == 'Novel'
+        mock_service.get_project.assert_not_called()
+        assert project_reads(db) == 1
+
+    def test_stats_target_after_cached_authorization(self, real_auth, client, flask_app, monkeypatch):
+        """Test the stats target is read from the project when access was served from the cache"""
+        project = {'id': 'proj1', 'owner_id': 'user1', 'target_word_count': 80000}
+        monkeypatch.setitem(flask_app.extensions, 'firestore', project_db(project))
+
+        with patch('utils.auth.verify_token', return_value={'uid': 'user1'}), \
+                patch('routes.story_bible.story_bible_service') as mock_service:
+            mock_service.get_stats.side_effect = lambda *args: {'words': 5}
+            mock_service.get_project.return_value = project
+            targets = [client.get('/api/story-bible/projects/proj1/stats',
+                                  headers={'Authorization': 'Bearer token'}).get_json()['target_word_count']
+                       for _ in range(2)]
+
+        assert targets == [80000, 80000]
+        mock_service.get_project.assert_called_once_with('proj1')
+
+    def test_denied_request(self, real_auth, client, flask_app, monkeypatch):
+        """Test a non-member is refused"""
+        monkeypatch.setitem(flask_app.extensions, 'firestore', project_db({'owner_id': 'user1'}))
+
+        with patch('utils.auth.verify_token', return_value={'uid': 'intruder'}):
+            response = client.get('/api/story-bible/projects/proj1',
+                                  headers={'Authorization': 'Bearer token'})
+
+        assert response.status_code == 403
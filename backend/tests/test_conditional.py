@@ -0,0 +1,98 @@
+"""
+Tests for project version counters and conditional GETs
+"""
+import json
+import pytest
+from unittest.mock import MagicMock, patch
+from services.project_versions import ProjectVersionService
+from utils.conditional import conditional_get_stats
+
+
+def versions_db(counters):
+    """Mock Firestore whose project_versions/<id> document holds counters (None if missing)"""
+    db = MagicMock()
+    snapshot = db.collection.return_value.document.return_value.get.return_value
+    snapshot.exists = counters is not None
+    snapshot.to_dict.return_value = counters
+    snapshot.create_time = '2025-01-01T00:00:00Z'
+    return db
+
+
+class TestProjectVersionService:
+    """Test suite for ProjectVersionService"""
+
+    def test_bump_increments_counters(self):
+        """Test a bump merges Firestore increments into the version document"""
+        db = MagicMock()
+
+        ProjectVersionService(db).bump('proj1', 'scenes', 'matrix')
+
+        db.collection.assert_called_with('project_versions')
+        data, kwargs = db.collection.return_value.document.return_value.set.call_args
+        assert set(data[0]) == {'scenes', 'matrix'}
+        assert kwargs == {'merge': True}
+
+    def test_etag_depends_only_on_listed_resources(self):
+        """Test an ETag changes with its own resources' counters only"""
+        counters = {'characters': 3, 'scenes': 7}
+        db = versions_db(counters)
+        versions = ProjectVersionService(db)
+        etag = versions.etag('proj1', ['characters'])
+
+        counters['scenes'] = 8
+        assert versions.etag('proj1', ['characters']) == etag
+
+        counters['characters'] = 4
+        assert versions.etag('proj1', ['characters']) != etag
+        assert versions.etag('proj1', ['characters'], variant='/other') != \
+            versions.etag('proj1', ['characters'])
+
+    def test_no_etag_without_version_document(self):
+        """Test projects never written since versions existed have no version ETag"""
+        assert ProjectVersionService(versions_db(None)).etag('proj1', ['characters']) is None
+
+
+class TestConditionalRoutes:
+    """Test conditional GETs on project views"""
+
+    @patch('routes.story_bible.story_bible_service')
+    def test_unchanged_list_returns_304_without_reading(self, mock_service, client,
+                                                        flask_app, monkeypatch):
+        """Test a matching If-None-Match is answered before the handler runs"""
+        counters = {'characters': 1}
+        monkeypatch.setitem(flask_app.extensions, 'firestore', versions_db(counters))
+        mock_service.list_characters.return_value = [{'id': 'char1', 'name': 'Hero'}]
+        url = '/api/story-bible/projects/proj1/characters'
+        before = conditional_get_stats()
+
+        first = client.get(url)
+        etag = first.headers['ETag']
+        second = client.get(url, headers={'If-None-Match': etag})
+
+        assert first.status_code == 200
+        assert second.status_code == 304
+        assert second.headers['ETag'] == etag
+        assert mock_service.list_characters.call_count == 1
+
+        counters['characters'] = 2
+        third = client.get(url, headers={'If-None-Match': etag})
+        assert third.status_code == 200
+        assert json.loads(third.data) == [{'id': 'char1', 'name': 'Hero'}]
+
+        after = conditional_get_stats()
+        assert after['not_modified_from_version'] - before['not_modified_from_version'] == 1
+        assert after['bytes_saved'] - before['bytes_saved'] == len(first.data)
+
+    @patch('routes.visual_planning.planning_service')
+    def test_content_etag_fallback(self, mock_service, client, flask_app, monkeypatch):
+        """Test views of unversioned projects still revalidate via a body hash"""
+        monkeypatch.setitem(flask_app.extensions, 'firestore', versions_db(None))
+        mock_service.get_corkboard.return_value = {'view_type': 'corkboard', 'items': []}
+
+        first = client.get('/api/planning/corkboard/proj1')
+        second = client.get('/api/planning/corkboard/proj1',
+                            headers={'If-None-Match': first.headers['ETag']})
+
+        assert first.status_code == 200
+        assert second.status_code == 304
+        assert mock_service.get_corkboard.call_count == 2
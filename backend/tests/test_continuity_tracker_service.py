@@ -2,7 +2,7 @@
 Tests for ContinuityTrackerService
 """
 import pytest
-from unittest.mock import MagicMock
+from unittest.mock import MagicMock, patch
 from services.continuity_tracker_service import ContinuityTrackerService
 
 
@@ -247,3 +247,128 @@ class TestContinuityTrackerService:
 
         # Test service initialization
         assert service.db is not None
+
+    def test_reconcile_issues_writes_only_changes(self, mock_firestore):
+        """Test re-checks keep resolved issues and only write differences"""
+        service = ContinuityTrackerService(mock_firestore)
+
+        kept = {
+            'type': 'timeline_inconsistency',
+            'description': 'Issue: dawn follows dusk',
+            'severity': 'medium',
+            'status': 'open'
+        }
+        resolved = {
+            'type': 'character_inconsistency',
+            'character_id': 'char1',
+            'description': 'Issue: eye colour changes',
+            'severity': 'medium',
+            'status': 'open'
+        }
+        kept_id = service._issue_id(kept)
+        resolved_id = service._issue_id(resolved)
+
+        def stored_doc(doc_id, data):
+            doc = MagicMock()
+            doc.id = doc_id
+            doc.to_dict.return_value = data
+            return doc
+
+        collection = mock_firestore.collection().document().collection()
+        collection.stream.return_value = [
+            stored_doc(kept_id, {**kept, 'id': kept_id}),
+            stored_doc(resolved_id, {**resolved, 'id': resolved_id, 'status': 'resolved'}),
+            stored_doc('issue_stale', {'id': 'issue_stale', 'type': 'timeline_inconsistency'})
+        ]
+        batch = mock_firestore.batch.return_value
+
+        new_issue = {
+            'type': 'location_inconsistency',
+            'location_id': 'loc1',
+            'description': 'Issue: tower count differs',
+            'severity': 'low',
+            'status': 'open'
+        }
+        writes = service._reconcile_issues(
+            'test_project', [dict(kept), dict(resolved), new_issue]
+        )
+
+        assert writes == {'created': 1, 'updated': 0, 'deleted': 1, 'unchanged': 2}
+        assert batch.set.call_count == 1
+        assert batch.delete.call_count == 1
+        batch.commit.assert_called_once()
+
+    def test_issue_ids_are_stable(self, mock_firestore):
+        """Test issue IDs depend on type and subject, not on the model's wording"""
+        service = ContinuityTrackerService(mock_firestore)
+
+        issue = {'type': 'character_inconsistency', 'character_id': 'char1',
+                 'description': 'Issue: eyes change colour'}
+        reworded = {'type': 'character_inconsistency', 'character_id': 'char1',
+                    'description': 'Issue: her eye colour is inconsistent'}
+        other = {'type': 'character_inconsistency', 'character_id': 'char2',
+                 'description': 'Issue: eyes change colour'}
+
+        assert service._issue_id(issue) == service._issue_id(reworded)
+        assert service._issue_id(issue) != service._issue_id(other)
+        assert service._issue_id(issue).startswith('issue_')
+
+    def test_status_survives_issue_id_change(self, mock_firestore):
+        """Test an issue stored under an old ID keeps its resolved status under the new one"""
+        service = ContinuityTrackerService(mock_firestore)
+        issue = {'type': 'character_inconsistency', 'character_id': 'char1',
+                 'description': 'Issue: reworded', 'severity': 'medium', 'status': 'open'}
+        old = MagicMock()
+        old.id = 'issue_from_description_hash'
+        old.to_dict.return_value = {**issue, 'description': 'Issue: original', 'status': 'resolved'}
+        mock_firestore.collection().document().collection().stream.return_value = [old]
+
+        writes = service._reconcile_issues('test_project', [issue])
+
+        assert writes == {'created': 1, 'updated': 0, 'deleted': 1, 'unchanged': 0}
+        assert mock_firestore.batch.return_value.set.call_args.args[1]['status'] == 'resolved'
+
+    def test_new_finding_reopens_resolved_issue(self, mock_firestore):
+        """Test a resolved issue stays resolved when reworded but reopens when other scenes are cited"""
+        service = ContinuityTrackerService(mock_firestore)
+        scenes = [{'id': 's1', 'title': 'Dock'}, {'id': 's2', 'title': 'Storm'},
+                  {'id': 's3', 'title': 'Harbour'}]
+        first = service._cited_scenes('- Issue: eyes\n- Location: Scene "Storm"', scenes)
+        reworded = service._cited_scenes("- Issue: eye colour\n- Location: Scene 'Storm'", scenes)
+        later = service._cited_scenes('- Issue: limp\n- Location: Scene "Harbour"', scenes)
+        assert first == reworded == ['s2']
+        assert service._cited_scenes('- Issue: x\n- Scenes: 3, 1', scenes, numbered=True) == ['s1', 's3']
+
+        issue = {'type': 'character_inconsistency', 'character_id': 'char1',
+                 'severity': 'medium', 'status': 'open'}
+        issue_id = service._issue_id(issue)
+        stored = MagicMock()
+        stored.id = issue_id
+        stored.to_dict.return_value = {**issue, 'id': issue_id, 'description': 'Issue: eyes',
+                                       'scene_ids': first, 'status': 'resolved'}
+        mock_firestore.collection().document().collection().stream.return_value = [stored]
+        batch = mock_firestore.batch.return_value
+
+        service._reconcile_issues('test_project', [dict(issue, description='Issue: eye colour',
+                                                        scene_ids=reworded)])
+        assert batch.set.call_args.args[1]['status'] == 'resolved'
+
+        service._reconcile_issues('test_project', [dict(issue, description='Issue: limp',
+                                                        scene_ids=later)])
+        assert batch.set.call_args.args[1]['status'] == 'open'
+
+    def test_full_check_counts_reconciled_issues(self, mock_firestore):
+        """Test totals count each issue once, however often it was reported"""
+        service = ContinuityTrackerService(mock_firestore)
+        duplicate = {'type': 'timeline_inconsistency', 'description': 'Issue: x',
+                     'severity': 'medium', 'status': 'open'}
+
+        with patch.object(service, 'check_character_continuity', return_value=[]), \
+             patch.object(service, 'check_timeline_continuity',
+                          return_value=[dict(duplicate), dict(duplicate, description='Issue: y')]), \
+             patch.object(service, 'check_location_continuity', return_value=[]):
+            result = service.perform_full_check('test_project', MagicMock())
+
+        assert result['total_issues'] == 1
+        assert result['by_type']['timeline'] == 1
+        assert len(result['issues']) == 1
@@ -0,0 +1,144 @@
+"""
+Tests for EmbeddingIndex
+"""
+import pytest
+from unittest.mock import MagicMock
+from services.embedding_index import EmbeddingIndex, HashingEmbedder, chunk_text
+from services.story_bible_service import StoryBibleService
+
+
+@pytest.fixture
+def index(tmp_path):
+    """Embedding index backed by a temporary SQLite file"""
+    return EmbeddingIndex(HashingEmbedder(), db_path=str(tmp_path / 'embeddings.db'))
+
+
+class TestEmbeddingIndex:
+    """Test suite for EmbeddingIndex"""
+
+    def test_hashing_embedder_is_deterministic(self):
+        """Test the offline embedder gives identical vectors for identical text"""
+        embedder = HashingEmbedder(dimensions=64)
+        first = embedder.embed(['The dragon sleeps under the mountain'])
+        second = embedder.embed(['The dragon sleeps under the mountain'])
+
+        assert first.shape == (1, 64)
+        assert (first == second).all()
+
+    def test_chunk_text(self):
+        """Test long text is split into passages"""
+        chunks = chunk_text(' '.join(['word'] * 450), chunk_words=200)
+
+        assert len(chunks) == 3
+        assert len(chunks[-1].split()) == 50
+
+    def test_search_ranks_relevant_passages_first(self, index):
+        """Test top-k search returns the most similar passage first"""
+        index.upsert('proj', 'lore', 'lore1', 'Dragons breathe fire and hoard gold in mountain caves')
+        index.upsert('proj', 'lore', 'lore2', 'The harbour city trades silk and spices by sea')
+        index.upsert('proj', 'scene', 'scene1', 'The knight rode toward the dragon in its mountain cave')
+
+        hits = index.search('proj', 'dragon hoard in the mountain', k=2)
+
+        assert len(hits) == 2
+        assert hits[0]['item_id'] in ('lore1', 'scene1')
+        assert hits[0]['score'] >= hits[1]['score']
+
+        lore_hits = index.search('proj', 'dragon hoard in the mountain', k=5, kinds=['lore'])
+        assert [hit['item_id'] for hit in lore_hits] == ['lore1', 'lore2']
+
+    def test_unchanged_text_is_not_reembedded(self, index):
+        """Test incremental updates skip items whose text did not change"""
+        index.embedder = MagicMock(wraps=index.embedder)
+        index.embedder.name = 'hashing-256'
+
+        assert index.upsert('proj', 'scene', 'scene1', 'A quiet morning') is True
+        assert index.upsert('proj', 'scene', 'scene1', 'A quiet morning') is False
+        assert index.upsert('proj', 'scene', 'scene1', 'A stormy night') is True
+        assert index.embedder.embed.call_count == 2
+
+    def test_updates_and_removals_are_visible_to_search(self, index):
+        """Test edits replace old passages in the loaded matrix"""
+        index.upsert('proj', 'scene', 'scene1', 'The castle had three towers')
+        assert index.search('proj', 'castle towers', k=5)
+
+        index.upsert('proj', 'scene', 'scene1', 'A ship sailed across the bay')
+        hits = index.search('proj', 'ship bay', k=5)
+        assert len(hits) == 1
+        assert 'ship' in hits[0]['text']
+
+        index.remove('proj', 'scene', 'scene1')
+        assert index.search('proj', 'ship bay', k=5) == []
+
+    def test_index_persists_to_sqlite(self, index, tmp_path):
+        """Test a fresh index instance reloads stored vectors"""
+        index.upsert('proj', 'character', 'char1', 'Mira, a cartographer with a scarred hand')
+
+        reloaded = EmbeddingIndex(HashingEmbedder(), db_path=str(tmp_path / 'embeddings.db'))
+        hits = reloaded.search('proj', 'cartographer', k=1)
+
+        assert hits[0]['item_id'] == 'char1'
+
+    def test_other_processes_writes_are_seen(self, index, tmp_path):
+        """Test a loaded matrix is reloaded after another instance writes to the same file"""
+        other = EmbeddingIndex(HashingEmbedder(), db_path=str(tmp_path / 'embeddings.db'))
+        index.upsert('proj', 'scene', 'scene1', 'The castle had three towers')
+        assert other.search('proj', 'castle towers', k=5)
+
+        index.upsert('proj', 'scene', 'scene1', 'A ship sailed across the bay')
+        assert 'ship' in other.search('proj', 'ship bay', k=5)[0]['text']
+
+        other.upsert('proj', 'lore', 'lore1', 'Ships are built in the bay yards')
+        index.remove('proj', 'scene', 'scene1')
+        assert [hit['item_id'] for hit in other.search('proj', 'ship bay', k=5)] == ['lore1']
+        assert [hit['item_id'] for hit in index.search('proj', 'ship bay', k=5)] == ['lore1']
+
+    def test_loaded_projects_are_bounded(self, tmp_path):
+        """Test the least recently searched project is dropped from memory"""
+        index = EmbeddingIndex(HashingEmbedder(), db_path=str(tmp_path / 'embeddings.db'),
+                               cache_projects=2)
+        for project in ('p1', 'p2', 'p3'):
+            index.upsert(project, 'lore', 'lore1', 'Dragons hoard gold')
+            index.search(project, 'dragon gold', k=1)
+        index.search('p2', 'dragon gold', k=1)
+        index.search('p1', 'dragon gold', k=1)
+
+        assert list(index._projects) == ['p2', 'p1']
+
+    def test_reindex_embeddings(self, mock_firestore, index):
+        """Test existing entities are embedded once, and unchanged ones are skipped on re-runs"""
+        service = StoryBibleService(mock_firestore, index)
+        service.list_characters = MagicMock(return_value=[{'id': 'mira', 'name': 'Mira'}])
+        service.list_locations = MagicMock(return_value=[{'id': 'bay', 'name': 'The Bay'}])
+        service.list_lore = MagicMock(return_value=[{'id': 'lore1', 'title': 'Tides', 'content': 'Moon'}])
+        service.iter_scenes = MagicMock(side_effect=lambda project_id: iter([
+            {'id': 'scene1', 'title': 'Dock', 'content': 'Mira waited at the bay'}
+        ]))
+
+        assert service.reindex_embeddings('proj') == 4
+        assert service.reindex_embeddings('proj') == 0
+        assert index.search('proj', 'Mira waited at the bay', k=1)[0]['item_id'] == 'scene1'
+
+    def test_scene_context_includes_relevant_lore(self, mock_firestore, index):
+        """Test scene context adds semantically related lore from the index"""
+        service = StoryBibleService(mock_firestore, index)
+        service.get_scene = MagicMock(return_value={
+            'id': 'scene1',
+            'title': 'The Forge',
+            'content': 'Sparks flew as the smith folded the star-iron blade',
+            'characters': [],
+            'plot_points': []
+        })
+        service.list_characters = MagicMock(return_value=[])
+        service.list_plot_points = MagicMock(return_value=[])
+        service.list_lore = MagicMock(return_value=[
+            {'id': 'lore1', 'title': 'Star-iron', 'content': 'Star-iron blades are folded by a smith'},
+            {'id': 'lore2', 'title': 'Tides', 'content': 'The moon pulls the northern sea'}
+        ])
+        index.upsert('proj', 'lore', 'lore1', 'Star-iron\nStar-iron blades are folded by a smith')
+        index.upsert('proj', 'lore', 'lore2', 'Tides\nThe moon pulls the northern sea')
+
+        context = service.get_context_for_scene('proj', 'scene1')
+
+        assert [lore['id'] for lore in context['related_lore']] == ['lore1']
+        assert context['relevant_passages'] == []
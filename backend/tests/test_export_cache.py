@@ -0,0 +1,208 @@
+"""
+Tests for ExportCache and cached export routes
+"""
+import io
+import os
+import pytest
+from unittest.mock import MagicMock, patch
+from services.export_cache import ExportCache
+from services.export_service import ExportService
+
+
+@pytest.fixture
+def cache(tmp_path):
+    """Export cache in a temporary directory"""
+    return ExportCache(cache_dir=str(tmp_path / 'cache'), max_bytes=1000)
+
+
+class TestExportCache:
+    """Test suite for ExportCache"""
+
+    def test_key_depends_on_content_and_options(self):
+        """Test keys change with scene versions, order and options"""
+        project = {'id': 'p1', 'title': 'Novel'}
+        scenes = [{'id': 's1', 'updated_at': 't1'}, {'id': 's2', 'updated_at': 't2'}]
+
+        key = ExportCache.make_key(project, scenes, 'pdf', {'font_size': 12})
+
+        assert key == ExportCache.make_key(dict(project), list(scenes), 'pdf', {'font_size': 12})
+        assert key != ExportCache.make_key(project, scenes[::-1], 'pdf', {'font_size': 12})
+        assert key != ExportCache.make_key(
+            project, [scenes[0], {'id': 's2', 'updated_at': 't3'}], 'pdf', {'font_size': 12}
+        )
+        assert key != ExportCache.make_key(project, scenes, 'pdf', {'font_size': 14})
+        assert key != ExportCache.make_key(project, scenes, 'epub', {'font_size': 12})
+
+    def test_put_and_get(self, cache):
+        """Test stored artifacts are returned on a hit"""
+        assert cache.get('p1', 'abc', 'pdf') is None
+
+        path = cache.put('p1', 'abc', 'pdf', io.BytesIO(b'%PDF-data'))
+
+        assert cache.get('p1', 'abc', 'pdf') == path
+        with open(path, 'rb') as f:
+            assert f.read() == b'%PDF-data'
+
+    def test_evicts_least_recently_used(self, cache):
+        """Test the cache stays within max_bytes by evicting old artifacts"""
+        old = cache.put('p1', 'old', 'txt', io.BytesIO(b'x' * 400))
+        used = cache.put('p1', 'used', 'txt', io.BytesIO(b'x' * 400))
+        os.utime(old, (1, 1))
+        os.utime(used, (2, 2))
+        cache.get('p1', 'used', 'txt')
+
+        cache.put('p1', 'new', 'txt', io.BytesIO(b'x' * 400))
+
+        assert cache.get('p1', 'old', 'txt') is None
+        assert cache.get('p1', 'used', 'txt') is not None
+        assert cache.get('p1', 'new', 'txt') is not None
+
+    def test_invalidate_project(self, cache):
+        """Test invalidation removes only the given project's artifacts"""
+        cache.put('p1', 'a', 'md', io.BytesIO(b'one'))
+        cache.put('p2', 'b', 'md', io.BytesIO(b'two'))
+
+        assert cache.invalidate_project('p1') == 1
+        assert cache.get('p1', 'a', 'md') is None
+        assert cache.get('p2', 'b', 'md') is not None
+
+    def test_tee_stores_only_complete_streams(self, cache):
+        """Test a fully consumed stream is stored and an aborted one is discarded"""
+        assert list(cache.tee('p1', 'full', 'md', iter([b'a', b'b']))) == [b'a', b'b']
+        with open(cache.get('p1', 'full', 'md'), 'rb') as f:
+            assert f.read() == b'ab'
+
+        aborted = cache.tee('p1', 'partial', 'md', iter([b'a', b'b']))
+        next(aborted)
+        aborted.close()
+
+        assert cache.get('p1', 'partial', 'md') is None
+        assert not [name for name in os.listdir(cache.cache_dir) if name.endswith('.tmp')]
+
+    def test_export_renders_once_for_unchanged_book(self, cache):
+        """Test repeated exports of an unchanged book hit the cache"""
+        service = ExportService(None, cache)
+        story_bible = MagicMock()
+        story_bible.get_project.return_value = {'id': 'p1', 'title': 'Novel'}
+        story_bible.list_scene_versions.return_value = [{'id': 's1', 'updated_at': 't1'}]
+        service._get_story_bible_service = MagicMock(return_value=story_bible)
+        service.iter_markdown = MagicMock(return_value=iter([b'# Novel\n']))
+
+        first = service.get_export('p1', 'markdown')
+        second = service.get_export('p1', 'markdown')
+
+        assert first == second
+        service.iter_markdown.assert_called_once()
+
+
+class TestCachedExportRoutes:
+    """Test cached export routes"""
+
+    @patch('routes.export_routes.export_service')
+    def test_etag_revalidation(self, mock_service, client, tmp_path):
+        """Test exports carry an ETag and answer If-None-Match with 304"""
+        artifact = tmp_path / 'novel.pdf'
+        artifact.write_bytes(b'%PDF-data')
+        mock_service.get_export.return_value = {'path': str(artifact), 'etag': 'abc123'}
+
+        response = client.get('/api/export/pdf/proj123')
+        assert response.status_code == 200
+        assert response.headers['ETag'] == '"abc123"'
+        assert response.data == b'%PDF-data'
+        response.close()
+
+        response = client.get('/api/export/pdf/proj123',
+                              headers={'If-None-Match': '"abc123"'})
+        assert response.status_code == 304
+        response.close()
+
+    @patch('routes.export_routes.export_service')
+    def test_exports_require_authentication(self, mock_service, client, monkeypatch):
+        """Test no export format can be downloaded without a token"""
+        monkeypatch.setenv('MOCK_AUTH', 'false')
+
+        for path in ('pdf', 'epub', 'markdown', 'text'):
+            response = client.get(f'/api/export/{path}/proj123')
+            assert response.status_code == 401
+        assert client.post('/api/export/pdf/proj123', json={}).status_code == 401
+        assert client.post('/api/export/audio/proj123', json={}).status_code == 401
+        mock_service.get_export.assert_not_called()
+        mock_service.stream_export.assert_not_called()
+
+    def test_audio_export_placeholder(self, client):
+        """Test the audiobook export echoes the voice and points at its download"""
+        response = client.post('/api/export/audio/proj123', json={'voice': 'narrator'})
+
+        assert response.status_code == 200
+        assert response.get_json() == {
+            'success': True,
+            'format': 'audio',
+            'download_url': '/api/export/download/proj123/audio',
+            'voice': 'narrator'
+        }
+
+    @patch('routes.export_routes.export_service')
+    def test_every_format_is_served(self, mock_service, client, tmp_path):
+        """Test EPUB is sent from the cache and text from a stream, with their content types"""
+        artifact = tmp_path / 'novel.epub'
+        artifact.write_bytes(b'PK-epub')
+        mock_service.get_export.return_value = {'path': str(artifact), 'etag': 'e1'}
+        mock_service.stream_export.return_value = {'chunks': iter([b'One', b'Two']), 'etag': 't1'}
+
+        epub = client.post('/api/export/epub/proj123', json={'options': {'toc': True}})
+        assert epub.headers['Content-Type'] == 'application/epub+zip'
+        assert epub.data == b'PK-epub'
+        epub.close()
+        assert mock_service.get_export.call_args.args == ('proj123', 'epub', {'toc': True})
+
+        text = client.get('/api/export/text/proj123')
+        assert text.headers['Content-Type'].startswith('text/plain')
+        assert text.get_data() == b'OneTwo'
+        text.close()
+
+        mock_service.stream_export.return_value = {'chunks': iter([]), 'etag': 't1'}
+        assert client.get('/api/export/text/proj123',
+                          headers={'If-None-Match': '"t1"'}).status_code == 304
+
+    @patch('routes.export_routes.export_service')
+    def test_export_failures_are_500(self, mock_service, client):
+        """Test a failing render is reported as a JSON error"""
+        mock_service.get_export.side_effect = ValueError('Project not found')
+        mock_service.stream_export.side_effect = ValueError('Project not found')
+
+        for path in ('pdf', 'epub', 'markdown', 'text'):
+            response = client.get(f'/api/export/{path}/proj123')
+            assert response.status_code == 500
+            assert response.get_json() == {'error': 'Project not found'}
+
+    def test_formats(self, client):
+        """Test the format list is public"""
+        response = client.get('/api/export/formats')
+        assert 'pdf' in [fmt['id'] for fmt in response.get_json()['formats']]
+
+    def test_markdown_streams_then_serves_from_cache(self, client, cache):
+        """Test a Markdown export streams on a miss and is sent from disk afterwards"""
+        service = ExportService(None, cache)
+        story_bible = MagicMock()
+        story_bible.get_project.return_value = {'id': 'p1', 'title': 'Novel'}
+        story_bible.list_scene_versions.return_value = [{'id': 's1', 'updated_at': 't1'}]
+        story_bible.iter_scenes.side_effect = lambda project_id: iter(
+            [{'id': 's1', 'title': 'Opening', 'content': 'It began.'}]
+        )
+        service._get_story_bible_service = MagicMock(return_value=story_bible)
+
+        with patch('routes.export_routes.export_service', service):
+            streamed = client.get('/api/export/markdown/p1')
+            assert streamed.status_code == 200
+            assert streamed.is_streamed
+            assert 'Content-Length' not in streamed.headers
+            body = streamed.get_data()
+            streamed.close()
+
+            cached = client.get('/api/export/markdown/p1')
+            assert cached.headers['Content-Length'] == str(len(body))
+            assert cached.headers['ETag'] == streamed.headers['ETag']
+            assert cached.get_data() == body
+            cached.close()
+
+        assert b'## Opening\n\nIt began.' in body
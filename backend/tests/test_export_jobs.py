@@ -0,0 +1,185 @@
+"""
+Tests for background export jobs
+"""
+import json
+import subprocess
+import sys
+import time
+import pytest
+from unittest.mock import MagicMock, patch
+import services.export_jobs as export_jobs
+from services.export_jobs import (ExportJobManager, ExportJobStore, JOB_COMPLETED, JOB_FAILED,
+                                  JOB_RUNNING)
+
+
+@pytest.fixture
+def artifact(tmp_path):
+    """A rendered export on disk"""
+    path = tmp_path / 'novel.pdf'
+    path.write_bytes(b'%PDF-' + bytes(range(256)) * 4)
+    return path
+
+
+@pytest.fixture
+def job_manager(tmp_path, artifact):
+    """ExportJobManager with a job store in tmp_path and a fake export service"""
+    export_service = MagicMock()
+
+    def get_export(project_id, export_format, options, progress=None):
+        for done in range(1, 4):
+            progress(done, 3)
+        return {'path': str(artifact), 'etag': 'etag123'}
+
+    export_service.get_export.side_effect = get_export
+    manager = ExportJobManager(export_service, ExportJobStore(str(tmp_path / 'jobs.db')),
+                               max_workers=1)
+    yield manager
+    manager.executor.shutdown(wait=True)
+
+
+def wait_for(manager):
+    """Block until every queued job has run (the fixture pool has one worker)"""
+    manager.executor.submit(lambda: None).result(timeout=10)
+
+
+class TestExportJobManager:
+    """Test suite for ExportJobManager"""
+
+    def test_job_reports_progress_and_completes(self, job_manager):
+        """Test a job runs in the background and publishes each update"""
+        updates = []
+        job = job_manager.submit('user1', 'proj1', 'pdf', {'font_size': 12},
+                                 on_update=updates.append)
+        wait_for(job_manager)
+
+        job = job_manager.get_job(job['id'])
+        assert job['status'] == JOB_COMPLETED
+        assert job['options'] == {'font_size': 12}
+        assert (job['progress'], job['total']) == (3, 3)
+        assert [u['status'] for u in updates] == ['running'] * 4 + ['completed']
+        assert [u['progress'] for u in updates[1:4]] == [1, 2, 3]
+
+    def test_failed_job_records_error(self, job_manager):
+        """Test a failing export marks the job failed"""
+        job_manager.export_service.get_export.side_effect = ValueError("Project not found")
+
+        job = job_manager.submit('user1', 'missing', 'pdf')
+        wait_for(job_manager)
+
+        job = job_manager.get_job(job['id'])
+        assert job['status'] == JOB_FAILED
+        assert job['error'] == 'Project not found'
+
+    def test_prune_removes_old_finished_jobs(self, job_manager):
+        """Test pruning drops finished jobs but keeps queued ones"""
+        store = job_manager.store
+        finished = store.create('user1', 'proj1', 'pdf')
+        store.update(finished['id'], status=JOB_COMPLETED)
+        queued = store.create('user1', 'proj1', 'pdf')
+
+        assert store.prune(max_age=-1) == 1
+        assert store.get(finished['id']) is None
+        assert store.get(queued['id']) is not None
+
+
+    def test_jobs_of_dead_workers_are_failed(self, job_manager):
+        """Test running jobs without a heartbeat or a live owner are marked failed when read"""
+        store = job_manager.store
+        exited = subprocess.Popen([sys.executable, '-c', 'pass'])
+        exited.wait()
+        orphaned = store.create('user1', 'proj1', 'pdf')
+        store.update(orphaned['id'], status=JOB_RUNNING, owner_pid=exited.pid)
+        hung = store.create('user1', 'proj1', 'pdf')
+        store.update(hung['id'], status=JOB_RUNNING)
+        alive = store.create('user1', 'proj1', 'pdf')
+        store.update(alive['id'], status=JOB_RUNNING)
+
+        stale_after = time.time() + export_jobs.EXPORT_JOB_STALE_AFTER + 1
+        with patch.object(export_jobs.time, 'time', return_value=stale_after):
+            assert store.get(hung['id'])['status'] == JOB_FAILED
+        assert store.get(orphaned['id'])['error'] == export_jobs.JOB_INTERRUPTED
+        assert store.get(alive['id'])['status'] == JOB_RUNNING
+
+    def test_owner_pids_of_other_hosts_are_not_probed(self, job_manager):
+        """Test a job owned on another host is judged by its heartbeat alone"""
+        store = job_manager.store
+        exited = subprocess.Popen([sys.executable, '-c', 'pass'])
+        exited.wait()
+        job = store.create('user1', 'proj1', 'pdf')
+        store.update(job['id'], status=JOB_RUNNING, owner_pid=exited.pid, owner_host='worker-2')
+
+        assert store.get(job['id'])['status'] == JOB_RUNNING
+        stale_after = time.time() + export_jobs.EXPORT_JOB_STALE_AFTER + 1
+        with patch.object(export_jobs.time, 'time', return_value=stale_after):
+            assert store.get(job['id'])['status'] == JOB_FAILED
+
+    def test_prune_fails_orphaned_jobs(self, job_manager):
+        """Test pruning sweeps jobs whose owner process exited"""
+        store = job_manager.store
+        exited = subprocess.Popen([sys.executable, '-c', 'pass'])
+        exited.wait()
+        job = store.create('user1', 'proj1', 'pdf')
+        store.update(job['id'], owner_pid=exited.pid)
+
+        store.prune()
+
+        with store.lock:
+            status = store._get_conn().execute(
+                'SELECT status FROM export_jobs WHERE id = ?', (job['id'],)
+            ).fetchone()['status']
+        assert status == JOB_FAILED
+
+class TestExportJobRoutes:
+    """Test export job API routes"""
+
+    def test_submit_poll_and_resume_download(self, client, job_manager):
+        """Test the job lifecycle through the API, including a Range download"""
+        with patch('routes.export_routes.export_jobs', job_manager):
+            response = client.post('/api/export/jobs/proj123',
+                                   data=json.dumps({'format': 'pdf'}),
+                                   content_type='application/json')
+            assert response.status_code == 202
+            job_id = json.loads(response.data)['job_id']
+            wait_for(job_manager)
+
+            response = client.get(f'/api/export/jobs/{job_id}')
+            status = json.loads(response.data)
+            assert status['status'] == 'completed'
+            assert status['download_url'] == f'/api/export/jobs/{job_id}/download'
+
+            response = client.get(status['download_url'], headers={'Range': 'bytes=5-'})
+            assert response.status_code == 206
+            assert response.headers['Content-Type'] == 'application/pdf'
+            assert response.data == bytes(range(256)) * 4
+            response.close()
+
+    def test_unsupported_format(self, client, job_manager):
+        """Test submitting an unknown format is rejected"""
+        with patch('routes.export_routes.export_jobs', job_manager):
+            response = client.post('/api/export/jobs/proj123',
+                                   data=json.dumps({'format': 'mobi'}),
+                                   content_type='application/json')
+
+        assert response.status_code == 400
+
+    def test_jobs_are_private_to_their_owner(self, client, job_manager):
+        """Test another user's job is reported as not found"""
+        job = job_manager.store.create('someone-else', 'proj123', 'pdf')
+
+        with patch('routes.export_routes.export_jobs', job_manager):
+            response = client.get(f"/api/export/jobs/{job['id']}")
+            download = client.get(f"/api/export/jobs/{job['id']}/download")
+
+        assert response.status_code == 404
+        assert download.status_code == 404
+
+    def test_download_before_completion_and_after_eviction(self, client, job_manager, tmp_path):
+        """Test an unfinished job answers 409 and an evicted export 410"""
+        job = job_manager.store.create('mock-user-id', 'proj123', 'pdf')
+
+        with patch('routes.export_routes.export_jobs', job_manager):
+            assert client.get(f"/api/export/jobs/{job['id']}/download").status_code == 409
+
+            job_manager.store.update(job['id'], status=JOB_COMPLETED,
+                                     path=str(tmp_path / 'evicted.pdf'), etag='gone')
+            assert client.get(f"/api/export/jobs/{job['id']}/download").status_code == 410
@@ -0,0 +1,183 @@
+"""
+Tests for ExportService
+"""
+import io
+import zipfile
+import pytest
+from unittest.mock import MagicMock
+from pypdf import PdfReader
+import services.export_service as export_module
+from services.export_cache import ExportCache
+from services.export_service import ExportService, render_pdf_chapter
+from utils.pdf_concat import concatenate_pdfs
+
+
+def make_scenes(count, chapter_size=2):
+    """Scenes grouped into chapters of chapter_size"""
+    return [
+        {
+            'id': f'scene{i}',
+            'title': f'Scene {i}',
+            'content': f'Paragraph one of scene {i}.\n\nParagraph two of scene {i}.',
+            'chapter_id': f'chapter{i // chapter_size}',
+            'sequence': i
+        }
+        for i in range(count)
+    ]
+
+
+@pytest.fixture
+def export_service(tmp_path, monkeypatch):
+    """ExportService reading from a mocked Story Bible service"""
+    monkeypatch.setattr(export_module, 'EXPORT_WORKERS', 1)
+    service = ExportService(None, cache=ExportCache(str(tmp_path / 'cache')))
+    story_bible = MagicMock()
+    story_bible.get_project.return_value = {
+        'title': 'Test Novel',
+        'author': 'Test Author',
+        'genre': 'Fantasy'
+    }
+    scenes = make_scenes(5)
+    story_bible.iter_scenes.side_effect = lambda project_id: iter(scenes)
+    service._get_story_bible_service = MagicMock(return_value=story_bible)
+    return service
+
+
+class TestExportService:
+    """Test suite for ExportService"""
+
+    def test_iter_chapters_groups_consecutive_scenes(self):
+        """Test scenes are grouped by chapter_id; unassigned scenes stand alone"""
+        scenes = [
+            {'id': 'a', 'chapter_id': 'c1'},
+            {'id': 'b', 'chapter_id': 'c1'},
+            {'id': 'c', 'chapter_id': None},
+            {'id': 'd', 'chapter_id': None},
+            {'id': 'e', 'chapter_id': 'c2'}
+        ]
+
+        chapters = list(ExportService._iter_chapters(scenes))
+
+        assert [[s['id'] for s in chapter] for chapter in chapters] == [
+            ['a', 'b'], ['c'], ['d'], ['e']
+        ]
+
+    def test_stream_pdf(self, export_service):
+        """Test the streamed PDF has a title page, then one page per scene in order"""
+        pages = PdfReader(export_service.stream_pdf('proj1')).pages
+
+        assert len(pages) == 6
+        assert 'Test Novel' in pages[0].extract_text()
+        for i in range(5):
+            assert f'Scene {i}' in pages[i + 1].extract_text()
+
+    def test_concatenate_pdfs(self):
+        """Test fragments are joined in order into a PDF that parses strictly"""
+        fragments = [render_pdf_chapter(scenes) for scenes in ([make_scenes(2)[1]], make_scenes(2))]
+        output = io.BytesIO()
+
+        assert concatenate_pdfs(fragments, output) == 3
+
+        texts = [page.extract_text() for page in PdfReader(io.BytesIO(output.getvalue()), strict=True).pages]
+        assert 'Scene 1' in texts[0] and 'Scene 0' in texts[1] and 'Scene 1' in texts[2]
+
+    def test_stream_pdf_project_not_found(self, export_service):
+        """Test streaming a missing project raises"""
+        export_service._get_story_bible_service().get_project.return_value = None
+
+        with pytest.raises(ValueError):
+            export_service.stream_pdf('missing')
+
+
+    def test_unchanged_chapters_are_not_rerendered(self, export_service, monkeypatch):
+        """Test a re-export renders only the chapters whose scenes changed"""
+        rendered = []
+        render, extension = export_module.CHAPTER_RENDERERS['pdf']
+
+        def counting_render(scenes):
+            rendered.append([scene['title'] for scene in scenes])
+            return render(scenes)
+
+        monkeypatch.setitem(export_module.CHAPTER_RENDERERS, 'pdf', (counting_render, extension))
+
+        export_service.stream_pdf('proj1')
+        assert len(rendered) == 3
+
+        scenes = make_scenes(5)
+        scenes[2]['content'] = 'A rewritten scene.'
+        export_service._get_story_bible_service().iter_scenes.side_effect = (
+            lambda project_id: iter(scenes)
+        )
+        rendered.clear()
+
+        pages = PdfReader(export_service.stream_pdf('proj1')).pages
+
+        assert rendered == [['Scene 2', 'Scene 3']]
+        assert len(pages) == 6
+        assert 'A rewritten scene.' in pages[3].extract_text()
+
+    def test_stream_pdf_in_worker_processes(self, export_service, monkeypatch):
+        """Test chapters rendered by the process pool assemble in manuscript order"""
+        monkeypatch.setattr(export_module, 'EXPORT_WORKERS', 2)
+        export_module._reset_render_pool()
+        try:
+            pages = PdfReader(export_service.stream_pdf('proj1')).pages
+        finally:
+            export_module._reset_render_pool()
+
+        assert len(pages) == 6
+        for i in range(5):
+            assert f'Scene {i}' in pages[i + 1].extract_text()
+
+    def test_export_to_epub(self, export_service):
+        """Test the EPUB contains one XHTML chapter per scene"""
+        buffer = export_service.export_to_epub('proj1')
+
+        with zipfile.ZipFile(buffer) as archive:
+            names = archive.namelist()
+            chapter = archive.read('EPUB/chap_4.xhtml').decode('utf-8')
+
+        assert sum(name.startswith('EPUB/chap_') for name in names) == 5
+        assert 'Paragraph two of scene 3.' in chapter
+
+
+    def test_iter_markdown_yields_one_chunk_per_scene(self, export_service):
+        """Test Markdown is produced as a header chunk plus one encoded chunk per scene"""
+        chunks = list(export_service.iter_markdown('proj1'))
+
+        assert len(chunks) == 6
+        assert all(isinstance(chunk, bytes) for chunk in chunks)
+        assert chunks[0].startswith(b'# Test Novel\n\n')
+        assert chunks[4] == b'## Scene 3\n\nParagraph one of scene 3.\n\nParagraph two of scene 3.\n\n---\n\n'
+        assert export_service.export_to_markdown('proj1') == b''.join(chunks).decode('utf-8')
+
+    def test_iter_text_project_not_found(self, export_service):
+        """Test a missing project raises before any chunk is requested"""
+        export_service._get_story_bible_service().get_project.return_value = None
+
+        with pytest.raises(ValueError):
+            export_service.iter_text('missing')
+
+
+class TestIterScenes:
+    """Test paged scene iteration used by streaming exports"""
+
+    def test_iter_scenes_pages_through_collection(self, mock_firestore):
+        """Test scenes are fetched page by page with a cursor"""
+        from services.story_bible_service import StoryBibleService
+
+        def doc(i):
+            snapshot = MagicMock()
+            snapshot.to_dict.return_value = {'id': f'scene{i}', 'sequence': i}
+            return snapshot
+
+        pages = [[doc(0), doc(1)], [doc(2), doc(3)], [doc(4)]]
+        query = mock_firestore.collection().document().collection().order_by().limit()
+        query.stream.return_value = pages[0]
+        query.start_after.return_value.stream.side_effect = pages[1:]
+
+        service = StoryBibleService(mock_firestore)
+        scenes = list(service.iter_scenes('proj1', page_size=2))
+
+        assert [s['sequence'] for s in scenes] == [0, 1, 2, 3, 4]
+        assert query.start_after.call_count == 2
@@ -0,0 +1,63 @@
+"""
+Tests for JSON Patch application
+"""
+import pytest
+from utils.json_patch import (
+    apply_patch, escape_token, parse_pointer, resolve, validate_patch,
+    JsonPatchError, JsonPatchTestFailed, MAX_PATCH_OPS
+)
+
+
+class TestJsonPatch:
+    """Test suite for apply_patch"""
+
+    def test_operations(self):
+        """Test each operation against an RFC 6902 style document"""
+        doc = {'foo': ['bar', 'baz'], 'qux': {'n': 1}}
+        result = apply_patch(doc, [
+            {'op': 'add', 'path': '/foo/1', 'value': 'new'},
+            {'op': 'add', 'path': '/foo/-', 'value': 'end'},
+            {'op': 'remove', 'path': '/foo/0'},
+            {'op': 'replace', 'path': '/qux/n', 'value': 2},
+            {'op': 'copy', 'from': '/qux', 'path': '/copied'},
+            {'op': 'move', 'from': '/copied/n', 'path': '/moved'},
+            {'op': 'test', 'path': '/moved', 'value': 2},
+        ])
+
+        assert result == {'foo': ['new', 'baz', 'end'], 'qux': {'n': 2}, 'copied': {}, 'moved': 2}
+        assert doc == {'foo': ['bar', 'baz'], 'qux': {'n': 1}}
+
+    def test_failed_test_applies_nothing(self):
+        """Test a failing 'test' raises JsonPatchTestFailed and leaves the input intact"""
+        doc = {'a': 1}
+
+        with pytest.raises(JsonPatchTestFailed):
+            apply_patch(doc, [{'op': 'replace', 'path': '/a', 'value': 2},
+                              {'op': 'test', 'path': '/a', 'value': 1}])
+        assert doc == {'a': 1}
+
+    @pytest.mark.parametrize('ops', [
+        {'op': 'add'},
+        [{'op': 'upsert', 'path': '/a', 'value': 1}],
+        [{'op': 'add', 'path': 'a', 'value': 1}],
+        [{'op': 'replace', 'path': '/a'}],
+        [{'op': 'move', 'path': '/a'}],
+        [{'op': 'remove', 'path': '/missing'}],
+        [{'op': 'replace', 'path': '/missing', 'value': 1}],
+        [{'op': 'add', 'path': '/list/5', 'value': 1}],
+        [{'op': 'add', 'path': '/list/01', 'value': 1}],
+        [{'op': 'move', 'from': '/obj', 'path': '/obj/inner'}],
+        [{'op': 'test', 'path': '/a'}] * (MAX_PATCH_OPS + 1),
+    ])
+    def test_invalid_patches(self, ops):
+        """Test malformed and inapplicable patches raise JsonPatchError"""
+        with pytest.raises(JsonPatchError):
+            apply_patch({'a': 1, 'list': [1], 'obj': {}}, ops)
+
+    def test_pointers(self):
+        """Test ~0 and ~1 escapes round-trip through pointers"""
+        token = 'a/b~c'
+        assert parse_pointer('/' + escape_token(token)) == [token]
+        assert resolve({token: 1}, '/a~1b~0c') == 1
+        assert resolve([1], '') == [1]
+        assert validate_patch([]) == []
@@ -0,0 +1,219 @@
+"""
+Tests for the character mention index
+"""
+import pytest
+from unittest.mock import MagicMock, patch
+from services.mention_index import MentionIndex, MentionMatcher
+from services.story_bible_service import StoryBibleService, _get_mention_pool
+from services.continuity_tracker_service import ContinuityTrackerService
+
+
+@pytest.fixture
+def index(tmp_path):
+    """Mention index backed by a temporary SQLite file"""
+    return MentionIndex(db_path=str(tmp_path / 'mentions.db'))
+
+
+class TestMentionMatcher:
+    """Test suite for MentionMatcher"""
+
+    def test_whole_words_any_case(self):
+        """Test names match as whole words regardless of case, and positions index the text"""
+        matcher = MentionMatcher({'mira': ['Mira', 'the Cartographer'], 'tom': ['Tom']})
+        text = 'MIRA waved. Tomás and Tomb stayed, but Tom saw The\ncartographer, and mirage.'
+
+        found = matcher.find(text)
+
+        assert [text[start:end] for start, end in found['mira']] == ['MIRA', 'The\ncartographer']
+        assert [text[start:end] for start, end in found['tom']] == ['Tom']
+
+    def test_overlapping_names(self):
+        """Test one character's longest name wins, while other characters still match"""
+        matcher = MentionMatcher({'anna': ['Anna', 'Anna Maria'], 'maria': ['Maria']})
+
+        found = matcher.find('Anna Maria met Anna.')
+
+        assert found['anna'] == [(0, 10), (15, 19)]
+        assert found['maria'] == [(5, 10)]
+
+    def test_short_and_empty_names_are_ignored(self):
+        """Test initials and blank aliases do not match"""
+        matcher = MentionMatcher({'j': ['J', '  ', None]})
+
+        assert matcher.empty
+        assert matcher.find('J said so') == {}
+
+
+class TestMentionIndex:
+    """Test suite for MentionIndex"""
+
+    def test_lookups_by_character_and_chapter(self, index):
+        """Test scenes are found by character and characters by chapter"""
+        index.set_character('p1', 'mira', ['Mira'])
+        index.set_character('p1', 'tom', ['Tom', 'Thomas'])
+        index.index_scene('p1', 's1', 'ch1', 'Mira met Thomas. Mira left.')
+        index.index_scene('p1', 's2', 'ch1', 'Tom slept.')
+        index.index_scene('p1', 's3', 'ch2', 'Mira alone.')
+
+        mentions = index.scenes_mentioning('p1', 'mira')
+        assert [(m['scene_id'], m['count']) for m in mentions] == [('s1', 2), ('s3', 1)]
+        assert mentions[0]['positions'] == [[0, 4], [17, 21]]
+        assert index.characters_in_chapter('p1', 'ch1') == [
+            {'character_id': 'mira', 'scenes': 1, 'mentions': 2},
+            {'character_id': 'tom', 'scenes': 2, 'mentions': 2}
+        ]
+        assert index.characters_in_scene('p1', 's1') == ['mira', 'tom']
+        assert index.scenes_mentioning('p2', 'mira') == []
+
+    def test_unchanged_scenes_are_skipped(self, index):
+        """Test a scene is re-scanned only when its text, chapter or the names change"""
+        index.set_character('p1', 'mira', ['Mira'])
+        assert index.index_scene('p1', 's1', 'ch1', 'Mira') == 1
+        assert index.index_scene('p1', 's1', 'ch1', 'Mira') is None
+        assert index.index_scene('p1', 's1', 'ch2', 'Mira') == 1
+        assert index.characters_in_chapter('p1', 'ch1') == []
+
+        assert index.set_character('p1', 'mira', ['Mira']) is False
+        assert index.set_character('p1', 'mira', ['Mira', 'Captain']) is True
+        assert index.index_scene('p1', 's1', 'ch2', 'Mira') == 1
+
+    def test_rescan_for_one_character(self, index):
+        """Test a partial re-scan replaces only the given characters' mentions"""
+        index.set_character('p1', 'mira', ['Mira'])
+        index.set_character('p1', 'tom', ['Tom'])
+        index.index_scene('p1', 's1', None, 'Mira and the Captain met Tom.')
+
+        index.set_character('p1', 'tom', ['Captain'])
+        assert index.index_scene('p1', 's1', None, 'Mira and the Captain met Tom.',
+                                 character_ids=['tom']) == 1
+
+        assert index.scenes_mentioning('p1', 'tom')[0]['positions'] == [[13, 20]]
+        assert index.characters_in_scene('p1', 's1') == ['mira', 'tom']
+
+    def test_removals(self, index):
+        """Test removed characters and scenes leave no mentions behind"""
+        index.set_character('p1', 'mira', ['Mira'])
+        index.index_scene('p1', 's1', 'ch1', 'Mira')
+        index.index_scene('p1', 's2', 'ch1', 'Mira')
+
+        index.remove_scene('p1', 's1')
+        assert [m['scene_id'] for m in index.scenes_mentioning('p1', 'mira')] == ['s2']
+
+        index.remove_character('p1', 'mira')
+        assert index.scenes_mentioning('p1', 'mira') == []
+        assert index.character_ids('p1') == []
+        assert index.index_scene('p1', 's2', 'ch1', 'Mira') == 0
+
+    def test_names_written_by_another_process(self, index):
+        """Test a cached matcher is rebuilt when another process changes the names"""
+        index.set_character('p1', 'mira', ['Mira'])
+        first = index.matcher('p1')
+        assert index.matcher('p1') is first
+
+        other = MentionIndex(db_path=index.db_path)
+        other.set_character('p1', 'tom', ['Tom'])
+
+        assert index.index_scene('p1', 's1', None, 'Mira met Tom.') == 2
+        assert index.characters_in_scene('p1', 's1') == ['mira', 'tom']
+
+    def test_scan_is_redone_if_names_change_meanwhile(self, index):
+        """Test a scan that raced a new character is not stored, so their mentions are kept"""
+        index.set_character('p1', 'mira', ['Mira'])
+        other = MentionIndex(db_path=index.db_path)
+        find = MentionMatcher.find
+        calls = []
+
+        def racing_find(matcher, text):
+            calls.append(1)
+            if len(calls) == 1:
+                other.set_character('p1', 'tom', ['Tom'])
+            return find(matcher, text)
+
+        with patch.object(MentionMatcher, 'find', racing_find):
+            assert index.index_scene('p1', 's1', None, 'Mira met Tom.') == 2
+
+        assert len(calls) == 2
+        assert index.characters_in_scene('p1', 's1') == ['mira', 'tom']
+
+
+class TestStoryBibleMentions:
+    """Test suite for the story bible's use of the mention index"""
+
+    def test_scene_writes_are_indexed(self, mock_firestore, index):
+        """Test created scenes are scanned for the project's characters and aliases"""
+        service = StoryBibleService(mock_firestore, mention_index=index)
+        character = service.create_character('proj1', {'name': 'Mira Vale', 'aliases': ['the Captain']})
+
+        scene = service.create_scene('proj1', {'title': 'Dock', 'chapter_id': 'ch1',
+                                               'content': 'The captain waited.'})
+
+        assert service.scenes_mentioning('proj1', character['id'])[0]['scene_id'] == scene['id']
+        assert service.characters_in_chapter('proj1', 'ch1')[0]['character_id'] == character['id']
+
+    def test_new_character_rescans_scenes(self, mock_firestore, index):
+        """Test existing scenes are scanned for a new character in the background, reading only needed fields"""
+        snapshot = MagicMock()
+        snapshot.to_dict.return_value = {'id': 's1', 'chapter_id': 'ch1', 'content': 'Mira sang.'}
+        scenes = mock_firestore.collection.return_value.document.return_value.collection.return_value
+        query = scenes.select.return_value.order_by.return_value.limit.return_value
+        query.stream.return_value = [snapshot]
+        service = StoryBibleService(mock_firestore, mention_index=index)
+
+        character = service.create_character('proj1', {'name': 'Mira'})
+        _get_mention_pool().submit(lambda: None).result()  # The worker runs one task at a time
+
+        scenes.select.assert_called_with(['id', 'chapter_id', 'content', 'rank'])
+        assert service.scenes_mentioning('proj1', character['id'])[0]['scene_id'] == 's1'
+
+    def test_scene_context_includes_named_characters(self, mock_firestore, index):
+        """Test scene context covers characters the text names but the scene does not tag"""
+        service = StoryBibleService(mock_firestore, mention_index=index)
+        index.set_character('proj1', 'mira', ['Mira'])
+        index.index_scene('proj1', 'scene1', None, 'Mira sang.')
+        scene = {'id': 'scene1', 'title': 'Song', 'content': 'Mira sang.', 'characters': ['tom']}
+        characters = [{'id': 'mira', 'name': 'Mira'}, {'id': 'tom', 'name': 'Tom'},
+                      {'id': 'kit', 'name': 'Kit'}]
+
+        with patch.object(service, 'get_scene', return_value=scene), \
+             patch.object(service, 'list_characters', return_value=characters), \
+             patch.object(service, 'list_plot_points', return_value=[]), \
+             patch.object(service, 'list_lore', return_value=[]):
+            context = service.get_context_for_scene('proj1', 'scene1')
+
+        assert {char['id'] for char in context['characters']} == {'mira', 'tom'}
+
+    def test_continuity_covers_untagged_scenes(self, mock_gemini_model):
+        """Test character continuity reviews scenes that name a character without tagging them"""
+        story_bible = MagicMock()
+        story_bible.list_characters.return_value = [{'id': 'mira', 'name': 'Mira'}]
+        story_bible.list_scenes.return_value = [
+            {'id': 's1', 'title': 'One', 'content': 'Mira', 'characters': ['mira']},
+            {'id': 's2', 'title': 'Two', 'content': 'Mira again', 'characters': []}
+        ]
+        story_bible.scenes_mentioning.return_value = [{'scene_id': 's1'}, {'scene_id': 's2'}]
+        story_bible.search_related.return_value = []
+        service = ContinuityTrackerService(None)
+        service.model = mock_gemini_model
+
+        service.check_character_continuity('proj1', story_bible)
+
+        prompt = mock_gemini_model.generate_content.call_args.args[0]
+        assert 'Scene: One' in prompt and 'Scene: Two' in prompt
+
+
+class TestMentionRoutes:
+    """Test suite for the mention endpoints"""
+
+    def test_character_mentions_and_chapter_cast(self, client, index):
+        """Test both lookups are served from the index"""
+        index.set_character('proj123', 'mira', ['Mira'])
+        index.index_scene('proj123', 's1', 'ch1', 'Mira sang.')
+
+        with patch('routes.story_bible.story_bible_service.mention_index', index):
+            response = client.get('/api/story-bible/projects/proj123/characters/mira/mentions')
+            assert response.status_code == 200
+            assert response.get_json() == [{'scene_id': 's1', 'chapter_id': 'ch1', 'count': 1,
+                                            'positions': [[0, 4]]}]
+
+            response = client.get('/api/story-bible/projects/proj123/chapters/ch1/characters')
+            assert response.get_json() == [{'character_id': 'mira', 'scenes': 1, 'mentions': 1}]
@@ -0,0 +1,210 @@
+"""
+Tests for word counting and project stats
+"""
+import random
+import pytest
+from unittest.mock import MagicMock, patch
+from google.api_core import exceptions as gcp_exceptions
+import services.project_stats as project_stats
+from services.project_stats import ProjectStatsService
+from services.story_bible_service import StoryBibleService
+from utils.word_count import count_words, WORD_COUNT_CHUNK
+
+
+class Increment:
+    """Stand-in for firestore.Increment that keeps its value"""
+
+    def __init__(self, value):
+        self.value = value
+
+
+class MergeBatch:
+    """Batch applying set(..., merge=True) calls with increments to in-memory documents"""
+
+    def __init__(self):
+        self.docs = {}
+
+    def set(self, ref, fields, merge=False):
+        self._merge(self.docs.setdefault(ref, {}), fields)
+
+    def update(self, ref, fields):
+        self._merge(self.docs.setdefault(ref, {}), fields)
+
+    def _merge(self, doc, fields):
+        for key, value in fields.items():
+            if isinstance(value, dict):
+                self._merge(doc.setdefault(key, {}), value)
+            elif isinstance(value, Increment):
+                doc[key] = doc.get(key, 0) + value.value
+            else:
+                doc[key] = value
+
+
+@pytest.fixture
+def stats():
+    """Stats service whose totals and daily documents are addressed by name"""
+    service = ProjectStatsService(MagicMock())
+    daily = MagicMock()
+    daily.document.side_effect = lambda day: f'daily/{day}'
+    with patch.object(project_stats.firestore, 'Increment', Increment), \
+         patch.object(service, '_project', return_value='project'), \
+         patch.object(service, '_totals_ref', return_value='totals'), \
+         patch.object(service, '_daily', return_value=daily):
+        yield service
+
+
+class TestCountWords:
+    """Test suite for count_words"""
+
+    def test_matches_split(self):
+        """Test counts equal len(text.split()), including words cut by chunk boundaries"""
+        rnd = random.Random(3)
+        pieces = ['word', 'Mira’s', '—', ' ', '  ', '\n\n', '\t', '　', 'x', ' ']
+        for size in (0, 1, 50, WORD_COUNT_CHUNK, WORD_COUNT_CHUNK * 3 + 7):
+            text = ''
+            while len(text) < size:
+                text += rnd.choice(pieces)
+            assert count_words(text) == len(text.split())
+
+        edge = 'a' * (WORD_COUNT_CHUNK - 1) + ' ' + 'b' * WORD_COUNT_CHUNK + ' c'
+        assert count_words(edge) == 3
+        assert count_words(' ' * (WORD_COUNT_CHUNK * 2)) == 0
+
+
+class TestProjectStats:
+    """Test suite for ProjectStatsService"""
+
+    def test_scene_writes_update_totals(self, stats):
+        """Test creates, edits and chapter moves adjust project, chapter and daily totals"""
+        batch = MergeBatch()
+        stats.record(batch, 'p1', None, ('ch1', 100), day='2026-10-01')
+        stats.record(batch, 'p1', None, (None, 5), day='2026-10-01')
+        stats.record(batch, 'p1', ('ch1', 100), ('ch1', 80), day='2026-10-02')
+        stats.record(batch, 'p1', ('ch1', 80), ('ch2', 80), day='2026-10-02')
+
+        assert batch.docs['totals'] == {
+            'words': 85, 'scenes': 2,
+            'chapters': {
+                'ch1': {'words': 0, 'scenes': 0},
+                'ch2': {'words': 80, 'scenes': 1},
+                '_unassigned': {'words': 5, 'scenes': 1}
+            }
+        }
+        assert batch.docs['project'] == {'current_word_count': 85}
+        assert batch.docs['daily/2026-10-01'] == {
+            'date': '2026-10-01', 'words_added': 105, 'words_removed': 0, 'net_words': 105
+        }
+        assert batch.docs['daily/2026-10-02']['net_words'] == -20
+
+    def test_unchanged_counts_write_nothing(self, stats):
+        """Test a write that keeps a scene's count and chapter adds nothing to the batch"""
+        batch = MagicMock()
+        stats.record(batch, 'p1', ('ch1', 10), ('ch1', 10))
+        batch.set.assert_not_called()
+        batch.update.assert_not_called()
+
+    def test_get_fills_daily_series(self, stats):
+        """Test totals are read from one document and missing days are zeros"""
+        stats._totals_ref.return_value = MagicMock()
+        stats._totals_ref.return_value.get.return_value.to_dict.return_value = {
+            'words': 90, 'scenes': 3,
+            'chapters': {'ch1': {'words': 80, 'scenes': 2}, 'old': {'words': 0, 'scenes': 0},
+                         '_unassigned': {'words': 10, 'scenes': 1}}
+        }
+        day = MagicMock()
+        day.id = '2026-10-18'
+        day.to_dict.return_value = {'words_added': 40, 'words_removed': 0, 'net_words': 40}
+        query = stats._daily.return_value.where.return_value.order_by.return_value
+        query.stream.return_value = [day]
+
+        result = stats.get('p1', days=3, today='2026-10-19')
+
+        assert result['words'] == 90
+        assert result['chapters'] == [
+            {'chapter_id': None, 'words': 10, 'scenes': 1},
+            {'chapter_id': 'ch1', 'words': 80, 'scenes': 2}
+        ]
+        assert [(d['date'], d['net_words']) for d in result['daily']] == [
+            ('2026-10-17', 0), ('2026-10-18', 40), ('2026-10-19', 0)
+        ]
+        where = stats._daily.return_value.where.call_args.kwargs['filter']
+        assert (where.field_path, where.op_string, where.value) == ('date', '>=', '2026-10-17')
+
+    def test_rebuild(self, stats):
+        """Test totals and the project's word count are recomputed from stored scene counts"""
+        totals = stats.rebuild('p1', [{'chapter_id': 'ch1', 'word_count': 10},
+                                      {'chapter_id': 'ch1', 'word_count': 5},
+                                      {'word_count': 2}])
+
+        assert totals == {'words': 17, 'scenes': 3,
+                          'chapters': {'ch1': {'words': 15, 'scenes': 2},
+                                       '_unassigned': {'words': 2, 'scenes': 1}}}
+        batch = stats.db.batch.return_value
+        batch.set.assert_called_once_with('totals', totals)
+        batch.update.assert_called_once_with('project', {'current_word_count': 17})
+        batch.commit.assert_called_once()
+
+
+class TestSceneStats:
+    """Test suite for scene writes keeping stats current"""
+
+    def test_create_scene_counts_in_the_same_batch(self, mock_firestore):
+        """Test a new scene and its total increments are committed together"""
+        service = StoryBibleService(mock_firestore)
+
+        with patch.object(service.stats, 'record') as record:
+            scene = service.create_scene('p1', {'title': 'Dock', 'chapter_id': 'ch1',
+                                                'content': 'The tide turned'})
+
+        batch = mock_firestore.batch.return_value
+        batch.set.assert_called_once()
+        record.assert_called_once_with(batch, 'p1', None, ('ch1', 3))
+        batch.commit.assert_called_once()
+        assert scene['word_count'] == 3
+
+    def test_update_scene_is_conditional_and_retried(self, mock_firestore):
+        """Test a content edit counts against the stored count and retries if the scene changed"""
+        service = StoryBibleService(mock_firestore)
+        ref = mock_firestore.collection.return_value.document.return_value \
+            .collection.return_value.document.return_value
+        ref.get.return_value.exists = True
+        ref.get.return_value.to_dict.return_value = {'chapter_id': 'ch1', 'word_count': 10}
+        batch = mock_firestore.batch.return_value
+        batch.commit.side_effect = [gcp_exceptions.FailedPrecondition('changed'), None]
+
+        with patch.object(service.stats, 'record') as record:
+            service.update_scene('p1', 'scene1', {'content': 'Two words'})
+
+        assert batch.commit.call_count == 2
+        assert record.call_args.args[1:] == ('p1', ('ch1', 10), ('ch1', 2))
+        ref.get.assert_any_call(field_paths=['chapter_id', 'word_count'])
+        assert 'option' in batch.update.call_args.kwargs
+
+    def test_uncounted_updates_skip_stats(self, mock_firestore):
+        """Test edits that leave content and chapter alone are a plain update"""
+        service = StoryBibleService(mock_firestore)
+        ref = mock_firestore.collection.return_value.document.return_value \
+            .collection.return_value.document.return_value
+
+        service.update_scene('p1', 'scene1', {'status': 'final'})
+
+        ref.update.assert_called_once()
+        mock_firestore.batch.assert_not_called()
+
+
+class TestStatsRoute:
+    """Test suite for the stats endpoint"""
+
+    def test_project_stats(self, client):
+        """Test stats are returned with the project's target and the requested window"""
+        from routes import story_bible
+        with patch.object(story_bible.story_bible_service, 'get_stats',
+                          return_value={'words': 5, 'scenes': 1, 'chapters': [], 'daily': []}) as get, \
+                patch.object(story_bible.story_bible_service, 'get_project',
+                             return_value={'id': 'proj123', 'target_word_count': 50000}):
+            response = client.get('/api/story-bible/projects/proj123/stats?days=7')
+
+        assert response.status_code == 200
+        assert response.get_json()['words'] == 5
+        assert response.get_json()['target_word_count'] == 50000
+        get.assert_called_once_with('proj123', 7)
@@ -0,0 +1,277 @@
+"""
+Tests for fractional rank keys and the rank rebalancer
+"""
+import random
+import threading
+import pytest
+from unittest.mock import MagicMock, patch
+from utils.ranking import (
+    rank_between, rank_after, rank_before, spread_ranks, validate_rank, RANK_MAX_LENGTH
+)
+import services.rank_rebalancer as rank_rebalancer
+from services.rank_rebalancer import RankRebalancer, rebalance_stats
+from services.story_bible_service import StoryBibleService
+
+
+class TestRankKeys:
+    """Test suite for rank key generation"""
+
+    def test_between_sorts_strictly_inside(self):
+        """Test random insertions keep keys unique, ordered and short"""
+        rnd = random.Random(7)
+        keys = [rank_between(None, None)]
+        for _ in range(2000):
+            i = rnd.randint(0, len(keys))
+            before = keys[i - 1] if i > 0 else None
+            after = keys[i] if i < len(keys) else None
+            keys.insert(i, rank_between(before, after))
+
+        assert keys == sorted(keys)
+        assert len(set(keys)) == len(keys)
+        assert max(len(key) for key in keys) <= RANK_MAX_LENGTH
+        for key in keys:
+            validate_rank(key)
+
+    def test_between_adjacent_and_prefix_keys(self):
+        """Test keys can always be found between close neighbours"""
+        for before, after in [('V', 'W'), ('V', 'V1'), ('Vz', 'W'), ('0001', '0002')]:
+            key = rank_between(before, after)
+            assert before < key < after
+
+    def test_between_rejects_bad_input(self):
+        """Test out-of-order, equal and malformed keys raise ValueError"""
+        for before, after in [('W', 'V'), ('V', 'V'), ('V0', None), ('', None), ('V-', None)]:
+            with pytest.raises(ValueError):
+                rank_between(before, after)
+
+    def test_appends_and_prepends_stay_short(self):
+        """Test repeated appends and prepends grow keys by about one digit per 60 moves"""
+        appended, prepended = ['V'], ['V']
+        for _ in range(3000):
+            appended.append(rank_after(appended[-1]))
+            prepended.append(rank_before(prepended[-1]))
+
+        assert appended == sorted(appended)
+        assert prepended == sorted(prepended, reverse=True)
+        assert max(len(key) for key in appended + prepended) <= 25
+        assert len(appended[1000]) == 2
+
+    def test_spread_ranks(self):
+        """Test spread keys are ordered, distinct and leave room at both ends"""
+        for count in (0, 1, 10, 5000):
+            keys = spread_ranks(count)
+            assert keys == sorted(keys)
+            assert len(set(keys)) == count
+            if keys:
+                assert rank_before(keys[0]) < keys[0] <= keys[-1] < rank_after(keys[-1])
+        assert max(len(key) for key in spread_ranks(5000)) == 4
+
+
+def rank_docs(ranks):
+    """Mock Firestore whose scene collection holds documents with the given ranks"""
+    db = MagicMock()
+    snapshots = []
+    for i, data in enumerate(ranks):
+        snapshot = MagicMock()
+        snapshot.id = f'scene{i}'
+        snapshot.update_time = i
+        snapshot.to_dict.return_value = data
+        snapshots.append(snapshot)
+    collection = db.collection.return_value.document.return_value.collection.return_value
+    collection.select.return_value.stream.return_value = snapshots
+    return db, snapshots
+
+
+def written_ranks(db):
+    """Document ID -> rank of every rank update added to a batch"""
+    return {call.args[0]: call.args[1]['rank']
+            for call in db.batch.return_value.update.call_args_list}
+
+
+class TestRankRebalancer:
+    """Test suite for RankRebalancer"""
+
+    def test_rebalance_keeps_order_and_backfills_legacy(self):
+        """Test ranked documents keep their order and unranked ones follow by sequence"""
+        db, snapshots = rank_docs([
+            {'rank': 'V00001'}, {'sequence': 2}, {'rank': 'U'}, {'sequence': 1}
+        ])
+
+        written = RankRebalancer(db).rebalance('proj1', 'scenes')
+
+        ranks = written_ranks(db)
+        assert written == 4
+        ordered = [snapshots[i].reference for i in (2, 0, 3, 1)]
+        assert [ranks[ref] for ref in ordered] == sorted(ranks.values())
+        db.batch.return_value.commit.assert_called_once()
+
+    def test_backfill_skips_fully_ranked_collections(self):
+        """Test an unforced rebalance writes nothing when every document has a rank"""
+        db, _ = rank_docs([{'rank': 'V'}, {'rank': 'W'}])
+
+        assert RankRebalancer(db).rebalance('proj1', 'scenes', force=False) == 0
+        db.batch.assert_not_called()
+
+    def test_retry_keeps_concurrently_moved_documents_in_place(self):
+        """Test a failed commit is re-planned so a move made meanwhile keeps its position"""
+        db, snapshots = rank_docs([{'rank': 'V'}, {'rank': 'Vzzzzzzzzzzzzz1'}, {'rank': 'W'}])
+        commits = []
+
+        def commit():
+            commits.append(1)
+            if len(commits) == 1:
+                # Scene 0 is moved to the end while the first batch is in flight
+                snapshots[0].to_dict.return_value = {'rank': 'X'}
+                raise RuntimeError('precondition failed')
+        db.batch.return_value.commit.side_effect = commit
+
+        written = RankRebalancer(db).rebalance('proj1', 'scenes')
+
+        assert written == 3
+        retry = {call.args[0]: call.args[1]['rank']
+                 for call in db.batch.return_value.update.call_args_list[3:]}
+        order = sorted(retry, key=retry.get)
+        assert order == [snapshots[i].reference for i in (1, 2, 0)]
+
+    def test_retry_orders_rewritten_documents_by_their_old_rank(self):
+        """Test documents committed before a failure are not mixed up with old ranks on retry"""
+        db, snapshots = rank_docs([{'rank': 'A'}, {'rank': 'B'}, {'rank': 'C'}])
+        first_plan = dict(zip(('scene0', 'scene1', 'scene2'), spread_ranks(3)))
+        commits = []
+
+        def commit():
+            commits.append(1)
+            if len(commits) == 1:
+                # Scene 2 was rewritten by an earlier partial commit; scene 0 moved after C
+                snapshots[2].to_dict.return_value = {'rank': first_plan['scene2']}
+                snapshots[0].to_dict.return_value = {'rank': 'D'}
+                raise RuntimeError('precondition failed')
+        db.batch.return_value.commit.side_effect = commit
+
+        RankRebalancer(db).rebalance('proj1', 'scenes')
+
+        retry = {call.args[0]: call.args[1]['rank']
+                 for call in db.batch.return_value.update.call_args_list[3:]}
+        final = {snapshot.reference: retry.get(snapshot.reference,
+                                               snapshot.to_dict.return_value['rank'])
+                 for snapshot in snapshots}
+        assert sorted(final, key=final.get) == [snapshots[i].reference for i in (1, 2, 0)]
+
+    def test_first_ordered_read_backfills_legacy_documents(self):
+        """Test unranked documents are ranked before the first rank-ordered read, and only once"""
+        db, snapshots = rank_docs([{'rank': 'V'}, {'sequence': 1}])
+        service = StoryBibleService(db)
+
+        service.list_scenes('legacy-proj')
+        service.list_scenes('legacy-proj')
+
+        ranks = written_ranks(db)
+        assert ranks[snapshots[0].reference] < ranks[snapshots[1].reference]
+        db.batch.return_value.commit.assert_called_once()
+        collection = db.collection.return_value.document.return_value.collection.return_value
+        assert collection.select.call_count == 1
+
+    def test_committed_rebalances_bump_the_collection_version(self):
+        """Test cached lists are invalidated after a rebalance writes, and not otherwise"""
+        db, _ = rank_docs([{'rank': 'V'}, {'sequence': 1}])
+        rebalancer = RankRebalancer(db)
+        rebalancer.versions = MagicMock()
+
+        assert rebalancer.rebalance('proj1', 'scenes') == 2
+        rebalancer.versions.bump.assert_called_once_with('proj1', 'scenes')
+
+        ranked, _ = rank_docs([{'rank': 'V'}])
+        quiet = RankRebalancer(ranked)
+        quiet.versions = MagicMock()
+        assert quiet.rebalance('proj1', 'scenes', force=False) == 0
+        quiet.versions.bump.assert_not_called()
+
+    def test_gives_up_after_repeated_conflicts(self):
+        """Test a collection that keeps changing is left alone after MAX_ATTEMPTS"""
+        db, _ = rank_docs([{'rank': 'V'}, {'rank': 'W'}])
+        db.batch.return_value.commit.side_effect = RuntimeError('precondition failed')
+        rebalancer = RankRebalancer(db)
+        rebalancer.versions = MagicMock()
+        before = rebalance_stats()
+
+        assert rebalancer.rebalance('proj1', 'scenes') == 0
+
+        stats = rebalance_stats()
+        assert stats['failures'] - before['failures'] == 1
+        assert stats['retries'] - before['retries'] == RankRebalancer.MAX_ATTEMPTS
+        rebalancer.versions.bump.assert_not_called()
+
+    def test_large_collections_commit_in_several_batches(self, monkeypatch):
+        """Test writes are committed every FIRESTORE_BATCH_COMMIT_LIMIT documents"""
+        monkeypatch.setattr(rank_rebalancer, 'FIRESTORE_BATCH_COMMIT_LIMIT', 2)
+        db, _ = rank_docs([{'sequence': i} for i in range(5)])
+
+        assert RankRebalancer(db).rebalance('proj1', 'scenes') == 5
+        assert db.batch.return_value.commit.call_count == 3
+
+    def test_giving_up_after_partial_commits_bumps_the_version(self, monkeypatch):
+        """Test batches committed before a final conflict still invalidate cached lists"""
+        monkeypatch.setattr(rank_rebalancer, 'FIRESTORE_BATCH_COMMIT_LIMIT', 2)
+        db, _ = rank_docs([{'sequence': i} for i in range(3)])
+        commits = []
+
+        def commit():
+            commits.append(1)
+            if len(commits) % 2 == 0:
+                raise RuntimeError('precondition failed')
+        db.batch.return_value.commit.side_effect = commit
+        rebalancer = RankRebalancer(db)
+        rebalancer.versions = MagicMock()
+
+        assert rebalancer.rebalance('proj1', 'scenes') == 2 * RankRebalancer.MAX_ATTEMPTS
+        rebalancer.versions.bump.assert_called_once_with('proj1', 'scenes')
+
+    def test_without_firestore_nothing_is_written(self):
+        """Test a rebalancer without a database is a no-op"""
+        assert RankRebalancer(None).rebalance('proj1', 'scenes') == 0
+
+    def test_schedule_runs_once_per_collection(self):
+        """Test repeated triggers while a rebalance is queued run it once, in the background"""
+        db, _ = rank_docs([{'rank': 'V'}])
+        rebalancer = RankRebalancer(db)
+        started, release = threading.Event(), threading.Event()
+        calls = []
+
+        def rebalance(project_id, collection_name):
+            calls.append((project_id, collection_name))
+            started.set()
+            release.wait(5)
+
+        with patch.object(rebalancer, 'rebalance', side_effect=rebalance):
+            assert rebalancer.schedule('sched-proj', 'scenes')
+            started.wait(5)
+            assert not rebalancer.schedule('sched-proj', 'scenes')
+            assert rebalance_stats()['pending'] >= 1
+            release.set()
+            rank_rebalancer._get_rebalance_pool().submit(lambda: None).result()
+
+        assert calls == [('sched-proj', 'scenes')]
+        assert rebalancer.schedule('sched-proj', 'scenes')
+        rank_rebalancer._get_rebalance_pool().submit(lambda: None).result()
+
+    def test_scheduled_failures_are_contained(self, capsys):
+        """Test a background rebalance that raises is logged and can be scheduled again"""
+        rebalancer = RankRebalancer(MagicMock())
+
+        with patch.object(rebalancer, 'rebalance', side_effect=RuntimeError('quota exceeded')):
+            assert rebalancer.schedule('failing-proj', 'scenes')
+            rank_rebalancer._get_rebalance_pool().submit(lambda: None).result()
+            assert rebalancer.schedule('failing-proj', 'scenes')
+            rank_rebalancer._get_rebalance_pool().submit(lambda: None).result()
+
+        assert 'Rank rebalance failed: quota exceeded' in capsys.readouterr().out
+
+    def test_ensure_ranked_skips_collections_known_ranked(self):
+        """Test a collection seen fully ranked is not read again by this process"""
+        db, _ = rank_docs([{'rank': 'V'}])
+        rebalancer = RankRebalancer(db)
+
+        assert rebalancer.ensure_ranked('ranked-proj', 'plot_points') == 0
+        assert rebalancer.ensure_ranked('ranked-proj', 'plot_points') == 0
+        collection = db.collection.return_value.document.return_value.collection.return_value
+        assert collection.select.call_count == 1
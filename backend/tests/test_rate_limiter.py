@@ -0,0 +1,265 @@
+"""
+Tests for the GCRA rate limiter
+"""
+import multiprocessing
+import threading
+import time
+import pytest
+from flask import Flask, jsonify
+from utils import rate_limiter
+from utils.rate_limiter import (
+    RateLimiter, RedisRateLimiter, SQLiteRateLimiter, create_limiter, rate_limit
+)
+
+
+class FakeRedis:
+    """
+    In-process stand-in for a Redis client
+
+    Runs the GCRA script's logic in Python under a lock, which is the
+    atomicity Redis gives a Lua script, and honours key expiry.
+    """
+
+    def __init__(self, clock):
+        self.clock = clock
+        self.lock = threading.Lock()
+        self.hashes = {}
+        self.expires = {}
+
+    def _live(self, key):
+        if key in self.expires and self.expires[key] <= self.clock():
+            self.hashes.pop(key, None)
+            self.expires.pop(key, None)
+        return self.hashes.get(key)
+
+    def register_script(self, script):
+        assert 'PEXPIREAT' in script
+
+        def run(keys, args):
+            interval, window, increment = (float(arg) for arg in args)
+            with self.lock:
+                now = self.clock()
+                entry = self._live(keys[0])
+                tat = max(float(entry[b'tat']), now) if entry else now
+                new_tat = tat + increment
+                wait = new_tat - window - now
+                if wait > 1e-9:
+                    return [0, str(wait).encode()]
+                self.hashes[keys[0]] = {b'tat': str(new_tat).encode(),
+                                        b'interval': str(interval).encode()}
+                self.expires[keys[0]] = new_tat
+                return [1, b'0']
+        return run
+
+    def hmget(self, key, fields):
+        with self.lock:
+            entry = self._live(key) or {}
+        return [entry.get(field.encode()) for field in fields]
+
+    def time(self):
+        now = self.clock()
+        return int(now), int((now % 1) * 1000000)
+
+
+def _hammer_shared_limiter(db_path, results):
+    limiter = SQLiteRateLimiter(db_path)
+    results.put(sum(limiter.is_allowed('shared', 40, 60) for _ in range(30)))
+
+
+@pytest.fixture
+def clock():
+    return [1000.0]
+
+
+@pytest.fixture
+def limiter(clock):
+    return RateLimiter(stripes=4, sweep_interval=60, clock=lambda: clock[0])
+
+
+class TestRateLimiter:
+    """Test suite for RateLimiter"""
+
+    def test_burst_then_steady_refill(self, limiter, clock):
+        """Test a fresh key bursts to the limit, then regains one slot per interval"""
+        assert all(limiter.is_allowed('ip1', 5, 60) for _ in range(5))
+        assert not limiter.is_allowed('ip1', 5, 60)
+        assert limiter.get_wait_time('ip1', 60) == 12
+
+        clock[0] += 12
+        assert limiter.is_allowed('ip1', 5, 60)
+        assert not limiter.is_allowed('ip1', 5, 60)
+
+    def test_keys_are_independent(self, limiter):
+        """Test one client exhausting its limit does not affect another"""
+        for _ in range(3):
+            limiter.is_allowed('ip1', 3, 60)
+
+        assert not limiter.is_allowed('ip1', 3, 60)
+        assert limiter.is_allowed('ip2', 3, 60)
+
+    def test_state_is_constant_per_key(self, limiter):
+        """Test a key holds one entry no matter how many requests it made"""
+        for _ in range(1000):
+            limiter.is_allowed('ip1', 1000, 60)
+
+        assert len(limiter) == 1
+
+    def test_idle_keys_are_swept(self, limiter, clock):
+        """Test keys whose limit has recovered are evicted on the next sweep"""
+        for i in range(100):
+            limiter.is_allowed(f'ip{i}', 10, 60)
+        limiter.is_allowed('busy', 1, 600)
+
+        clock[0] += 61
+        assert limiter.sweep() == 100
+        assert len(limiter) == 1
+        assert limiter.get_wait_time('busy', 600) > 0
+
+    def test_hits_sweep_every_stripe_after_interval(self, clock):
+        """Test a hit on one stripe evicts idle keys from all stripes once the interval passes"""
+        limiter = RateLimiter(stripes=4, sweep_interval=60, clock=lambda: clock[0])
+        for i in range(10):
+            limiter.is_allowed(f'ip{i}', 10, 60)
+
+        clock[0] += 30
+        limiter.is_allowed('ip0', 10, 60)
+        assert len(limiter) == 10
+
+        clock[0] += 31
+        limiter.is_allowed('ip0', 10, 60)
+        assert len(limiter) == 1
+
+    def test_backends_must_implement_hit_and_wait(self):
+        """Test an incomplete backend cannot be instantiated"""
+        class Incomplete(rate_limiter.RateLimiterBackend):
+            def hit(self, key, limit, window, cost=1):
+                return True, 0.0
+
+        with pytest.raises(TypeError):
+            Incomplete()
+
+    def test_concurrent_requests_never_exceed_limit(self, limiter):
+        """Test exactly the limit is granted when many threads race on one key"""
+        granted = []
+        barrier = threading.Barrier(8)
+
+        def worker():
+            barrier.wait()
+            granted.append(sum(limiter.is_allowed('shared', 50, 60) for _ in range(100)))
+
+        threads = [threading.Thread(target=worker) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        assert sum(granted) == 50
+
+    def test_decorator_reports_retry_after(self):
+        """Test the decorator answers 429 with a whole-second retry_after"""
+        app = Flask(__name__)
+
+        @app.route('/limited')
+        @rate_limit(limit=2, window=60, per='test-key')
+        def limited():
+            return jsonify({'ok': True})
+
+        with app.test_client() as client:
+            statuses = [client.get('/limited').status_code for _ in range(3)]
+            response = client.get('/limited')
+
+        assert statuses == [200, 200, 429]
+        assert 29 <= response.get_json()['retry_after'] <= 30
+
+    def test_backend_failure_fails_open(self, monkeypatch):
+        """Test requests are let through when the shared backend errors"""
+        broken = RateLimiter()
+        monkeypatch.setattr(broken, 'hit', lambda *args: (_ for _ in ()).throw(OSError('down')))
+        monkeypatch.setattr(rate_limiter, 'limiter', broken)
+        app = Flask(__name__)
+
+        @app.route('/limited')
+        @rate_limit(limit=1, window=60, per='test-key')
+        def limited():
+            return jsonify({'ok': True})
+
+        with app.test_client() as client:
+            assert client.get('/limited').status_code == 200
+
+    @pytest.mark.slow
+    def test_throughput_under_contention(self):
+        """Micro-benchmark: checks per second with 8 threads over 1000 keys"""
+        limiter = RateLimiter()
+        keys = [f'10.0.{i // 256}.{i % 256}' for i in range(1000)]
+        per_thread = 20000
+
+        def worker(offset):
+            for i in range(per_thread):
+                limiter.is_allowed(keys[(i + offset) % len(keys)], 100, 60)
+
+        threads = [threading.Thread(target=worker, args=(n * 125,)) for n in range(8)]
+        start = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - start
+
+        rate = 8 * per_thread / elapsed
+        print(f"\n{rate:,.0f} checks/s over {len(limiter)} keys")
+        assert len(limiter) == len(keys)
+
+
+class TestSharedBackends:
+    """Test the SQLite and Redis limiter backends"""
+
+    def test_sqlite_limit_and_wait(self, tmp_path, clock):
+        """Test the SQLite backend enforces the same GCRA limit"""
+        limiter = SQLiteRateLimiter(str(tmp_path / 'limits.db'), clock=lambda: clock[0])
+
+        assert all(limiter.is_allowed('ip1', 4, 60) for _ in range(4))
+        assert limiter.hit('ip1', 4, 60) == (False, pytest.approx(15))
+        assert limiter.get_wait_time('ip1', 60) == 15
+
+        clock[0] += 61
+        assert limiter.sweep() == 1
+        assert len(limiter) == 0
+
+    def test_sqlite_state_is_shared_across_processes(self, tmp_path):
+        """Test four worker processes together get exactly the limit"""
+        db_path = str(tmp_path / 'limits.db')
+        SQLiteRateLimiter(db_path).sweep()  # create the table up front
+        context = multiprocessing.get_context('fork')
+        results = context.Queue()
+        workers = [context.Process(target=_hammer_shared_limiter, args=(db_path, results))
+                   for _ in range(4)]
+        for worker in workers:
+            worker.start()
+        granted = [results.get(timeout=30) for _ in workers]
+        for worker in workers:
+            worker.join()
+
+        assert sum(granted) == 40
+
+    def test_redis_limit_wait_and_expiry(self, clock):
+        """Test the Redis backend decodes script replies and lets idle keys expire"""
+        client = FakeRedis(lambda: clock[0])
+        limiter = RedisRateLimiter(client)
+
+        assert all(limiter.is_allowed('ip1', 2, 60) for _ in range(2))
+        allowed, wait = limiter.hit('ip1', 2, 60)
+        assert not allowed and wait == pytest.approx(30)
+        assert limiter.get_wait_time('ip1', 60) == 30
+        assert 'ratelimit:ip1' in client.hashes
+
+        clock[0] += 61
+        assert limiter.get_wait_time('ip1', 60) == 0
+        assert limiter.is_allowed('ip1', 2, 60)
+
+    def test_create_limiter_falls_back_to_memory(self, tmp_path, monkeypatch):
+        """Test backend selection, including unknown or unavailable backends"""
+        monkeypatch.setattr(rate_limiter, 'RATE_LIMIT_DB_PATH', str(tmp_path / 'limits.db'))
+
+        assert isinstance(create_limiter('sqlite'), SQLiteRateLimiter)
+        assert isinstance(create_limiter('memory'), RateLimiter)
+        assert isinstance(create_limiter('carrier-pigeon'), RateLimiter)
@@ -53,6 +53,21 @@ class TestStoryBibleRoutes:
         data = json.loads(response.data)
         assert data['id'] == 'proj123'
 
+    @patch('routes.story_bible.story_bible_service')
+    def test_list_projects_paginates(self, mock_service, client):
+        """Test listing returns the user's projects with a next-page cursor header"""
+        mock_service.list_projects.return_value = {
+            'projects': [{'id': 'proj123', 'title': 'Test Novel'}],
+            'next_cursor': 'proj123'
+        }
+
+        response = client.get('/api/story-bible/projects?limit=1')
+
+        assert response.status_code == 200
+        assert json.loads(response.data) == [{'id': 'proj123', 'title': 'Test Novel'}]
+        assert response.headers['X-Next-Cursor'] == 'proj123'
+        mock_service.list_projects.assert_called_once_with('mock-user-id', 1, None)
+
     @patch('routes.story_bible.story_bible_service')
     def test_get_project(self, mock_service, client):
         """Test getting a project"""
@@ -103,6 +118,66 @@ class TestStoryBibleRoutes:
         data = json.loads(response.data)
         assert len(data) == 2
 
+    @patch('routes.story_bible.story_bible_service')
+    def test_move_scene(self, mock_service, client):
+        """Test moving a scene returns its new rank, or 400/404 on bad IDs"""
+        mock_service.move_scene.return_value = {'id': 'scene2', 'rank': 'VV'}
+
+        response = client.post('/api/story-bible/projects/proj123/scenes/scene2/move',
+                               data=json.dumps({'after_id': 'scene1', 'before_id': 'scene3'}),
+                               content_type='application/json')
+
+        assert response.status_code == 200
+        assert json.loads(response.data)['rank'] == 'VV'
+        mock_service.move_scene.assert_called_once_with('proj123', 'scene2', 'scene1', 'scene3')
+
+        mock_service.move_scene.side_effect = ValueError('Neighbour not found: scene9')
+        response = client.post('/api/story-bible/projects/proj123/scenes/scene2/move',
+                               data=json.dumps({'after_id': 'scene9'}),
+                               content_type='application/json')
+        assert response.status_code == 400
+
+        mock_service.move_scene.side_effect = None
+        mock_service.move_scene.return_value = None
+        response = client.post('/api/story-bible/projects/proj123/scenes/missing/move',
+                               data=json.dumps({}),
+                               content_type='application/json')
+        assert response.status_code == 404
+
+    @patch('routes.story_bible.story_bible_service')
+    def test_add_collaborator(self, mock_service, client):
+        """Test the owner can share a project, and the body is validated first"""
+        mock_service.get_project.return_value = {'id': 'proj123', 'owner_id': 'mock-user-id'}
+
+        response = client.post('/api/story-bible/projects/proj123/collaborators',
+                               data=json.dumps({'user_id': ' user2 '}),
+                               content_type='application/json')
+        assert response.status_code == 200
+        mock_service.add_collaborator.assert_called_once_with('proj123', 'user2')
+
+        for body in ({}, {'user_id': ''}, {'user_id': 42}):
+            response = client.post('/api/story-bible/projects/proj123/collaborators',
+                                   data=json.dumps(body), content_type='application/json')
+            assert response.status_code == 400
+            assert json.loads(response.data)['error'] == 'Validation failed'
+        assert mock_service.add_collaborator.call_count == 1
+
+    @patch('routes.story_bible.story_bible_service')
+    def test_owner_collaborator_changes_are_rejected(self, mock_service, client):
+        """Test adding or removing the owner as a collaborator is a 400"""
+        mock_service.get_project.return_value = {'id': 'proj123', 'owner_id': 'mock-user-id'}
+        error = ValueError('The project owner cannot be a collaborator')
+        mock_service.add_collaborator.side_effect = error
+        mock_service.remove_collaborator.side_effect = error
+
+        response = client.post('/api/story-bible/projects/proj123/collaborators',
+                               data=json.dumps({'user_id': 'mock-user-id'}),
+                               content_type='application/json')
+        assert response.status_code == 400
+        response = client.delete('/api/story-bible/projects/proj123/collaborators/mock-user-id')
+        assert response.status_code == 400
+        assert json.loads(response.data)['error'] == str(error)
+
 
 class TestEditorRoutes:
     """Test Editor API routes"""
@@ -240,6 +315,72 @@ class TestVisualPlanningRoutes:
         data = json.loads(response.data)
         assert 'outline' in data
 
+    @patch('routes.visual_planning.planning_service')
+    def test_refresh_matrix_for_changed_scenes(self, mock_service, client):
+        """Test scene_ids limit matrix generation to the changed scenes"""
+        mock_service.create_matrix_from_scenes.return_value = {'rows': [], 'cells': {}}
+
+        response = client.post('/api/planning/matrix/proj123/generate',
+                               data=json.dumps({'scene_ids': ['scene1']}),
+                               content_type='application/json')
+        assert response.status_code == 200
+        assert mock_service.create_matrix_from_scenes.call_args.args[2] == ['scene1']
+
+        response = client.post('/api/planning/outline/proj123/generate',
+                               data=json.dumps({'scene_ids': 'scene1'}),
+                               content_type='application/json')
+        assert response.status_code == 400
+
+    @patch('routes.visual_planning.planning_service')
+    def test_get_corkboard_viewport(self, mock_service, client):
+        """Test ?bbox= is parsed into a viewport and malformed boxes are rejected"""
+        mock_service.get_corkboard.return_value = {'items': [], 'connections': []}
+
+        response = client.get('/api/planning/corkboard/proj123?bbox=0,0,1920.5,1080')
+        assert response.status_code == 200
+        mock_service.get_corkboard.assert_called_once_with('proj123', (0, 0, 1920.5, 1080))
+
+        for bbox in ('0,0,1920', '10,0,0,10', 'a,b,c,d', '0,0,inf,10', '0,0,2e6,2e6', '0,-1e9,10,0'):
+            response = client.get(f'/api/planning/corkboard/proj123?bbox={bbox}')
+            assert response.status_code == 400
+
+    @patch('routes.visual_planning.planning_service')
+    def test_patch_corkboard(self, mock_service, client):
+        """Test JSON Patch bodies reach the service and patch failures map to status codes"""
+        from utils.json_patch import JsonPatchError, JsonPatchTestFailed
+        from services.visual_planning_service import CorkboardItemNotFound
+        ops = [{'op': 'replace', 'path': '/items/card1/position', 'value': {'x': 1, 'y': 2}}]
+        mock_service.patch_corkboard.return_value = {'items': {'card1': {'id': 'card1'}}}
+
+        response = client.patch('/api/planning/corkboard/proj123', data=json.dumps(ops),
+                                content_type='application/json-patch+json')
+
+        assert response.status_code == 200
+        mock_service.patch_corkboard.assert_called_once_with('proj123', ops)
+
+        for error, status in [(JsonPatchTestFailed('x'), 409), (CorkboardItemNotFound('x'), 404),
+                              (JsonPatchError('x'), 400)]:
+            mock_service.update_corkboard_item.side_effect = error
+            response = client.patch('/api/planning/corkboard/proj123/items/card1',
+                                    data=json.dumps({'title': 'New'}),
+                                    content_type='application/json')
+            assert response.status_code == status
+
+    @patch('routes.visual_planning.planning_service')
+    def test_update_matrix_cell(self, mock_service, client):
+        """Test setting a matrix cell requires row, col and content"""
+        mock_service.update_matrix_cell.return_value = {'cells': {'act_1_pp1': 'x'}}
+
+        response = client.patch('/api/planning/matrix/proj123/cells',
+                                data=json.dumps({'row': 0, 'col': 'pp1', 'content': 'x'}),
+                                content_type='application/json')
+        assert response.status_code == 200
+        mock_service.update_matrix_cell.assert_called_once_with('proj123', 0, 'pp1', 'x')
+
+        response = client.patch('/api/planning/matrix/proj123/cells',
+                                data=json.dumps({'row': 0}), content_type='application/json')
+        assert response.status_code == 400
+
 
 class TestContinuityRoutes:
     """Test Continuity Tracker API routes"""
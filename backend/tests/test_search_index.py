@@ -0,0 +1,116 @@
+"""
+Tests for SearchIndex
+"""
+import asyncio
+import pytest
+from unittest.mock import MagicMock, patch
+from services.search_index import SearchIndex, match_expression
+from services.story_bible_service import StoryBibleService
+
+
+@pytest.fixture
+def index(tmp_path):
+    """Search index backed by a temporary SQLite file"""
+    return SearchIndex(db_path=str(tmp_path / 'search.db'))
+
+
+class TestSearchIndex:
+    """Test suite for SearchIndex"""
+
+    def test_match_expression(self):
+        """Test user input becomes quoted terms, with a prefix match on the last word"""
+        assert match_expression('elara "the storm" caf') == '"elara" "the storm" "caf"*'
+        assert match_expression('NEAR(a b) OR -x') == '"NEAR(a" "b)" "OR" "-x"*'
+        assert match_expression('  "" ') is None
+
+    def test_ranked_highlighted_results(self, index):
+        """Test title matches rank first and hits are highlighted in escaped HTML"""
+        index.upsert('project:p1', 'scene', 'scene1', 'Harbour',
+                     'Mira waited at the <dock> while the tide turned.')
+        index.upsert('project:p1', 'character', 'char1', 'Mira', 'A cartographer')
+
+        results = index.search(['project:p1'], 'mira')['results']
+
+        assert [hit['item_id'] for hit in results] == ['char1', 'scene1']
+        assert results[0]['title'] == '<mark>Mira</mark>'
+        assert results[1]['snippet'] == ('<mark>Mira</mark> waited at the &lt;dock&gt; '
+                                         'while the tide turned.')
+
+    def test_scopes_kinds_and_pages(self, index):
+        """Test results are limited to the requested scopes and kinds, a page at a time"""
+        for i in range(5):
+            index.upsert('project:p1', 'scene', f'scene{i}', f'Storm {i}', 'The storm broke')
+        index.upsert('project:p1', 'lore', 'lore1', 'Storms', 'Storms come from the west')
+        index.upsert('project:p2', 'scene', 'other', 'Storm', 'The storm broke')
+
+        first = index.search(['project:p1'], 'storm', kinds=['scene'], limit=3)
+        second = index.search(['project:p1'], 'storm', kinds=['scene'], limit=3,
+                              offset=first['next_offset'])
+
+        assert first['next_offset'] == 3
+        assert second['next_offset'] is None
+        ids = [hit['item_id'] for hit in first['results'] + second['results']]
+        assert sorted(ids) == [f'scene{i}' for i in range(5)]
+        assert index.search(['project:p1'], 'sto')['results']
+        assert index.search(['project:p3'], 'storm')['results'] == []
+
+    def test_incremental_updates(self, index):
+        """Test unchanged text is skipped and edits and removals replace old entries"""
+        assert index.upsert('user:u1', 'document', 'doc1', 'Draft', 'A quiet morning') is True
+        assert index.upsert('user:u1', 'document', 'doc1', 'Draft', 'A quiet morning') is False
+        assert index.upsert('user:u1', 'document', 'doc1', 'Draft', 'A stormy night') is True
+
+        assert index.search(['user:u1'], 'quiet')['results'] == []
+        assert index.search(['user:u1'], 'stormy')['results'][0]['item_id'] == 'doc1'
+
+        index.remove('user:u1', 'document', 'doc1')
+        assert index.search(['user:u1'], 'stormy')['results'] == []
+        assert index.count('user:u1') == 0
+
+    def test_story_bible_writes_are_indexed(self, mock_firestore, index):
+        """Test the story bible mirrors written and deleted entities into the index"""
+        service = StoryBibleService(mock_firestore, search_index=index)
+
+        character = service.create_character('proj1', {'name': 'Mira', 'description': 'A cartographer',
+                                                       'traits': ['stubborn']})
+        assert index.search(['project:proj1'], 'stubborn')['results'][0]['item_id'] == character['id']
+
+        service.delete_character('proj1', character['id'])
+        assert index.search(['project:proj1'], 'stubborn')['results'] == []
+
+    def test_saved_documents_are_indexed(self, index, tmp_path):
+        """Test save_document indexes the document under its user"""
+        with patch('db.schema.DB_PATH', str(tmp_path / 'litrift.db')):
+            from db.connection import DatabaseManager
+            manager = DatabaseManager(index)
+            asyncio.run(manager.save_document('u1', 'doc1', 'The lighthouse keeper', 'device1', 'Ch 1'))
+
+        assert index.search(['user:u1'], 'lighthouse')['results'][0]['item_id'] == 'doc1'
+
+
+class TestSearchRoutes:
+    """Test suite for the search endpoints"""
+
+    def test_project_search(self, client, index):
+        """Test project search covers the project and the user's documents, paged by cursor"""
+        index.upsert('project:proj123', 'lore', 'lore1', 'Star-iron', 'Forged in comet fire')
+        index.index_document('mock-user-id', 'doc1', 'Draft', 'The comet rose')
+        index.upsert('project:other', 'lore', 'lore2', 'Comets', 'comet')
+
+        with patch('routes.search.search_index', index):
+            response = client.get('/api/search/projects/proj123?q=comet&limit=1')
+            assert response.status_code == 200
+            assert len(response.get_json()) == 1
+            cursor = response.headers['X-Next-Cursor']
+
+            response = client.get(f'/api/search/projects/proj123?q=comet&limit=1&cursor={cursor}')
+            assert 'X-Next-Cursor' not in response.headers
+
+            response = client.get('/api/search?q=comet')
+            assert [hit['item_id'] for hit in response.get_json()] == ['doc1']
+
+    def test_invalid_requests(self, client, index):
+        """Test a missing query or a malformed cursor is rejected"""
+        with patch('routes.search.search_index', index):
+            assert client.get('/api/search').status_code == 400
+            assert client.get('/api/search?q=comet&cursor=-1').status_code == 400
@@ -0,0 +1,141 @@
+"""
+Tests for the orjson JSON provider and response compression
+"""
+import gzip
+import json
+import uuid
+from datetime import date, datetime
+import pytest
+from flask import Flask, Response, jsonify, request
+from flask.json.provider import DefaultJSONProvider
+from unittest.mock import patch
+from utils import compression
+from utils.compression import compress_response
+from utils.json_provider import ORJSONProvider, dumps_bytes
+
+PAYLOAD = {
+    'title': 'Chapitre un — le début',
+    'when': datetime(2025, 1, 2, 3, 4, 5),
+    'day': date(2025, 1, 2),
+    'id': uuid.UUID('12345678-1234-5678-1234-567812345678'),
+    'counts': {2: 'two', 1: 'one'},
+    'scenes': [{'word_count': 2000, 'ratio': 0.5, 'tags': None}],
+}
+
+
+@pytest.fixture
+def json_app():
+    app = Flask(__name__)
+    app.json = ORJSONProvider(app)
+    return app
+
+
+class TestORJSONProvider:
+    """Test suite for ORJSONProvider"""
+
+    def test_matches_default_provider(self, json_app):
+        """Test output decodes to the same value the stdlib provider produces"""
+        stdlib = DefaultJSONProvider(json_app)
+
+        assert json.loads(json_app.json.dumps(PAYLOAD)) == json.loads(stdlib.dumps(PAYLOAD))
+        with json_app.app_context():
+            body = jsonify(PAYLOAD).get_data()
+        assert json.loads(body) == json.loads(stdlib.dumps(PAYLOAD))
+        assert body.endswith(b'\n')
+
+    def test_falls_back_for_unsupported_values(self, json_app):
+        """Test values orjson rejects still serialize and parse"""
+        assert json.loads(json_app.json.dumps({'big': 2 ** 70})) == {'big': 2 ** 70}
+        assert json.loads(dumps_bytes([2 ** 70])) == [2 ** 70]
+        assert json_app.json.loads('{"big": 1180591620717411303424}')['big'] == 2 ** 70
+
+    def test_request_json_parsing(self, json_app):
+        """Test request.get_json goes through the provider"""
+        @json_app.route('/echo', methods=['POST'])
+        def echo():
+            return jsonify(request.get_json())
+
+        response = json_app.test_client().post('/echo', data='{"a": [1, 2]}',
+                                               content_type='application/json')
+        assert response.get_json() == {'a': [1, 2]}
+
+
+@pytest.fixture
+def compress_app():
+    app = Flask(__name__)
+    app.json = ORJSONProvider(app)
+
+    @app.route('/big')
+    def big():
+        response = jsonify([{'content': 'The quick brown fox. ' * 50}] * 20)
+        response.set_etag('abc')
+        return response
+
+    @app.route('/small')
+    def small():
+        return jsonify({'ok': True})
+
+    @app.route('/stream')
+    def stream():
+        return Response((b'x' * 4096 for _ in range(3)), mimetype='text/plain')
+
+    app.after_request(lambda response: compress_response(response, request))
+    return app
+
+
+class TestCompression:
+    """Test suite for response compression"""
+
+    def test_gzip_when_accepted(self, compress_app):
+        """Test large JSON bodies are gzipped and their ETag made weak"""
+        client = compress_app.test_client()
+        plain = client.get('/big')
+        response = client.get('/big', headers={'Accept-Encoding': 'gzip'})
+
+        assert response.headers['Content-Encoding'] == 'gzip'
+        assert 'Accept-Encoding' in response.headers['Vary']
+        assert response.headers['ETag'] == 'W/"abc"'
+        assert gzip.decompress(response.data) == plain.data
+        assert len(response.data) * 4 < len(plain.data)
+
+    def test_skips_small_unaccepted_and_streamed(self, compress_app):
+        """Test small, non-negotiated and streamed bodies are left alone"""
+        client = compress_app.test_client()
+
+        assert 'Content-Encoding' not in client.get('/small', headers={'Accept-Encoding': 'gzip'}).headers
+        assert 'Content-Encoding' not in client.get('/big').headers
+        assert 'Content-Encoding' not in client.get('/big', headers={'Accept-Encoding': 'gzip;q=0'}).headers
+        streamed = client.get('/stream', headers={'Accept-Encoding': 'gzip'})
+        assert 'Content-Encoding' not in streamed.headers
+        assert streamed.data == b'x' * 4096 * 3
+
+    def test_prefers_brotli_when_available(self, compress_app):
+        """Test br is chosen over gzip when the brotli package is installed"""
+        brotli = pytest.importorskip('brotli')
+        response = compress_app.test_client().get('/big', headers={'Accept-Encoding': 'gzip, br'})
+
+        assert response.headers['Content-Encoding'] == 'br'
+        assert json.loads(brotli.decompress(response.data))
+
+    def test_gzip_without_brotli(self, compress_app):
+        """Test gzip is used when brotli is not installed"""
+        with patch.object(compression, 'brotli', None):
+            response = compress_app.test_client().get('/big', headers={'Accept-Encoding': 'br, gzip'})
+
+        assert response.headers['Content-Encoding'] == 'gzip'
+
+    def test_app_compresses_and_revalidates(self, client, flask_app, monkeypatch):
+        """Test the app compresses API responses and a weak ETag still revalidates"""
+        from routes import story_bible
+        monkeypatch.setattr(story_bible.story_bible_service, 'list_scenes',
+                            lambda project_id: [{'id': f's{i}', 'content': 'Words. ' * 200}
+                                                for i in range(10)])
+        url = '/api/story-bible/projects/proj1/scenes'
+
+        response = client.get(url, headers={'Accept-Encoding': 'gzip'})
+        revalidated = client.get(url, headers={'Accept-Encoding': 'gzip',
+                                               'If-None-Match': response.headers['ETag']})
+
+        assert response.headers['Content-Encoding'] == 'gzip'
+        assert len(json.loads(gzip.decompress(response.data))) == 10
+        assert revalidated.status_code == 304
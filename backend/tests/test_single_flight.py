@@ -0,0 +1,136 @@
+"""
+Tests for request coalescing of concurrent identical reads
+"""
+import threading
+import time
+import pytest
+from unittest.mock import MagicMock, patch
+from services.story_bible_service import StoryBibleService, collection_read_stats
+from utils.single_flight import SingleFlight
+
+
+def wait_until(condition, timeout=5):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "timed out"
+        time.sleep(0.001)
+
+
+def run_concurrently(target, count):
+    results = [None] * count
+
+    def worker(index):
+        results[index] = target()
+
+    threads = [threading.Thread(target=worker, args=(i,)) for i in range(count)]
+    for thread in threads:
+        thread.start()
+    return threads, results
+
+
+class TestSingleFlight:
+    """Test suite for SingleFlight"""
+
+    def test_concurrent_callers_share_one_execution(self):
+        """Test N callers of a key in flight get the leader's result"""
+        flight = SingleFlight()
+        release = threading.Event()
+        executions = []
+
+        def fetch():
+            executions.append(1)
+            release.wait(5)
+            return 'value'
+
+        threads, results = run_concurrently(lambda: flight.do('key', fetch), 8)
+        wait_until(lambda: flight.stats()['coalesced'] == 7)
+        release.set()
+        for thread in threads:
+            thread.join()
+
+        assert len(executions) == 1
+        assert sorted(shared for _, shared in results) == [False] + [True] * 7
+        assert {value for value, _ in results} == {'value'}
+        assert flight.stats() == {'calls': 8, 'executions': 1, 'coalesced': 7, 'in_flight': 0}
+
+    def test_errors_reach_every_waiter(self):
+        """Test a failed call raises for the waiters too, and is not remembered"""
+        flight = SingleFlight()
+        release = threading.Event()
+        errors = []
+
+        def fetch():
+            release.wait(5)
+            raise RuntimeError('unavailable')
+
+        def call():
+            try:
+                flight.do('key', fetch)
+            except RuntimeError as e:
+                errors.append(e)
+
+        threads, _ = run_concurrently(call, 3)
+        wait_until(lambda: flight.stats()['coalesced'] == 2)
+        release.set()
+        for thread in threads:
+            thread.join()
+
+        assert len(errors) == 3
+        assert flight.do('key', lambda: 'fresh') == ('fresh', False)
+
+    def test_sequential_calls_are_not_cached(self):
+        """Test a finished call does not serve later callers"""
+        flight = SingleFlight()
+        counter = iter(range(10))
+
+        assert flight.do('key', lambda: next(counter))[0] == 0
+        assert flight.do('key', lambda: next(counter))[0] == 1
+
+
+class TestCoalescedCollectionReads:
+    """Test StoryBibleService collection reads are coalesced"""
+
+    def test_simultaneous_list_requests_read_firestore_once(self):
+        """Test N simultaneous list_characters calls stream the collection once"""
+        db = MagicMock()
+        release = threading.Event()
+        doc = MagicMock()
+        doc.to_dict.return_value = {'id': 'char1', 'name': 'Hero', 'traits': ['Brave']}
+
+        def stream():
+            release.wait(5)
+            return [doc]
+
+        collection = db.collection.return_value.document.return_value.collection.return_value
+        collection.stream.side_effect = stream
+        service = StoryBibleService(db)
+        before = collection_read_stats()
+
+        threads, results = run_concurrently(lambda: service.list_characters('proj1'), 10)
+        wait_until(lambda: collection_read_stats()['coalesced'] - before['coalesced'] == 9)
+        release.set()
+        for thread in threads:
+            thread.join()
+
+        assert collection.stream.call_count == 1
+        assert all(result == [{'id': 'char1', 'name': 'Hero', 'traits': ['Brave']}]
+                   for result in results)
+
+        # Each caller owns its documents, down to nested values
+        results[0][0]['name'] = 'Changed'
+        results[0][0]['traits'].append('Reckless')
+        assert all(result[0]['name'] == 'Hero' for result in results[1:])
+        assert all(result[0]['traits'] == ['Brave'] for result in results[1:])
+
+    def test_reader_that_ran_the_read_gets_a_copy(self):
+        """Test the caller whose read was shared cannot change what joiners copy"""
+        shared_docs = [{'id': 'char1', 'name': 'Hero', 'relationships': {'char2': ['rival']}}]
+        service = StoryBibleService(MagicMock())
+
+        with patch('services.story_bible_service._collection_reads.do',
+                   return_value=(shared_docs, False)):
+            result = service._list_collection('proj1', 'characters')
+
+        result[0]['name'] = 'Changed'
+        result[0]['relationships']['char2'].append('ally')
+        assert shared_docs == [{'id': 'char1', 'name': 'Hero', 'relationships': {'char2': ['rival']}}]
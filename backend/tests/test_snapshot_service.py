@@ -0,0 +1,104 @@
+"""
+Tests for composite project snapshots
+"""
+import json
+import threading
+import pytest
+from unittest.mock import MagicMock, patch
+from services.snapshot_service import ProjectSnapshotService
+
+PROJECT = {'id': 'proj123', 'title': 'Test Novel'}
+
+
+@pytest.fixture
+def services():
+    """Story Bible and planning services returning one entity of each kind"""
+    story_bible = MagicMock()
+    story_bible.get_project.return_value = PROJECT
+    story_bible.list_characters.return_value = [{'id': 'char1', 'name': 'Hero'}]
+    story_bible.list_locations.return_value = [{'id': 'loc1', 'name': 'Castle'}]
+    story_bible.list_lore.return_value = []
+    story_bible.list_plot_points.return_value = [{'id': 'plot1', 'title': 'Inciting incident'}]
+    story_bible.list_scene_summaries.return_value = [{'id': 'scene1', 'title': 'Opening'}]
+    planning = MagicMock()
+    planning.get_corkboard.return_value = {'view_type': 'corkboard', 'items': []}
+    planning.get_matrix.return_value = {'view_type': 'matrix', 'rows': []}
+    planning.get_outline.return_value = {'view_type': 'outline', 'structure': []}
+    return story_bible, planning
+
+
+class TestProjectSnapshotService:
+    """Test suite for ProjectSnapshotService"""
+
+    def test_parts_are_fetched_concurrently(self, services):
+        """Test every part is in flight at once (a sequential fetch would break the barrier)"""
+        story_bible, planning = services
+        barrier = threading.Barrier(9, timeout=5)
+        for mock in (story_bible.get_project, story_bible.list_characters,
+                     story_bible.list_locations, story_bible.list_lore,
+                     story_bible.list_plot_points, story_bible.list_scene_summaries,
+                     planning.get_corkboard, planning.get_matrix, planning.get_outline):
+            result = mock.return_value
+            mock.side_effect = lambda project_id, result=result: (barrier.wait(), result)[1]
+
+        snapshot = ProjectSnapshotService(story_bible, planning).get_snapshot('proj123')
+
+        assert snapshot['project'] == PROJECT
+        assert snapshot['scenes'] == [{'id': 'scene1', 'title': 'Opening'}]
+        assert snapshot['planning']['matrix']['view_type'] == 'matrix'
+
+    def test_reuses_authorized_project(self, services):
+        """Test a project read during authorization is not fetched again"""
+        story_bible, planning = services
+
+        snapshot = ProjectSnapshotService(story_bible, planning).get_snapshot('proj123', PROJECT)
+
+        assert snapshot['project'] == PROJECT
+        story_bible.get_project.assert_not_called()
+        story_bible.list_scenes.assert_not_called()
+
+    def test_missing_project(self, services):
+        """Test a missing project yields no snapshot"""
+        story_bible, planning = services
+        story_bible.get_project.return_value = None
+
+        assert ProjectSnapshotService(story_bible, planning).get_snapshot('missing') is None
+
+    def test_etag_tracks_content(self, services):
+        """Test the ETag is stable for equal snapshots and changes with content"""
+        service = ProjectSnapshotService(*services)
+        snapshot = service.get_snapshot('proj123')
+
+        first = service.serialize(snapshot)
+        assert service.serialize(json.loads(first['body'])) == first
+
+        snapshot['characters'][0]['name'] = 'Villain'
+        assert service.serialize(snapshot)['etag'] != first['etag']
+
+
+class TestSnapshotRoute:
+    """Test the snapshot endpoint"""
+
+    def test_snapshot_and_revalidation(self, client, services):
+        """Test the snapshot is served with an ETag and revalidates with 304"""
+        with patch('routes.story_bible.snapshot_service', ProjectSnapshotService(*services)):
+            response = client.get('/api/story-bible/projects/proj123/snapshot')
+            etag = response.headers['ETag']
+            revalidated = client.get('/api/story-bible/projects/proj123/snapshot',
+                                     headers={'If-None-Match': etag})
+
+        assert response.status_code == 200
+        data = json.loads(response.data)
+        assert set(data) == {'project', 'characters', 'locations', 'lore',
+                             'plot_points', 'scenes', 'planning'}
+        assert revalidated.status_code == 304
+        assert revalidated.data == b''
+
+    def test_snapshot_not_found(self, client, services):
+        """Test a missing project returns 404"""
+        services[0].get_project.return_value = None
+
+        with patch('routes.story_bible.snapshot_service', ProjectSnapshotService(*services)):
+            response = client.get('/api/story-bible/projects/missing/snapshot')
+
+        assert response.status_code == 404
@@ -3,7 +3,7 @@ Tests for StoryBibleService
 """
 import pytest
 from unittest.mock import MagicMock, patch
-from services.story_bible_service import StoryBibleService
+from services.story_bible_service import StoryBibleService, _project_list_cache
 
 
 class TestStoryBibleService:
@@ -28,6 +28,18 @@ class TestStoryBibleService:
         assert 'id' in result
         mock_doc_ref.set.assert_called_once()
 
+    def test_writes_bump_project_version(self, mock_firestore, sample_character_data):
+        """Test entity writes bump their resource's version counter"""
+        service = StoryBibleService(mock_firestore)
+
+        with patch.object(service.versions, 'bump') as bump:
+            service.create_character('test_project', sample_character_data)
+            service.update_scene('test_project', 'scene1', {'content': 'New words'})
+
+        assert [c.args for c in bump.call_args_list] == [
+            ('test_project', 'characters'), ('test_project', 'scenes')
+        ]
+
     def test_get_character(self, mock_firestore):
         """Test retrieving a character"""
         service = StoryBibleService(mock_firestore)
@@ -220,20 +232,23 @@ class TestStoryBibleService:
         assert result['location']['name'] == 'Kingdom'
 
     def test_create_project(self, mock_firestore, sample_project_data):
-        """Test creating a project"""
+        """Test creating a project indexes it under its owner in the same batch"""
         service = StoryBibleService(mock_firestore)
 
         mock_doc_ref = MagicMock()
         mock_doc_ref.id = 'project123'
-        mock_doc_ref.set = MagicMock()
 
         mock_firestore.collection().document.return_value = mock_doc_ref
+        batch = mock_firestore.batch.return_value
 
-        result = service.create_project(sample_project_data)
+        result = service.create_project(sample_project_data, owner_id='user1')
 
         assert result is not None
         assert 'id' in result
-        mock_doc_ref.set.assert_called_once()
+        assert result['owner_id'] == 'user1'
+        assert batch.set.call_count == 2
+        batch.set.assert_any_call(mock_doc_ref, result)
+        batch.commit.assert_called_once()
 
     def test_without_firestore(self):
         """Test service behavior without Firestore"""
@@ -242,3 +257,172 @@ class TestStoryBibleService:
         # Should handle gracefully
         result = service.list_characters('test_project')
         assert result == []
+
+
+class TestListProjects:
+    """Test owner-indexed project listing"""
+
+    @pytest.fixture(autouse=True)
+    def clear_cache(self):
+        _project_list_cache.clear()
+        yield
+        _project_list_cache.clear()
+
+    @staticmethod
+    def snapshot(doc_id, data=None):
+        doc = MagicMock()
+        doc.id = doc_id
+        doc.exists = True
+        doc.to_dict.return_value = data or {'id': doc_id}
+        return doc
+
+    def setup_refs(self, mock_firestore, ref_ids):
+        refs = mock_firestore.collection().document().collection()
+        query = refs.order_by.return_value.limit.return_value
+        query.stream.return_value = [self.snapshot(ref_id) for ref_id in ref_ids]
+        query.start_after.return_value = query
+        mock_firestore.get_all.side_effect = lambda doc_refs: [
+            self.snapshot(ref_id, {'id': ref_id, 'title': ref_id.upper()}) for ref_id in ref_ids
+        ]
+        return refs, query
+
+    def test_lists_a_page_from_the_owner_index(self, mock_firestore):
+        """Test a full page returns a cursor and reads projects in one batch"""
+        service = StoryBibleService(mock_firestore)
+        refs, query = self.setup_refs(mock_firestore, ['p2', 'p1'])
+
+        page = service.list_projects('user1', limit=2)
+
+        assert [p['title'] for p in page['projects']] == ['P2', 'P1']
+        assert page['next_cursor'] == 'p1'
+        refs.order_by.return_value.limit.assert_called_with(2)
+        mock_firestore.get_all.assert_called_once()
+        mock_firestore.collection.return_value.stream.assert_not_called()
+
+    def test_cursor_resumes_after_last_project(self, mock_firestore):
+        """Test the cursor starts the query after its index entry"""
+        service = StoryBibleService(mock_firestore)
+        refs, query = self.setup_refs(mock_firestore, ['p0'])
+
+        page = service.list_projects('user1', limit=2, cursor='p1')
+
+        query.start_after.assert_called_once_with(refs.document.return_value.get.return_value)
+        assert page['next_cursor'] is None
+
+    def test_pages_are_cached_until_owner_creates_project(self, mock_firestore):
+        """Test repeat listings are served from cache and a new project invalidates them"""
+        service = StoryBibleService(mock_firestore)
+        refs, query = self.setup_refs(mock_firestore, ['p1'])
+
+        service.list_projects('user1')
+        service.list_projects('user1')
+        assert query.stream.call_count == 1
+
+        service.create_project({'title': 'New'}, owner_id='user1')
+        service.list_projects('user1')
+        assert query.stream.call_count == 2
+
+    def test_adding_collaborator_refreshes_their_access_and_list(self, mock_firestore):
+        """Test sharing a project invalidates the collaborator's cached decisions and pages"""
+        service = StoryBibleService(mock_firestore)
+        refs, query = self.setup_refs(mock_firestore, ['p1'])
+        service.list_projects('user2')
+
+        with patch('services.story_bible_service.invalidate_project_access') as invalidate:
+            assert service.add_collaborator('p1', 'user2')
+
+        invalidate.assert_called_once_with('p1', 'user2')
+        mock_firestore.batch.return_value.commit.assert_called_once()
+        service.list_projects('user2')
+        assert query.stream.call_count == 2
+
+    def test_owner_cannot_be_added_or_removed_as_collaborator(self, mock_firestore):
+        """Test the owner's project ref is never rewritten or deleted as a collaborator's"""
+        service = StoryBibleService(mock_firestore)
+        project = mock_firestore.collection.return_value.document.return_value.get.return_value
+        project.exists = True
+        project.to_dict.return_value = {'id': 'p1', 'owner_id': 'user1', 'collaborators': []}
+
+        with pytest.raises(ValueError):
+            service.add_collaborator('p1', 'user1')
+        with pytest.raises(ValueError):
+            service.remove_collaborator('p1', 'user1')
+        mock_firestore.batch.assert_not_called()
+
+
+class TestSceneOrdering:
+    """Test rank-ordered scenes and single-write moves"""
+
+    @staticmethod
+    def snapshot(doc_id, rank):
+        snapshot = MagicMock()
+        snapshot.id = doc_id
+        snapshot.exists = True
+        snapshot.to_dict.return_value = {'id': doc_id, 'rank': rank}
+        return snapshot
+
+    def test_new_scene_is_ranked_after_the_last(self, mock_firestore, sample_scene_data):
+        """Test a created scene gets a rank after the current last scene"""
+        service = StoryBibleService(mock_firestore)
+        scenes = mock_firestore.collection().document().collection()
+        last = scenes.order_by.return_value.limit.return_value
+        last.stream.return_value = [self.snapshot('scene9', 'W')]
+
+        scene = service.create_scene('proj1', sample_scene_data)
+
+        scenes.order_by.assert_called_with('rank', direction='DESCENDING')
+        assert scene['rank'] > 'W'
+
+    def test_lists_sort_by_rank_in_firestore(self, mock_firestore):
+        """Test scene and plot point lists are ordered by the query"""
+        service = StoryBibleService(mock_firestore)
+        scenes = mock_firestore.collection().document().collection()
+        scenes.order_by.return_value.stream.return_value = [self.snapshot('a', 'V')]
+
+        assert [s['id'] for s in service.list_scenes('proj1')] == ['a']
+        service.list_plot_points('proj1')
+
+        assert [c.args for c in scenes.order_by.call_args_list] == [('rank',), ('rank',)]
+
+    def test_move_is_a_single_write(self, mock_firestore):
+        """Test moving a scene reads its neighbours once and updates only itself"""
+        service = StoryBibleService(mock_firestore)
+        mock_firestore.get_all.return_value = [
+            self.snapshot('moved', 'Z'), self.snapshot('prev', 'V'), self.snapshot('next', 'W')
+        ]
+        scenes = mock_firestore.collection().document().collection()
+
+        with patch.object(service.versions, 'bump') as bump:
+            result = service.move_scene('proj1', 'moved', after_id='prev', before_id='next')
+
+        assert 'V' < result['rank'] < 'W'
+        scenes.document.return_value.update.assert_called_once()
+        assert scenes.document.return_value.update.call_args.args[0]['rank'] == result['rank']
+        mock_firestore.get_all.assert_called_once()
+        bump.assert_called_once_with('proj1', 'scenes')
+
+    def test_move_between_unranked_neighbours_rebalances_first(self, mock_firestore):
+        """Test legacy neighbours are ranked before the move is computed"""
+        service = StoryBibleService(mock_firestore)
+        legacy = [self.snapshot('moved', None), self.snapshot('prev', None)]
+        ranked = [self.snapshot('moved', 'W'), self.snapshot('prev', 'V')]
+        mock_firestore.get_all.side_effect = [legacy, ranked]
+
+        with patch.object(service.rebalancer, 'rebalance') as rebalance:
+            result = service.move_scene('proj1', 'moved', after_id='prev')
+
+        rebalance.assert_called_once_with('proj1', 'scenes')
+        assert result['rank'] > 'V'
+
+    def test_move_errors(self, mock_firestore):
+        """Test unknown scenes return None and unknown neighbours raise"""
+        service = StoryBibleService(mock_firestore)
+        mock_firestore.get_all.return_value = [self.snapshot('moved', 'V')]
+
+        with pytest.raises(ValueError):
+            service.move_scene('proj1', 'moved', after_id='gone')
+        with pytest.raises(ValueError):
+            service.move_scene('proj1', 'moved', after_id='moved')
+
+        mock_firestore.get_all.return_value = []
+        assert service.move_scene('proj1', 'missing', before_id='other') is None
@@ -0,0 +1,197 @@
+"""
+Tests for TokenVerifier, using locally minted RS256 tokens
+"""
+import time
+import jwt
+import pytest
+from cryptography.hazmat.primitives import serialization
+from cryptography.hazmat.primitives.asymmetric import rsa
+from utils.token_verifier import TokenVerifier
+
+PROJECT_ID = 'lit-rift-test'
+ISSUER = f'https://securetoken.google.com/{PROJECT_ID}'
+KEY_ID = 'test-key'
+
+
+class LocalKeyEndpoint:
+    """Stand-in for Google's public key endpoint, serving one locally generated key"""
+
+    def __init__(self):
+        self.private_key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+        self.fetches = 0
+
+    def public_keys(self):
+        self.fetches += 1
+        return {KEY_ID: self.private_key.public_key().public_bytes(
+            serialization.Encoding.PEM, serialization.PublicFormat.SubjectPublicKeyInfo
+        )}
+
+    def mint(self, uid, expires_in=3600, issued_at=None):
+        now = int(issued_at or time.time())
+        return jwt.encode(
+            {'uid': uid, 'sub': uid, 'aud': PROJECT_ID, 'iss': ISSUER,
+             'iat': now, 'exp': now + expires_in},
+            self.private_key, algorithm='RS256', headers={'kid': KEY_ID}
+        )
+
+
+class RevokedToken(ValueError):
+    """Stand-in for auth.RevokedIdTokenError"""
+
+
+class LocalFirebaseAuth:
+    """verify_id_token look-alike checking signatures against the local key endpoint"""
+
+    def __init__(self, endpoint):
+        self.endpoint = endpoint
+        self.revoked = set()
+        self.outage = None
+        self.calls = []
+
+    def verify_id_token(self, id_token, check_revoked=False):
+        self.calls.append(check_revoked)
+        kid = jwt.get_unverified_header(id_token)['kid']
+        claims = jwt.decode(id_token, self.endpoint.public_keys()[kid], algorithms=['RS256'],
+                            audience=PROJECT_ID, issuer=ISSUER)
+        if check_revoked and self.outage:
+            raise self.outage
+        if check_revoked and claims['uid'] in self.revoked:
+            raise RevokedToken('The Firebase ID token has been revoked.')
+        return claims
+
+
+@pytest.fixture
+def endpoint():
+    return LocalKeyEndpoint()
+
+
+@pytest.fixture
+def firebase_auth(endpoint):
+    return LocalFirebaseAuth(endpoint)
+
+
+@pytest.fixture
+def clock():
+    now = [time.time()]
+    return now
+
+
+@pytest.fixture
+def verifier(firebase_auth, clock):
+    return TokenVerifier(firebase_auth.verify_id_token, maxsize=2,
+                         revocation_check_interval=300, clock=lambda: clock[0],
+                         revoked_errors=(RevokedToken,))
+
+
+class TestTokenVerifier:
+    """Test suite for TokenVerifier"""
+
+    def test_repeat_requests_skip_verification(self, verifier, endpoint, firebase_auth):
+        """Test a token is verified once and then served from the cache"""
+        token = endpoint.mint('user1')
+
+        for _ in range(5):
+            assert verifier.verify(token)['uid'] == 'user1'
+
+        assert firebase_auth.calls == [False]
+        assert endpoint.fetches == 1
+        stats = verifier.stats()
+        assert (stats['hits'], stats['misses'], stats['verifications']) == (4, 1, 1)
+        assert stats['avg_verify_ms'] > 0
+
+    def test_cache_keys_are_token_hashes(self, verifier, endpoint):
+        """Test raw tokens are not kept as cache keys"""
+        token = endpoint.mint('user1')
+        verifier.verify(token)
+
+        assert token not in verifier._entries
+        assert all(len(key) == 64 for key in verifier._entries)
+
+    def test_cached_token_expires_with_exp_claim(self, verifier, endpoint, firebase_auth, clock):
+        """Test a cached token is re-verified once its exp has passed"""
+        token = endpoint.mint('user1', expires_in=60)
+        verifier.verify(token)
+
+        clock[0] += 61
+        verifier.verify(token)
+
+        assert len(firebase_auth.calls) == 2
+
+    def test_invalid_tokens_are_never_cached(self, verifier, endpoint, firebase_auth):
+        """Test expired or tampered tokens are rejected every time"""
+        expired = endpoint.mint('user1', expires_in=-10)
+        tampered = endpoint.mint('user1')[:-4] + 'AAAA'
+
+        for token in (expired, tampered, expired):
+            with pytest.raises(jwt.InvalidTokenError):
+                verifier.verify(token)
+
+        assert len(firebase_auth.calls) == 3
+        assert verifier.stats()['cached_tokens'] == 0
+
+    def test_revocation_checked_on_cadence(self, verifier, endpoint, firebase_auth, clock):
+        """Test a revoked token keeps working only until the next revocation check"""
+        token = endpoint.mint('user1')
+        verifier.verify(token)
+        firebase_auth.revoked.add('user1')
+
+        clock[0] += 100
+        assert verifier.verify(token)['uid'] == 'user1'
+
+        clock[0] += 201
+        with pytest.raises(ValueError):
+            verifier.verify(token)
+        assert verifier.stats()['cached_tokens'] == 0
+
+        # No longer cached, but not let back in by a local verification either
+        with pytest.raises(ValueError):
+            verifier.verify(token)
+        assert firebase_auth.calls == [False, True, False, True]
+
+    def test_failed_checks_are_not_taken_as_revocations(self, verifier, endpoint, firebase_auth, clock):
+        """Test a revocation check that errors is retried next time, not recorded as revoked"""
+        token = endpoint.mint('user1')
+        verifier.verify(token)
+        clock[0] += 301
+        firebase_auth.outage = ConnectionError('Firebase unavailable')
+
+        with pytest.raises(ConnectionError):
+            verifier.verify(token)
+        assert verifier._revoked == {}
+
+        firebase_auth.outage = None
+        assert verifier.verify(token)['uid'] == 'user1'
+        assert verifier.verify(endpoint.mint('user2'))['uid'] == 'user2'
+        assert firebase_auth.calls == [False, True, True, False]
+
+    def test_new_tokens_are_verified_locally(self, verifier, endpoint, firebase_auth, clock):
+        """Test only cached tokens due a revocation check call Firebase"""
+        for i in range(3):
+            verifier.verify(endpoint.mint(f'user{i}'))
+
+        assert firebase_auth.calls == [False] * 3
+        assert verifier.stats()['revocation_checks'] == 0
+
+    def test_tokens_issued_after_revocation_are_accepted(self, verifier, endpoint, firebase_auth, clock):
+        """Test a user who signs in again after a revocation is verified locally"""
+        old = endpoint.mint('user1', issued_at=time.time() - 10)
+        verifier.verify(old)
+        firebase_auth.revoked.add('user1')
+        clock[0] += 301
+        with pytest.raises(ValueError):
+            verifier.verify(old)
+
+        firebase_auth.revoked.clear()
+        assert verifier.verify(endpoint.mint('user1'))['uid'] == 'user1'
+        assert firebase_auth.calls[-1] is False
+
+    def test_cache_is_bounded(self, verifier, endpoint, firebase_auth):
+        """Test the least recently used token is evicted at maxsize"""
+        tokens = [endpoint.mint(f'user{i}') for i in range(3)]
+        for token in tokens:
+            verifier.verify(token)
+
+        verifier.verify(tokens[0])
+
+        assert verifier.stats()['cached_tokens'] == 2
+        assert len(firebase_auth.calls) == 4
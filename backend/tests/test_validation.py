@@ -0,0 +1,111 @@
+"""
+Tests for request validation
+"""
+import json
+import pytest
+from typing import List
+from flask import Flask, request, jsonify
+from schemas.story_bible_schemas import CreateSceneRequest, UpdateSceneRequest
+from utils.validation import validate_request, validate_json, get_type_adapter
+
+
+@pytest.fixture
+def validation_app():
+    """Minimal app with one route per validation mode"""
+    app = Flask(__name__)
+
+    @app.route('/scenes', methods=['POST'])
+    @validate_request(CreateSceneRequest)
+    def create_scene():
+        return jsonify(request.validated_data.model_dump())
+
+    @app.route('/scenes/strict', methods=['POST'])
+    @validate_request(CreateSceneRequest, strict=True)
+    def create_scene_strict():
+        return jsonify(request.validated_data.model_dump())
+
+    return app.test_client()
+
+
+def post(client, path, body, content_type='application/json'):
+    data = body if isinstance(body, (str, bytes)) else json.dumps(body)
+    return client.post(path, data=data, content_type=content_type)
+
+
+class TestValidateRequest:
+    """Test suite for the validate_request decorator"""
+
+    def test_valid_body(self, validation_app):
+        """Test a valid body is parsed, validated and normalized"""
+        response = post(validation_app, '/scenes',
+                        {'title': '  Opening  ', 'content': 'It was a dark night — “quiet”.',
+                         'sequence': 3})
+
+        assert response.status_code == 200
+        data = response.get_json()
+        assert data['title'] == 'Opening'
+        assert data['content'] == 'It was a dark night — “quiet”.'
+        assert data['sequence'] == 3
+        assert data['status'] == 'draft'
+
+    def test_field_errors(self, validation_app):
+        """Test schema violations are reported per field"""
+        response = post(validation_app, '/scenes', {'title': 'x', 'status': 'lost'})
+
+        assert response.status_code == 400
+        data = response.get_json()
+        assert data['error'] == 'Validation failed'
+        assert data['details'][0]['field'] == 'status'
+
+    def test_strict_is_opt_in(self, validation_app):
+        """Test numbers sent as strings are converted unless the route asks for strict types"""
+        body = {'title': 'Opening', 'sequence': '3'}
+
+        response = post(validation_app, '/scenes', body)
+        assert response.status_code == 200
+        assert response.get_json()['sequence'] == 3
+
+        response = post(validation_app, '/scenes/strict', body)
+        assert response.status_code == 400
+        assert response.get_json()['details'][0]['type'] == 'int_type'
+
+    @pytest.mark.parametrize('body,content_type,error', [
+        ('invalid json', 'application/json', 'Invalid JSON'),
+        ('', 'application/json', 'Request body must be valid JSON'),
+        ('{"title": "Opening"}', 'text/plain', 'Request body must be valid JSON'),
+    ])
+    def test_unusable_bodies(self, validation_app, body, content_type, error):
+        """Test malformed, empty and non-JSON bodies are rejected with 400"""
+        response = post(validation_app, '/scenes', body, content_type)
+
+        assert response.status_code == 400
+        assert response.get_json()['error'] == error
+
+    def test_non_object_body(self, validation_app):
+        """Test a JSON array is a validation error rather than a server error"""
+        response = post(validation_app, '/scenes', [1, 2])
+
+        assert response.status_code == 400
+        assert response.get_json()['error'] == 'Validation failed'
+
+
+class TestValidateJson:
+    """Test suite for validate_json"""
+
+    def test_adapters_are_cached(self):
+        """Test each schema's TypeAdapter is built once"""
+        assert get_type_adapter(UpdateSceneRequest) is get_type_adapter(UpdateSceneRequest)
+
+    def test_non_model_schema(self):
+        """Test plain types are validated through a TypeAdapter"""
+        assert validate_json(List[int], b'[1, 2, 3]') == [1, 2, 3]
+
+    def test_large_scene(self):
+        """Test a scene at the content limit validates from raw bytes"""
+        content = ('word ' * 20000)[:100000]
+        raw = json.dumps({'content': content}).encode('utf-8')
+
+        scene = validate_json(UpdateSceneRequest, raw)
+
+        assert scene.content == content
+        assert scene.model_dump(exclude_unset=True) == {'content': content}
@@ -2,8 +2,11 @@
 Tests for VisualPlanningService
 """
 import pytest
-from unittest.mock import MagicMock
-from services.visual_planning_service import VisualPlanningService
+from unittest.mock import MagicMock, patch
+from google.api_core.exceptions import FailedPrecondition
+import services.visual_planning_service as planning_module
+from services.visual_planning_service import VisualPlanningService, CorkboardItemNotFound
+from utils.json_patch import JsonPatchError, JsonPatchTestFailed
 
 
 class TestVisualPlanningService:
@@ -218,3 +221,262 @@ class TestVisualPlanningService:
         assert result is not None
         assert 'structure' in result
         assert len(result['structure']) == 0
+
+
+def planning_view(mock_firestore, data):
+    """Mock the stored planning view returned for any project"""
+    snapshot = MagicMock()
+    snapshot.exists = data is not None
+    snapshot.to_dict.return_value = data
+    ref = mock_firestore.collection.return_value.document.return_value \
+        .collection.return_value.document.return_value
+    ref.get.return_value = snapshot
+    return ref, snapshot
+
+
+class TestPlanningPatches:
+    """Test suite for patching planning views"""
+
+    def test_patch_matrix_writes_changed_fields(self, mock_firestore):
+        """Test a cell edit updates only the cells, conditional on the read"""
+        service = VisualPlanningService(mock_firestore)
+        ref, snapshot = planning_view(mock_firestore, {
+            'view_type': 'matrix', 'rows': [{'id': 'act_1'}], 'columns': [{'id': 'pp1'}], 'cells': {}
+        })
+
+        result = service.update_matrix_cell('proj1', 0, 'pp1', [{'scene_id': 's1'}])
+
+        assert result['cells'] == {'act_1_pp1': [{'scene_id': 's1'}]}
+        batch = mock_firestore.batch.return_value
+        args, kwargs = batch.update.call_args
+        assert set(args[1]) == {'cells', 'updated_at'}
+        mock_firestore.write_option.assert_called_with(last_update_time=snapshot.update_time)
+        batch.commit.assert_called_once()
+
+    def test_patch_retries_on_conflict(self, mock_firestore):
+        """Test a patch is re-applied when the view changed after it was read"""
+        service = VisualPlanningService(mock_firestore)
+        planning_view(mock_firestore, {'view_type': 'outline', 'structure': []})
+        batch = mock_firestore.batch.return_value
+        batch.commit.side_effect = [FailedPrecondition('changed'), None]
+
+        result = service.patch_view('proj1', 'outline',
+                                    [{'op': 'add', 'path': '/structure/-', 'value': {'id': 'a'}}])
+
+        assert result['structure'] == [{'id': 'a'}]
+        assert batch.commit.call_count == 2
+
+    def test_patch_rejects_other_fields(self, mock_firestore):
+        """Test patches cannot reach outside the view's own fields"""
+        service = VisualPlanningService(mock_firestore)
+
+        with pytest.raises(JsonPatchError):
+            service.patch_view('proj1', 'matrix', [{'op': 'replace', 'path': '/view_type', 'value': 'x'}])
+
+    def test_patch_inline_corkboard_item(self, mock_firestore):
+        """Test an item is patched by ID and the test failure aborts the write"""
+        service = VisualPlanningService(mock_firestore)
+        planning_view(mock_firestore, {'view_type': 'corkboard', 'connections': [], 'items': [
+            {'id': 'a', 'title': 'A', 'position': {'x': 0, 'y': 0}},
+            {'id': 'b', 'title': 'B', 'position': {'x': 1, 'y': 1}},
+        ]})
+
+        result = service.update_corkboard_item('proj1', 'b', {'position': {'x': 5, 'y': 6}})
+
+        assert result['position'] == {'x': 5, 'y': 6}
+        items = mock_firestore.batch.return_value.update.call_args.args[1]['items']
+        assert [item['id'] for item in items] == ['a', 'b']
+        assert items[0] == {'id': 'a', 'title': 'A', 'position': {'x': 0, 'y': 0}}
+
+        with pytest.raises(JsonPatchTestFailed):
+            service.patch_corkboard('proj1', [{'op': 'test', 'path': '/items/a/title', 'value': 'Z'}])
+        with pytest.raises(CorkboardItemNotFound):
+            service.delete_corkboard_item('proj1', 'missing')
+        assert mock_firestore.batch.return_value.commit.call_count == 1
+
+    def test_patch_sharded_corkboard_item(self, mock_firestore):
+        """Test a sharded board reads and writes only the moved item"""
+        service = VisualPlanningService(mock_firestore)
+        ref, _ = planning_view(mock_firestore, {
+            'view_type': 'corkboard', 'connections': [], 'sharded': True,
+            'item_count': 1000, 'last_rank': 'V'
+        })
+        item = MagicMock()
+        item.id = 'card7'
+        item.exists = True
+        item.to_dict.return_value = {'id': 'card7', 'position': {'x': 0, 'y': 0}, 'rank': 'U'}
+        mock_firestore.get_all.return_value = [item]
+
+        service.update_corkboard_item('proj1', 'card7', {'position': {'x': 3, 'y': 4}})
+
+        batch = mock_firestore.batch.return_value
+        written = batch.set.call_args.args[1]
+        assert written['position'] == {'x': 3, 'y': 4}
+        assert written['rank'] == 'U'
+        assert batch.set.call_count == 1
+        assert batch.update.call_args.args[1]['item_count'] == 1000
+
+    def test_corkboard_shards_past_threshold(self, mock_firestore, monkeypatch):
+        """Test adding past the threshold moves every item out of the view document"""
+        monkeypatch.setattr(planning_module, 'CORKBOARD_SHARD_THRESHOLD', 2)
+        service = VisualPlanningService(mock_firestore)
+        planning_view(mock_firestore, {'view_type': 'corkboard', 'connections': [],
+                                       'items': [{'id': 'a'}, {'id': 'b'}]})
+
+        item = service.add_corkboard_item('proj1', {'title': 'C'})
+
+        batch = mock_firestore.batch.return_value
+        ranks = [call.args[1]['rank'] for call in batch.set.call_args_list]
+        assert [call.args[1]['id'] for call in batch.set.call_args_list] == ['a', 'b', item['id']]
+        assert ranks == sorted(ranks)
+        fields = batch.update.call_args.args[1]
+        assert fields['sharded'] is True
+        assert fields['item_count'] == 3
+
+
+def story_bible(scenes, plot_points):
+    """Mock StoryBibleService listing the given scenes and plot points"""
+    service = MagicMock()
+    service.list_scenes.return_value = scenes
+    service.list_plot_points.return_value = plot_points
+    service.list_characters.return_value = []
+    return service
+
+
+class TestPlanningGeneration:
+    """Test suite for generating the matrix and outline"""
+
+    plot_points = [
+        {'id': 'pp1', 'title': 'Inciting incident', 'act': 1},
+        {'id': 'pp2', 'title': 'Midpoint', 'act': 2},
+        {'id': 'pp3', 'title': 'Climax', 'act': 3},
+    ]
+
+    def scenes(self):
+        return [
+            {'id': 's1', 'title': 'One', 'word_count': 100, 'plot_points': ['pp1']},
+            {'id': 's2', 'title': 'Two', 'word_count': 200, 'plot_points': ['pp1', 'pp2']},
+            {'id': 's3', 'title': 'Three', 'word_count': 300, 'plot_points': ['pp3', 'gone']},
+        ]
+
+    def test_generate_matrix(self):
+        """Test scenes are placed in the cells of their plot points' acts"""
+        matrix = VisualPlanningService(None).create_matrix_from_scenes(
+            'proj1', story_bible(self.scenes(), self.plot_points))
+
+        assert [row['id'] for row in matrix['rows']] == ['act_1', 'act_2', 'act_3']
+        assert matrix['cells']['act_1_pp1'] == [
+            {'scene_id': 's1', 'title': 'One', 'word_count': 100},
+            {'scene_id': 's2', 'title': 'Two', 'word_count': 200},
+        ]
+        assert set(matrix['cells']) == {'act_1_pp1', 'act_2_pp2', 'act_3_pp3'}
+
+    def test_generate_outline(self):
+        """Test scenes are nested under their plot points within acts"""
+        outline = VisualPlanningService(None).generate_outline_from_plot(
+            'proj1', story_bible(self.scenes(), self.plot_points))
+
+        acts = outline['structure']
+        assert [act['id'] for act in acts] == ['act_1', 'act_2', 'act_3']
+        assert [scene['id'] for scene in acts[0]['children'][0]['children']] == ['s1', 's2']
+        assert [scene['id'] for scene in acts[2]['children'][0]['children']] == ['s3']
+
+    def test_refresh_matrix_rows_of_changed_scenes(self, mock_firestore):
+        """Test a changed scene rebuilds only the rows it left and joined"""
+        service = VisualPlanningService(None)
+        matrix = service.create_matrix_from_scenes('proj1', story_bible(self.scenes(), self.plot_points))
+        matrix['cells']['act_2_pp2'].append({'scene_id': 'note', 'title': 'Kept edit'})
+        planning_view(mock_firestore, matrix)
+        scenes = self.scenes()
+        scenes[0]['plot_points'] = ['pp3']
+
+        result = VisualPlanningService(mock_firestore).create_matrix_from_scenes(
+            'proj1', story_bible(scenes, self.plot_points), ['s1'])
+
+        assert [entry['scene_id'] for entry in result['cells']['act_1_pp1']] == ['s2']
+        assert [entry['scene_id'] for entry in result['cells']['act_3_pp3']] == ['s1', 's3']
+        assert result['cells']['act_2_pp2'][-1]['title'] == 'Kept edit'
+        written = mock_firestore.batch.return_value.update.call_args.args[1]
+        assert set(written) == {'cells.act_1_pp1', 'cells.act_3_pp3', 'updated_at'}
+
+    def test_refresh_outline_acts_of_changed_scenes(self, mock_firestore):
+        """Test a changed scene rebuilds only the acts it left and joined"""
+        service = VisualPlanningService(None)
+        outline = service.generate_outline_from_plot('proj1', story_bible(self.scenes(), self.plot_points))
+        outline['structure'][1]['title'] = 'Act 2: Edited'
+        planning_view(mock_firestore, outline)
+        scenes = self.scenes()
+        scenes[2]['plot_points'] = ['pp1']
+
+        result = VisualPlanningService(mock_firestore).generate_outline_from_plot(
+            'proj1', story_bible(scenes, self.plot_points), ['s3'])
+
+        acts = result['structure']
+        assert [scene['id'] for scene in acts[0]['children'][0]['children']] == ['s1', 's2', 's3']
+        assert acts[1]['title'] == 'Act 2: Edited'
+        assert acts[2]['children'][0]['children'] == []
+
+
+class TestCorkboardViewport:
+    """Test suite for viewport-windowed corkboard reads"""
+
+    items = [
+        {'id': 'near', 'position': {'x': 100, 'y': 100}, 'size': {'width': 200, 'height': 150}},
+        {'id': 'edge', 'position': {'x': 950, 'y': 500}, 'size': {'width': 200, 'height': 150}},
+        {'id': 'far', 'position': {'x': 5000, 'y': 5000}, 'size': {'width': 200, 'height': 150}},
+    ]
+    connections = [{'from': 'near', 'to': 'far'}, {'from': 'far', 'to': 'far'}]
+
+    def test_inline_window(self, mock_firestore):
+        """Test only overlapping items and the connections touching them are returned"""
+        planning_view(mock_firestore, {'view_type': 'corkboard', 'items': self.items,
+                                       'connections': self.connections})
+
+        result = VisualPlanningService(mock_firestore).get_corkboard('proj1', (0, 0, 1000, 600))
+
+        assert [item['id'] for item in result['items']] == ['near', 'edge']
+        assert result['connections'] == [{'from': 'near', 'to': 'far'}]
+        assert result['bbox'] == [0, 0, 1000, 600]
+
+    def test_item_grid_cells(self):
+        """Test items are indexed by every cell they overlap, and huge items by the wildcard"""
+        assert planning_module._item_doc(self.items[1], 'V')['grid_cells'] == ['0:0', '1:0']
+        huge = {'id': 'map', 'position': {'x': -10, 'y': 0}, 'size': {'width': 9000, 'height': 9000}}
+        assert planning_module._item_doc(huge, 'V')['grid_cells'] == ['*']
+
+    def test_sharded_window_queries_grid_cells(self, mock_firestore):
+        """Test a sharded board queries only the viewport's grid cells"""
+        planning_view(mock_firestore, {'view_type': 'corkboard', 'connections': [], 'sharded': True,
+                                       'grid_size': planning_module.CORKBOARD_GRID_SIZE})
+        snapshots = []
+        for item in self.items[:2]:
+            snapshot = MagicMock()
+            snapshot.id = item['id']
+            snapshot.to_dict.return_value = planning_module._item_doc(item, 'V' + item['id'])
+            snapshots.append(snapshot)
+        items_ref = mock_firestore.collection.return_value.document.return_value.collection.return_value
+        items_ref.where.return_value.stream.return_value = snapshots
+
+        result = VisualPlanningService(mock_firestore).get_corkboard('proj1', (0, 0, 1000, 600))
+
+        grid_filter = items_ref.where.call_args.kwargs['filter']
+        assert grid_filter.value == ['0:0', '1:0', '*']
+        assert [item['id'] for item in result['items']] == ['edge', 'near']
+        assert 'grid_cells' not in result['items'][0]
+
+    def test_huge_sharded_window_reads_whole_board(self, mock_firestore):
+        """Test a viewport over too many cells falls back to a full read without listing them"""
+        planning_view(mock_firestore, {'view_type': 'corkboard', 'connections': [], 'sharded': True,
+                                       'grid_size': planning_module.CORKBOARD_GRID_SIZE})
+        snapshot = MagicMock()
+        snapshot.id = 'near'
+        snapshot.to_dict.return_value = planning_module._item_doc(self.items[0], 'V')
+        items_ref = mock_firestore.collection.return_value.document.return_value.collection.return_value
+        items_ref.order_by.return_value.stream.return_value = [snapshot]
+
+        with patch.object(planning_module, '_grid_cells', side_effect=AssertionError):
+            result = VisualPlanningService(mock_firestore).get_corkboard('proj1', (0, 0, 2e6, 2e6))
+
+        assert planning_module._grid_cell_count((0, 0, 2e6, 2e6)) == 2001 * 2001
+        items_ref.where.assert_not_called()
+        assert [item['id'] for item in result['items']] == ['near']
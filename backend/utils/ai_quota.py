@@ -0,0 +1,224 @@
+"""
+AI Quota
+Per-user, token-weighted throttling for endpoints that call Gemini
+"""
+
+import math
+import os
+import threading
+import time
+from functools import wraps
+from typing import Callable, Dict, Optional, Union
+from flask import request, jsonify
+
+from utils import rate_limiter
+
+# Estimated Gemini tokens (prompt + response) each user may spend per window
+AI_TOKEN_BUDGET = int(os.getenv('AI_TOKEN_BUDGET') or 40000)
+AI_QUOTA_WINDOW = int(os.getenv('AI_QUOTA_WINDOW') or 60)
+
+# Requests that fit within this many seconds wait their turn; later ones are refused.
+# Kept short: a waiting request holds its worker, and gunicorn kills workers after 120s
+AI_QUOTA_MAX_WAIT = float(os.getenv('AI_QUOTA_MAX_WAIT') or 3)
+
+# Rough size of English prose in Gemini tokens
+CHARS_PER_TOKEN = 4
+
+# Instructions wrapped around every prompt, and a typical Story Bible context block
+PROMPT_OVERHEAD_TOKENS = 100
+CONTEXT_TOKENS = 1500
+CHARACTER_CONTEXT_TOKENS = 200
+
+# Expected response sizes, from the word counts the prompts ask for
+SCENE_RESPONSE_TOKENS = {'short': 400, 'medium': 800, 'long': 1350}
+DIALOGUE_RESPONSE_TOKENS = 700
+CONTINUE_RESPONSE_TOKENS = 400
+
+# A full continuity check makes one call per character, location and timeline
+CONTINUITY_CHECK_TOKENS = 12000
+
+
+def estimate_tokens(text: Optional[str]) -> int:
+    """Approximate token count of a piece of text"""
+    return -(-len(text or '') // CHARS_PER_TOKEN)
+
+
+def scene_cost(data) -> int:
+    """Estimated tokens for a generate-scene request"""
+    context = CONTEXT_TOKENS if data.project_id else 0
+    context += CHARACTER_CONTEXT_TOKENS * len(data.characters or [])
+    return (PROMPT_OVERHEAD_TOKENS + context + estimate_tokens(data.prompt)
+            + SCENE_RESPONSE_TOKENS.get(data.length, SCENE_RESPONSE_TOKENS['medium']))
+
+
+def dialogue_cost(data) -> int:
+    """Estimated tokens for a generate-dialogue request"""
+    return (PROMPT_OVERHEAD_TOKENS + CONTEXT_TOKENS
+            + CHARACTER_CONTEXT_TOKENS * len(data.characters)
+            + estimate_tokens(data.situation) + DIALOGUE_RESPONSE_TOKENS)
+
+
+def rewrite_cost(data) -> int:
+    """Estimated tokens for rewrite and expand requests (the response is at least the input)"""
+    text_tokens = estimate_tokens(data.text)
+    context = CONTEXT_TOKENS if data.project_id else 0
+    return PROMPT_OVERHEAD_TOKENS + context + 3 * text_tokens
+
+
+def summarize_cost(data) -> int:
+    """Estimated tokens for a summarize request"""
+    text_tokens = estimate_tokens(data.text)
+    return PROMPT_OVERHEAD_TOKENS + text_tokens + max(50, text_tokens // 4)
+
+
+def continue_cost(data) -> int:
+    """Estimated tokens for a continue-writing request"""
+    context = CONTEXT_TOKENS if data.project_id else 0
+    return (PROMPT_OVERHEAD_TOKENS + context + estimate_tokens(data.text)
+            + estimate_tokens(data.direction) + CONTINUE_RESPONSE_TOKENS)
+
+
+class AIQuota:
+    """
+    Token budget per user, enforced with the shared rate limiter
+
+    Each request is charged its estimated token cost against a budget of
+    AI_TOKEN_BUDGET tokens per AI_QUOTA_WINDOW seconds, keyed by uid, so
+    a long scene uses far more of it than a short summary. A request that
+    will fit within max_wait seconds sleeps until it does; one that would
+    wait longer is refused at once with the seconds until it would fit.
+    """
+
+    def __init__(self, budget: int = AI_TOKEN_BUDGET, window: int = AI_QUOTA_WINDOW,
+                 max_wait: float = AI_QUOTA_MAX_WAIT, limiter=None,
+                 sleep: Callable[[float], None] = time.sleep):
+        self.budget = budget
+        self.window = window
+        self.max_wait = max_wait
+        self._limiter = limiter
+        self.sleep = sleep
+        self.lock = threading.Lock()
+        self._spend: Dict[str, Dict] = {}
+
+    @property
+    def limiter(self):
+        return self._limiter if self._limiter is not None else rate_limiter.limiter
+
+    def acquire(self, uid: str, cost: int) -> Dict:
+        """
+        Charge a request to a user's budget, waiting at most max_wait seconds
+
+        Returns:
+            dict: allowed, waited (seconds slept) and retry_after (seconds
+            until it would fit, when refused)
+        """
+        waited = 0.0
+        while True:
+            allowed, wait = self.limiter.hit(f"ai:{uid}", self.budget, self.window, cost)
+            if allowed:
+                self._record(uid, cost, waited)
+                return {'allowed': True, 'waited': waited, 'retry_after': 0}
+            if waited + wait > self.max_wait:
+                self._record(uid, 0, waited, rejected=True)
+                return {'allowed': False, 'waited': waited, 'retry_after': wait}
+            self.sleep(wait)
+            waited += wait
+
+    def _record(self, uid: str, tokens: int, waited: float, rejected: bool = False):
+        with self.lock:
+            spend = self._spend.setdefault(uid, {
+                'requests': 0, 'tokens': 0, 'queued': 0, 'wait_seconds': 0.0, 'rejected': 0
+            })
+            if rejected:
+                spend['rejected'] += 1
+            else:
+                spend['requests'] += 1
+                spend['tokens'] += tokens
+            spend['queued'] += int(waited > 0)
+            spend['wait_seconds'] += waited
+
+    def user_spend(self, uid: str) -> Dict:
+        """Estimated tokens and requests a user has been charged in this process"""
+        with self.lock:
+            return dict(self._spend.get(uid, {}))
+
+    def stats(self, top: int = 20) -> Dict:
+        """Totals across users, plus the heaviest spenders"""
+        with self.lock:
+            spend = {uid: dict(entry) for uid, entry in self._spend.items()}
+        heaviest = sorted(spend.items(), key=lambda item: item[1]['tokens'], reverse=True)[:top]
+        return {
+            'budget_tokens': self.budget,
+            'window_seconds': self.window,
+            'users': len(spend),
+            'requests': sum(entry['requests'] for entry in spend.values()),
+            'tokens': sum(entry['tokens'] for entry in spend.values()),
+            'queued': sum(entry['queued'] for entry in spend.values()),
+            'rejected': sum(entry['rejected'] for entry in spend.values()),
+            'top_users': [
+                {'uid': uid, **entry, 'wait_seconds': round(entry['wait_seconds'], 3)}
+                for uid, entry in heaviest
+            ],
+        }
+
+    def clear(self):
+        """Forget recorded spend"""
+        with self.lock:
+            self._spend.clear()
+
+
+_default_quota: Optional[AIQuota] = None
+_default_quota_lock = threading.Lock()
+
+
+def get_ai_quota() -> AIQuota:
+    """Get the process-wide AI quota"""
+    global _default_quota
+    with _default_quota_lock:
+        if _default_quota is None:
+            _default_quota = AIQuota()
+        return _default_quota
+
+
+def ai_quota(cost: Union[int, Callable]):
+    """
+    Decorator charging an AI route's estimated token cost to the current user
+
+    Apply it below require_auth (or require_project_access) and
+    validate_request, so the uid and validated body are available.
+
+    Args:
+        cost: Estimated tokens, or a callable taking request.validated_data
+
+    Usage:
+        @bp.route('/summarize', methods=['POST'])
+        @require_auth
+        @validate_request(SummarizeTextRequest)
+        @ai_quota(summarize_cost)
+        def summarize_text(current_user):
+            ...
+    """
+    def decorator(f):
+        @wraps(f)
+        def decorated_function(*args, **kwargs):
+            current_user = kwargs.get('current_user') or {}
+            uid = current_user.get('uid') or request.remote_addr or 'unknown'
+            tokens = cost(getattr(request, 'validated_data', None)) if callable(cost) else cost
+
+            # Fail open if a shared limiter backend is unavailable
+            try:
+                result = get_ai_quota().acquire(uid, tokens)
+            except Exception as e:
+                print(f"Warning: AI quota unavailable: {e}")
+                result = {'allowed': True}
+
+            if not result['allowed']:
+                retry_after = math.ceil(result['retry_after'])
+                response = jsonify({'error': 'AI quota exceeded', 'retry_after': retry_after})
+                response.headers['Retry-After'] = str(retry_after)
+                return response, 429
+
+            return f(*args, **kwargs)
+
+        return decorated_function
+    return decorator
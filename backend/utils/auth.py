@@ -2,10 +2,23 @@
 Authentication middleware and utilities
 """
 from functools import wraps
-from flask import request, jsonify
+from flask import request, jsonify, g, current_app
 import firebase_admin
-from firebase_admin import auth
 import os
+import threading
+import time
+from typing import Dict, Optional, Tuple
+
+from utils.token_verifier import get_token_verifier
+from utils.ttl_cache import TTLCache, MISSING
+
+# Seconds an access decision for (uid, project_id) is reused; denials expire sooner
+PROJECT_ACCESS_TTL = float(os.getenv('PROJECT_ACCESS_TTL') or 30)
+PROJECT_ACCESS_DENIED_TTL = float(os.getenv('PROJECT_ACCESS_DENIED_TTL') or 5)
+
+_project_access_cache = TTLCache(maxsize=10000, ttl=PROJECT_ACCESS_TTL)
+_project_access_stats = {'lookups': 0, 'lookup_seconds': 0.0}
+_project_access_stats_lock = threading.Lock()
 
 def verify_token(id_token):
     """
@@ -32,7 +45,8 @@ def verify_token(id_token):
         if not firebase_admin._apps:
              raise ValueError("Firebase not initialized")
 
-        decoded_token = auth.verify_id_token(id_token)
+        # Cached until the token's exp, with periodic revocation checks
+        decoded_token = get_token_verifier().verify(id_token)
         return decoded_token
     except Exception as e:
         if os.environ.get('FLASK_ENV') == 'development':
@@ -122,10 +136,55 @@ def optional_auth(f):
     return decorated_function
 
 
+def _authorize_project(user_id, project_id, db) -> Tuple[bool, Optional[Dict]]:
+    """
+    Decide project access, consulting the access cache first
+
+    Returns:
+        tuple: (allowed, project document if it was read for this decision)
+    """
+    if not db:
+        # If no database, allow access (development/mock mode)
+        return True, None
+
+    # If using mock auth, allow access
+    if os.environ.get('MOCK_AUTH') == 'true':
+        return True, None
+
+    key = (user_id, project_id)
+    allowed = _project_access_cache.get(key)
+    if allowed is not MISSING:
+        return allowed, None
+
+    start = time.perf_counter()
+    try:
+        # Get project
+        project = db.collection('projects').document(project_id).get()
+        project_data = project.to_dict() if project.exists else None
+    except Exception:
+        # Transient failures are not cached
+        return False, None
+    finally:
+        with _project_access_stats_lock:
+            _project_access_stats['lookups'] += 1
+            _project_access_stats['lookup_seconds'] += time.perf_counter() - start
+
+    # Owner or collaborator
+    allowed = project_data is not None and (
+        project_data.get('owner_id') == user_id
+        or user_id in project_data.get('collaborators', [])
+    )
+    _project_access_cache.set(key, allowed, ttl=None if allowed else PROJECT_ACCESS_DENIED_TTL)
+    return allowed, project_data if allowed else None
+
+
 def check_project_access(user_id, project_id, db):
     """
     Check if user has access to a project
 
+    Decisions are cached per (user_id, project_id) for PROJECT_ACCESS_TTL
+    seconds, and denials for PROJECT_ACCESS_DENIED_TTL seconds.
+
     Args:
         user_id: Firebase user ID
         project_id: Project ID
@@ -134,37 +193,40 @@ def check_project_access(user_id, project_id, db):
     Returns:
         bool: True if user has access, False otherwise
     """
-    if not db:
-        # If no database, allow access (development/mock mode)
-        return True
+    return _authorize_project(user_id, project_id, db)[0]
 
-    # If using mock auth, allow access
-    if os.environ.get('MOCK_AUTH') == 'true':
-        return True
 
-    try:
-        # Get project
-        project_ref = db.collection('projects').document(project_id)
-        project = project_ref.get()
+def invalidate_project_access(project_id, user_id=None):
+    """Forget cached access decisions for a project, or for one user on it"""
+    if user_id is not None:
+        _project_access_cache.invalidate((user_id, project_id))
+    else:
+        _project_access_cache.invalidate_where(lambda key: key[1] == project_id)
 
-        if not project.exists:
-            return False
 
-        project_data = project.to_dict()
-
-        # Check if user is owner
-        if project_data.get('owner_id') == user_id:
-            return True
+def get_authorized_project() -> Optional[Dict]:
+    """
+    Project document read by require_project_access during this request
 
-        # Check if user is collaborator
-        collaborators = project_data.get('collaborators', [])
-        if user_id in collaborators:
-            return True
+    None when the access decision came from the cache; the handler should
+    then read the project itself.
+    """
+    return g.get('authorized_project')
 
-        return False
 
-    except Exception:
-        return False
+def project_access_stats() -> Dict:
+    """Access cache effectiveness: hits skip one Firestore read each"""
+    with _project_access_stats_lock:
+        lookups = _project_access_stats['lookups']
+        lookup_seconds = _project_access_stats['lookup_seconds']
+    avg_lookup_ms = lookup_seconds * 1000 / lookups if lookups else 0.0
+    return {
+        'cache_hits': _project_access_cache.hits,
+        'cache_misses': _project_access_cache.misses,
+        'firestore_lookups': lookups,
+        'avg_lookup_ms': round(avg_lookup_ms, 3),
+        'estimated_saved_ms': round(_project_access_cache.hits * avg_lookup_ms, 1)
+    }
 
 
 def require_project_access(f):
@@ -206,23 +268,15 @@ def require_project_access(f):
         if not project_id:
             return jsonify({'error': 'Project ID required'}), 400
 
-        # Check project access
-        # Use deferred import to avoid circular dependency
-        from flask import current_app
-        # Access db from some global or context if possible, or import from app
-        # But app imports this, so it's tricky.
-        # Ideally db should be in a separate extension module.
-        # For now, we'll try to get it from where it lives.
-
-        try:
-             import app as main_app
-             db = main_app.db
-        except ImportError:
-             db = None
-
-        if not check_project_access(current_user['uid'], project_id, db):
+        # Check project access; app.py registers the Firestore client as an extension
+        db = current_app.extensions.get('firestore')
+        allowed, project = _authorize_project(current_user['uid'], project_id, db)
+        if not allowed:
             return jsonify({'error': 'Access denied'}), 403
 
+        # Handlers can reuse the document instead of reading it again
+        g.authorized_project = project
+
         # Pass current_user to the route
         return f(current_user=current_user, *args, **kwargs)
 
@@ -0,0 +1,105 @@
+"""
+Response compression
+Gzip or Brotli encoding of JSON and text responses, negotiated by Accept-Encoding
+"""
+
+import gzip
+import os
+import threading
+from typing import Dict, Optional
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+# Bodies smaller than this are sent as-is; compressing them costs more than it saves
+COMPRESSION_MIN_SIZE = int(os.getenv('COMPRESSION_MIN_SIZE') or 1024)
+
+# Favour speed: responses are compressed on every request
+GZIP_LEVEL = 3
+BROTLI_QUALITY = 4
+
+COMPRESSIBLE_MIMETYPES = {
+    'application/json', 'application/javascript', 'application/xml', 'image/svg+xml'
+}
+
+_stats_lock = threading.Lock()
+_stats = {'compressed': 0, 'bytes_in': 0, 'bytes_out': 0}
+
+
+def compression_stats() -> Dict:
+    """Responses compressed and their size before and after"""
+    with _stats_lock:
+        return dict(_stats)
+
+
+def _is_compressible(mimetype: Optional[str]) -> bool:
+    return bool(mimetype) and (mimetype.startswith('text/') or mimetype in COMPRESSIBLE_MIMETYPES)
+
+
+def choose_encoding(accept_encodings) -> Optional[str]:
+    """Pick br or gzip from a parsed Accept-Encoding header, or None"""
+    if brotli is not None and accept_encodings['br'] > 0:
+        return 'br'
+    if accept_encodings['gzip'] > 0:
+        return 'gzip'
+    return None
+
+
+def compress_body(data: bytes, encoding: str) -> bytes:
+    """Encode a body with the given content coding"""
+    if encoding == 'br':
+        return brotli.compress(data, quality=BROTLI_QUALITY)
+    return gzip.compress(data, compresslevel=GZIP_LEVEL)
+
+
+def compress_response(response, request, min_size: int = COMPRESSION_MIN_SIZE):
+    """
+    Compress a buffered response when the client accepts it
+
+    Streamed, file and partial responses are passed through untouched.
+    A strong ETag is made weak, since the encoded bytes differ from the
+    identity representation it names.
+    """
+    response.vary.add('Accept-Encoding')
+
+    if (response.status_code != 200 or response.direct_passthrough or response.is_streamed
+            or 'Content-Encoding' in response.headers
+            or not _is_compressible(response.mimetype)):
+        return response
+
+    encoding = choose_encoding(request.accept_encodings)
+    if encoding is None:
+        return response
+
+    data = response.get_data()
+    if len(data) < min_size:
+        return response
+
+    compressed = compress_body(data, encoding)
+    if len(compressed) >= len(data):
+        return response
+
+    response.set_data(compressed)
+    response.headers['Content-Encoding'] = encoding
+    etag, weak = response.get_etag()
+    if etag and not weak:
+        response.set_etag(etag, weak=True)
+
+    with _stats_lock:
+        _stats['compressed'] += 1
+        _stats['bytes_in'] += len(data)
+        _stats['bytes_out'] += len(compressed)
+    return response
+
+
+def init_compression(app):
+    """Compress eligible responses of every route of an app"""
+    from flask import request
+
+    @app.after_request
+    def _compress(response):
+        return compress_response(response, request)
+
+    return app
@@ -0,0 +1,106 @@
+"""
+Conditional GET utilities
+ETags for project views, answered from the project's version document
+"""
+
+import threading
+from functools import wraps
+from typing import Dict
+from flask import request, current_app, make_response, Response
+
+from services.project_versions import ProjectVersionService
+from utils.ttl_cache import TTLCache, MISSING
+
+# Body size last sent per ETag, to estimate what each 304 saved
+_body_sizes = TTLCache(maxsize=8192, ttl=24 * 60 * 60)
+
+_stats_lock = threading.Lock()
+_stats = {
+    'requests': 0,
+    'not_modified': 0,
+    'not_modified_from_version': 0,
+    'bytes_sent': 0,
+    'bytes_saved': 0,
+}
+
+
+def _record(sent: int = 0, saved: int = 0, not_modified: bool = False,
+            from_version: bool = False):
+    with _stats_lock:
+        _stats['requests'] += 1
+        _stats['bytes_sent'] += sent
+        _stats['bytes_saved'] += saved
+        _stats['not_modified'] += int(not_modified)
+        _stats['not_modified_from_version'] += int(from_version)
+
+
+def conditional_get_stats() -> Dict:
+    """Counts of conditional responses and the body bytes they sent and saved"""
+    with _stats_lock:
+        return dict(_stats)
+
+
+def _not_modified(etag: str) -> Response:
+    response = Response(status=304)
+    response.set_etag(etag)
+    response.cache_control.private = True
+    response.cache_control.no_cache = True
+    return response
+
+
+def versioned_etag(*resources: str):
+    """
+    Decorator adding ETag / If-None-Match support to a project view
+
+    The ETag comes from the project's version counters for the given
+    resources, so a matching If-None-Match is answered with 304 after a
+    single small document read, before the handler fetches or serializes
+    anything. Projects without a version document fall back to an ETag
+    hashed from the response body.
+
+    Usage:
+        @bp.route('/projects/<project_id>/characters', methods=['GET'])
+        @require_project_access
+        @versioned_etag('characters')
+        def list_characters(current_user, project_id):
+            ...
+    """
+    def decorator(f):
+        @wraps(f)
+        def decorated_function(*args, **kwargs):
+            project_id = kwargs.get('project_id')
+            etag = None
+            try:
+                versions = ProjectVersionService(current_app.extensions.get('firestore'))
+                etag = versions.etag(project_id, resources, variant=request.full_path)
+            except Exception as e:
+                print(f"Warning: Failed to read project version: {e}")
+
+            if etag and request.if_none_match.contains_weak(etag):
+                size = _body_sizes.get(etag)
+                _record(saved=0 if size is MISSING else size, not_modified=True,
+                        from_version=True)
+                return _not_modified(etag)
+
+            response = make_response(f(*args, **kwargs))
+            if response.status_code != 200 or response.is_streamed:
+                return response
+
+            if etag:
+                response.set_etag(etag)
+            elif not response.get_etag()[0]:
+                response.add_etag()
+            response.cache_control.private = True
+            response.cache_control.no_cache = True
+
+            size = response.calculate_content_length() or 0
+            _body_sizes.set(response.get_etag()[0], size)
+            response = response.make_conditional(request)
+            if response.status_code == 304:
+                _record(saved=size, not_modified=True)
+            else:
+                _record(sent=size)
+            return response
+
+        return decorated_function
+    return decorator
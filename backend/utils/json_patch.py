@@ -0,0 +1,155 @@
+"""
+JSON Patch (RFC 6902)
+Applies add/remove/replace/move/copy/test operations to plain JSON documents
+"""
+
+import copy
+from typing import Any, Dict, List, Tuple
+
+JSON_PATCH_OPS = ('add', 'remove', 'replace', 'move', 'copy', 'test')
+
+# Operations accepted in one patch
+MAX_PATCH_OPS = 200
+
+
+class JsonPatchError(ValueError):
+    """A patch is malformed or does not apply to the document"""
+
+
+class JsonPatchTestFailed(JsonPatchError):
+    """A 'test' operation did not match, e.g. because the document changed"""
+
+
+def parse_pointer(pointer: str) -> List[str]:
+    """Split a JSON Pointer (RFC 6901) into unescaped reference tokens"""
+    if pointer == '':
+        return []
+    if not isinstance(pointer, str) or not pointer.startswith('/'):
+        raise JsonPatchError(f"Invalid JSON pointer: {pointer!r}")
+    return [token.replace('~1', '/').replace('~0', '~') for token in pointer[1:].split('/')]
+
+
+def escape_token(token: str) -> str:
+    """Escape one reference token for use in a JSON Pointer"""
+    return token.replace('~', '~0').replace('/', '~1')
+
+
+def _index(container: list, token: str, allow_end: bool = False) -> int:
+    if allow_end and token == '-':
+        return len(container)
+    if not token.isdigit() or (token != '0' and token.startswith('0')):
+        raise JsonPatchError(f"Invalid array index: {token!r}")
+    index = int(token)
+    if index > len(container) or (index == len(container) and not allow_end):
+        raise JsonPatchError(f"Array index out of range: {index}")
+    return index
+
+
+def _parent(doc: Any, tokens: List[str]) -> Tuple[Any, str]:
+    """The container holding the target of a pointer, and the target's token"""
+    target = doc
+    for token in tokens[:-1]:
+        if isinstance(target, dict) and token in target:
+            target = target[token]
+        elif isinstance(target, list):
+            target = target[_index(target, token)]
+        else:
+            raise JsonPatchError(f"Path not found: /{'/'.join(tokens)}")
+    return target, tokens[-1]
+
+
+def resolve(doc: Any, pointer: str) -> Any:
+    """Value a JSON Pointer refers to"""
+    tokens = parse_pointer(pointer)
+    if not tokens:
+        return doc
+    container, token = _parent(doc, tokens)
+    if isinstance(container, dict) and token in container:
+        return container[token]
+    if isinstance(container, list):
+        return container[_index(container, token)]
+    raise JsonPatchError(f"Path not found: {pointer}")
+
+
+def _add(doc: Any, tokens: List[str], value: Any) -> Any:
+    if not tokens:
+        return value
+    container, token = _parent(doc, tokens)
+    if isinstance(container, dict):
+        container[token] = value
+    elif isinstance(container, list):
+        container.insert(_index(container, token, allow_end=True), value)
+    else:
+        raise JsonPatchError(f"Cannot add to a scalar at /{'/'.join(tokens)}")
+    return doc
+
+
+def _remove(doc: Any, tokens: List[str]) -> Any:
+    if not tokens:
+        raise JsonPatchError("Cannot remove the whole document")
+    container, token = _parent(doc, tokens)
+    if isinstance(container, dict) and token in container:
+        return container.pop(token)
+    if isinstance(container, list):
+        return container.pop(_index(container, token))
+    raise JsonPatchError(f"Path not found: /{'/'.join(tokens)}")
+
+
+def validate_patch(ops: Any) -> List[Dict]:
+    """
+    Check the shape of a patch
+
+    Raises:
+        JsonPatchError: If it is not a list of well-formed operations
+    """
+    if not isinstance(ops, list):
+        raise JsonPatchError("A patch must be a list of operations")
+    if len(ops) > MAX_PATCH_OPS:
+        raise JsonPatchError(f"At most {MAX_PATCH_OPS} operations per patch")
+    for op in ops:
+        if not isinstance(op, dict) or op.get('op') not in JSON_PATCH_OPS:
+            raise JsonPatchError(f"Invalid operation: {op!r}")
+        parse_pointer(op.get('path'))
+        if op['op'] in ('add', 'replace', 'test') and 'value' not in op:
+            raise JsonPatchError(f"'{op['op']}' requires a value")
+        if op['op'] in ('move', 'copy'):
+            parse_pointer(op.get('from'))
+    return ops
+
+
+def apply_patch(doc: Any, ops: List[Dict]) -> Any:
+    """
+    Apply a patch to a copy of a document
+
+    The patch applies as a whole or not at all: the input is never modified.
+
+    Returns:
+        The patched document
+
+    Raises:
+        JsonPatchTestFailed: If a 'test' operation does not match
+        JsonPatchError: If an operation does not apply
+    """
+    doc = copy.deepcopy(doc)
+    for op in validate_patch(ops):
+        tokens = parse_pointer(op['path'])
+        name = op['op']
+        if name == 'add':
+            doc = _add(doc, tokens, copy.deepcopy(op['value']))
+        elif name == 'remove':
+            _remove(doc, tokens)
+        elif name == 'replace':
+            resolve(doc, op['path'])
+            if tokens:
+                _remove(doc, tokens)
+            doc = _add(doc, tokens, copy.deepcopy(op['value']))
+        elif name == 'move':
+            source = parse_pointer(op['from'])
+            if tokens[:len(source)] == source and tokens != source:
+                raise JsonPatchError("Cannot move a value into itself")
+            doc = _add(doc, tokens, _remove(doc, source))
+        elif name == 'copy':
+            doc = _add(doc, tokens, copy.deepcopy(resolve(doc, op['from'])))
+        elif resolve(doc, op['path']) != op['value']:
+            raise JsonPatchTestFailed(f"Test failed at {op['path']}")
+    return doc
@@ -0,0 +1,81 @@
+"""
+JSON provider
+Serializes responses with orjson when it is installed, and the stdlib json otherwise
+"""
+
+import json
+from typing import Any
+
+from flask.json.provider import DefaultJSONProvider
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - exercised only without orjson installed
+    orjson = None
+
+
+def _orjson_options(sort_keys: bool, indent: bool = False) -> int:
+    # Dates and dataclasses go through DefaultJSONProvider's default() so the
+    # output matches the stdlib provider (HTTP dates rather than ISO 8601)
+    options = (orjson.OPT_NON_STR_KEYS | orjson.OPT_PASSTHROUGH_DATETIME
+               | orjson.OPT_PASSTHROUGH_DATACLASS)
+    if sort_keys:
+        options |= orjson.OPT_SORT_KEYS
+    if indent:
+        options |= orjson.OPT_INDENT_2
+    return options
+
+
+def dumps_bytes(obj: Any, sort_keys: bool = True) -> bytes:
+    """
+    Encode an object as compact UTF-8 JSON
+
+    Uses orjson when available; values it cannot encode (e.g. integers
+    beyond 64 bits) fall back to the stdlib encoder.
+    """
+    if orjson is not None:
+        try:
+            return orjson.dumps(obj, default=DefaultJSONProvider.default,
+                                option=_orjson_options(sort_keys))
+        except (orjson.JSONEncodeError, TypeError):
+            pass
+    return json.dumps(obj, default=DefaultJSONProvider.default, sort_keys=sort_keys,
+                      separators=(',', ':'), ensure_ascii=False).encode('utf-8')
+
+
+class ORJSONProvider(DefaultJSONProvider):
+    """
+    Flask JSON provider backed by orjson
+
+    Keeps DefaultJSONProvider's behaviour (sorted keys, the same handling
+    of dates, UUIDs and dataclasses, indentation in debug mode) and falls
+    back to it for anything orjson rejects.
+    """
+
+    def dumps(self, obj: Any, **kwargs: Any) -> str:
+        if orjson is None or kwargs:
+            return super().dumps(obj, **kwargs)
+        return dumps_bytes(obj, self.sort_keys).decode('utf-8')
+
+    def loads(self, s, **kwargs: Any) -> Any:
+        if orjson is None or kwargs:
+            return super().loads(s, **kwargs)
+        try:
+            return orjson.loads(s)
+        except orjson.JSONDecodeError:
+            # The stdlib also accepts NaN/Infinity and integers beyond 64 bits
+            return super().loads(s)
+
+    def response(self, *args: Any, **kwargs: Any):
+        obj = self._prepare_response_obj(args, kwargs)
+        if orjson is None:
+            return super().response(obj)
+
+        indent = self.compact is False or (self.compact is None and self._app.debug)
+        try:
+            body = orjson.dumps(obj, default=self.default,
+                                option=_orjson_options(self.sort_keys, indent)
+                                | orjson.OPT_APPEND_NEWLINE)
+        except (orjson.JSONEncodeError, TypeError):
+            return super().response(obj)
+        return self._app.response_class(body, mimetype=self.mimetype)
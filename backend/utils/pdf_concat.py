@@ -0,0 +1,111 @@
+"""
+PDF Concatenation
+Joins PDFs page by page into one output file, holding one input at a time
+"""
+
+from io import BytesIO
+from typing import BinaryIO, Iterable, List
+
+from pypdf import PdfReader
+from pypdf.generic import ArrayObject, DictionaryObject, IndirectObject, NameObject
+
+# Object numbers of the document catalog and page tree, written last
+_CATALOG = 1
+_PAGES = 2
+
+
+class _PdfOutput:
+    """Writes numbered objects straight to a file and keeps only their offsets"""
+
+    def __init__(self, output: BinaryIO):
+        self.output = output
+        self.start = output.tell()
+        self.offsets: List[int] = [0, 0, 0]  # Entry 0 is the free-list head
+        output.write(b'%PDF-1.4\n%\xe2\xe3\xcf\xd3\n')
+
+    def reserve(self) -> int:
+        """Next unused object number"""
+        self.offsets.append(0)
+        return len(self.offsets) - 1
+
+    def write_object(self, number: int, obj) -> None:
+        self.offsets[number] = self.output.tell() - self.start
+        self.output.write(b'%d 0 obj\n' % number)
+        if isinstance(obj, bytes):
+            self.output.write(obj)
+        else:
+            obj.write_to_stream(self.output)
+        self.output.write(b'\nendobj\n')
+
+    def finish(self, pages: List[int]) -> None:
+        """Write the page tree, catalog, cross-reference table and trailer"""
+        kids = b' '.join(b'%d 0 R' % page for page in pages)
+        self.write_object(_PAGES, b'<< /Type /Pages /Kids [%s] /Count %d >>' % (kids, len(pages)))
+        self.write_object(_CATALOG, b'<< /Type /Catalog /Pages %d 0 R >>' % _PAGES)
+
+        xref = self.output.tell() - self.start
+        self.output.write(b'xref\n0 %d\n0000000000 65535 f \n' % len(self.offsets))
+        for offset in self.offsets[1:]:
+            self.output.write(b'%010d 00000 n \n' % offset)
+        self.output.write(b'trailer\n<< /Size %d /Root %d 0 R >>\nstartxref\n%d\n%%%%EOF\n'
+                          % (len(self.offsets), _CATALOG, xref))
+
+
+def _copy_pages(data: bytes, out: _PdfOutput) -> List[int]:
+    """Write one PDF's pages and everything they reference; returns the new page numbers"""
+    reader = PdfReader(BytesIO(data))
+    numbers = {}  # Input object number -> output object number
+    queue = []
+
+    def relink(obj):
+        """Point obj's references at output numbers, queueing objects not yet written"""
+        if isinstance(obj, IndirectObject):
+            if obj.pdf is None:
+                return obj  # Already relinked; pages can share an inherited object
+            if obj.idnum not in numbers:
+                numbers[obj.idnum] = out.reserve()
+                queue.append(obj)
+            return IndirectObject(numbers[obj.idnum], 0, None)
+        if isinstance(obj, DictionaryObject):
+            for key, value in list(dict.items(obj)):
+                dict.__setitem__(obj, key, relink(value))
+        elif isinstance(obj, ArrayObject):
+            for i, value in enumerate(list.__iter__(obj)):
+                list.__setitem__(obj, i, relink(value))
+        return obj
+
+    pages = list(reader.pages)
+    for page in pages:
+        numbers[page.indirect_reference.idnum] = out.reserve()
+    for page in pages:
+        dict.__setitem__(page, NameObject('/Parent'), IndirectObject(_PAGES, 0, None))
+        out.write_object(numbers[page.indirect_reference.idnum], relink(page))
+
+    while queue:
+        original = queue.pop()
+        out.write_object(numbers[original.idnum], relink(original.get_object()))
+    return [numbers[page.indirect_reference.idnum] for page in pages]
+
+
+def concatenate_pdfs(fragments: Iterable[bytes], output: BinaryIO) -> int:
+    """
+    Write the pages of several PDFs, in order, as one PDF
+
+    Each fragment's pages and the objects they use are written as soon as
+    the fragment is read, so memory holds one fragment and a table of
+    object offsets rather than the whole document. Outlines and metadata
+    of the fragments are not carried over.
+
+    Args:
+        fragments: PDF files' bytes, in order
+        output: Binary file the combined PDF is written to
+
+    Returns:
+        int: Number of pages written
+    """
+    out = _PdfOutput(output)
+    pages = []
+    for data in fragments:
+        pages.extend(_copy_pages(data, out))
+    out.finish(pages)
+    return len(pages)
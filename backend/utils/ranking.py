@@ -0,0 +1,132 @@
+"""
+Fractional rank keys
+Strings ordering items so that any item can be moved by rewriting only its own key
+"""
+
+import os
+import string
+from typing import List, Optional
+
+# Digits in ascending byte order, so keys compare the same in Python and Firestore
+RANK_DIGITS = string.digits + string.ascii_uppercase + string.ascii_lowercase
+RANK_BASE = len(RANK_DIGITS)
+_DIGIT_VALUES = {digit: value for value, digit in enumerate(RANK_DIGITS)}
+
+# Digits of keys produced by appends and rebalancing; the last one is left free
+# so a few items can later be slotted between neighbours without growing the key
+RANK_WIDTH = 3
+
+# Keys longer than this get their collection rebalanced in the background
+RANK_MAX_LENGTH = int(os.getenv('RANK_MAX_LENGTH') or 12)
+
+
+def _encode(value: int, width: int) -> str:
+    """Fixed-width digits of value, without trailing zero digits"""
+    digits = []
+    for _ in range(width):
+        value, digit = divmod(value, RANK_BASE)
+        digits.append(RANK_DIGITS[digit])
+    return ''.join(reversed(digits)).rstrip(RANK_DIGITS[0])
+
+
+def _decode(key: str, width: int) -> int:
+    """Value of a key padded with zero digits to width"""
+    value = 0
+    for digit in key.ljust(width, RANK_DIGITS[0]):
+        value = value * RANK_BASE + _DIGIT_VALUES[digit]
+    return value
+
+
+def _midpoint(low: str, high: Optional[str]) -> str:
+    """A key strictly between low ('' for the start) and high (None for the end)"""
+    if high is not None:
+        # Skip the digits both keys share
+        n = 0
+        while n < len(high) and (low[n] if n < len(low) else RANK_DIGITS[0]) == high[n]:
+            n += 1
+        if n:
+            return high[:n] + _midpoint(low[n:], high[n:])
+
+    low_digit = _DIGIT_VALUES[low[0]] if low else 0
+    high_digit = _DIGIT_VALUES[high[0]] if high is not None else RANK_BASE
+    if high_digit - low_digit > 1:
+        return RANK_DIGITS[(low_digit + high_digit) // 2]
+    # Adjacent digits: high's first digit alone sorts between them if high goes on
+    if high is not None and len(high) > 1:
+        return high[:1]
+    return RANK_DIGITS[low_digit] + _midpoint(low[1:], None)
+
+
+def validate_rank(key: str) -> None:
+    """Raise ValueError unless key is a usable rank"""
+    if not key or key[-1] == RANK_DIGITS[0] or any(digit not in _DIGIT_VALUES for digit in key):
+        raise ValueError(f"Invalid rank: {key!r}")
+
+
+def rank_between(before: Optional[str], after: Optional[str]) -> str:
+    """
+    Key sorting strictly between two keys
+
+    Args:
+        before: Key of the preceding item, or None for the start
+        after: Key of the following item, or None for the end
+
+    Returns:
+        str: New key
+
+    Raises:
+        ValueError: If before does not sort before after
+    """
+    for key in (before, after):
+        if key is not None:
+            validate_rank(key)
+    if before is not None and after is not None and before >= after:
+        raise ValueError(f"Rank {before!r} does not sort before {after!r}")
+    return _midpoint(before or '', after)
+
+
+def rank_after(key: Optional[str]) -> str:
+    """
+    Key for an item appended after key
+
+    Steps over the last digit, so appends keep keys short and leave room
+    for insertions between consecutive items. Once the key's width is used
+    up, the key grows by one digit rather than halving towards the end.
+    """
+    if key is None:
+        return rank_between(None, None)
+    validate_rank(key)
+    for width in (max(RANK_WIDTH, len(key)), len(key) + 1, len(key) + 2):
+        value = _decode(key, width) + RANK_BASE
+        if value < RANK_BASE ** width:
+            break
+    return _encode(value, width)
+
+
+def rank_before(key: Optional[str]) -> str:
+    """Key for an item prepended before key"""
+    if key is None:
+        return rank_between(None, None)
+    validate_rank(key)
+    for width in (max(RANK_WIDTH, len(key)), len(key) + 1, len(key) + 2):
+        value = _decode(key, width) - RANK_BASE
+        if value > 0:
+            break
+    return _encode(value, width)
+
+
+def spread_ranks(count: int) -> List[str]:
+    """
+    Evenly spaced ascending keys for count items
+
+    The keys fill the middle half of the key space, leaving room at both
+    ends for appends and prepends, and at least two steps between
+    neighbours for insertions.
+    """
+    width = RANK_WIDTH
+    while RANK_BASE ** width < 4 * (count + 1) * RANK_BASE:
+        width += 1
+    space = RANK_BASE ** width
+    step = space // (2 * (count + 1))
+    start = space // 4
+    return [_encode(start + i * step, width) for i in range(1, count + 1)]
@@ -1,23 +1,63 @@
 """
 Rate limiting utilities
 """
+from abc import ABC, abstractmethod
 from functools import wraps
 from flask import request, jsonify
-from datetime import datetime, timedelta
-from collections import defaultdict
+from typing import Callable, Optional, Tuple
+import math
+import os
+import sqlite3
 import threading
+import time
 
+# Where limiter state lives: memory (per process, the desktop default),
+# sqlite (shared by every worker on one host) or redis (shared across hosts)
+RATE_LIMIT_BACKEND = os.getenv('RATE_LIMIT_BACKEND') or 'memory'
 
-class RateLimiter:
-    """
-    Simple in-memory rate limiter
+# SQLite file for the sqlite backend; defaults to the app data directory
+RATE_LIMIT_DB_PATH = os.getenv('RATE_LIMIT_DB_PATH')
 
-    For production, use Redis-based rate limiting
-    """
+# Connection URL for the redis backend
+REDIS_URL = os.getenv('REDIS_URL') or 'redis://localhost:6379/0'
+
+# Independent lock/dict shards; requests for different keys rarely contend
+RATE_LIMIT_STRIPES = 16
+
+# Seconds between sweeps of every stripe for keys whose limit has fully recovered
+RATE_LIMIT_SWEEP_INTERVAL = 60.0
+
+# Slack for float drift when N intervals add up to slightly more than the window
+_EPSILON = 1e-9
+
+
+class _Stripe:
+    """One shard of limiter state: key -> (theoretical arrival time, emission interval)"""
+
+    __slots__ = ('lock', 'state')
 
     def __init__(self):
-        self.requests = defaultdict(list)
         self.lock = threading.Lock()
+        self.state = {}
+
+
+class RateLimiterBackend(ABC):
+    """Interface shared by the limiter backends"""
+
+    @abstractmethod
+    def hit(self, key: str, limit: int, window: int, cost: float = 1) -> Tuple[bool, float]:
+        """
+        Record a request against a key if it is within the limit
+
+        Args:
+            key: Unique identifier (e.g., IP address or user ID)
+            limit: Maximum number of requests (or units of cost)
+            window: Time window in seconds
+            cost: Units the request uses; capped at limit so it can always pass eventually
+
+        Returns:
+            tuple: (allowed, seconds until the next request would be allowed)
+        """
 
     def is_allowed(self, key: str, limit: int, window: int) -> bool:
         """
@@ -31,38 +71,266 @@ class RateLimiter:
         Returns:
             bool: True if allowed, False if rate limited
         """
-        now = datetime.now()
-        window_start = now - timedelta(seconds=window)
+        return self.hit(key, limit, window)[0]
 
-        with self.lock:
-            # Clean old requests
-            self.requests[key] = [
-                timestamp for timestamp in self.requests[key]
-                if timestamp > window_start
-            ]
+    @abstractmethod
+    def get_wait_time(self, key: str, window: int) -> int:
+        """Get seconds until next request is allowed"""
+
+    def sweep(self) -> int:
+        """Evict every idle key now; returns the number evicted"""
+        return 0
+
+
+class RateLimiter(RateLimiterBackend):
+    """
+    In-memory GCRA (generic cell rate algorithm) rate limiter
+
+    Each key holds a single float, its theoretical arrival time (TAT), so a
+    check is O(1) regardless of the limit. A limit of N per window lets a
+    fresh key burst N requests and then refills one slot every window / N
+    seconds. Keys whose TAT has passed carry no information. The first hit
+    after each sweep interval sweeps them out of every stripe, so memory
+    tracks active clients rather than every client ever seen.
+    """
+
+    def __init__(self, stripes: int = RATE_LIMIT_STRIPES,
+                 sweep_interval: float = RATE_LIMIT_SWEEP_INTERVAL,
+                 clock: Callable[[], float] = time.monotonic):
+        self.clock = clock
+        self.sweep_interval = sweep_interval
+        self._stripes = [_Stripe() for _ in range(max(1, stripes))]
+        self._last_sweep = clock()
+        self._sweep_lock = threading.Lock()
 
-            # Check limit
-            if len(self.requests[key]) >= limit:
-                return False
+    def _stripe(self, key: str) -> _Stripe:
+        return self._stripes[hash(key) % len(self._stripes)]
 
-            # Add current request
-            self.requests[key].append(now)
-            return True
+    def hit(self, key: str, limit: int, window: int, cost: float = 1) -> Tuple[bool, float]:
+        interval = window / limit
+        increment = interval * min(cost, limit)
+        now = self.clock()
+        if now - self._last_sweep >= self.sweep_interval:
+            self._sweep_if_due(now)
+        stripe = self._stripe(key)
+
+        with stripe.lock:
+            entry = stripe.state.get(key)
+            tat = max(entry[0], now) if entry else now
+            new_tat = tat + increment
+
+            if new_tat - now > window + _EPSILON:
+                return False, new_tat - window - now
+
+            stripe.state[key] = (new_tat, interval)
+            return True, 0.0
 
     def get_wait_time(self, key: str, window: int) -> int:
-        """Get seconds until next request is allowed"""
-        if key not in self.requests or not self.requests[key]:
+        stripe = self._stripe(key)
+        with stripe.lock:
+            entry = stripe.state.get(key)
+        if not entry:
             return 0
 
-        oldest_request = min(self.requests[key])
-        window_end = oldest_request + timedelta(seconds=window)
-        wait_time = (window_end - datetime.now()).total_seconds()
+        tat, interval = entry
+        return max(0, math.ceil(tat + interval - window - self.clock()))
+
+    def _sweep_if_due(self, now: float):
+        """Sweep from one request when the interval has passed; others carry on"""
+        if not self._sweep_lock.acquire(blocking=False):
+            return
+        try:
+            if now - self._last_sweep >= self.sweep_interval:
+                self._sweep_all(now)
+        finally:
+            self._sweep_lock.release()
+
+    def _sweep_all(self, now: float) -> int:
+        # One stripe lock at a time, never while holding another
+        evicted = 0
+        for stripe in self._stripes:
+            with stripe.lock:
+                idle = [key for key, (tat, _) in stripe.state.items() if tat <= now]
+                for key in idle:
+                    del stripe.state[key]
+            evicted += len(idle)
+        self._last_sweep = now
+        return evicted
+
+    def sweep(self) -> int:
+        with self._sweep_lock:
+            return self._sweep_all(self.clock())
+
+    def __len__(self) -> int:
+        return sum(len(stripe.state) for stripe in self._stripes)
+
+
+class SQLiteRateLimiter(RateLimiterBackend):
+    """
+    GCRA limiter whose state is a SQLite table shared by every worker process
+
+    Each check runs in a BEGIN IMMEDIATE transaction, so the read and
+    update of a key's TAT are atomic across processes on the same host.
+    Times are wall-clock, since monotonic clocks are not comparable
+    between processes.
+    """
+
+    def __init__(self, db_path: Optional[str] = None,
+                 sweep_interval: float = RATE_LIMIT_SWEEP_INTERVAL,
+                 clock: Callable[[], float] = time.time):
+        if db_path is None:
+            from db.schema import DB_PATH
+            db_path = os.path.join(os.path.dirname(DB_PATH), 'rate_limits.db')
+        self.db_path = db_path
+        self.sweep_interval = sweep_interval
+        self.clock = clock
+        self._local = threading.local()
+        self._last_sweep = clock()
+
+    def _get_conn(self):
+        """Open this thread's connection on first use"""
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            os.makedirs(os.path.dirname(self.db_path) or '.', exist_ok=True)
+            conn = sqlite3.connect(self.db_path, timeout=5, isolation_level=None)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            conn.execute('''
+                CREATE TABLE IF NOT EXISTS rate_limits (
+                    key TEXT PRIMARY KEY,
+                    tat REAL NOT NULL,
+                    interval REAL NOT NULL
+                ) WITHOUT ROWID
+            ''')
+            self._local.conn = conn
+        return conn
+
+    def hit(self, key: str, limit: int, window: int, cost: float = 1) -> Tuple[bool, float]:
+        interval = window / limit
+        increment = interval * min(cost, limit)
+        conn = self._get_conn()
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            now = self.clock()
+            if now - self._last_sweep >= self.sweep_interval:
+                self._last_sweep = now
+                conn.execute('DELETE FROM rate_limits WHERE tat <= ?', (now,))
+
+            row = conn.execute('SELECT tat FROM rate_limits WHERE key = ?', (key,)).fetchone()
+            tat = max(row[0], now) if row else now
+            new_tat = tat + increment
+
+            if new_tat - now > window + _EPSILON:
+                conn.execute('COMMIT')
+                return False, new_tat - window - now
+
+            conn.execute(
+                'INSERT INTO rate_limits (key, tat, interval) VALUES (?, ?, ?) '
+                'ON CONFLICT(key) DO UPDATE SET tat = excluded.tat, interval = excluded.interval',
+                (key, new_tat, interval)
+            )
+            conn.execute('COMMIT')
+            return True, 0.0
+        except Exception:
+            conn.execute('ROLLBACK')
+            raise
+
+    def get_wait_time(self, key: str, window: int) -> int:
+        row = self._get_conn().execute(
+            'SELECT tat, interval FROM rate_limits WHERE key = ?', (key,)
+        ).fetchone()
+        if not row:
+            return 0
+
+        tat, interval = row
+        return max(0, math.ceil(tat + interval - window - self.clock()))
+
+    def sweep(self) -> int:
+        now = self.clock()
+        self._last_sweep = now
+        return self._get_conn().execute('DELETE FROM rate_limits WHERE tat <= ?', (now,)).rowcount
+
+    def __len__(self) -> int:
+        return self._get_conn().execute('SELECT COUNT(*) FROM rate_limits').fetchone()[0]
+
+
+# Atomic GCRA check-and-update. Uses the server clock so every client agrees
+# on "now", and lets Redis expire keys once their limit has fully recovered.
+# Floats are returned as strings because Lua numbers are truncated in replies.
+REDIS_GCRA_SCRIPT = """
+redis.replicate_commands()
+local interval = tonumber(ARGV[1])
+local window = tonumber(ARGV[2])
+local increment = tonumber(ARGV[3])
+local time = redis.call('TIME')
+local now = tonumber(time[1]) + tonumber(time[2]) / 1000000
+local tat = tonumber(redis.call('HGET', KEYS[1], 'tat')) or now
+if tat < now then tat = now end
+local new_tat = tat + increment
+local wait = new_tat - window - now
+if wait > 1e-9 then
+    return {0, tostring(wait)}
+end
+redis.call('HSET', KEYS[1], 'tat', tostring(new_tat), 'interval', tostring(interval))
+redis.call('PEXPIREAT', KEYS[1], math.ceil(new_tat * 1000))
+return {1, '0'}
+"""
+
+
+class RedisRateLimiter(RateLimiterBackend):
+    """
+    GCRA limiter whose state lives in Redis, shared across processes and hosts
+
+    The check-and-update runs as one Lua script, so it is atomic on the
+    server. Idle keys expire on their own.
+    """
+
+    def __init__(self, client, prefix: str = 'ratelimit:'):
+        self.client = client
+        self.prefix = prefix
+        self._script = client.register_script(REDIS_GCRA_SCRIPT)
+
+    def hit(self, key: str, limit: int, window: int, cost: float = 1) -> Tuple[bool, float]:
+        interval = window / limit
+        allowed, wait = self._script(keys=[self.prefix + key],
+                                     args=[interval, window, interval * min(cost, limit)])
+        return bool(int(allowed)), float(wait)
+
+    def get_wait_time(self, key: str, window: int) -> int:
+        tat, interval = self.client.hmget(self.prefix + key, ['tat', 'interval'])
+        if tat is None:
+            return 0
+
+        seconds, micros = self.client.time()
+        now = seconds + micros / 1000000
+        return max(0, math.ceil(float(tat) + float(interval) - window - now))
+
+
+def create_limiter(backend: str = RATE_LIMIT_BACKEND) -> RateLimiterBackend:
+    """
+    Build the limiter for the configured backend
+
+    Falls back to the in-memory limiter when the backend cannot be set up.
+    """
+    if backend == 'sqlite':
+        return SQLiteRateLimiter(RATE_LIMIT_DB_PATH)
+
+    if backend == 'redis':
+        try:
+            import redis
+            return RedisRateLimiter(redis.Redis.from_url(REDIS_URL))
+        except ImportError:
+            print("Warning: redis package not installed, using in-memory rate limiting")
+        except Exception as e:
+            print(f"Warning: Could not connect rate limiter to Redis: {e}")
+    elif backend != 'memory':
+        print(f"Warning: Unknown rate limit backend '{backend}', using memory")
 
-        return max(0, int(wait_time))
+    return RateLimiter()
 
 
 # Global rate limiter instance
-limiter = RateLimiter()
+limiter = create_limiter()
 
 
 def rate_limit(limit=100, window=60, per='ip'):
@@ -101,13 +369,17 @@ def rate_limit(limit=100, window=60, per='ip'):
             else:
                 key = per
 
-            # Check rate limit
-            if not limiter.is_allowed(key, limit, window):
-                wait_time = limiter.get_wait_time(key, window)
-                return jsonify({
-                    'error': 'Rate limit exceeded',
-                    'retry_after': wait_time
-                }), 429
+            # Check rate limit; fail open if a shared backend is unavailable
+            try:
+                allowed, wait_time = limiter.hit(key, limit, window)
+            except Exception as e:
+                print(f"Warning: Rate limiter unavailable: {e}")
+                allowed, wait_time = True, 0.0
+            if not allowed:
+                retry_after = math.ceil(wait_time)
+                response = jsonify({'error': 'Rate limit exceeded', 'retry_after': retry_after})
+                response.headers['Retry-After'] = str(retry_after)
+                return response, 429
 
             return f(*args, **kwargs)
 
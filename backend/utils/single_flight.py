@@ -0,0 +1,76 @@
+"""
+Single Flight
+Coalesces concurrent identical calls so only one of them does the work
+"""
+
+import threading
+from typing import Any, Callable, Dict, Hashable, Tuple
+
+
+class _Call:
+    """One in-flight call and the callers waiting on it"""
+
+    __slots__ = ('done', 'result', 'error')
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    """
+    Run at most one call per key at a time
+
+    Callers arriving while a call for the same key is running wait for it
+    and receive its result (or exception) instead of starting their own.
+    Nothing is cached: once the call finishes, the next caller runs fn again.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self._calls: Dict[Hashable, _Call] = {}
+        self._stats = {'calls': 0, 'executions': 0, 'coalesced': 0}
+
+    def do(self, key: Hashable, fn: Callable[[], Any]) -> Tuple[Any, bool]:
+        """
+        Run fn, or join an identical call already in flight
+
+        Returns:
+            tuple: (result, shared), where shared is True for callers that
+            received another caller's result
+        """
+        with self.lock:
+            self._stats['calls'] += 1
+            call = self._calls.get(key)
+            if call is not None:
+                self._stats['coalesced'] += 1
+                leader = False
+            else:
+                call = self._calls[key] = _Call()
+                self._stats['executions'] += 1
+                leader = True
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result, True
+
+        try:
+            call.result = fn()
+            return call.result, False
+        except Exception as e:
+            call.error = e
+            raise
+        finally:
+            with self.lock:
+                del self._calls[key]
+            call.done.set()
+
+    def stats(self) -> Dict:
+        """Call counts and how many were served by another caller's fetch"""
+        with self.lock:
+            stats = dict(self._stats)
+            stats['in_flight'] = len(self._calls)
+        return stats
@@ -0,0 +1,192 @@
+"""
+Token Verifier
+Caches verified Firebase ID tokens so repeat requests skip signature checks
+"""
+
+import hashlib
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable, Dict, Optional, Tuple
+
+# Verified tokens kept in memory; the least recently used are dropped first
+TOKEN_CACHE_SIZE = int(os.getenv('TOKEN_CACHE_SIZE') or 10000)
+
+# Seconds between revocation checks of a cached token; 0 disables them
+TOKEN_REVOCATION_CHECK_INTERVAL = float(os.getenv('TOKEN_REVOCATION_CHECK_INTERVAL') or 300)
+
+
+def _firebase_verify(id_token: str, check_revoked: bool = False) -> Dict:
+    from firebase_admin import auth
+
+    return auth.verify_id_token(id_token, check_revoked=check_revoked)
+
+
+def _firebase_revoked_errors() -> Tuple[type, ...]:
+    from firebase_admin import auth
+
+    return (auth.RevokedIdTokenError, auth.UserDisabledError)
+
+
+class TokenVerifier:
+    """
+    Bounded cache of verified ID tokens, keyed by a SHA-256 hash of the token
+
+    A token seen for the first time is verified locally (signature and
+    claims, no call to Firebase) and then trusted until its exp claim.
+    When revocation checks are enabled, a cached token is re-verified with
+    check_revoked=True once every revocation_check_interval seconds, so a
+    revoked session is refused within one interval. Once a user's token
+    is found revoked or disabled, their tokens issued no later than it are
+    always checked with Firebase. Failures are never cached; a check that
+    fails for another reason (e.g. a network error) is retried on the
+    token's next request.
+    """
+
+    def __init__(self, verify: Callable[..., Dict] = _firebase_verify,
+                 maxsize: int = TOKEN_CACHE_SIZE,
+                 revocation_check_interval: float = TOKEN_REVOCATION_CHECK_INTERVAL,
+                 clock: Callable[[], float] = time.time,
+                 revoked_errors: Optional[Tuple[type, ...]] = None):
+        self.verify_fn = verify
+        # Errors meaning the session is revoked; default: Firebase's revoked and disabled errors
+        self.revoked_errors = revoked_errors
+        self.maxsize = maxsize
+        self.revocation_check_interval = revocation_check_interval
+        self.clock = clock
+        self.lock = threading.Lock()
+        self._entries: OrderedDict = OrderedDict()  # hash -> (claims, revocation checked at)
+        self._revoked: OrderedDict = OrderedDict()  # uid -> iat of their newest revoked token
+        self._stats = {
+            'hits': 0,
+            'misses': 0,
+            'verifications': 0,
+            'revocation_checks': 0,
+            'verify_seconds': 0.0,
+            'max_verify_seconds': 0.0,
+        }
+
+    @staticmethod
+    def _key(id_token: str) -> str:
+        # Never keep raw bearer tokens in memory longer than the request
+        return hashlib.sha256(id_token.encode('utf-8')).hexdigest()
+
+    def verify(self, id_token: str) -> Dict:
+        """
+        Verify a token, serving it from the cache when still valid
+
+        Returns:
+            dict: Decoded token claims
+
+        Raises:
+            Exception: Whatever the underlying verifier raises for a bad token
+        """
+        key = self._key(id_token)
+        now = self.clock()
+
+        with self.lock:
+            entry = self._entries.get(key)
+            # Only a cached token that is due a revocation check goes to Firebase
+            check_revoked = False
+            if entry is not None:
+                claims, checked_at = entry
+                if claims.get('exp', 0) <= now:
+                    # Expired: drop it and let the verifier reject the token
+                    del self._entries[key]
+                elif (not self.revocation_check_interval
+                      or now - checked_at < self.revocation_check_interval):
+                    self._entries.move_to_end(key)
+                    self._stats['hits'] += 1
+                    return claims
+                else:
+                    check_revoked = True
+            self._stats['misses'] += 1
+
+        try:
+            claims = self._timed_verify(id_token, check_revoked)
+            if not check_revoked and self._known_revoked(claims):
+                check_revoked = True
+                claims = self._timed_verify(id_token, check_revoked)
+        except Exception as e:
+            revoked = isinstance(e, self.revoked_errors or _firebase_revoked_errors())
+            if check_revoked and entry is not None and not revoked:
+                # Outcome unknown: keep the token due its check rather than
+                # let a local verification cache it again unchecked
+                raise
+            with self.lock:
+                self._entries.pop(key, None)
+                if revoked and entry is not None:
+                    self._record_revoked(entry[0])
+            raise
+
+        with self.lock:
+            self._entries[key] = (claims, now)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+        return claims
+
+    def _timed_verify(self, id_token: str, check_revoked: bool) -> Dict:
+        start = time.perf_counter()
+        try:
+            if check_revoked:
+                return self.verify_fn(id_token, check_revoked=True)
+            return self.verify_fn(id_token)
+        finally:
+            elapsed = time.perf_counter() - start
+            with self.lock:
+                self._stats['verifications'] += 1
+                self._stats['revocation_checks'] += int(check_revoked)
+                self._stats['verify_seconds'] += elapsed
+                self._stats['max_verify_seconds'] = max(self._stats['max_verify_seconds'], elapsed)
+
+    def _known_revoked(self, claims: Dict) -> bool:
+        """Whether a token may belong to a session already found revoked"""
+        with self.lock:
+            revoked_iat = self._revoked.get(claims.get('uid'))
+        return revoked_iat is not None and claims.get('iat', 0) <= revoked_iat
+
+    def _record_revoked(self, claims: Dict):
+        """Remember a user's token failed its revocation check; call with the lock held"""
+        uid = claims.get('uid')
+        self._revoked[uid] = max(self._revoked.get(uid, 0), claims.get('iat', 0))
+        self._revoked.move_to_end(uid)
+        while len(self._revoked) > self.maxsize:
+            self._revoked.popitem(last=False)
+
+    def clear(self):
+        """Drop every cached token"""
+        with self.lock:
+            self._entries.clear()
+            self._revoked.clear()
+
+    def stats(self) -> Dict:
+        """Cache and verification-time metrics"""
+        with self.lock:
+            stats = dict(self._stats)
+            size = len(self._entries)
+        verifications = stats['verifications']
+        return {
+            'cached_tokens': size,
+            'hits': stats['hits'],
+            'misses': stats['misses'],
+            'verifications': verifications,
+            'revocation_checks': stats['revocation_checks'],
+            'avg_verify_ms': round(stats['verify_seconds'] * 1000 / verifications, 3)
+            if verifications else 0.0,
+            'max_verify_ms': round(stats['max_verify_seconds'] * 1000, 3),
+        }
+
+
+_default_verifier: Optional[TokenVerifier] = None
+_default_verifier_lock = threading.Lock()
+
+
+def get_token_verifier() -> TokenVerifier:
+    """Get the process-wide token verifier"""
+    global _default_verifier
+    with _default_verifier_lock:
+        if _default_verifier is None:
+            _default_verifier = TokenVerifier()
+        return _default_verifier
@@ -2,18 +2,45 @@
 Request validation utilities using Pydantic
 """
 
-from functools import wraps
+from functools import wraps, lru_cache
 from flask import request, jsonify
 from werkzeug.exceptions import BadRequest
-from pydantic import BaseModel, ValidationError
-from typing import Type, Callable
+from pydantic import BaseModel, TypeAdapter, ValidationError
+from typing import Any, Type, Callable, Optional
 import logging
 
 
-def validate_request(schema: Type[BaseModel]) -> Callable:
+@lru_cache(maxsize=None)
+def get_type_adapter(schema: Any) -> TypeAdapter:
+    """Get the TypeAdapter of a schema, building it once per process"""
+    return TypeAdapter(schema)
+
+
+def validate_json(schema: Any, raw: bytes, strict: Optional[bool] = None) -> Any:
+    """
+    Parse and validate a raw JSON document in one pass
+
+    Args:
+        schema: Pydantic model or any type a TypeAdapter accepts
+        raw: JSON bytes or str
+        strict: Override the schema's strict mode (None keeps its config)
+
+    Returns:
+        Validated object
+
+    Raises:
+        ValidationError: If the JSON is malformed or does not match the schema
+    """
+    return get_type_adapter(schema).validate_json(raw, strict=strict)
+
+
+def validate_request(schema: Type[BaseModel], strict: Optional[bool] = None) -> Callable:
     """
     Decorator to validate Flask request JSON against a Pydantic schema
 
+    The raw body is validated directly by pydantic-core, without first
+    being decoded into Python dicts by request.get_json().
+
     Usage:
         @bp.route('/endpoint', methods=['POST'])
         @validate_request(MyRequestSchema)
@@ -23,6 +50,7 @@ def validate_request(schema: Type[BaseModel]) -> Callable:
 
     Args:
         schema: Pydantic BaseModel class for validation
+        strict: Override the schema's strict mode (None keeps its config)
 
     Returns:
         Decorated function that validates request data
@@ -31,17 +59,16 @@ def validate_request(schema: Type[BaseModel]) -> Callable:
         @wraps(f)
         def decorated_function(*args, **kwargs):
             try:
-                # Get JSON data from request
-                data = request.get_json()
+                raw = request.get_data(cache=True)
 
-                if data is None:
+                if not request.is_json or not raw.strip():
                     return jsonify({
                         'error': 'Request body must be valid JSON',
                         'details': 'No JSON data provided'
                     }), 400
 
-                # Validate against schema
-                validated_data = schema(**data)
+                # Parse and validate against schema in one pass
+                validated_data = validate_json(schema, raw, strict)
 
                 # Store validated data in request context
                 request.validated_data = validated_data
@@ -50,6 +77,12 @@ def validate_request(schema: Type[BaseModel]) -> Callable:
                 return f(*args, **kwargs)
 
             except ValidationError as e:
+                if any(error['type'] == 'json_invalid' for error in e.errors()):
+                    return jsonify({
+                        'error': 'Invalid JSON',
+                        'details': e.errors()[0]['msg']
+                    }), 400
+
                 # Return validation errors
                 errors = []
                 for error in e.errors():
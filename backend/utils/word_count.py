@@ -0,0 +1,31 @@
+"""
+Word Count
+Counts words in bounded memory, however long the text
+"""
+
+# Characters split at a time; the largest temporary list holds one chunk's words
+WORD_COUNT_CHUNK = 8 * 1024
+
+
+def count_words(text: str) -> int:
+    """
+    Number of whitespace-separated words, as len(text.split()) would count them
+
+    Long texts are scanned a chunk at a time, so memory use stays flat
+    instead of growing with a list of every word. A word cut by a chunk
+    boundary is counted once.
+    """
+    if not text:
+        return 0
+    if len(text) <= WORD_COUNT_CHUNK:
+        return len(text.split())
+
+    count = 0
+    open_word = False
+    for start in range(0, len(text), WORD_COUNT_CHUNK):
+        chunk = text[start:start + WORD_COUNT_CHUNK]
+        count += len(chunk.split())
+        if open_word and not chunk[0].isspace():
+            count -= 1
+        open_word = not chunk[-1].isspace()
+    return count